@@ -0,0 +1,210 @@
+"""
+Admission control for extraction requests
+At most `max_in_flight` requests are processed at once and at most
+`max_queued` more wait for a slot, in arrival order. Anything beyond that,
+or a request that waits longer than the queue timeout, is turned away with
+429 and a Retry-After computed from the measured completion rate, before its
+upload is read. Work in progress stays bounded, so throughput holds steady
+under overload instead of every request slowing down together.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Sequence
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight slots with a bounded FIFO queue and drain-rate tracking"""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queued: int = 0,
+        queue_timeout: float = 10.0,
+        rate_window: float = 10.0,
+        max_retry_after: int = 60
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            max_in_flight: Requests processed at once
+            max_queued: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request waits for a slot before it is rejected
+            rate_window: Seconds of completions the drain rate is measured over
+            max_retry_after: Upper bound of the Retry-After hint in seconds
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.rate_window = max(1.0, rate_window)
+        self.max_retry_after = max(1, max_retry_after)
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._completions: Deque[float] = deque()
+
+        # Statistics
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Take an in-flight slot, waiting in line if all are busy
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"Server is at capacity ({self.in_flight} requests in flight, {self.queued} queued)",
+                self.retry_after()
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended: pass it on
+                self._hand_off()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"No capacity within {self.queue_timeout:g} s", self.retry_after()
+            )
+        self.admitted += 1
+
+    def release(self) -> None:
+        """Return a slot after the response has been sent"""
+        now = time.monotonic()
+        self._completions.append(now)
+        self._trim(now)
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        """Give a free slot to the longest waiting request, if any"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _trim(self, now: float) -> None:
+        while self._completions and self._completions[0] < now - self.rate_window:
+            self._completions.popleft()
+
+    def drain_rate(self) -> float:
+        """Requests completed per second over the rate window"""
+        self._trim(time.monotonic())
+        return len(self._completions) / self.rate_window
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the current queue is expected to drain, at least 1
+
+        Without recent completions the queue timeout is used, since that is
+        how long a queued request may take to be either served or rejected.
+        """
+        rate = self.drain_rate()
+        if rate <= 0:
+            estimate = self.queue_timeout
+        else:
+            estimate = (self.queued + 1) / rate
+        return min(self.max_retry_after, max(1, math.ceil(estimate)))
+
+    def load(self) -> dict:
+        """
+        Load signal for /health and autoscaling
+
+        utilization is in-flight plus queued requests over the total capacity:
+        above 1 - max_queued / capacity requests queue, at 1 new ones are rejected.
+        """
+        capacity = self.max_in_flight + self.max_queued
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'max_in_flight': self.max_in_flight,
+            'max_queued': self.max_queued,
+            'utilization': round((self.in_flight + self.queued) / capacity, 3),
+            'drain_rate_per_s': round(self.drain_rate(), 3),
+            'retry_after_s': self.retry_after(),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests to the given paths through an AdmissionController"""
+
+    def __init__(self, app, controller: AdmissionController, endpoints: Sequence[str]):
+        """
+        Args:
+            app: ASGI application
+            controller: Shared admission state
+            endpoints: Paths subject to admission control
+        """
+        self.app = app
+        self.controller = controller
+        self.endpoints = frozenset(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire()
+        except AdmissionRejected as e:
+            await self._reject(send, e)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    async def _reject(send, rejection: AdmissionRejected) -> None:
+        """429 with Retry-After, sent without reading the request body"""
+        body = json.dumps({"detail": rejection.reason}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(rejection.retry_after).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,212 @@
+"""
+ONNX Runtime session autotuner
+Sweeps thread counts, execution mode, memory arena/pattern, spinning and
+batch size on this machine and saves the setting with the best throughput
+whose p99 latency meets the target as a named tuning profile.
+
+The default sweep is staged (threads and execution mode, then memory
+options, then batch size), each stage keeping the previous stage's winner;
+--exhaustive measures the full grid.
+
+Usage:
+    python autotune.py --target-p99-ms 50 --profile tuning_profiles.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import SessionTuning, settings
+from feature_extractor import ResNet50FeatureExtractor
+from session_tuning import node_fingerprint, save_tuning_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+
+
+def thread_counts(cores: int) -> List[int]:
+    """1, 2, 4, ... and the core count"""
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def threading_candidates(cores: int) -> List[SessionTuning]:
+    """Sequential execution at each thread count, plus parallel execution with two inter-op threads"""
+    candidates = [SessionTuning(intra_op_threads=threads, inter_op_threads=1) for threads in thread_counts(cores)]
+    candidates += [
+        SessionTuning(intra_op_threads=threads, inter_op_threads=2, execution_mode="parallel")
+        for threads in thread_counts(cores) if threads * 2 <= cores
+    ]
+    return candidates
+
+
+def memory_candidates(base: SessionTuning) -> List[SessionTuning]:
+    """Arena, memory pattern and spinning combinations on top of a threading setting"""
+    return [
+        base.model_copy(update={'enable_cpu_mem_arena': arena, 'enable_mem_pattern': pattern, 'allow_spinning': spinning})
+        for arena, pattern, spinning in itertools.product((True, False), repeat=3)
+    ]
+
+
+class SessionBenchmark:
+    """Times inference for a tuning on random input, reusing the session across batch sizes"""
+
+    def __init__(self, model_path: str, iterations: int = 50, warmup: int = 5):
+        self.model_path = model_path
+        self.iterations = iterations
+        self.warmup = warmup
+        self._key: Optional[str] = None
+        self._extractor: Optional[ResNet50FeatureExtractor] = None
+
+    def __call__(self, tuning: SessionTuning, batch_size: int) -> Dict[str, float]:
+        """
+        Measure one setting
+
+        Returns:
+            images_per_second and p50/p99/mean latency of one inference call in ms
+        """
+        key = tuning.model_copy(update={'batch_size': 1}).model_dump_json()
+        if key != self._key:
+            self._extractor = None  # release the previous session first
+            self._extractor = ResNet50FeatureExtractor(self.model_path, tuning=tuning)
+            self._key = key
+
+        width, height = self._extractor.input_size
+        batch = np.random.default_rng(0).standard_normal((batch_size, 3, height, width)).astype(np.float32)
+        for _ in range(self.warmup):
+            self._extractor.run_inference(batch)
+
+        latencies = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            self._extractor.run_inference(batch)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        mean_ms = float(np.mean(latencies))
+        return {
+            'images_per_second': round(batch_size * 1000 / mean_ms, 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+            'mean_ms': round(mean_ms, 3)
+        }
+
+
+def select_best(trials: List[dict], target_p99_ms: float) -> dict:
+    """Highest throughput within the p99 target; the lowest p99 if nothing meets it"""
+    within = [trial for trial in trials if trial['measured']['p99_ms'] <= target_p99_ms]
+    if within:
+        return max(within, key=lambda trial: trial['measured']['images_per_second'])
+    return min(trials, key=lambda trial: trial['measured']['p99_ms'])
+
+
+def autotune(
+    measure: Callable[[SessionTuning, int], Dict[str, float]],
+    cores: int,
+    target_p99_ms: float,
+    batch_sizes: Optional[List[int]] = None,
+    exhaustive: bool = False
+) -> dict:
+    """
+    Search for the best tuning on this machine
+
+    Args:
+        measure: (tuning, batch_size) -> measurement dict, e.g. a SessionBenchmark
+        cores: Usable cores
+        target_p99_ms: Latency target per inference call
+        batch_sizes: Batch sizes to try
+        exhaustive: Measure every combination instead of the staged sweep
+
+    Returns:
+        Dict with the selected 'tuning' (SessionTuning), its 'measured' numbers,
+        whether it 'meets_target', and all 'trials'
+    """
+    batch_sizes = sorted(batch_sizes or DEFAULT_BATCH_SIZES)
+    trials: List[dict] = []
+
+    def run(candidates: List[SessionTuning], sizes: List[int]) -> dict:
+        stage = []
+        for tuning, batch_size in itertools.product(candidates, sizes):
+            tuning = tuning.model_copy(update={'batch_size': batch_size})
+            trial = {'tuning': tuning, 'measured': measure(tuning, batch_size)}
+            logger.info(f"{tuning.model_dump()} -> {trial['measured']}")
+            stage.append(trial)
+        trials.extend(stage)
+        return select_best(stage, target_p99_ms)
+
+    if exhaustive:
+        candidates = [m for t in threading_candidates(cores) for m in memory_candidates(t)]
+        best = run(candidates, batch_sizes)
+    else:
+        smallest = batch_sizes[:1]
+        best = run(threading_candidates(cores), smallest)
+        best = run(memory_candidates(best['tuning']), smallest)
+        best = run([best['tuning']], batch_sizes)
+
+    return {
+        'tuning': best['tuning'],
+        'measured': best['measured'],
+        'meets_target': best['measured']['p99_ms'] <= target_p99_ms,
+        'trials': trials
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find the fastest ONNX Runtime settings within a p99 target")
+    parser.add_argument("--model", default=settings.serving_model_path)
+    parser.add_argument("--target-p99-ms", type=float, required=True, help="Latency target per inference call")
+    parser.add_argument("--batch-sizes", default=",".join(str(size) for size in DEFAULT_BATCH_SIZES))
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per setting")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--exhaustive", action="store_true", help="Measure the full grid instead of stages")
+    parser.add_argument("--profile", default=settings.tuning_profile_path or "tuning_profiles.json",
+                        help="Profile file to add the result to")
+    parser.add_argument("--name", default=None, help="Profile name (default: this node's CPU fingerprint)")
+    parser.add_argument("--report", help="Also write every trial to this JSON file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    result = autotune(
+        SessionBenchmark(args.model, iterations=args.iterations, warmup=args.warmup),
+        cores=cores,
+        target_p99_ms=args.target_p99_ms,
+        batch_sizes=[int(size) for size in args.batch_sizes.split(',')],
+        exhaustive=args.exhaustive
+    )
+
+    name = args.name or node_fingerprint()
+    save_tuning_profile(
+        args.profile,
+        name,
+        result['tuning'],
+        result['measured'],
+        target_p99_ms=args.target_p99_ms,
+        meets_target=result['meets_target'],
+        cores=cores,
+        model=os.path.basename(args.model)
+    )
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(
+                [{'tuning': t['tuning'].model_dump(), 'measured': t['measured']} for t in result['trials']],
+                f, indent=2
+            )
+
+    print(f"Profile '{name}': {result['tuning'].model_dump()}")
+    print(f"  {result['measured']['images_per_second']} images/s, p99 {result['measured']['p99_ms']} ms"
+          f"{'' if result['meets_target'] else ' (target not met; lowest-latency setting saved)'}")
+    print(f"Written to {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Dynamic micro-batching for the feature extractor
+Collects single-image requests that arrive within a short window and runs
+them as one batched inference, fanning results back to the waiting callers.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from feature_extractor import ResNet50FeatureExtractor
+from metrics import observe_batch_size, stage_timer
+from pipeline import StagePool
+from preprocessing import BatchBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent preprocessed inputs into batched inference calls.
+
+    The first request of a batch opens a window of `window_ms`; every request
+    arriving before the window closes (up to `max_batch_size`) joins the batch.
+    While a batch is running, new requests queue up and form the next one.
+    """
+
+    def __init__(
+        self,
+        extractor: ResNet50FeatureExtractor,
+        max_batch_size: int = 16,
+        window_ms: float = 5.0,
+        executor: Optional[StagePool] = None
+    ):
+        """
+        Initialize the batcher
+
+        Args:
+            extractor: Loaded feature extractor used to run the batches
+            max_batch_size: Maximum number of requests per inference call
+            window_ms: How long to wait for more requests after the first one
+            executor: Stage pool that runs inference (event loop default executor if None)
+        """
+        self.extractor = extractor
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = max(0.0, window_ms) / 1000.0
+
+        self.batch_buffer = BatchBuffer()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.batches_run = 0
+        self.items_processed = 0
+
+    async def start(self) -> None:
+        """Start the background batching loop"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batcher started (max_batch_size={self.max_batch_size}, "
+            f"window_ms={self.window_seconds * 1000:.1f})"
+        )
+
+    async def stop(self) -> None:
+        """Stop the batching loop and fail any requests still queued"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        logger.info("Micro-batcher stopped")
+
+    async def submit(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        Queue a preprocessed image for batched inference and wait for its result
+
+        Args:
+            input_tensor: Preprocessed tensor (1, 3, 224, 224) from prepare_image
+
+        Returns:
+            L2-normalized feature vector for this input
+
+        Raises:
+            RuntimeError: If the batcher is not running or inference failed
+        """
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((input_tensor, future))
+        return await future
+
+    def stats(self) -> dict:
+        """Current queue depth and batching statistics"""
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'batches_run': self.batches_run,
+            'items_processed': self.items_processed,
+            'avg_batch_size': round(self.items_processed / self.batches_run, 2) if self.batches_run else 0.0
+        }
+
+    async def _collect_batch(self) -> list:
+        """Wait for the first request, then gather more until the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window_seconds
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    def _infer_stacked(self, tensors: List[np.ndarray]) -> np.ndarray:
+        """Stack tensors into the worker thread's reusable buffer and run the model"""
+        observe_batch_size(len(tensors))
+        with stage_timer("inference"):
+            return self.extractor.run_inference(self.batch_buffer.stack(tensors))
+
+    async def _infer(self, tensors: List[np.ndarray]) -> np.ndarray:
+        """Run inference for a batch of tensors on the configured executor"""
+        if self.executor is not None:
+            return await self.executor.run(self._infer_stacked, tensors)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._infer_stacked, tensors)
+
+    async def _run(self) -> None:
+        """Batching loop: collect, run one inference, fan results out"""
+        while True:
+            batch = await self._collect_batch()
+
+            # Callers that already gave up do not need inference
+            batch = [(tensor, future) for tensor, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                features = await self._infer([tensor for tensor, _ in batch])
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError(str(e)))
+                continue
+
+            self.batches_run += 1
+            self.items_processed += len(batch)
+
+            for row, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(features[row])
@@ -0,0 +1,475 @@
+"""
+Offline bulk embedding
+Embeds a directory tree or a manifest of images with ResNet50FeatureExtractor
+without going through the HTTP service. Images are decoded and preprocessed in
+a process pool, run through the model in batches, and appended to a
+memory-mapped float32 matrix with one id per row. Progress is checkpointed
+every few batches, so a run that was interrupted resumes where it stopped
+when started again with the same arguments.
+
+Output directory:
+    vectors.npy       (capacity, dimension) float32 .npy; rows [0, rows) are valid
+    ids.txt           Id of each row, one per line
+    errors.txt        id<TAB>error for each image that could not be embedded
+    checkpoint.json   Inputs, model, progress and images per second
+
+Manifest lines are an image path, or an id and a path separated by a tab;
+relative paths are resolved against the manifest's directory. Images found by
+walking a directory get their relative path as id.
+
+Usage:
+    python bulk_embed.py --images /data/catalog --output /data/embeddings
+    python bulk_embed.py --manifest images.tsv --output /data/embeddings --batch-size 64
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+from feature_extractor import ResNet50FeatureExtractor
+from quantize_model import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.txt"
+ERRORS_FILE = "errors.txt"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Images per decode task sent to a worker process
+_DECODE_CHUNK = 8
+
+# Decode-only extractor of this process (set by _init_decoder)
+_decoder: Optional[ResNet50FeatureExtractor] = None
+
+# (id, path) of one input image
+Item = Tuple[str, str]
+
+
+def walk_images(root: str) -> List[Item]:
+    """Images under a directory, recursively, with their relative path as id, sorted"""
+    items = []
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(names):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(directory, name)
+                items.append((os.path.relpath(path, root).replace(os.sep, '/'), path))
+    return items
+
+
+def read_manifest(manifest_path: str) -> List[Item]:
+    """
+    Images listed in a manifest
+
+    Raises:
+        ValueError: If an id appears twice
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    items = []
+    seen = set()
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            image_id, _, path = line.partition('\t')
+            if not path:
+                image_id, path = line, line
+            if image_id in seen:
+                raise ValueError(f"Duplicate id in manifest: {image_id}")
+            seen.add(image_id)
+            items.append((image_id, os.path.join(base, path)))
+    return items
+
+
+def fingerprint(items: Sequence[Item]) -> str:
+    """Digest of the input list; a checkpoint only resumes the same inputs in the same order"""
+    digest = hashlib.sha256()
+    for image_id, _ in items:
+        digest.update(f"{image_id}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _init_decoder(decoder_options: dict) -> None:
+    """Create this process's decode-only extractor"""
+    global _decoder
+    _decoder = ResNet50FeatureExtractor(load_model=False, **decoder_options)
+
+
+def _decode(paths: Sequence[str]) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+    """Read and preprocess images into model input tensors, or an error per image"""
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                tensor, _ = _decoder.prepare_image(f.read())
+            results.append((tensor, None))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+
+def decode_in_order(
+    paths: Sequence[str], pool: Optional[ProcessPoolExecutor], prefetch: int
+) -> Iterator[Tuple[Optional[np.ndarray], Optional[str]]]:
+    """
+    Decoded tensors in input order, keeping at most `prefetch` chunks in flight
+
+    Args:
+        paths: Image files
+        pool: Decode processes (decoded in this process if None)
+        prefetch: Chunks submitted ahead of the one being consumed
+
+    Yields:
+        (tensor, error) per path
+    """
+    chunks = (paths[start:start + _DECODE_CHUNK] for start in range(0, len(paths), _DECODE_CHUNK))
+    if pool is None:
+        for chunk in chunks:
+            yield from _decode(chunk)
+        return
+
+    pending: Deque = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_decode, chunk))
+        if len(pending) > prefetch:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def _truncate_lines(path: str, count: int) -> None:
+    """Keep the first `count` lines of a text file (lines written after the last checkpoint are dropped)"""
+    if not os.path.exists(path):
+        open(path, 'w').close()
+        return
+    with open(path, encoding='utf-8', newline='') as f:
+        lines = f.read().split('\n')[:-1]
+    if len(lines) != count:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(''.join(line + '\n' for line in lines[:count]))
+
+
+class EmbeddingWriter:
+    """
+    Memory-mapped output of a bulk run and its checkpoint.
+
+    The vector file is allocated for every input image up front, so rows are
+    written in place and never copied. A checkpoint records how many inputs
+    were consumed and how many rows and errors that produced, after the rows
+    and ids have been flushed; reopening truncates anything written later.
+    """
+
+    def __init__(self, directory: str, items: Sequence[Item], model: dict, restart: bool = False):
+        """
+        Open the output directory, resuming from its checkpoint if there is one
+
+        Args:
+            directory: Output directory (created if missing)
+            items: The run's input images
+            model: Model name and version recorded with the vectors
+            restart: Discard any existing output instead of resuming
+
+        Raises:
+            ValueError: If the checkpoint belongs to other inputs or another model
+        """
+        self.directory = directory
+        if restart and os.path.isdir(directory):
+            for name in (VECTORS_FILE, IDS_FILE, ERRORS_FILE, CHECKPOINT_FILE):
+                if os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+        os.makedirs(directory, exist_ok=True)
+
+        self.state = {
+            'fingerprint': fingerprint(items),
+            'total': len(items),
+            'model': model,
+            'dimension': None,
+            'next_index': 0,
+            'rows': 0,
+            'failed': 0,
+            'completed': False
+        }
+        saved = self._read_checkpoint()
+        if saved is not None:
+            for key in ('fingerprint', 'total', 'model'):
+                if saved.get(key) != self.state[key]:
+                    raise ValueError(
+                        f"{directory} holds a run for different inputs or another model ({key} differs); "
+                        f"use another output directory or --restart"
+                    )
+            self.state.update(saved)
+
+        self.vectors: Optional[np.memmap] = None
+        vectors_path = os.path.join(directory, VECTORS_FILE)
+        if self.state['dimension'] is not None and os.path.exists(vectors_path):
+            self.vectors = np.load(vectors_path, mmap_mode='r+')
+        elif self.state['rows']:
+            raise ValueError(f"{vectors_path} is missing; use --restart")
+
+        ids_path = os.path.join(directory, IDS_FILE)
+        errors_path = os.path.join(directory, ERRORS_FILE)
+        _truncate_lines(ids_path, self.state['rows'])
+        _truncate_lines(errors_path, self.state['failed'])
+        self._ids_file = open(ids_path, 'a', encoding='utf-8', newline='')
+        self._errors_file = open(errors_path, 'a', encoding='utf-8', newline='')
+        self.rows = self.state['rows']
+        self.failed = self.state['failed']
+
+    @property
+    def next_index(self) -> int:
+        """Position in the input list to continue from"""
+        return self.state['next_index']
+
+    def _read_checkpoint(self) -> Optional[dict]:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Write vectors to the next rows and their ids"""
+        if self.vectors is None:
+            self.state['dimension'] = int(vectors.shape[1])
+            self.vectors = np.lib.format.open_memmap(
+                os.path.join(self.directory, VECTORS_FILE),
+                mode='w+',
+                dtype=np.float32,
+                shape=(max(1, self.state['total']), vectors.shape[1])
+            )
+        self.vectors[self.rows:self.rows + len(ids)] = vectors
+        self._ids_file.write(''.join(image_id + '\n' for image_id in ids))
+        self.rows += len(ids)
+
+    def fail(self, image_id: str, error: str) -> None:
+        """Record an image that could not be embedded"""
+        self._errors_file.write(f"{image_id}\t{' '.join(error.split())}\n")
+        self.failed += 1
+
+    def checkpoint(self, next_index: int, completed: bool = False, **stats) -> None:
+        """
+        Flush the output, then record progress atomically
+
+        Args:
+            next_index: Inputs before this position are embedded or recorded as failed
+            completed: Every input has been processed
+            **stats: Extra values stored in the checkpoint (throughput)
+        """
+        if self.vectors is not None:
+            self.vectors.flush()
+        for handle in (self._ids_file, self._errors_file):
+            handle.flush()
+            os.fsync(handle.fileno())
+
+        self.state.update(stats)
+        self.state.update({
+            'next_index': next_index,
+            'rows': self.rows,
+            'failed': self.failed,
+            'completed': completed
+        })
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def close(self) -> None:
+        self._ids_file.close()
+        self._errors_file.close()
+        self.vectors = None
+
+
+def embed(
+    items: Sequence[Item],
+    extractor: ResNet50FeatureExtractor,
+    writer: EmbeddingWriter,
+    decoder_options: dict,
+    batch_size: int = 32,
+    decode_workers: int = 0,
+    checkpoint_every: int = 10,
+    progress_interval: float = 10.0
+) -> dict:
+    """
+    Embed the inputs the writer has not checkpointed yet
+
+    Decoding runs ahead in the worker processes while the model runs a batch.
+    On KeyboardInterrupt the last complete batch is checkpointed before
+    re-raising, so nothing already embedded is redone on resume.
+
+    Args:
+        items: All input images of the run
+        extractor: Loaded extractor running the batches
+        writer: Output and checkpoint
+        decoder_options: ResNet50FeatureExtractor options for the decode processes
+        batch_size: Images per inference call
+        decode_workers: Decode processes (0 = decode in this process)
+        checkpoint_every: Batches between checkpoints
+        progress_interval: Seconds between progress log lines
+
+    Returns:
+        Summary with images embedded and failed in this run and images per second
+    """
+    start_index = writer.next_index
+    remaining = items[start_index:]
+    if start_index:
+        logger.info(f"Resuming at image {start_index} of {len(items)} ({writer.rows} embedded, {writer.failed} failed)")
+
+    start = time.perf_counter()
+    last_report = start
+    batches = 0
+    position = start_index
+    # Progress that the output on disk fully reflects (updated after each batch)
+    committed = (start_index, writer.rows, writer.failed)
+    batch_ids: List[str] = []
+    batch_tensors: List[np.ndarray] = []
+
+    def throughput() -> dict:
+        elapsed = time.perf_counter() - start
+        processed = committed[0] - start_index
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'images_per_second': round(processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+    def run_batch() -> None:
+        nonlocal batches, committed
+        if batch_ids:
+            writer.append(batch_ids, extractor.run_inference(extractor.batch_buffer.stack(batch_tensors)))
+            batch_ids.clear()
+            batch_tensors.clear()
+            batches += 1
+        committed = (position, writer.rows, writer.failed)
+
+    pool = None
+    if decode_workers > 0:
+        # Spawned, not forked: this process holds an ONNX Runtime session and its threads
+        pool = ProcessPoolExecutor(
+            max_workers=decode_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_decoder,
+            initargs=(decoder_options,)
+        )
+    else:
+        _init_decoder(decoder_options)
+
+    try:
+        decoded = decode_in_order([path for _, path in remaining], pool, prefetch=2 * max(1, decode_workers))
+        for (image_id, _), (tensor, error) in zip(remaining, decoded):
+            position += 1
+            if error is not None:
+                writer.fail(image_id, error)
+            else:
+                batch_ids.append(image_id)
+                batch_tensors.append(tensor)
+            if len(batch_ids) < batch_size:
+                continue
+
+            run_batch()
+            if batches % checkpoint_every == 0:
+                writer.checkpoint(position, **throughput())
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                logger.info(
+                    f"{position}/{len(items)} images, {writer.rows} embedded, {writer.failed} failed, "
+                    f"{throughput()['images_per_second']} img/s"
+                )
+
+        run_batch()
+        writer.checkpoint(position, completed=True, **throughput())
+    except KeyboardInterrupt:
+        # Only the rows of complete batches are kept; the rest is redone on resume
+        next_index, writer.rows, writer.failed = committed
+        writer.checkpoint(next_index, **throughput())
+        logger.info(f"Interrupted; checkpointed at image {next_index} of {len(items)}")
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    return {
+        'total': len(items),
+        'resumed_from': start_index,
+        'processed': position - start_index,
+        'embedded': writer.rows,
+        'failed': writer.failed,
+        'batches': batches,
+        **throughput()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embed a directory or manifest of images into a memory-mapped matrix")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--images", help="Directory walked recursively for images")
+    source.add_argument("--manifest", help="File of image paths, or id<TAB>path lines")
+    parser.add_argument("--output", required=True, help="Output directory (resumed if it holds a checkpoint)")
+    parser.add_argument("--model", default=settings.serving_model_path, help="ONNX model")
+    parser.add_argument("--model-name", default=settings.model_name)
+    parser.add_argument("--model-version", default=settings.serving_model_version)
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per inference call")
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count() or 1,
+                        help="Decode processes (0 = decode in the main process)")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Batches between checkpoints")
+    parser.add_argument("--fast-decode", action="store_true", default=settings.fast_decode)
+    parser.add_argument("--restart", action="store_true", help="Discard existing output instead of resuming")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    items = walk_images(args.images) if args.images else read_manifest(args.manifest)
+    model = {'model_name': args.model_name, 'model_version': args.model_version}
+    writer = EmbeddingWriter(args.output, items, model, restart=args.restart)
+    if writer.state['completed']:
+        print(f"{args.output} is complete: {writer.rows} embedded, {writer.failed} failed")
+        writer.close()
+        return
+
+    decoder_options = {
+        'model_path': args.model,
+        'fast_decode': args.fast_decode,
+        'resample': settings.resample_filter,
+        'perceptual_hash': None,
+        'input_size': tuple(settings.input_size),
+        'normalization_mean': tuple(settings.normalization_mean),
+        'normalization_std': tuple(settings.normalization_std)
+    }
+    extractor = ResNet50FeatureExtractor(
+        load_model=True,
+        optimized_model_dir=settings.optimized_model_dir,
+        optimized_model_format=settings.optimized_model_format,
+        **decoder_options
+    )
+    try:
+        summary = embed(
+            items,
+            extractor,
+            writer,
+            decoder_options,
+            batch_size=max(1, args.batch_size),
+            decode_workers=max(0, args.decode_workers),
+            checkpoint_every=max(1, args.checkpoint_every)
+        )
+    finally:
+        writer.close()
+
+    print(f"{summary['processed']} images in {summary['elapsed_s']} s ({summary['images_per_second']} img/s); "
+          f"{summary['embedded']} embedded, {summary['failed']} failed in total")
+    print(f"Vectors written to {os.path.join(args.output, VECTORS_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Near-duplicate clustering of feature vectors
+Groups L2-normalized vectors whose cosine similarity reaches a threshold,
+transitively (single linkage): the similarity matrix is computed block by
+block with matrix products, keeping only the upper triangle, and every pair
+above the threshold is merged with union-find. Memory stays at one
+block_size x N score block however large the set is.
+"""
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path compression and union by size"""
+
+    def __init__(self, count: int):
+        self.parent = list(range(count))
+        self.size = [1] * count
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of a and b; False if they were already one set"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+    def groups(self) -> List[List[int]]:
+        """Members of each set, each sorted, sets ordered by their first member"""
+        members: Dict[int, List[int]] = {}
+        for item in range(len(self.parent)):
+            members.setdefault(self.find(item), []).append(item)
+        return sorted(members.values(), key=lambda group: group[0])
+
+
+def similar_pairs(
+    vectors: np.ndarray, threshold: float, block_size: int = 1024
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Pairs (i < j) with cosine similarity >= threshold, one score block at a time
+
+    Args:
+        vectors: (N, D) L2-normalized vectors
+        threshold: Minimum cosine similarity
+        block_size: Rows per score block
+
+    Yields:
+        (rows, columns, similarities) arrays for each block
+    """
+    count = vectors.shape[0]
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        # Only columns from `start` on: pairs with earlier rows were covered by earlier blocks
+        scores = vectors[start:stop] @ vectors[start:].T
+        rows, columns = np.nonzero(scores >= threshold)
+        upper = columns > rows
+        rows, columns = rows[upper], columns[upper]
+        yield rows + start, columns + start, scores[rows, columns]
+
+
+def cluster_vectors(
+    vectors: np.ndarray, threshold: float, block_size: int = 1024
+) -> Tuple[List[List[int]], Dict[str, int]]:
+    """
+    Group vectors connected by similarities at or above the threshold
+
+    Args:
+        vectors: (N, D) L2-normalized vectors
+        threshold: Minimum cosine similarity for two vectors to be linked
+        block_size: Rows per score block
+
+    Returns:
+        Tuple of (clusters, stats)
+        - clusters: Member indices of every cluster (singletons included),
+          largest first, then by first member
+        - stats: pairwise comparisons and pairs at or above the threshold
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count = vectors.shape[0]
+    sets = UnionFind(count)
+    pairs = 0
+
+    for rows, columns, _ in similar_pairs(vectors, threshold, block_size):
+        pairs += rows.size
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            sets.union(row, column)
+
+    clusters = sorted(sets.groups(), key=lambda group: (-len(group), group[0]))
+    stats = {
+        'comparisons': count * (count - 1) // 2,
+        'pairs_above_threshold': pairs
+    }
+    return clusters, stats
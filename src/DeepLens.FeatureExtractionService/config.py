@@ -3,9 +3,17 @@ Configuration module for Feature Extraction Service
 Stateless ML inference service for image feature extraction using ResNet50.
 Loads settings from environment variables with defaults for development.
 """
+import os
+
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Literal, Tuple
+
+
+def quantized_model_path_for(model_path: str) -> str:
+    """Default INT8 model path next to the fp32 one (resnet50-v2-7.onnx -> resnet50-v2-7-int8.onnx)"""
+    root, extension = os.path.splitext(model_path)
+    return f"{root}-int8{extension or '.onnx'}"
 
 
 class ModelConfig(BaseModel):
@@ -20,6 +28,18 @@ class ModelConfig(BaseModel):
     description: str = ""
 
 
+class SessionTuning(BaseModel):
+    """ONNX Runtime session options and inference batch size for one node type"""
+    graph_optimization_level: Literal["disable", "basic", "extended", "all"] = "all"
+    intra_op_threads: int = 0  # 0 = ONNX Runtime default (one per physical core)
+    inter_op_threads: int = 0  # Only used with parallel execution
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+    enable_cpu_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    allow_spinning: bool = True
+    batch_size: int = 1  # Largest-throughput batch within the latency target
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
@@ -35,6 +55,10 @@ class Settings(BaseSettings):
     model_path: str = "/app/models/resnet50-v2-7.onnx"
     feature_dimension: int = 2048
     
+    # Precision served: fp32, or the INT8 model written by quantize_model.py
+    model_precision: Literal["fp32", "int8"] = "fp32"
+    quantized_model_path: Optional[str] = None  # Defaults to <model_path>-int8.onnx
+    
     # Model-specific parameters
     input_size: Tuple[int, int] = (224, 224)
     normalization_mean: List[float] = [0.485, 0.456, 0.406]  # ImageNet defaults
@@ -48,15 +72,154 @@ class Settings(BaseSettings):
             "model_name": self.model_name,
             "model_version": self.model_version,
             "feature_dimension": self.feature_dimension,
+            "precision": self.model_precision,
             "input_size": self.input_size,
             "description": "ResNet50 v2.7 pre-trained on ImageNet"
         }
     
+    @property
+    def serving_model_path(self) -> str:
+        """ONNX file loaded for the configured precision"""
+        if self.model_precision == "int8":
+            return self.quantized_model_path or quantized_model_path_for(self.model_path)
+        return self.model_path
+    
+    @property
+    def serving_model_version(self) -> str:
+        """Model version qualified by precision (INT8 embeddings differ slightly from fp32)"""
+        if self.model_precision == "int8":
+            return f"{self.model_version}-int8"
+        return self.model_version
+    
+    @property
+    def default_model_config(self) -> ModelConfig:
+        """The startup model as a registry entry"""
+        return ModelConfig(
+            model_name=self.model_name,
+            model_version=self.serving_model_version,
+            feature_dimension=self.feature_dimension,
+            input_size=self.input_size,
+            normalization_mean=self.normalization_mean,
+            normalization_std=self.normalization_std,
+            model_file=self.serving_model_path,
+            description=self.current_model_info["description"]
+        )
+    
+    # Further models served on request (`model` parameter), loaded on first use:
+    # JSON list of ModelConfig in SERVED_MODELS. Least recently used sessions are
+    # unloaded once the loaded models' ONNX files pass the budget; the startup
+    # model is never unloaded
+    served_models: List[ModelConfig] = []
+    model_memory_budget_mb: int = 0  # 0 = no limit
+    
+    # Hot swap of the startup model through POST /admin/model: requests that
+    # started on the previous model get this long to finish before it is released
+    model_drain_timeout_s: float = 30.0
+    admin_token: Optional[str] = None  # X-Admin-Token for /admin endpoints (disabled if unset)
+    
+    # ONNX Runtime tuning profile written by autotune.py; the entry is chosen by
+    # name, else by this node's CPU fingerprint, else "default"
+    tuning_profile_path: Optional[str] = None
+    tuning_profile_name: Optional[str] = None
+    
+    # Cold start: cache the optimized graph (keyed by model, ORT version and CPU)
+    # and run warmup batches before /ready reports ready
+    optimized_model_dir: Optional[str] = None  # None = optimize on every start
+    optimized_model_format: Literal["ort", "onnx"] = "ort"
+    warmup_iterations: int = 2
+    warmup_batch_sizes: List[int] = [1]
+    
     # Performance Configuration
     batch_size: int = 1
+    max_batch_images: int = 32  # Max images per /extract-features/batch call
     max_image_size: int = 10 * 1024 * 1024  # 10 MB
+    max_image_pixels: int = 64 * 1000 * 1000  # Width * height limit (decompression bomb guard)
+    
+    # Image decode: reduced-resolution JPEG decode (DCT scaling) and final resize filter
+    fast_decode: bool = False
+    resample_filter: Literal["nearest", "box", "bilinear", "bicubic", "lanczos"] = "bilinear"
+    
+    # Recall report written by vector_encoding.py, served by /encodings
+    encoding_report_path: Optional[str] = None
+    
+    # Prometheus /metrics and per-request Server-Timing headers on extraction endpoints
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = True
+    
+    # Admission control of extraction endpoints: 429 + Retry-After beyond these (0 in flight = no limit)
+    admission_max_in_flight: int = 32
+    admission_max_queued: int = 128
+    admission_queue_timeout_s: float = 10.0
+    admission_rate_window_s: float = 10.0  # Completions the Retry-After drain rate is measured over
+    
+    # Executor pools (decode/preprocess and inference run off the event loop)
+    decode_workers: int = 4
+    inference_workers: int = 1
+    
+    # Pre-forked inference processes started by serve.py (0 = inference in the server process)
+    inference_processes: int = 0
+    reserve_cores: int = 0  # Cores kept for the server process when pinning workers
+    pin_cores: bool = True
+    share_model_weights: bool = True
+    shared_model_dir: Optional[str] = None  # Defaults to the model's directory
+    
+    # Content-addressed embedding cache (memory LRU + optional disk tier)
+    embedding_cache_enabled: bool = False
+    embedding_cache_memory_mb: int = 64
+    embedding_cache_dir: Optional[str] = None
+    embedding_cache_disk_mb: int = 1024
+    
+    # Perceptual hash computed during decode (None = off) and reuse of the
+    # embedding of near-duplicate images within a Hamming distance
+    perceptual_hash_algorithm: Optional[Literal["phash", "dhash"]] = "phash"
+    near_duplicate_enabled: bool = False
+    near_duplicate_max_distance: int = 4  # Of 64 bits
+    near_duplicate_max_entries: int = 100_000
+    
+    # In-process vector index of extracted vectors (by image_id), served by /search
+    vector_index_enabled: bool = False
+    vector_index_mode: Literal["exact", "ivf"] = "exact"
+    vector_index_path: Optional[str] = None  # Memory-mapped files (in memory only if unset)
+    vector_index_nlist: int = 256  # IVF lists
+    vector_index_nprobe: int = 16  # IVF lists scored per query
+    search_max_k: int = 100
+    
+    # /cluster: near-duplicate grouping of a set of images or vectors
+    cluster_threshold: float = 0.9  # Cosine similarity linking two items
+    max_cluster_items: int = 1000
+    cluster_block_size: int = 1024  # Rows per similarity block
+    
+    # Dynamic micro-batching of concurrent /extract-features calls
+    micro_batch_enabled: bool = False
+    micro_batch_max_size: int = 16
+    micro_batch_window_ms: float = 5.0
     supported_formats: list[str] = ["image/jpeg", "image/png", "image/webp"]
     
+    # Two-lane priority scheduling of inference (supersedes micro-batching)
+    priority_scheduling_enabled: bool = False
+    interactive_max_batch_size: int = 4
+    interactive_decode_workers: int = 1  # Decode threads reserved for interactive requests
+    bulk_max_batch_size: int = 32
+    bulk_batch_window_ms: float = 20.0
+    bulk_queue_size: int = 512  # Bulk images waiting for inference before requests get 503
+    
+    # Kafka consumer mode (FeatureExtractionRequested -> VectorIndexingRequested)
+    kafka_enabled: bool = False
+    kafka_bootstrap_servers: str = "localhost:9092"
+    kafka_group_id: str = "deeplens-feature-extraction-workers"
+    kafka_extraction_topic: str = "deeplens.features.extraction"
+    kafka_indexing_topic: str = "deeplens.vectors.indexing"
+    kafka_batch_size: int = 32  # Messages per poll, extracted as one batch
+    kafka_poll_timeout_ms: int = 500
+    
+    # Image storage read by the Kafka worker: a local root, else MinIO
+    image_store_root: Optional[str] = None
+    minio_endpoint: str = "localhost:9000"
+    minio_access_key: str = "minioadmin"
+    minio_secret_key: str = "minioadmin"
+    minio_secure: bool = False
+    minio_default_bucket: str = "deeplens-storage"
+    
     # Authentication (Future enhancement)
     enable_auth: bool = False
     jwt_issuer: Optional[str] = None
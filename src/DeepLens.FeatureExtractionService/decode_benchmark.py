@@ -0,0 +1,133 @@
+"""
+Benchmark of the reduced-resolution decode path
+Times full decode versus JPEG DCT-scaled decode for each image and checks
+that the resulting embeddings stay close to the full-decode ones.
+
+Usage:
+    python decode_benchmark.py --images ../../data/testData --output decode_report.json
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from config import settings
+from feature_extractor import ResNet50FeatureExtractor
+from quantize_model import find_images
+
+logger = logging.getLogger(__name__)
+
+
+def time_prepare(extractor: ResNet50FeatureExtractor, image_bytes: bytes, runs: int = 5) -> float:
+    """Median wall time of prepare_image in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        extractor.prepare_image(image_bytes)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a.ravel()
+    b = b.ravel()
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-8))
+
+
+def compare_decode(
+    extractor: ResNet50FeatureExtractor,
+    images: List[Tuple[str, bytes]],
+    runs: int = 5,
+    with_embeddings: bool = True
+) -> dict:
+    """
+    Compare full and reduced-resolution decode on the same images
+
+    Args:
+        extractor: Feature extractor; its fast_decode flag is toggled and restored
+        images: (name, image_bytes) pairs
+        runs: Timed prepare_image calls per image and mode
+        with_embeddings: Also run inference and compare the embeddings
+
+    Returns:
+        Report with per-image timings and similarities, plus a summary
+    """
+    original = extractor.fast_decode
+    entries = []
+    try:
+        for name, image_bytes in images:
+            extractor.fast_decode = False
+            full_ms = time_prepare(extractor, image_bytes, runs)
+            full_tensor, metadata = extractor.prepare_image(image_bytes)
+
+            extractor.fast_decode = True
+            fast_ms = time_prepare(extractor, image_bytes, runs)
+            fast_tensor, _ = extractor.prepare_image(image_bytes)
+
+            entry = {
+                'image': name,
+                'width': metadata['width'],
+                'height': metadata['height'],
+                'format': metadata['format'],
+                'full_decode_ms': round(full_ms, 3),
+                'fast_decode_ms': round(fast_ms, 3),
+                'speedup': round(full_ms / fast_ms, 2) if fast_ms > 0 else None,
+                'input_cosine': round(_cosine(full_tensor, fast_tensor), 6)
+            }
+            if with_embeddings:
+                features = extractor.run_inference(np.concatenate([full_tensor, fast_tensor], axis=0))
+                entry['embedding_cosine'] = round(_cosine(features[0], features[1]), 6)
+            entries.append(entry)
+    finally:
+        extractor.fast_decode = original
+
+    summary = {
+        'images': len(entries),
+        'full_decode_ms_total': round(sum(e['full_decode_ms'] for e in entries), 3),
+        'fast_decode_ms_total': round(sum(e['fast_decode_ms'] for e in entries), 3),
+        'min_input_cosine': min((e['input_cosine'] for e in entries), default=None)
+    }
+    if summary['fast_decode_ms_total'] > 0:
+        summary['speedup'] = round(summary['full_decode_ms_total'] / summary['fast_decode_ms_total'], 2)
+    if with_embeddings:
+        summary['min_embedding_cosine'] = min((e['embedding_cosine'] for e in entries), default=None)
+
+    return {'summary': summary, 'images': entries}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full and reduced-resolution image decode")
+    parser.add_argument("--images", required=True, help="Directory of images to decode")
+    parser.add_argument("--model", default=settings.serving_model_path, help="ONNX model for the embedding check")
+    parser.add_argument("--resample", default=settings.resample_filter, help="Final resize filter")
+    parser.add_argument("--runs", type=int, default=5, help="Timed decodes per image and mode")
+    parser.add_argument("--skip-embeddings", action="store_true", help="Only compare preprocessed inputs")
+    parser.add_argument("--output", default="decode_report.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    extractor = ResNet50FeatureExtractor(args.model, resample=args.resample)
+    images = []
+    for path in find_images(args.images):
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    if not images:
+        parser.error(f"No images found in {args.images}")
+
+    report = compare_decode(extractor, images, runs=args.runs, with_embeddings=not args.skip_embeddings)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in report['images']:
+        print(f"{entry['image']}: {entry['width']}x{entry['height']} "
+              f"{entry['full_decode_ms']:.1f} ms -> {entry['fast_decode_ms']:.1f} ms "
+              f"(cosine {entry.get('embedding_cosine', entry['input_cosine'])})")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Content-addressed embedding cache
+Caches feature vectors by SHA-256 of the image bytes plus model name,
+version and preprocessing, in an in-memory LRU with an optional size-bounded
+on-disk tier.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Disk entry layout: 4-byte little-endian metadata length, metadata JSON, float32 vector
+_HEADER = struct.Struct('<I')
+_ENTRY_SUFFIX = '.emb'
+
+
+def preprocessing_fingerprint(**parameters: Any) -> str:
+    """
+    Short digest of the preprocessing that produced the cached vectors
+
+    Args:
+        **parameters: Decode, resize and normalization settings (JSON-serializable)
+
+    Returns:
+        12 hex characters
+    """
+    encoded = json.dumps(parameters, sort_keys=True, default=list)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:12]
+
+
+class EmbeddingCache:
+    """
+    Two-tier LRU cache of L2-normalized feature vectors.
+
+    Entries are keyed by image content, so the same image forwarded many
+    times is embedded once. The on-disk tier lives under
+    `<disk_path>/<model_name>/<model_version>/<preprocessing>/`; entries made
+    with other preprocessing of the same version are removed when the cache
+    is opened, and directories of other versions too, unless `prune` is False
+    (see prune_versions).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_version: str,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        prune: bool = True,
+        preprocessing: str = ""
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            model_name: Model the cached vectors were produced by
+            model_version: Model version; part of every key
+            max_memory_bytes: Size budget of the in-memory tier
+            disk_path: Root directory of the on-disk tier (disabled if None)
+            max_disk_bytes: Size budget of the on-disk tier
+            prune: Remove the disk tiers of other versions of the model on open
+            preprocessing: Fingerprint of the preprocessing (see preprocessing_fingerprint);
+                part of every key, so changing decode or resize settings makes old entries misses
+        """
+        self.model_name = model_name
+        self.model_version = model_version
+        self.preprocessing = preprocessing
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, dict, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self.disk_dir: Optional[str] = None
+
+        # Statistics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        if disk_path:
+            self._open_disk_tier(disk_path)
+            if prune:
+                self.prune_versions()
+
+    @staticmethod
+    def digest(image_bytes: bytes) -> str:
+        """SHA-256 hex digest of the image content"""
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def key(self, digest: str) -> str:
+        """Cache key for an image digest under the current model and preprocessing"""
+        return f"{self.model_name}:{self.model_version}:{self.preprocessing}:{digest}"
+
+    def lookup(self, image_bytes: bytes) -> Tuple[str, Optional[Tuple[np.ndarray, dict]]]:
+        """
+        Hash the image and look it up
+
+        Returns:
+            Tuple of (digest, cached) where cached is (features, metadata) or None
+        """
+        digest = self.digest(image_bytes)
+        return digest, self.get(digest)
+
+    def get(self, digest: str) -> Optional[Tuple[np.ndarray, dict]]:
+        """
+        Look up an image digest, memory first, then disk
+
+        Returns:
+            Tuple of (features, metadata) or None on a miss
+        """
+        key = self.key(digest)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0], dict(entry[1])
+
+        if self.disk_dir is not None:
+            loaded = self._read_disk(digest)
+            if loaded is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, loaded[0], loaded[1])
+                return loaded[0], dict(loaded[1])
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, digest: str, features: np.ndarray, metadata: dict) -> None:
+        """
+        Store a feature vector for an image digest in both tiers
+
+        Args:
+            digest: SHA-256 hex digest of the image
+            features: 1-D feature vector
+            metadata: Image metadata (width, height, format)
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32).copy()
+        with self._lock:
+            self._remember(self.key(digest), features, dict(metadata))
+
+        if self.disk_dir is not None:
+            self._write_disk(digest, features, metadata)
+
+    def clear(self) -> None:
+        """Drop all entries from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._disk.clear()
+            self._disk_bytes = 0
+        if self.disk_dir is not None:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def stats(self) -> dict:
+        """Hit, miss, eviction and size counters"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'memory_evictions': self.memory_evictions,
+                'disk_evictions': self.disk_evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes
+            }
+
+    def _remember(self, key: str, features: np.ndarray, metadata: dict) -> None:
+        """Insert into the memory tier and evict LRU entries over budget (lock held)"""
+        size = features.nbytes + 256  # vector plus rough per-entry overhead
+        if size > self.max_memory_bytes:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[2]
+
+        self._memory[key] = (features, metadata, size)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.memory_evictions += 1
+
+    def prune_versions(self, keep: Iterable[str] = ()) -> None:
+        """
+        Remove the disk tiers of other versions of the model
+
+        Args:
+            keep: Versions to leave in place besides this one (e.g. still served)
+        """
+        if self.disk_dir is None:
+            return
+        version_dir = os.path.dirname(self.disk_dir) if self.preprocessing else self.disk_dir
+        model_dir = os.path.dirname(version_dir)
+        keep = {self.model_version, *keep}
+        for name in os.listdir(model_dir):
+            if name not in keep:
+                logger.info(f"Invalidating embedding cache for {self.model_name} {name}")
+                shutil.rmtree(os.path.join(model_dir, name), ignore_errors=True)
+
+    def _open_disk_tier(self, disk_path: str) -> None:
+        """Prepare the version and preprocessing directory and index its entries"""
+        version_dir = os.path.join(disk_path, self.model_name, self.model_version)
+        self.disk_dir = os.path.join(version_dir, self.preprocessing) if self.preprocessing else version_dir
+        os.makedirs(self.disk_dir, exist_ok=True)
+
+        if self.preprocessing:
+            # Entries of other preprocessing (or from before it was keyed) are stale
+            for name in os.listdir(version_dir):
+                if name != self.preprocessing:
+                    logger.info(f"Invalidating embedding cache for {self.model_name} {self.model_version} {name}")
+                    path = os.path.join(version_dir, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(_ENTRY_SUFFIX):
+                stat = os.stat(os.path.join(self.disk_dir, name))
+                entries.append((stat.st_mtime, name[:-len(_ENTRY_SUFFIX)], stat.st_size))
+
+        for _, digest, size in sorted(entries):
+            self._disk[digest] = size
+            self._disk_bytes += size
+
+        logger.info(
+            f"Embedding cache disk tier at {self.disk_dir}: "
+            f"{len(self._disk)} entries, {self._disk_bytes} bytes"
+        )
+        self._evict_disk()
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.disk_dir, digest + _ENTRY_SUFFIX)
+
+    def _read_disk(self, digest: str) -> Optional[Tuple[np.ndarray, dict]]:
+        """Load an entry from disk, or None if absent or unreadable"""
+        with self._lock:
+            if digest not in self._disk:
+                return None
+            self._disk.move_to_end(digest)
+
+        path = self._entry_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            (metadata_length,) = _HEADER.unpack_from(data)
+            offset = _HEADER.size + metadata_length
+            metadata = json.loads(data[_HEADER.size:offset])
+            features = np.frombuffer(data, dtype='<f4', offset=offset).copy()
+            os.utime(path)
+            return features, metadata
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Dropping unreadable cache entry {digest}: {str(e)}")
+            self._drop_disk(digest)
+            return None
+
+    def _write_disk(self, digest: str, features: np.ndarray, metadata: dict) -> None:
+        """Atomically write an entry and evict the oldest entries over budget"""
+        metadata_json = json.dumps(metadata).encode('utf-8')
+        payload = _HEADER.pack(len(metadata_json)) + metadata_json + features.astype('<f4').tobytes()
+
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, self._entry_path(digest))
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {digest}: {str(e)}")
+            return
+
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(digest, 0)
+            self._disk[digest] = len(payload)
+            self._disk_bytes += len(payload)
+        self._evict_disk()
+
+    def _drop_disk(self, digest: str) -> None:
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(digest, 0)
+        try:
+            os.remove(self._entry_path(digest))
+        except OSError:
+            pass
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used disk entries until within budget"""
+        while True:
+            with self._lock:
+                if self._disk_bytes <= self.max_disk_bytes or not self._disk:
+                    return
+                digest, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.disk_evictions += 1
+            try:
+                os.remove(self._entry_path(digest))
+            except OSError:
+                pass
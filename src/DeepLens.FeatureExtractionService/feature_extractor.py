@@ -7,10 +7,29 @@ import numpy as np
 from PIL import Image
 import io
 import logging
-from typing import Tuple, List, Optional
+import os
+import time
+import warnings
+from typing import Dict, Tuple, List, Optional, Sequence
+
+from config import SessionTuning, settings
+from metrics import stage_timer
+from model_cache import optimized_model_path
+from perceptual_hash import HASH_ALGORITHMS, compute_hash, format_hash
+from preprocessing import Preprocessor, BatchBuffer
+from session_tuning import build_session_options
 
 logger = logging.getLogger(__name__)
 
+# Resample filters selectable for the final resize to the model input size
+RESAMPLE_FILTERS = {
+    'nearest': Image.Resampling.NEAREST,
+    'box': Image.Resampling.BOX,
+    'bilinear': Image.Resampling.BILINEAR,
+    'bicubic': Image.Resampling.BICUBIC,
+    'lanczos': Image.Resampling.LANCZOS
+}
+
 
 class ResNet50FeatureExtractor:
     """
@@ -18,24 +37,77 @@ class ResNet50FeatureExtractor:
     Extracts 2048-dimensional feature vectors from images.
     """
     
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        fast_decode: bool = False,
+        resample: str = 'bilinear',
+        intra_op_threads: Optional[int] = None,
+        shared_weights: bool = False,
+        tuning: Optional[SessionTuning] = None,
+        optimized_model_dir: Optional[str] = None,
+        optimized_model_format: str = 'ort',
+        perceptual_hash: Optional[str] = 'phash',
+        input_size: Tuple[int, int] = (224, 224),
+        normalization_mean: Sequence[float] = (0.485, 0.456, 0.406),
+        normalization_std: Sequence[float] = (0.229, 0.224, 0.225),
+        load_model: bool = True,
+        max_pixels: Optional[int] = None
+    ):
         """
         Initialize the feature extractor with ONNX model
         
         Args:
             model_path: Path to the ONNX model file
+            fast_decode: Decode large images at reduced resolution before resizing
+            resample: Resample filter for the final resize (see RESAMPLE_FILTERS)
+            intra_op_threads: ONNX Runtime intra-op threads, overriding the tuning profile
+            shared_weights: model_path was written by prefork.prepare_shared_model; load it
+                as is and without prepacking, so the weights stay in the memory-mapped
+                data file that every worker process shares
+            tuning: ONNX Runtime session tuning profile (defaults if None)
+            optimized_model_dir: Cache the optimized graph here and load it on later starts
+            optimized_model_format: Cached graph format, 'ort' or 'onnx'
+            perceptual_hash: Hash added to metadata during decode (see HASH_ALGORITHMS), or None
+            input_size: Model input (width, height)
+            normalization_mean: Per-channel mean subtracted from [0, 1] pixels (ImageNet default)
+            normalization_std: Per-channel standard deviation (ImageNet default)
+            load_model: Create the inference session; False gives a decode-only
+                instance (prepare_image only), e.g. for decode worker processes
+            max_pixels: Largest width * height decoded (settings.max_image_pixels if None)
         """
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unsupported resample filter: {resample}")
+        if perceptual_hash is not None and perceptual_hash not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported perceptual hash: {perceptual_hash}")
+        
         self.model_path = model_path
+        self.fast_decode = fast_decode
+        self.resample = RESAMPLE_FILTERS[resample]
+        self.intra_op_threads = intra_op_threads
+        self.shared_weights = shared_weights
+        self.tuning = tuning or SessionTuning()
+        self.optimized_model_dir = optimized_model_dir
+        self.optimized_model_format = optimized_model_format
+        self.perceptual_hash = perceptual_hash
+        self.load_timings: Dict[str, object] = {}
+        self.input_size = tuple(input_size)
+        self.max_pixels = settings.max_image_pixels if max_pixels is None else max_pixels
         self.session: Optional[ort.InferenceSession] = None
         self.input_name: Optional[str] = None
         self.output_name: Optional[str] = None
         self.input_shape: Optional[Tuple[int, ...]] = None
         
-        # ImageNet normalization parameters
-        self.mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-        self.std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+        # Normalization parameters
+        self.mean = np.array(normalization_mean, dtype=np.float32)
+        self.std = np.array(normalization_std, dtype=np.float32)
         
-        self._load_model()
+        # Fused normalization and per-thread batch input buffers
+        self.preprocessor = Preprocessor(self.mean, self.std, self.input_size)
+        self.batch_buffer = BatchBuffer()
+        
+        if load_model:
+            self._load_model()
     
     def _load_model(self) -> None:
         """Load the ONNX model and configure inference session"""
@@ -43,21 +115,36 @@ class ResNet50FeatureExtractor:
             logger.info(f"Loading ONNX model from: {self.model_path}")
             
             # Create inference session with CPU provider
-            sess_options = ort.SessionOptions()
-            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            sess_options = build_session_options(self.tuning)
+            if self.intra_op_threads:
+                sess_options.intra_op_num_threads = self.intra_op_threads
+                if not self.tuning.inter_op_threads:
+                    sess_options.inter_op_num_threads = 1
             
-            self.session = ort.InferenceSession(
-                self.model_path,
-                sess_options=sess_options,
-                providers=['CPUExecutionProvider']
-            )
+            if self.shared_weights:
+                # Already optimized; prepacking would copy every weight into private memory
+                sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+                sess_options.add_session_config_entry('session.disable_prepacking', '1')
+            
+            start = time.perf_counter()
+            if self.optimized_model_dir and not self.shared_weights:
+                self.session = self._load_cached(sess_options)
+            else:
+                self.load_timings['optimized_model'] = 'disabled'
+                self.session = ort.InferenceSession(
+                    self.model_path,
+                    sess_options=sess_options,
+                    providers=['CPUExecutionProvider']
+                )
+            self.load_timings['session_ms'] = round((time.perf_counter() - start) * 1000, 2)
             
             # Get input/output names and shapes
             self.input_name = self.session.get_inputs()[0].name
             self.output_name = self.session.get_outputs()[0].name
             self.input_shape = self.session.get_inputs()[0].shape
             
-            logger.info(f"Model loaded successfully")
+            logger.info(f"Model loaded successfully in {self.load_timings['session_ms']} ms "
+                        f"(optimized model cache: {self.load_timings['optimized_model']})")
             logger.info(f"Input: {self.input_name}, Shape: {self.input_shape}")
             logger.info(f"Output: {self.output_name}")
             
@@ -65,6 +152,78 @@ class ResNet50FeatureExtractor:
             logger.error(f"Failed to load model: {str(e)}")
             raise RuntimeError(f"Model loading failed: {str(e)}")
     
+    def _load_cached(self, sess_options: ort.SessionOptions) -> ort.InferenceSession:
+        """
+        Load the cached optimized graph, or optimize the source model and cache the result
+        
+        Sets load_timings['optimized_model'] to 'hit' or 'miss'. An unreadable
+        cache entry is replaced; failing to write one never fails the load.
+        """
+        cached_path = optimized_model_path(
+            self.model_path,
+            self.optimized_model_dir,
+            self.tuning.graph_optimization_level,
+            self.optimized_model_format
+        )
+        if os.path.isfile(cached_path):
+            optimization_level = sess_options.graph_optimization_level
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                session = ort.InferenceSession(
+                    cached_path,
+                    sess_options=sess_options,
+                    providers=['CPUExecutionProvider']
+                )
+                self.load_timings['optimized_model'] = 'hit'
+                return session
+            except Exception as e:
+                logger.warning(f"Discarding unreadable optimized model {cached_path}: {str(e)}")
+                os.remove(cached_path)
+                sess_options.graph_optimization_level = optimization_level
+        
+        temp_path = f"{cached_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.optimized_model_dir, exist_ok=True)
+            sess_options.optimized_model_filepath = temp_path
+            sess_options.add_session_config_entry(
+                'session.save_model_format', self.optimized_model_format.upper()
+            )
+        except OSError as e:
+            logger.warning(f"Optimized model cache unavailable: {str(e)}")
+        
+        session = ort.InferenceSession(
+            self.model_path,
+            sess_options=sess_options,
+            providers=['CPUExecutionProvider']
+        )
+        self.load_timings['optimized_model'] = 'miss'
+        if os.path.isfile(temp_path):
+            os.replace(temp_path, cached_path)
+            logger.info(f"Cached optimized model at {cached_path}")
+        return session
+    
+    def warmup(self, batch_sizes: Sequence[int] = (1,), iterations: int = 1) -> float:
+        """
+        Run inference on synthetic batches so allocation and kernel setup
+        happen before real traffic
+        
+        Args:
+            batch_sizes: Batch shapes to warm (each gets its own memory plan)
+            iterations: Runs per batch size
+            
+        Returns:
+            Elapsed milliseconds
+        """
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        for batch_size in batch_sizes:
+            batch = rng.standard_normal((batch_size,) + self.preprocessor.sample_shape).astype(np.float32)
+            for _ in range(iterations):
+                self.run_inference(batch)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.load_timings['warmup_ms'] = elapsed_ms
+        return elapsed_ms
+    
     def _preprocess_image(self, image: Image.Image) -> np.ndarray:
         """
         Preprocess image for ResNet50 model
@@ -75,23 +234,138 @@ class ResNet50FeatureExtractor:
         Returns:
             Preprocessed image tensor (1, 3, 224, 224)
         """
-        # Resize to 224x224
-        image = image.convert('RGB')
-        image = image.resize((224, 224), Image.Resampling.BILINEAR)
+        # Scale, normalize and HWC -> CHW in one pass into the output tensor
+        return self.preprocessor.normalize(self._resize(image))
+    
+    def _resize(self, image: Image.Image) -> Image.Image:
+        """Convert to RGB and resize to the model input size"""
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image.resize(self.input_size, self.resample)
+    
+    def _open_image(self, image_bytes: bytes) -> Tuple[Image.Image, dict]:
+        """
+        Open image bytes, capturing metadata before any reduced decode
+        
+        Returns:
+            Tuple of (image, metadata)
+        
+        Raises:
+            ValueError: If the header declares more than max_pixels pixels
+        """
+        try:
+            with warnings.catch_warnings():
+                # Size is checked explicitly below against our own limit
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                image = Image.open(io.BytesIO(image_bytes))
+        except Image.DecompressionBombError as e:
+            raise ValueError(f"Image dimensions exceed the allowed pixel count: {str(e)}")
+        if image.width * image.height > self.max_pixels:
+            raise ValueError(
+                f"Image dimensions {image.width}x{image.height} exceed the maximum of {self.max_pixels} pixels"
+            )
+        
+        # Extract metadata (original dimensions, before any reduced decode)
+        metadata = {
+            'width': image.width,
+            'height': image.height,
+            'format': image.format or 'UNKNOWN'
+        }
+        
+        if self.fast_decode:
+            image = self._reduce_for_decode(image)
+        
+        return image, metadata
+    
+    def prepare_image(self, image_bytes: bytes) -> Tuple[np.ndarray, dict]:
+        """
+        Decode and preprocess image bytes into a model input tensor
+        
+        Args:
+            image_bytes: Raw image bytes
+            
+        Returns:
+            Tuple of (input_tensor, metadata)
+            - input_tensor: Preprocessed tensor (1, 3, 224, 224)
+            - metadata: Dictionary with image metadata (width, height, format,
+              and perceptual_hash when enabled)
+        """
+        with stage_timer("decode"):
+            image, metadata = self._open_image(image_bytes)
+            image.load()
+        with stage_timer("preprocess"):
+            resized = self._resize(image)
+            self._add_perceptual_hash(resized, metadata)
+            return self.preprocessor.normalize(resized), metadata
+    
+    def _add_perceptual_hash(self, resized: Image.Image, metadata: dict) -> None:
+        """
+        Hash the model-input-sized image into metadata['perceptual_hash']
         
-        # Convert to numpy array and normalize to [0, 1]
-        img_array = np.array(image, dtype=np.float32) / 255.0
+        Hashing the 224x224 resize rather than the original keeps the cost
+        small and independent of upload size and fast_decode.
+        """
+        if self.perceptual_hash is not None:
+            metadata['perceptual_hash'] = format_hash(compute_hash(resized, self.perceptual_hash))
+    
+    def _reduce_for_decode(self, image: Image.Image) -> Image.Image:
+        """
+        Decode at the smallest scale that is still at least the model input size
         
-        # Apply ImageNet normalization
-        img_array = (img_array - self.mean) / self.std
+        JPEGs use DCT scaling (`draft`, 1/2, 1/4 or 1/8 during decode) so the
+        full-resolution pixels are never materialized; other formats are
+        decoded fully and box-reduced by an integer factor. The final resize
+        to the input size is left to `_preprocess_image`.
         
-        # Convert from HWC to CHW format
-        img_array = np.transpose(img_array, (2, 0, 1))
+        Args:
+            image: Opened, not yet loaded, PIL Image
+            
+        Returns:
+            Image with both sides >= the model input size
+        """
+        target_width, target_height = self.input_size
+        if image.format == 'JPEG':
+            image.draft('RGB', (target_width, target_height))
+            return image
         
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+        factor = min(image.width // target_width, image.height // target_height)
+        if factor >= 2:
+            return image.reduce(factor)
+        return image
+    
+    def run_inference(self, input_batch: np.ndarray) -> np.ndarray:
+        """
+        Run the model on a preprocessed NCHW batch
         
-        return img_array
+        Args:
+            input_batch: Preprocessed tensor (N, 3, 224, 224)
+            
+        Returns:
+            L2-normalized feature matrix (N, feature_dimension)
+        """
+        # Models exported with a fixed batch dimension are run chunk by chunk
+        fixed_batch = self.input_shape[0] if self.input_shape else None
+        if isinstance(fixed_batch, int) and 0 < fixed_batch < input_batch.shape[0]:
+            chunks = [
+                self.session.run(
+                    [self.output_name],
+                    {self.input_name: input_batch[start:start + fixed_batch]}
+                )[0]
+                for start in range(0, input_batch.shape[0], fixed_batch)
+            ]
+            raw_features = np.concatenate(chunks, axis=0)
+        else:
+            raw_features = self.session.run(
+                [self.output_name],
+                {self.input_name: input_batch}
+            )[0]
+
+        # Flatten everything after the batch dimension
+        features = raw_features.reshape(input_batch.shape[0], -1)
+        
+        # L2 normalization for cosine similarity
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / (norms + 1e-8)
     
     def extract_features(self, image_bytes: bytes) -> Tuple[List[float], dict]:
         """
@@ -106,38 +380,65 @@ class ResNet50FeatureExtractor:
             - metadata: Dictionary with image metadata (width, height, format)
         """
         try:
-            # Load image from bytes
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract metadata
-            metadata = {
-                'width': image.width,
-                'height': image.height,
-                'format': image.format or 'UNKNOWN'
-            }
-            
-            # Preprocess image
-            input_tensor = self._preprocess_image(image)
-            
-            # Run inference
-            outputs = self.session.run(
-                [self.output_name],
-                {self.input_name: input_tensor}
-            )
-            
-            # Extract feature vector (remove batch dimension and flatten)
-            features = outputs[0].flatten()
-            
-            # Convert to list and normalize (L2 normalization for cosine similarity)
-            features = features / (np.linalg.norm(features) + 1e-8)
-            feature_list = features.tolist()
-            
-            return feature_list, metadata
+            input_tensor, metadata = self.prepare_image(image_bytes)
+            features = self.run_inference(input_tensor)
+            return features[0].tolist(), metadata
             
         except Exception as e:
             logger.error(f"Feature extraction failed: {str(e)}")
             raise ValueError(f"Failed to extract features: {str(e)}")
     
+    def extract_features_batch(
+        self, images: List[bytes]
+    ) -> List[Tuple[Optional[List[float]], Optional[dict], Optional[str]]]:
+        """
+        Extract feature vectors for several images with a single inference call
+        
+        Images that fail to decode are reported individually and do not
+        prevent the rest of the batch from being processed.
+        
+        Args:
+            images: List of raw image bytes
+            
+        Returns:
+            List aligned with the input of (feature_vector, metadata, error)
+            - feature_vector/metadata are None when the item failed
+            - error is None when the item succeeded
+        """
+        results: List[Tuple[Optional[List[float]], Optional[dict], Optional[str]]] = [
+            (None, None, None) for _ in images
+        ]
+        decoded: List[Tuple[int, dict]] = []
+        
+        # Decode and preprocess each image straight into this thread's
+        # reusable NCHW buffer, collecting per-item errors
+        batch = self.batch_buffer.acquire(len(images), self.preprocessor.sample_shape)
+        for index, image_bytes in enumerate(images):
+            try:
+                image, metadata = self._open_image(image_bytes)
+                resized = self._resize(image)
+                self._add_perceptual_hash(resized, metadata)
+                self.preprocessor.normalize_into(resized, batch[len(decoded)])
+                decoded.append((index, metadata))
+            except Exception as e:
+                logger.warning(f"Failed to decode batch item {index}: {str(e)}")
+                results[index] = (None, None, f"Failed to extract features: {str(e)}")
+        
+        if not decoded:
+            return results
+        
+        # Run a single inference on the filled rows (a contiguous leading slice)
+        try:
+            features = self.run_inference(batch[:len(decoded)])
+        except Exception as e:
+            logger.error(f"Batch inference failed: {str(e)}")
+            raise RuntimeError(f"Batch inference failed: {str(e)}")
+        
+        for row, (index, metadata) in enumerate(decoded):
+            results[index] = (features[row].tolist(), metadata, None)
+        
+        return results
+    
     def is_loaded(self) -> bool:
         """Check if model is loaded and ready"""
         return self.session is not None
@@ -0,0 +1,93 @@
+"""
+Model leases for zero-downtime model swaps
+Every request leases the extractors it uses until its response has been
+sent. After traffic is switched to a new model, the previous extractor is
+drained: its resources are released once the requests that started on it
+have finished, so none of them fail or change model half way.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Any, Dict, List, Optional
+
+# Extractors leased by the current request (set by ModelLeaseMiddleware)
+_current_leases: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar(
+    "model_leases", default=None
+)
+
+
+class ModelLeases:
+    """Number of in-flight requests per extractor"""
+
+    def __init__(self):
+        self._counts: Dict[Any, int] = {}
+
+    def acquire(self, extractor: Any) -> None:
+        """
+        Lease an extractor for the rest of the current request
+
+        Outside a request handled by ModelLeaseMiddleware this does nothing.
+        """
+        leases = _current_leases.get()
+        if leases is None or extractor is None:
+            return
+        leases.append(extractor)
+        self._counts[extractor] = self._counts.get(extractor, 0) + 1
+
+    def release(self, leases: List[Any]) -> None:
+        """Return the leases of a finished request"""
+        for extractor in leases:
+            remaining = self._counts.get(extractor, 0) - 1
+            if remaining > 0:
+                self._counts[extractor] = remaining
+            else:
+                self._counts.pop(extractor, None)
+
+    def in_flight(self, extractor: Any) -> int:
+        """Requests currently holding a lease on the extractor"""
+        return self._counts.get(extractor, 0)
+
+    async def drain(self, extractor: Any, timeout: float, poll_interval: float = 0.01) -> bool:
+        """
+        Wait until no request holds a lease on the extractor
+
+        Args:
+            extractor: Extractor no longer handed to new requests
+            timeout: Seconds to wait at most
+            poll_interval: Seconds between checks
+
+        Returns:
+            True if drained, False if requests were still running at the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self.in_flight(extractor) > 0:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+        return True
+
+
+class ModelLeaseMiddleware:
+    """ASGI middleware releasing a request's model leases once its response is sent"""
+
+    def __init__(self, app, leases: ModelLeases):
+        """
+        Args:
+            app: ASGI application
+            leases: Lease counts shared with the request handlers
+        """
+        self.app = app
+        self.leases = leases
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        held: List[Any] = []
+        token = _current_leases.set(held)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_leases.reset(token)
+            self.leases.release(held)
@@ -0,0 +1,535 @@
+"""
+Kafka consumer mode
+Consumes FeatureExtractionRequested events from `deeplens.features.extraction`
+in bulk, reads the images from storage, runs one batched inference per poll
+and publishes VectorIndexingRequested events to `deeplens.vectors.indexing`,
+committing offsets only after every produced event has been delivered.
+The events carry the original image dimensions, which the .NET
+VectorIndexingWorker stores on the media record.
+
+The consumer/producer interface is the subset of confluent-kafka used here;
+InMemoryBroker provides a stand-in for tests and local runs without Kafka.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_extractor import ResNet50FeatureExtractor
+from pipeline import ExtractionPipeline
+from scheduling import BULK
+from serialization import dumps_json
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEXING_REQUESTED = "vector.indexing.requested"
+
+# librdkafka logical offsets
+OFFSET_BEGINNING = -2
+OFFSET_INVALID = -1001
+TENANT_ID = "SINGLE_TENANT"
+
+
+def strip_storage_scheme(image_path: str) -> str:
+    """Drop a minio:// prefix (possibly doubled, as the C# storage service tolerates)"""
+    marker = image_path.find("minio://")
+    if marker >= 0:
+        image_path = image_path[marker + len("minio://"):]
+    return image_path.lstrip('/')
+
+
+class FileImageStore:
+    """Reads images referenced by imagePath from a local directory (e.g. a mounted bucket)"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def read(self, image_path: str) -> bytes:
+        path = os.path.abspath(os.path.join(self.root, strip_storage_scheme(image_path)))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Image path escapes the storage root: {image_path}")
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class MinioImageStore:
+    """
+    Reads images from MinIO/S3.
+    Paths are resolved like the C# storage service: "<bucket>/<object>" when
+    the first segment is an existing bucket, otherwise relative to the default bucket.
+    """
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, default_bucket: str, secure: bool = False):
+        try:
+            from minio import Minio
+        except ImportError:
+            raise RuntimeError("MinIO image store requires the minio package (pip install -r requirements-kafka.txt)")
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.default_bucket = default_bucket
+        self._buckets: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def _bucket_exists(self, bucket: str) -> bool:
+        with self._lock:
+            if bucket not in self._buckets:
+                try:
+                    self._buckets[bucket] = self.client.bucket_exists(bucket)
+                except Exception:
+                    return False
+            return self._buckets[bucket]
+
+    def read(self, image_path: str) -> bytes:
+        bucket, object_name = self.default_bucket, strip_storage_scheme(image_path)
+        parts = object_name.split('/', 1)
+        if len(parts) > 1 and self._bucket_exists(parts[0]):
+            bucket, object_name = parts
+        response = self.client.get_object(bucket, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+
+def build_indexing_event(
+    request_event: dict,
+    features: np.ndarray,
+    metadata: dict,
+    processing_time_ms: float,
+    model_version: str,
+    extractor_version: str
+) -> dict:
+    """
+    VectorIndexingRequestedEvent for an extracted image, in the C# contract's JSON shape
+
+    Args:
+        request_event: The consumed FeatureExtractionRequestedEvent
+        features: L2-normalized feature vector
+        metadata: Image width, height and format
+        processing_time_ms: Extraction time attributed to this image
+        model_version: Version of the model that produced the vector
+        extractor_version: Version of this service
+    """
+    data = request_event['data']
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        'eventId': str(uuid.uuid4()),
+        'eventType': VECTOR_INDEXING_REQUESTED,
+        'eventVersion': '1.0',
+        'timestamp': now,
+        'tenantId': request_event.get('tenantId') or TENANT_ID,
+        'correlationId': request_event.get('correlationId'),
+        'data': {
+            'imageId': data['imageId'],
+            'modelName': data.get('modelName'),
+            'featureVector': features,
+            'vectorMetadata': {
+                'extractionTime': now,
+                'processingTimeMs': round(processing_time_ms, 2),
+                'modelVersion': model_version,
+                'extractorVersion': extractor_version
+            },
+            'imageMetadata': {
+                'width': metadata['width'],
+                'height': metadata['height'],
+                'format': metadata['format']
+            }
+        }
+    }
+
+
+class KafkaExtractionWorker:
+    """
+    Bulk Kafka consumer running batched feature extraction.
+
+    Each poll takes up to `batch_size` messages, reads their images on the
+    decode pool, runs them through `ExtractionPipeline.extract_batch` and
+    produces one indexing event per extracted image. Offsets are committed
+    after the producer has flushed, so a crash redelivers rather than drops.
+    All consumer/producer calls run on one dedicated client thread.
+    """
+
+    def __init__(
+        self,
+        extractor: ResNet50FeatureExtractor,
+        pipeline: ExtractionPipeline,
+        consumer: Any,
+        producer: Any,
+        image_store: Any,
+        extraction_topic: str = "deeplens.features.extraction",
+        indexing_topic: str = "deeplens.vectors.indexing",
+        batch_size: int = 32,
+        poll_timeout: float = 0.5,
+        flush_timeout: float = 30.0,
+        model_version: str = "v2.7",
+        extractor_version: str = "1.0.0"
+    ):
+        """
+        Initialize the worker
+
+        Args:
+            extractor: Loaded feature extractor
+            pipeline: Extraction pipeline providing the decode/inference stages
+            consumer: confluent_kafka.Consumer (or stand-in) with auto-commit disabled
+            producer: confluent_kafka.Producer (or stand-in)
+            image_store: Object with read(image_path) -> bytes
+            extraction_topic: Topic of FeatureExtractionRequested events
+            indexing_topic: Topic for VectorIndexingRequested events
+            batch_size: Maximum messages per poll and inference batch
+            poll_timeout: Seconds to wait for messages per poll
+            flush_timeout: Seconds to wait for produced events to be delivered
+            model_version: Model version reported in produced events
+            extractor_version: Service version reported in produced events
+        """
+        self.extractor = extractor
+        self.pipeline = pipeline
+        self.consumer = consumer
+        self.producer = producer
+        self.image_store = image_store
+        self.extraction_topic = extraction_topic
+        self.indexing_topic = indexing_topic
+        self.batch_size = max(1, batch_size)
+        self.poll_timeout = poll_timeout
+        self.flush_timeout = flush_timeout
+        self.model_version = model_version
+        self.extractor_version = extractor_version
+
+        self._client_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kafka-client")
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._delivery_errors = 0
+
+        # Statistics
+        self.polls = 0
+        self.messages_consumed = 0
+        self.events_produced = 0
+        self.failed = 0
+        self.invalid = 0
+        self.commits = 0
+
+    async def _client(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking Kafka client call on the dedicated client thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._client_executor, functools.partial(fn, *args, **kwargs))
+
+    async def start(self) -> None:
+        """Subscribe and start the consume loop"""
+        await self._client(self.consumer.subscribe, [self.extraction_topic])
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Kafka worker consuming {self.extraction_topic} -> {self.indexing_topic}")
+
+    async def stop(self) -> None:
+        """Finish the current batch, then close the consumer and flush the producer"""
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self._client(self.producer.flush, self.flush_timeout)
+        await self._client(self.consumer.close)
+        self._client_executor.shutdown(wait=True)
+
+    async def _run(self) -> None:
+        """Consume loop; errors back off and retry from the last committed offset"""
+        while not self._stopping:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Kafka batch failed, retrying: {str(e)}")
+                try:
+                    await self._client(self._rewind)
+                except Exception as rewind_error:
+                    logger.error(f"Failed to rewind to committed offsets: {str(rewind_error)}")
+                await asyncio.sleep(1.0)
+
+    def _rewind(self) -> None:
+        """Seek assigned partitions back to their committed offsets so the failed batch is redelivered"""
+        for partition in self.consumer.committed(self.consumer.assignment(), timeout=10):
+            if partition.offset == OFFSET_INVALID:
+                # Nothing committed yet: auto.offset.reset=earliest semantics
+                partition.offset = OFFSET_BEGINNING
+            self.consumer.seek(partition)
+
+    def _on_delivery(self, error, message) -> None:
+        if error is not None:
+            self._delivery_errors += 1
+            logger.error(f"Failed to deliver indexing event: {error}")
+
+    def _parse(self, message: Any) -> Optional[dict]:
+        """Decode a FeatureExtractionRequested event, or None if it is unusable"""
+        if message.error() is not None:
+            logger.warning(f"Kafka consume error: {message.error()}")
+            return None
+        try:
+            event = json.loads(message.value())
+            data = event['data']
+            if not data.get('imageId') or not data.get('imagePath'):
+                raise KeyError("imageId/imagePath")
+            return event
+        except (ValueError, KeyError, TypeError) as e:
+            self.invalid += 1
+            logger.warning(f"Skipping malformed extraction event at offset {message.offset()}: {str(e)}")
+            return None
+
+    async def run_once(self) -> int:
+        """
+        Process one poll: consume, read, extract, produce, flush, commit
+
+        Returns:
+            Number of messages consumed
+
+        Raises:
+            RuntimeError: If produced events were not delivered (offsets are not committed)
+        """
+        messages = await self._client(self.consumer.consume, self.batch_size, self.poll_timeout)
+        self.polls += 1
+        if not messages:
+            return 0
+        self.messages_consumed += len(messages)
+
+        events = [event for event in (self._parse(message) for message in messages) if event is not None]
+        if events:
+            await self._process(events)
+
+        self._delivery_errors = 0
+        remaining = await self._client(self.producer.flush, self.flush_timeout)
+        if remaining or self._delivery_errors:
+            raise RuntimeError(
+                f"{remaining or self._delivery_errors} indexing events not delivered; offsets not committed"
+            )
+
+        await self._client(self.consumer.commit, asynchronous=False)
+        self.commits += 1
+        return len(messages)
+
+    async def _process(self, events: List[dict]) -> None:
+        """Read images, run one batched extraction and produce indexing events"""
+        start_time = asyncio.get_running_loop().time()
+
+        reads = await asyncio.gather(
+            *(self.pipeline.decode.run(self.image_store.read, event['data']['imagePath']) for event in events),
+            return_exceptions=True
+        )
+        loaded: List[Tuple[dict, bytes]] = []
+        for event, image_bytes in zip(events, reads):
+            if isinstance(image_bytes, Exception):
+                self.failed += 1
+                logger.error(f"Failed to read image {event['data']['imageId']}: {str(image_bytes)}")
+            else:
+                loaded.append((event, image_bytes))
+        if not loaded:
+            return
+
+        # Read together so a model swap never labels vectors with the other version
+        extractor, model_version = self.extractor, self.model_version
+        # Bulk lane: a full queue fails the batch, which is redelivered after the backoff
+        results = await self.pipeline.extract_batch(extractor, [image for _, image in loaded], lane=BULK)
+        per_image_ms = (asyncio.get_running_loop().time() - start_time) * 1000 / len(loaded)
+
+        for (event, _), (features, metadata, error) in zip(loaded, results):
+            image_id = event['data']['imageId']
+            if error is not None:
+                self.failed += 1
+                logger.error(f"Feature extraction failed for {image_id}: {error}")
+                continue
+            indexing_event = build_indexing_event(
+                event, features, metadata, per_image_ms, model_version, self.extractor_version
+            )
+            await self._client(
+                self.producer.produce,
+                self.indexing_topic,
+                key=str(image_id),
+                value=dumps_json(indexing_event),
+                on_delivery=self._on_delivery
+            )
+            self.events_produced += 1
+
+    def stats(self) -> dict:
+        """Consume/produce counters"""
+        return {
+            'polls': self.polls,
+            'messages_consumed': self.messages_consumed,
+            'events_produced': self.events_produced,
+            'failed': self.failed,
+            'invalid': self.invalid,
+            'commits': self.commits
+        }
+
+
+def create_kafka_clients(bootstrap_servers: str, group_id: str, client_id: str) -> Tuple[Any, Any]:
+    """
+    Create a confluent-kafka consumer (manual commits) and producer
+
+    Raises:
+        RuntimeError: If confluent-kafka is not installed
+    """
+    try:
+        from confluent_kafka import Consumer, Producer
+    except ImportError:
+        raise RuntimeError("Kafka mode requires the confluent-kafka package (pip install -r requirements-kafka.txt)")
+
+    consumer = Consumer({
+        'bootstrap.servers': bootstrap_servers,
+        'group.id': group_id,
+        'client.id': f"{client_id}-consumer",
+        'auto.offset.reset': 'earliest',
+        'enable.auto.commit': False
+    })
+    producer = Producer({
+        'bootstrap.servers': bootstrap_servers,
+        'client.id': f"{client_id}-producer",
+        'linger.ms': 20,
+        'enable.idempotence': True
+    })
+    return consumer, producer
+
+
+class InMemoryTopicPartition:
+    """TopicPartition with the attributes used by the worker"""
+
+    def __init__(self, topic: str, partition: int = 0, offset: int = OFFSET_INVALID):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+class InMemoryMessage:
+    """Message with the confluent-kafka accessor methods"""
+
+    def __init__(self, topic: str, offset: int, key: Optional[bytes], value: bytes):
+        self._topic = topic
+        self._offset = offset
+        self._key = key
+        self._value = value
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return 0
+
+    def offset(self) -> int:
+        return self._offset
+
+    def key(self) -> Optional[bytes]:
+        return self._key
+
+    def value(self) -> bytes:
+        return self._value
+
+    def error(self) -> None:
+        return None
+
+
+class InMemoryBroker:
+    """
+    Single-partition in-process broker with consumer-group offsets.
+    Stands in for Kafka in tests and local runs.
+    """
+
+    def __init__(self):
+        self.topics: Dict[str, List[InMemoryMessage]] = {}
+        self.committed: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, value: Any, key: Optional[Any] = None) -> None:
+        """Append a message (str/bytes value, or a dict serialized as JSON)"""
+        if isinstance(value, dict):
+            value = json.dumps(value)
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        with self._lock:
+            messages = self.topics.setdefault(topic, [])
+            messages.append(InMemoryMessage(topic, len(messages), key, value))
+
+    def messages(self, topic: str) -> List[InMemoryMessage]:
+        with self._lock:
+            return list(self.topics.get(topic, []))
+
+    def consumer(self, group_id: str) -> "InMemoryConsumer":
+        return InMemoryConsumer(self, group_id)
+
+    def producer(self) -> "InMemoryProducer":
+        return InMemoryProducer(self)
+
+
+class InMemoryConsumer:
+    """Consumer starting from the group's committed offset"""
+
+    def __init__(self, broker: InMemoryBroker, group_id: str):
+        self.broker = broker
+        self.group_id = group_id
+        self.positions: Dict[str, int] = {}
+        self.closed = False
+
+    def subscribe(self, topics: List[str]) -> None:
+        with self.broker._lock:
+            for topic in topics:
+                self.positions[topic] = self.broker.committed.get((self.group_id, topic), 0)
+
+    def consume(self, num_messages: int = 1, timeout: float = -1) -> List[InMemoryMessage]:
+        batch: List[InMemoryMessage] = []
+        with self.broker._lock:
+            for topic, position in self.positions.items():
+                available = self.broker.topics.get(topic, [])[position:position + num_messages - len(batch)]
+                batch.extend(available)
+                self.positions[topic] = position + len(available)
+        return batch
+
+    def assignment(self) -> List[InMemoryTopicPartition]:
+        return [InMemoryTopicPartition(topic) for topic in self.positions]
+
+    def committed(self, partitions: List[InMemoryTopicPartition], timeout: float = -1) -> List[InMemoryTopicPartition]:
+        with self.broker._lock:
+            return [
+                InMemoryTopicPartition(p.topic, p.partition, self.broker.committed.get((self.group_id, p.topic), OFFSET_INVALID))
+                for p in partitions
+            ]
+
+    def seek(self, partition: InMemoryTopicPartition) -> None:
+        self.positions[partition.topic] = 0 if partition.offset == OFFSET_BEGINNING else partition.offset
+
+    def commit(self, asynchronous: bool = True) -> None:
+        with self.broker._lock:
+            for topic, position in self.positions.items():
+                self.broker.committed[(self.group_id, topic)] = position
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class InMemoryProducer:
+    """Producer that delivers on flush, like a batching Kafka producer"""
+
+    def __init__(self, broker: InMemoryBroker):
+        self.broker = broker
+        self._pending: List[Tuple[str, Any, Any, Optional[Callable]]] = []
+        self.fail_deliveries = False
+
+    def produce(self, topic: str, value: Any = None, key: Any = None, on_delivery: Optional[Callable] = None) -> None:
+        self._pending.append((topic, value, key, on_delivery))
+
+    def poll(self, timeout: float = 0) -> int:
+        return 0
+
+    def flush(self, timeout: float = -1) -> int:
+        pending, self._pending = self._pending, []
+        for topic, value, key, on_delivery in pending:
+            if self.fail_deliveries:
+                if on_delivery is not None:
+                    on_delivery("broker unavailable", None)
+                continue
+            self.broker.publish(topic, value, key)
+            if on_delivery is not None:
+                on_delivery(None, self.broker.messages(topic)[-1])
+        return 0
@@ -0,0 +1,424 @@
+"""
+HTTP load generator for the extraction and reasoning services
+Replays a corpus of images against /extract-features (or descriptions
+against the reasoning endpoints) and reports latency percentiles, error
+rates and achieved throughput at each load level, plus the saturation point.
+
+Modes:
+- open loop: requests arrive at a fixed rate whether or not earlier ones have
+  finished (like independent users); latency is measured from the scheduled
+  send time, so queueing in the client is not hidden
+- closed loop: a fixed number of clients each send their next request as soon
+  as the previous one completes
+
+A sweep runs several levels (--rps 5,10,20 or --concurrency 1,2,4,8). The
+saturation point is the first level where the service stops keeping up:
+throughput below 90% of the offered rate (open loop) or under 10% gain per
+doubling of clients (closed loop), p99 over --slo-p99-ms, or error rate over
+--max-error-rate. Needs httpx (requirements-dev.txt).
+
+Usage:
+    python loadgen.py extraction --base-url http://localhost:8001 --mode open --rps 5,10,20,40 --duration 30
+    python loadgen.py reasoning --base-url http://localhost:8002 --mode closed --concurrency 1,2,4
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from quantize_model import find_images
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'testData')
+REASONING_ENDPOINTS = ["/extract-product", "/extract", "/generate-youtube-title"]
+IMAGE_CONTENT_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+
+# Used when no description files are given
+SAMPLE_DESCRIPTIONS = [
+    "Pure Banarasi silk saree with heavy zari border and contrast blouse. Price 1850 plus shipping",
+    "Georgette anarkali suit, semi-stitched, sizes M L XL, mirror work, rate 1299 free shipping",
+    "Soft organza saree with floral digital print and sequence work, ready to ship, 990+$",
+    "Cotton kurti set with dupatta, stitched, sizes 38 to 44, daily wear, 650 rs plus shipping"
+]
+
+
+class RequestSpec:
+    """One request of the workload: method, path and httpx keyword arguments"""
+
+    def __init__(self, name: str, method: str, path: str, **kwargs):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.kwargs = kwargs
+
+    def send(self, client):
+        """Start the request on an httpx.AsyncClient"""
+        return client.request(self.method, self.path, **self.kwargs)
+
+
+def image_requests(
+    images: Sequence[Tuple[str, bytes]],
+    endpoint: str = "/extract-features"
+) -> List[RequestSpec]:
+    """
+    Extraction workload: one multipart upload (or raw body for /stream) per image
+
+    Args:
+        images: (file name, image bytes) pairs
+        endpoint: /extract-features, /extract-features/stream or /extract-features/batch
+    """
+    specs = []
+    for name, image_bytes in images:
+        content_type = IMAGE_CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'image/jpeg')
+        if endpoint.endswith("/stream"):
+            specs.append(RequestSpec(name, "POST", endpoint, content=image_bytes,
+                                     headers={'Content-Type': 'application/octet-stream'}))
+        elif endpoint.endswith("/batch"):
+            specs.append(RequestSpec(name, "POST", endpoint, files=[('files', (name, image_bytes, content_type))]))
+        else:
+            specs.append(RequestSpec(name, "POST", endpoint, files={'file': (name, image_bytes, content_type)}))
+    return specs
+
+
+def reasoning_requests(
+    descriptions: Sequence[str],
+    endpoints: Sequence[str] = REASONING_ENDPOINTS,
+    priority: Optional[int] = None
+) -> List[RequestSpec]:
+    """
+    Reasoning workload: every description against every endpoint
+
+    Args:
+        descriptions: Product descriptions
+        endpoints: Reasoning endpoints to exercise
+        priority: Queue priority for /extract-product (0 = interactive, 1 = bulk)
+    """
+    specs = []
+    for index, description in enumerate(descriptions):
+        for endpoint in endpoints:
+            if endpoint == "/extract":
+                body: Dict[str, Any] = {'text': description}
+            elif endpoint == "/suggest-group-metadata":
+                body = {'descriptions': [description]}
+            else:
+                body = {'description': description}
+            params = {'priority': priority} if endpoint == "/extract-product" and priority is not None else None
+            specs.append(RequestSpec(f"{endpoint}#{index}", "POST", endpoint, json=body, params=params))
+    return specs
+
+
+def load_images(path: str) -> List[Tuple[str, bytes]]:
+    """Images in a directory (or a single image file)"""
+    paths = [path] if os.path.isfile(path) else find_images(path)
+    images = []
+    for image_path in paths:
+        with open(image_path, 'rb') as f:
+            images.append((os.path.basename(image_path), f.read()))
+    return images
+
+
+def load_descriptions(paths: Sequence[str]) -> List[str]:
+    """Descriptions from text files (blank-line separated), or the built-in samples"""
+    descriptions = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            descriptions += [block.strip() for block in f.read().split("\n\n") if block.strip()]
+    return descriptions or list(SAMPLE_DESCRIPTIONS)
+
+
+class LoadRecorder:
+    """Outcomes of the requests sent at one load level"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.errors = 0
+        self.dropped = 0
+        self.started = 0
+        self.first_send: Optional[float] = None
+        self.last_completion: Optional[float] = None
+
+    def record(self, scheduled: float, status: str, ok: bool) -> None:
+        """Record one completed request whose latency counts from `scheduled`"""
+        now = time.perf_counter()
+        self.latencies_ms.append((now - scheduled) * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+        self.last_completion = now
+
+    def summary(self) -> Dict[str, Any]:
+        """Completed count, achieved throughput, error rate and latency percentiles"""
+        completed = len(self.latencies_ms)
+        elapsed = (
+            self.last_completion - self.first_send
+            if completed and self.first_send is not None else 0.0
+        )
+        result: Dict[str, Any] = {
+            'sent': self.started,
+            'completed': completed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'error_rate': round((self.errors + self.dropped) / (completed + self.dropped), 4)
+            if completed + self.dropped else 0.0,
+            'statuses': dict(sorted(self.statuses.items())),
+            'achieved_rps': round((completed - self.errors) / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        if completed:
+            latencies = np.asarray(self.latencies_ms)
+            for percentile in (50, 90, 95, 99):
+                result[f'p{percentile}_ms'] = round(float(np.percentile(latencies, percentile)), 2)
+            result['max_ms'] = round(float(latencies.max()), 2)
+            result['mean_ms'] = round(float(latencies.mean()), 2)
+        return result
+
+
+async def _send(client, spec: RequestSpec, scheduled: float, recorder: LoadRecorder) -> None:
+    try:
+        response = await spec.send(client)
+        recorder.record(scheduled, str(response.status_code), response.status_code < 400)
+    except Exception as e:
+        recorder.record(scheduled, type(e).__name__, False)
+
+
+async def run_open_loop(
+    client,
+    specs: Sequence[RequestSpec],
+    rps: float,
+    duration_s: float,
+    poisson: bool = False,
+    max_outstanding: int = 1000,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Send requests at a fixed arrival rate for a duration
+
+    Args:
+        client: httpx.AsyncClient with the service base URL
+        specs: Workload, replayed round-robin
+        rps: Arrival rate
+        duration_s: Sending window
+        poisson: Exponential inter-arrival times instead of a fixed interval
+        max_outstanding: Arrivals beyond this many in-flight requests are dropped
+            (counted as errors) so an overloaded target cannot exhaust the client
+        seed: Random seed for Poisson arrivals
+
+    Returns:
+        LoadRecorder summary with the offered rate
+    """
+    recorder = LoadRecorder()
+    rng = random.Random(seed)
+    workload = itertools.cycle(specs)
+    tasks = set()
+    start = time.perf_counter()
+    recorder.first_send = start
+    next_send = start
+
+    while next_send - start < duration_s:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        spec = next(workload)
+        if len(tasks) >= max_outstanding:
+            recorder.dropped += 1
+        else:
+            recorder.started += 1
+            task = asyncio.ensure_future(_send(client, spec, next_send, recorder))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        next_send += rng.expovariate(rps) if poisson else 1 / rps
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    return {'mode': 'open', 'offered_rps': rps, **recorder.summary()}
+
+
+async def run_closed_loop(
+    client,
+    specs: Sequence[RequestSpec],
+    concurrency: int,
+    duration_s: float
+) -> Dict[str, Any]:
+    """
+    Run `concurrency` clients back to back for a duration
+
+    Args:
+        client: httpx.AsyncClient with the service base URL
+        specs: Workload, replayed round-robin across all clients
+        concurrency: Simultaneous clients
+        duration_s: Time after which clients stop sending
+
+    Returns:
+        LoadRecorder summary with the concurrency
+    """
+    recorder = LoadRecorder()
+    workload = itertools.cycle(specs)
+    start = time.perf_counter()
+    recorder.first_send = start
+
+    async def client_loop():
+        while time.perf_counter() - start < duration_s:
+            recorder.started += 1
+            await _send(client, next(workload), time.perf_counter(), recorder)
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return {'mode': 'closed', 'concurrency': concurrency, **recorder.summary()}
+
+
+def find_saturation(
+    levels: Sequence[Dict[str, Any]],
+    slo_p99_ms: Optional[float] = None,
+    max_error_rate: float = 0.01,
+    min_open_ratio: float = 0.9,
+    min_closed_gain: float = 0.1
+) -> Optional[Dict[str, Any]]:
+    """
+    First level at which the service no longer keeps up
+
+    Args:
+        levels: Summaries in increasing load order
+        slo_p99_ms: p99 latency objective (ignored if None)
+        max_error_rate: Highest acceptable error rate
+        min_open_ratio: Open loop: achieved / offered rate below this saturates
+        min_closed_gain: Closed loop: relative throughput gain per doubling of
+            clients below this saturates
+
+    Returns:
+        The saturating level's summary with a 'reason', or None if all levels kept up
+    """
+    previous = None
+    for level in levels:
+        reasons = []
+        if level['error_rate'] > max_error_rate:
+            reasons.append(f"error rate {level['error_rate']}")
+        if slo_p99_ms is not None and level.get('p99_ms', float('inf')) > slo_p99_ms:
+            reasons.append(f"p99 {level.get('p99_ms')} ms over {slo_p99_ms} ms")
+        if level['mode'] == 'open' and level['achieved_rps'] < min_open_ratio * level['offered_rps']:
+            reasons.append(f"achieved {level['achieved_rps']} of {level['offered_rps']} rps")
+        if level['mode'] == 'closed' and previous is not None and previous['achieved_rps'] > 0:
+            doublings = max(np.log2(level['concurrency'] / previous['concurrency']), 1e-9)
+            gain = (level['achieved_rps'] / previous['achieved_rps']) ** (1 / doublings) - 1
+            if gain < min_closed_gain:
+                reasons.append(f"throughput gain {round(gain * 100, 1)}% per doubling of clients")
+        if reasons:
+            return {**level, 'reason': "; ".join(reasons)}
+        previous = level
+    return None
+
+
+async def sweep(
+    client,
+    specs: Sequence[RequestSpec],
+    mode: str,
+    levels: Sequence[float],
+    duration_s: float,
+    poisson: bool = False,
+    max_outstanding: int = 1000,
+    pause_s: float = 0.0
+) -> List[Dict[str, Any]]:
+    """Run each load level in turn (open loop: rps values, closed loop: concurrency values)"""
+    results = []
+    for level in levels:
+        if mode == 'open':
+            result = await run_open_loop(client, specs, level, duration_s, poisson, max_outstanding)
+        else:
+            result = await run_closed_loop(client, specs, int(level), duration_s)
+        logger.info(
+            f"{mode} {level}: {result['achieved_rps']} rps, p50 {result.get('p50_ms')} ms, "
+            f"p99 {result.get('p99_ms')} ms, errors {result['error_rate']}"
+        )
+        results.append(result)
+        if pause_s:
+            await asyncio.sleep(pause_s)
+    return results
+
+
+def iter_levels(value: str) -> Iterator[float]:
+    for part in value.split(','):
+        if part.strip():
+            yield float(part)
+
+
+async def _run(args) -> Dict[str, Any]:
+    import httpx
+
+    if args.target == 'extraction':
+        specs = image_requests(load_images(args.images), endpoint=args.endpoint)
+    else:
+        specs = reasoning_requests(
+            load_descriptions(args.descriptions),
+            endpoints=args.endpoints.split(','),
+            priority=args.priority
+        )
+    if not specs:
+        raise SystemExit("Empty workload: no images or descriptions found")
+
+    levels = list(iter_levels(args.rps if args.mode == 'open' else args.concurrency))
+    limits = httpx.Limits(max_connections=args.max_outstanding, max_keepalive_connections=args.max_outstanding)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        results = await sweep(
+            client, specs, args.mode, levels, args.duration,
+            poisson=args.poisson, max_outstanding=args.max_outstanding, pause_s=args.pause
+        )
+
+    return {
+        'target': args.target,
+        'base_url': args.base_url,
+        'mode': args.mode,
+        'duration_s': args.duration,
+        'workload_size': len(specs),
+        'levels': results,
+        'saturation': find_saturation(results, slo_p99_ms=args.slo_p99_ms, max_error_rate=args.max_error_rate)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the latency/throughput curve of a service")
+    parser.add_argument("target", choices=["extraction", "reasoning"])
+    parser.add_argument("--base-url", default=None, help="Default: http://localhost:8001 (extraction), :8002 (reasoning)")
+    parser.add_argument("--mode", choices=["open", "closed"], default="open")
+    parser.add_argument("--rps", default="1,2,4,8,16", help="Open-loop arrival rates to sweep")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Closed-loop client counts to sweep")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per level")
+    parser.add_argument("--pause", type=float, default=2.0, help="Seconds between levels")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--max-outstanding", type=int, default=1000)
+    parser.add_argument("--slo-p99-ms", type=float, default=None)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--images", default=DEFAULT_TEST_DATA, help="Image directory or file (extraction)")
+    parser.add_argument("--endpoint", default="/extract-features", help="Extraction endpoint")
+    parser.add_argument("--descriptions", nargs="*", default=[], help="Description text files (reasoning)")
+    parser.add_argument("--endpoints", default=",".join(REASONING_ENDPOINTS), help="Reasoning endpoints")
+    parser.add_argument("--priority", type=int, default=None, help="/extract-product priority (0 high, 1 low)")
+    parser.add_argument("--output", default="load_report.json")
+    args = parser.parse_args()
+    args.base_url = args.base_url or ("http://localhost:8001" if args.target == 'extraction' else "http://localhost:8002")
+    logging.basicConfig(level=logging.INFO)
+
+    report = asyncio.run(_run(args))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    level_key = 'offered_rps' if args.mode == 'open' else 'concurrency'
+    for level in report['levels']:
+        print(f"{level_key} {level[level_key]:>7}: {level['achieved_rps']:>8} rps  p50 {level.get('p50_ms')} ms  "
+              f"p99 {level.get('p99_ms')} ms  errors {level['error_rate']:.2%}")
+    saturation = report['saturation']
+    if saturation:
+        print(f"Saturates at {level_key} {saturation[level_key]}: {saturation['reason']}")
+    else:
+        print("No saturation within the tested levels")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
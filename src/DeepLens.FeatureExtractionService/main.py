@@ -3,22 +3,69 @@ Feature Extraction Service - FastAPI Application
 Stateless ML inference service providing REST API for extracting ResNet50 features from images.
 Part of DeepLens distributed architecture - handles only feature extraction, no data storage.
 """
+import asyncio
+import functools
+import json
 import logging
+import os
+import secrets
 import time
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, Query, Request
+from fastapi.responses import JSONResponse, Response
 from pythonjsonlogger import jsonlogger
 
-from config import settings
+from config import ModelConfig, SessionTuning, settings
 from models import (
     HealthResponse,
     ExtractFeaturesResponse,
+    BatchExtractFeaturesResponse,
+    StatsResponse,
+    SearchResponse,
+    ClusterResponse,
+    ModelInfo,
+    ModelsResponse,
+    ModelSwapRequest,
+    ModelSwapStatus,
+    EncodingInfo,
+    EncodingsResponse,
     ErrorResponse
 )
 from feature_extractor import ResNet50FeatureExtractor
+from batching import MicroBatcher
+from clustering import cluster_vectors
+from model_registry import ModelRegistry, model_key
+from hot_swap import ModelLeases, ModelLeaseMiddleware
+from admission import AdmissionController, AdmissionMiddleware
+from pipeline import ExtractionPipeline
+from scheduling import BULK, INTERACTIVE, LANES, LaneFullError, PriorityScheduler
+from embedding_cache import EmbeddingCache, preprocessing_fingerprint
+from perceptual_hash import PerceptualHashIndex
+import metrics
+from metrics import MetricsMiddleware, stage_timer, stats_families
+from prefork import InferenceWorkerPool, PreforkFeatureExtractor
+from session_tuning import load_tuning_profile
+from kafka_worker import KafkaExtractionWorker, FileImageStore, MinioImageStore, create_kafka_clients
+from serialization import (
+    MEDIA_JSON,
+    MEDIA_OCTET_STREAM,
+    BINARY_RESPONSE_DOCS,
+    negotiate_media_type,
+    json_response,
+    binary_response,
+    metadata_headers,
+    perceptual_hash_fields,
+    perceptual_hash_headers,
+    failed_indices_header,
+    encoded_fields,
+    encoded_binary
+)
+from upload_stream import StreamingImageValidator, UploadRejected
+from vector_index import VectorIndex
+from vector_encoding import FLOAT32, ENCODINGS, ENCODING_DTYPES, bytes_per_vector
 
 # Configure logging
 logger = logging.getLogger()
@@ -30,32 +77,299 @@ logHandler.setFormatter(formatter)
 logger.addHandler(logHandler)
 logger.setLevel(settings.log_level)
 
-# Global feature extractor instance
+# Global feature extractor instance and the model it serves (replaced together by a hot swap)
 feature_extractor: Optional[ResNet50FeatureExtractor] = None
+primary_model: ModelConfig = settings.default_model_config
+
+# Requests in flight per extractor, so a replaced model can be drained
+model_leases = ModelLeases()
+
+# Latest hot swap of the startup model
+swap_state: Dict[str, Any] = {'status': 'idle'}
+swap_task: Optional[asyncio.Task] = None
+
+# Registry of every servable model, the startup one included (pinned)
+model_registry: Optional[ModelRegistry] = None
+
+# Pre-forked inference processes, set by serve.py before the server starts
+inference_pool: Optional[InferenceWorkerPool] = None
+
+# Executor stages keeping decode and inference off the event loop; priority
+# scheduling reserves an inference thread for interactive batches, so needs two
+extraction_pipeline = ExtractionPipeline(
+    decode_workers=settings.decode_workers,
+    inference_workers=max(settings.inference_workers, 2 if settings.priority_scheduling_enabled else 1),
+    interactive_decode_workers=settings.interactive_decode_workers
+)
+
+# Optional micro-batcher in front of the feature extractor
+micro_batcher: Optional[MicroBatcher] = None
+
+# Optional Kafka consumer running batched extraction for the event pipeline
+kafka_worker: Optional[KafkaExtractionWorker] = None
+
+# Optional in-process vector index behind /search
+vector_index: Optional[VectorIndex] = None
+
+# Bounded in-flight and queued extraction requests (None = no limit)
+admission: Optional[AdmissionController] = None
+if settings.admission_max_in_flight > 0:
+    admission = AdmissionController(
+        max_in_flight=settings.admission_max_in_flight,
+        max_queued=settings.admission_max_queued,
+        queue_timeout=settings.admission_queue_timeout_s,
+        rate_window=settings.admission_rate_window_s
+    )
+
+# Startup phase timings; ready once the model is loaded and warmed up
+startup_state: Dict[str, Any] = {'ready': False}
+
+
+def load_registered_model(
+    config: ModelConfig, tuning: Optional[SessionTuning] = None
+) -> ResNet50FeatureExtractor:
+    """Create the extractor of a registry model with the service's decode and session settings"""
+    return ResNet50FeatureExtractor(
+        config.model_file,
+        fast_decode=settings.fast_decode,
+        resample=settings.resample_filter,
+        tuning=tuning,
+        optimized_model_dir=settings.optimized_model_dir,
+        optimized_model_format=settings.optimized_model_format,
+        perceptual_hash=settings.perceptual_hash_algorithm,
+        input_size=config.input_size,
+        normalization_mean=config.normalization_mean,
+        normalization_std=config.normalization_std
+    )
+
+
+def create_embedding_cache(config: ModelConfig) -> Optional[EmbeddingCache]:
+    """Embedding cache for a model's vectors, if enabled (other versions are kept; see prune_model_state)"""
+    if not settings.embedding_cache_enabled:
+        return None
+    return EmbeddingCache(
+        model_name=config.model_name,
+        model_version=config.model_version,
+        max_memory_bytes=settings.embedding_cache_memory_mb * 1024 * 1024,
+        disk_path=settings.embedding_cache_dir,
+        max_disk_bytes=settings.embedding_cache_disk_mb * 1024 * 1024,
+        prune=False,
+        preprocessing=preprocessing_fingerprint(
+            fast_decode=settings.fast_decode,
+            resample=settings.resample_filter,
+            input_size=config.input_size,
+            normalization_mean=config.normalization_mean,
+            normalization_std=config.normalization_std,
+            perceptual_hash=settings.perceptual_hash_algorithm
+        )
+    )
+
+
+def create_near_duplicate_index() -> Optional[PerceptualHashIndex]:
+    """Empty near-duplicate index, if enabled"""
+    if not (settings.near_duplicate_enabled and settings.perceptual_hash_algorithm):
+        return None
+    return PerceptualHashIndex(
+        max_distance=settings.near_duplicate_max_distance,
+        max_entries=settings.near_duplicate_max_entries
+    )
+
+
+def open_vector_index(config: ModelConfig) -> Optional[VectorIndex]:
+    """Vector index of a model's vectors if enabled (None if it cannot be opened; other versions are kept)"""
+    if not settings.vector_index_enabled:
+        return None
+    try:
+        return VectorIndex(
+            config.feature_dimension,
+            mode=settings.vector_index_mode,
+            path=settings.vector_index_path,
+            model_name=config.model_name,
+            model_version=config.model_version,
+            nlist=settings.vector_index_nlist,
+            nprobe=settings.vector_index_nprobe,
+            prune=False
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to open vector index: {str(e)}")
+        return None
+
+
+def prune_model_state(cache: Optional[EmbeddingCache], index: Optional[VectorIndex]) -> None:
+    """
+    Remove the disk cache and index files of versions of the serving model that
+    are no longer registered; registered ones may still serve or be swapped back to
+    """
+    keep = model_registry.versions(primary_model.model_name) if model_registry is not None else []
+    for state in (cache, index):
+        if state is not None:
+            try:
+                state.prune_versions(keep)
+            except OSError as e:
+                logger.warning(f"Failed to remove state of old model versions: {str(e)}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
-    global feature_extractor
+    global feature_extractor, primary_model, model_registry, micro_batcher, kafka_worker, vector_index, swap_task
     
     # Startup
+    startup_start = time.perf_counter()
+    startup_state.clear()
+    startup_state['ready'] = False
+    primary_model = settings.default_model_config
     logger.info(f"Starting {settings.service_name} v{settings.service_version}")
-    logger.info(f"Model path: {settings.model_path}")
+    logger.info(f"Model path: {settings.serving_model_path} ({settings.model_precision})")
     logger.info(f"Authentication enabled: {settings.enable_auth}")
     
+    session_tuning = None
+    if settings.tuning_profile_path:
+        try:
+            session_tuning = load_tuning_profile(settings.tuning_profile_path, settings.tuning_profile_name)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load tuning profile: {str(e)}")
+    
     try:
-        feature_extractor = ResNet50FeatureExtractor(settings.model_path)
+        phase_start = time.perf_counter()
+        if inference_pool is not None:
+            # Workers loaded and warmed up before serve.py started the server
+            feature_extractor = PreforkFeatureExtractor(
+                inference_pool,
+                fast_decode=settings.fast_decode,
+                resample=settings.resample_filter,
+                perceptual_hash=settings.perceptual_hash_algorithm
+            )
+        else:
+            feature_extractor = ResNet50FeatureExtractor(
+                settings.serving_model_path,
+                fast_decode=settings.fast_decode,
+                resample=settings.resample_filter,
+                tuning=session_tuning,
+                optimized_model_dir=settings.optimized_model_dir,
+                optimized_model_format=settings.optimized_model_format,
+                perceptual_hash=settings.perceptual_hash_algorithm
+            )
+            startup_state['optimized_model'] = feature_extractor.load_timings['optimized_model']
+        startup_state['model_load_ms'] = round((time.perf_counter() - phase_start) * 1000, 2)
         logger.info("Feature extractor initialized successfully")
+        
+        if inference_pool is None and settings.warmup_iterations > 0 and settings.warmup_batch_sizes:
+            startup_state['warmup_ms'] = await extraction_pipeline.inference.run(
+                feature_extractor.warmup,
+                settings.warmup_batch_sizes,
+                settings.warmup_iterations
+            )
+        startup_state['ready'] = True
     except Exception as e:
         logger.error(f"Failed to initialize feature extractor: {str(e)}")
         # Note: In production, you might want to fail fast here
         # For development, we'll allow startup to continue
     
+    # Further models are loaded on their first request
+    model_registry = ModelRegistry(
+        functools.partial(load_registered_model, tuning=session_tuning),
+        memory_budget_bytes=settings.model_memory_budget_mb * 1024 * 1024
+    )
+    model_registry.register(primary_model, extractor=feature_extractor, pinned=True, default=True)
+    for model_config in settings.served_models:
+        try:
+            model_registry.register(model_config)
+        except ValueError as e:
+            logger.error(f"Failed to register model: {str(e)}")
+    startup_state['models'] = len(model_registry.stats()['models'])
+    
+    extraction_pipeline.cache = create_embedding_cache(primary_model)
+    extraction_pipeline.near_duplicates = create_near_duplicate_index()
+    vector_index = open_vector_index(primary_model)
+    if vector_index is not None:
+        startup_state['vector_index_vectors'] = len(vector_index)
+    prune_model_state(extraction_pipeline.cache, vector_index)
+    
+    if settings.priority_scheduling_enabled:
+        # Serves every model and outlives hot swaps, so it is not tied to an extractor
+        scheduler = PriorityScheduler(
+            executor=extraction_pipeline.inference,
+            interactive_batch_size=settings.interactive_max_batch_size,
+            bulk_batch_size=settings.bulk_max_batch_size,
+            bulk_window_ms=settings.bulk_batch_window_ms,
+            bulk_queue_size=settings.bulk_queue_size
+        )
+        await scheduler.start()
+        extraction_pipeline.scheduler = scheduler
+        if settings.micro_batch_enabled:
+            logger.info("Micro-batching is superseded by the priority scheduler")
+    elif settings.micro_batch_enabled and feature_extractor is not None:
+        max_batch_size = settings.micro_batch_max_size
+        if session_tuning is not None:
+            # The profile's batch size is the largest that met the latency target
+            max_batch_size = min(max_batch_size, session_tuning.batch_size)
+        micro_batcher = MicroBatcher(
+            feature_extractor,
+            max_batch_size=max_batch_size,
+            window_ms=settings.micro_batch_window_ms,
+            executor=extraction_pipeline.inference
+        )
+        await micro_batcher.start()
+    
+    if settings.kafka_enabled and feature_extractor is not None:
+        consumer, producer = create_kafka_clients(
+            settings.kafka_bootstrap_servers,
+            settings.kafka_group_id,
+            client_id=settings.service_name
+        )
+        if settings.image_store_root:
+            image_store = FileImageStore(settings.image_store_root)
+        else:
+            image_store = MinioImageStore(
+                settings.minio_endpoint,
+                settings.minio_access_key,
+                settings.minio_secret_key,
+                default_bucket=settings.minio_default_bucket,
+                secure=settings.minio_secure
+            )
+        kafka_worker = KafkaExtractionWorker(
+            feature_extractor,
+            extraction_pipeline,
+            consumer,
+            producer,
+            image_store,
+            extraction_topic=settings.kafka_extraction_topic,
+            indexing_topic=settings.kafka_indexing_topic,
+            batch_size=settings.kafka_batch_size,
+            poll_timeout=settings.kafka_poll_timeout_ms / 1000,
+            model_version=primary_model.model_version,
+            extractor_version=settings.service_version
+        )
+        await kafka_worker.start()
+    
+    startup_state['total_ms'] = round((time.perf_counter() - startup_start) * 1000, 2)
+    logger.info(f"Startup complete: {startup_state}")
+    
     yield
     
     # Shutdown
     logger.info(f"Shutting down {settings.service_name}")
+    if swap_task is not None and not swap_task.done():
+        swap_task.cancel()
+    swap_task = None
+    if kafka_worker is not None:
+        await kafka_worker.stop()
+        kafka_worker = None
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+        micro_batcher = None
+    if extraction_pipeline.scheduler is not None:
+        await extraction_pipeline.scheduler.stop()
+        extraction_pipeline.scheduler = None
+    if vector_index is not None:
+        vector_index.close()
+        vector_index = None
+    model_registry = None
+    startup_state['ready'] = False
+    extraction_pipeline.shutdown()
+    extraction_pipeline.cache = None
+    extraction_pipeline.near_duplicates = None
 
 
 # Create FastAPI app
@@ -66,51 +380,155 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Extraction endpoints get in-flight/latency metrics and a Server-Timing header
+EXTRACTION_ENDPOINTS = (
+    "/extract-features", "/extract-features/batch", "/extract-features/stream", "/search", "/cluster"
+)
+
+# Innermost, so rejected requests still show up in the request metrics
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission, endpoints=EXTRACTION_ENDPOINTS)
+
+if settings.metrics_enabled:
+    app.add_middleware(
+        MetricsMiddleware,
+        endpoints=EXTRACTION_ENDPOINTS,
+        server_timing=settings.server_timing_enabled
+    )
+
+# Requests hold the model serving them until the response is sent (see hot_swap.py)
+app.add_middleware(ModelLeaseMiddleware, leases=model_leases)
+
+
+def collect_service_stats() -> list:
+    """Scrape-time metric families from the stage pools, cache, scheduler, micro-batcher and Kafka worker"""
+    pipeline_stats = extraction_pipeline.stats()
+    registry_stats = model_registry.stats() if model_registry is not None else {'models': {}}
+    scheduler_stats = pipeline_stats['scheduler']['lanes'] if pipeline_stats['scheduler'] is not None else None
+    return (
+        stats_families(
+            "deeplens_stage",
+            [({'stage': stage}, pipeline_stats[stage]) for stage in ('decode', 'interactive_decode', 'inference')],
+            counters=('completed', 'failed')
+        )
+        + stats_families(
+            "deeplens_cache",
+            [({}, pipeline_stats['cache'])],
+            counters=('memory_hits', 'disk_hits', 'misses', 'memory_evictions', 'disk_evictions')
+        )
+        + stats_families(
+            "deeplens_near_duplicates",
+            [({}, pipeline_stats['near_duplicates'])],
+            counters=('lookups', 'hits', 'added')
+        )
+        + stats_families(
+            "deeplens_vector_index",
+            [({}, vector_index.stats() if vector_index is not None else None)],
+            counters=('searches', 'exact_searches', 'ivf_searches', 'trainings')
+        )
+        + stats_families(
+            "deeplens_model",
+            [({'model': key}, model_stats) for key, model_stats in registry_stats['models'].items()],
+            counters=('requests', 'loads', 'evictions')
+        )
+        + stats_families(
+            "deeplens_model_registry",
+            [({}, registry_stats)]
+        )
+        + stats_families(
+            "deeplens_scheduler",
+            [({'lane': lane}, lane_stats) for lane, lane_stats in (scheduler_stats or {}).items()],
+            counters=('submitted', 'rejected', 'batches_run', 'items_processed')
+        )
+        + stats_families(
+            "deeplens_micro_batcher",
+            [({}, micro_batcher.stats() if micro_batcher is not None else None)],
+            counters=('batches_run', 'items_processed')
+        )
+        + stats_families(
+            "deeplens_admission",
+            [({}, admission.load() if admission is not None else None)],
+            counters=('admitted', 'rejected', 'timed_out')
+        )
+        + stats_families(
+            "deeplens_kafka",
+            [({}, kafka_worker.stats() if kafka_worker is not None else None)],
+            counters=('polls', 'messages_consumed', 'events_produced', 'failed', 'invalid', 'commits')
+        )
+    )
+
+
+metrics.registry.add_collector(collect_service_stats)
+
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
     Health check endpoint
-    Returns service status and model availability
+    Returns service status, model availability and the current load
+    (`load.utilization` reaches 1 when extraction requests are being rejected)
     """
     return HealthResponse(
         status="healthy",
         service=settings.service_name,
         version=settings.service_version,
-        model_loaded=feature_extractor is not None and feature_extractor.is_loaded()
+        model_loaded=feature_extractor is not None and feature_extractor.is_loaded(),
+        ready=startup_state['ready'],
+        startup=startup_state,
+        load=admission.load() if admission is not None else None
     )
 
 
-@app.post(
-    "/extract-features",
-    response_model=ExtractFeaturesResponse,
-    responses={
-        400: {"model": ErrorResponse},
-        500: {"model": ErrorResponse}
-    }
-)
-async def extract_features(
-    file: UploadFile = File(..., description="Image file to extract features from"),
-    image_id: Optional[str] = Form(None, description="Optional image identifier"),
-    return_metadata: bool = Form(False, description="Whether to return image metadata")
-):
+@app.get("/ready", response_model=HealthResponse)
+async def readiness_check():
     """
-    Extract feature vector from an uploaded image
-    
-    - **file**: Image file (JPEG, PNG, or WebP)
-    - **image_id**: Optional identifier for the image
-    - **return_metadata**: Whether to include image dimensions and format in response
-    
-    Returns a feature vector suitable for similarity search
+    Readiness check endpoint
+    Returns 503 until the model is loaded and warmed up, so load balancers
+    only route traffic to instances that will answer at full speed
     """
-    # Check if model is loaded
-    if feature_extractor is None or not feature_extractor.is_loaded():
+    model_loaded = feature_extractor is not None and feature_extractor.is_loaded()
+    ready = bool(startup_state['ready']) and model_loaded
+    body = HealthResponse(
+        status="ready" if ready else "starting",
+        service=settings.service_name,
+        version=settings.service_version,
+        model_loaded=model_loaded,
+        ready=ready,
+        startup=startup_state
+    )
+    return JSONResponse(status_code=200 if ready else 503, content=body.model_dump())
+
+
+def validate_priority(priority: str) -> None:
+    """Reject unknown priority lanes with a 400"""
+    if priority not in LANES:
         raise HTTPException(
-            status_code=500,
-            detail="Feature extraction model not available"
+            status_code=400,
+            detail=f"Unsupported priority: {priority}. "
+                   f"Supported priorities: {', '.join(LANES)}"
         )
-    
-    # Validate content type
+
+
+def lane_full(e: LaneFullError) -> HTTPException:
+    """503 asking the client to retry once the lane's queue is expected to have drained"""
+    logger.warning(f"Rejected extraction: {str(e)}")
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def validate_encoding(encoding: str) -> None:
+    """Reject unknown vector encodings with a 400"""
+    if encoding not in ENCODINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported encoding: {encoding}. "
+                   f"Supported encodings: {', '.join(ENCODINGS)}"
+        )
+
+
+async def read_image_upload(file: UploadFile) -> bytes:
+    """
+    Read an uploaded image, rejecting unsupported types and oversized files with a 400
+    """
     if file.content_type not in settings.supported_formats:
         raise HTTPException(
             status_code=400,
@@ -118,51 +536,203 @@ async def extract_features(
                    f"Supported formats: {', '.join(settings.supported_formats)}"
         )
     
-    try:
-        # Read file contents
-        start_time = time.time()
+    with stage_timer("upload_read"):
         image_bytes = await file.read()
-        
-        # Validate file size
-        if len(image_bytes) > settings.max_image_size:
+    
+    if len(image_bytes) > settings.max_image_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Image size exceeds maximum allowed size of "
+                   f"{settings.max_image_size / (1024*1024):.1f} MB"
+        )
+    return image_bytes
+
+
+async def read_batch_upload(file: UploadFile) -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    Read one image of a multi-file request, reporting validation failures
+    as a per-item error instead of failing the request
+    
+    Returns:
+        Tuple of (image_bytes, error), exactly one of them None
+    """
+    if file.content_type not in settings.supported_formats:
+        return None, f"Unsupported image format: {file.content_type}"
+    
+    with stage_timer("upload_read"):
+        image_bytes = await file.read()
+    if len(image_bytes) > settings.max_image_size:
+        return None, (
+            f"Image size exceeds maximum allowed size of "
+            f"{settings.max_image_size / (1024*1024):.1f} MB"
+        )
+    return image_bytes, None
+
+
+async def select_model(model: Optional[str]) -> Tuple[ModelConfig, ResNet50FeatureExtractor]:
+    """
+    The model serving a request, loading a registry model on first use
+    
+    The startup model is the global feature_extractor; only its embeddings
+    go through the cache, near-duplicate index, micro-batcher and vector index.
+    The extractor is leased until the response is sent, so a hot swap drains
+    it before releasing it and the response reports the version that served it.
+    
+    Args:
+        model: Requested model as name or name:version, or None for the default
+    
+    Returns:
+        Tuple of (config, extractor)
+    
+    Raises:
+        HTTPException: 400 for an unknown model, 500 if it is not available
+    """
+    primary = primary_model
+    primary_key = model_key(primary.model_name, primary.model_version)
+    key = primary_key
+    if model:
+        if model_registry is not None:
+            try:
+                key = model_registry.resolve(model)
+            except KeyError as e:
+                raise HTTPException(status_code=400, detail=e.args[0])
+        elif model not in (primary.model_name, primary_key):
+            raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+    
+    if key == primary_key:
+        if feature_extractor is None or not feature_extractor.is_loaded():
             raise HTTPException(
-                status_code=400,
-                detail=f"Image size exceeds maximum allowed size of "
-                       f"{settings.max_image_size / (1024*1024):.1f} MB"
+                status_code=500,
+                detail="Feature extraction model not available"
             )
-        
-        # Extract features
-        features, metadata = feature_extractor.extract_features(image_bytes)
-        
-        # Calculate processing time
-        processing_time_ms = (time.time() - start_time) * 1000
-        
-        # Build response
-        response = ExtractFeaturesResponse(
-            image_id=image_id,
-            features=features,
-            feature_dimension=len(features),
-            model_name=settings.model_name,
-            processing_time_ms=round(processing_time_ms, 2)
+        if model_registry is not None and primary_key in model_registry:
+            model_registry.record_request(primary_key)
+        model_leases.acquire(feature_extractor)
+        return primary, feature_extractor
+    
+    try:
+        # Session creation takes seconds; keep it off the event loop and the stage pools
+        served_model, extractor = await asyncio.get_running_loop().run_in_executor(None, model_registry.get, key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    model_leases.acquire(extractor)
+    return served_model, extractor
+
+
+async def index_vectors(ids: List[str], vectors: List[np.ndarray]) -> None:
+    """Store extracted vectors in the in-process index, if enabled"""
+    if vector_index is None or not ids:
+        return
+    try:
+        await extraction_pipeline.decode.run(vector_index.add, ids, np.stack(vectors))
+    except (OSError, ValueError) as e:
+        # Indexing is best effort; the extraction itself succeeded
+        logger.warning(f"Failed to index vectors: {str(e)}")
+
+
+def load_encoding_report() -> dict:
+    """Read the configured recall report, or an empty dict if none is available"""
+    if not settings.encoding_report_path:
+        return {}
+    try:
+        with open(settings.encoding_report_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read encoding report: {str(e)}")
+        return {}
+
+
+async def extract_single_image(
+    served_model: ModelConfig,
+    extractor: ResNet50FeatureExtractor,
+    image_bytes: bytes,
+    image_id: Optional[str],
+    return_metadata: bool,
+    encoding: str,
+    accept: Optional[str],
+    start_time: float,
+    priority: str = INTERACTIVE
+) -> Response:
+    """
+    Extract features for one validated upload and build the response
+    
+    Args:
+        served_model: Config of the model serving the request
+        extractor: Its loaded extractor (see select_model)
+        image_bytes: Raw image bytes within the size limit
+        image_id: Optional image identifier echoed in the response
+        return_metadata: Whether to include image dimensions and format
+        encoding: Vector encoding (already validated)
+        accept: Raw Accept header used to pick JSON or a binary format
+        start_time: time.perf_counter() when the request started
+        priority: Scheduler lane (already validated)
+    
+    Returns:
+        JSON or binary response
+    """
+    primary = extractor is feature_extractor
+    try:
+        # Extract features on the executor stages (coalesced with concurrent
+        # requests when micro-batching is enabled)
+        features, metadata = await extraction_pipeline.extract(
+            extractor, image_bytes, batcher=micro_batcher if primary else None, reuse=primary, lane=priority
         )
+        # Re-checked: a hot swap may have replaced the model during extraction
+        if image_id is not None and extractor is feature_extractor:
+            await index_vectors([image_id], [features])
         
-        # Add metadata if requested
-        if return_metadata:
-            response.image_width = metadata['width']
-            response.image_height = metadata['height']
-            response.image_format = metadata['format']
+        # Calculate processing time
+        processing_time_ms = (time.perf_counter() - start_time) * 1000
         
         logger.info(
             f"Feature extraction successful",
             extra={
                 'image_id': image_id,
-                'feature_dimension': len(features),
+                'feature_dimension': features.shape[0],
                 'processing_time_ms': processing_time_ms
             }
         )
         
-        return response
+        with stage_timer("serialization"):
+            # Binary formats carry the ONNX output buffer as-is, metadata in headers
+            media_type = negotiate_media_type(accept)
+            if media_type != MEDIA_JSON:
+                encoded, headers = encoded_binary(features, encoding)
+                headers.update(metadata_headers(
+                    served_model.model_name,
+                    served_model.model_version,
+                    processing_time_ms,
+                    image_id=image_id,
+                    metadata=metadata if return_metadata else None
+                ))
+                headers.update(perceptual_hash_headers([metadata]))
+                return binary_response(encoded, media_type, headers)
+            
+            # Build response (serialized directly, without per-float validation)
+            response = {
+                'image_id': image_id,
+                **encoded_fields(features, encoding),
+                'feature_dimension': int(features.shape[0]),
+                'model_name': served_model.model_name,
+                'model_version': served_model.model_version,
+                'processing_time_ms': round(processing_time_ms, 2),
+                **perceptual_hash_fields(metadata)
+            }
+            
+            # Add metadata if requested
+            if return_metadata:
+                response['image_width'] = metadata['width']
+                response['image_height'] = metadata['height']
+                response['image_format'] = metadata['format']
+            
+            return json_response(response)
         
+    except HTTPException:
+        raise
+    
+    except LaneFullError as e:
+        raise lane_full(e)
+    
     except ValueError as e:
         # Feature extraction specific errors
         logger.warning(f"Feature extraction failed: {str(e)}")
@@ -177,6 +747,790 @@ async def extract_features(
         )
 
 
+@app.post(
+    "/extract-features",
+    response_model=ExtractFeaturesResponse,
+    responses={
+        200: BINARY_RESPONSE_DOCS,
+        400: {"model": ErrorResponse},
+        500: {"model": ErrorResponse}
+    }
+)
+async def extract_features(
+    file: UploadFile = File(..., description="Image file to extract features from"),
+    image_id: Optional[str] = Form(None, description="Optional image identifier"),
+    return_metadata: bool = Form(False, description="Whether to return image metadata"),
+    encoding: str = Form(FLOAT32, description="Vector encoding: float32 (default), float16, int8 or binary"),
+    model: Optional[str] = Form(None, description="Model as name or name:version (default model if omitted)"),
+    priority: str = Form(INTERACTIVE, description="Scheduling lane: interactive (default) or bulk"),
+    accept: Optional[str] = Header(None, description="application/json (default), application/octet-stream or application/x-npy")
+):
+    """
+    Extract feature vector from an uploaded image
+    
+    - **file**: Image file (JPEG, PNG, or WebP)
+    - **image_id**: Optional identifier for the image
+    - **return_metadata**: Whether to include image dimensions and format in response
+    - **encoding**: float32, float16, int8 (per-vector scale) or binary (packed sign bits)
+    - **model**: A registered model (see /models); the default model if omitted
+    - **priority**: `interactive` for queries, `bulk` for indexing (may be rejected
+      with 503 when the bulk queue is full)
+    
+    Returns a feature vector suitable for similarity search. With
+    `Accept: application/octet-stream` the body is the raw little-endian
+    vector in the requested encoding (`application/x-npy` wraps it in an
+    .npy header) and the remaining fields are sent as `X-*` response headers.
+    """
+    # Resolve the requested model, loading it if needed
+    served_model, extractor = await select_model(model)
+    
+    validate_encoding(encoding)
+    validate_priority(priority)
+    
+    # Validate content type and size while reading the upload
+    start_time = time.perf_counter()
+    image_bytes = await read_image_upload(file)
+    
+    return await extract_single_image(
+        served_model, extractor, image_bytes, image_id, return_metadata, encoding, accept, start_time, priority
+    )
+
+
+@app.post(
+    "/extract-features/stream",
+    response_model=ExtractFeaturesResponse,
+    responses={
+        200: BINARY_RESPONSE_DOCS,
+        400: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
+        500: {"model": ErrorResponse}
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {MEDIA_OCTET_STREAM: {"schema": {"type": "string", "format": "binary"}}}
+        }
+    }
+)
+async def extract_features_stream(
+    request: Request,
+    image_id: Optional[str] = Query(None, description="Optional image identifier"),
+    return_metadata: bool = Query(False, description="Whether to return image metadata"),
+    encoding: str = Query(FLOAT32, description="Vector encoding: float32 (default), float16, int8 or binary"),
+    model: Optional[str] = Query(None, description="Model as name or name:version (default model if omitted)"),
+    priority: str = Query(INTERACTIVE, description="Scheduling lane: interactive (default) or bulk"),
+    content_length: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None, description="application/json (default), application/octet-stream or application/x-npy")
+):
+    """
+    Extract a feature vector from a raw image request body
+    
+    The body is the image itself (no multipart). It is validated while it
+    streams in: the upload is rejected as soon as it passes `max_image_size`,
+    if its magic bytes are not JPEG/PNG/WebP, or once the image header shows
+    more than `max_image_pixels` pixels, without waiting for the rest of the body.
+    The format is taken from the data, not from the client's Content-Type.
+    `model` selects a registered model and `priority` the scheduling lane as
+    on /extract-features.
+    """
+    # Resolve the requested model, loading it if needed
+    served_model, extractor = await select_model(model)
+    
+    validate_encoding(encoding)
+    validate_priority(priority)
+    
+    start_time = time.perf_counter()
+    validator = StreamingImageValidator(
+        max_bytes=settings.max_image_size,
+        max_pixels=settings.max_image_pixels,
+        supported_types=tuple(settings.supported_formats)
+    )
+    try:
+        validator.check_declared_length(content_length)
+        with stage_timer("upload_read"):
+            async for chunk in request.stream():
+                validator.feed(chunk)
+            image_bytes, _ = validator.finish()
+    except UploadRejected as e:
+        logger.warning(
+            f"Streaming upload rejected: {e.detail}",
+            extra={'image_id': image_id, 'bytes_received': validator.size}
+        )
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return await extract_single_image(
+        served_model, extractor, image_bytes, image_id, return_metadata, encoding, accept, start_time, priority
+    )
+
+
+@app.post(
+    "/extract-features/batch",
+    response_model=BatchExtractFeaturesResponse,
+    responses={
+        200: BINARY_RESPONSE_DOCS,
+        400: {"model": ErrorResponse},
+        500: {"model": ErrorResponse}
+    }
+)
+async def extract_features_batch(
+    files: List[UploadFile] = File(..., description="Image files to extract features from"),
+    image_ids: List[str] = Form([], description="Optional identifiers, one per file in order"),
+    return_metadata: bool = Form(False, description="Whether to return image metadata"),
+    encoding: str = Form(FLOAT32, description="Vector encoding: float32 (default), float16, int8 or binary"),
+    model: Optional[str] = Form(None, description="Model as name or name:version (default model if omitted)"),
+    priority: str = Form(BULK, description="Scheduling lane: bulk (default) or interactive"),
+    accept: Optional[str] = Header(None, description="application/json (default), application/octet-stream or application/x-npy")
+):
+    """
+    Extract feature vectors from several uploaded images in one inference call
+    
+    - **files**: Image files (JPEG, PNG, or WebP), at most `max_batch_images`
+    - **image_ids**: Optional identifiers aligned with `files`
+    - **return_metadata**: Whether to include image dimensions and format per item
+    - **encoding**: float32, float16, int8 (per-vector scale) or binary (packed sign bits)
+    - **model**: A registered model (see /models); the default model if omitted
+    - **priority**: `bulk` (default) or `interactive` scheduling lane
+    
+    Items that fail validation or decoding are reported individually;
+    the remaining images are still processed. Binary formats return an
+    (N, D) matrix in the requested encoding and in request order; failed
+    rows are zero-filled and listed in the `X-Failed-Indices` header.
+    """
+    # Resolve the requested model, loading it if needed
+    served_model, extractor = await select_model(model)
+    
+    validate_encoding(encoding)
+    validate_priority(priority)
+    
+    if len(files) > settings.max_batch_images:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch contains {len(files)} images, maximum is {settings.max_batch_images}"
+        )
+    
+    if image_ids and len(image_ids) != len(files):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Got {len(image_ids)} image_ids for {len(files)} files"
+        )
+    
+    start_time = time.perf_counter()
+    results: List[dict] = []
+    vectors: List[Optional[np.ndarray]] = [None] * len(files)
+    metadatas: List[Optional[dict]] = [None] * len(files)
+    indexed_ids: List[str] = []
+    indexed_vectors: List[np.ndarray] = []
+    pending_indices: List[int] = []
+    pending_images: List[bytes] = []
+    
+    # Validate each upload; invalid items become per-item errors
+    for index, file in enumerate(files):
+        image_id = image_ids[index] if image_ids else None
+        results.append({
+            'index': index, 'image_id': image_id, 'features': None, 'encoding': encoding, 'error': None
+        })
+        
+        image_bytes, error = await read_batch_upload(file)
+        if error is not None:
+            results[index]['error'] = error
+            continue
+        
+        pending_indices.append(index)
+        pending_images.append(image_bytes)
+    
+    if pending_images:
+        try:
+            extracted = await extraction_pipeline.extract_batch(
+                extractor, pending_images, reuse=extractor is feature_extractor, lane=priority
+            )
+        except LaneFullError as e:
+            raise lane_full(e)
+        except Exception as e:
+            logger.error(f"Unexpected error during batch feature extraction: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail="Internal server error during feature extraction"
+            )
+        
+        for index, (features, metadata, error) in zip(pending_indices, extracted):
+            item = results[index]
+            item['error'] = error
+            if features is not None:
+                vectors[index] = features
+                metadatas[index] = metadata
+                item.update(encoded_fields(features, encoding))
+                item.update(perceptual_hash_fields(metadata))
+                if item['image_id'] is not None and extractor is feature_extractor:
+                    indexed_ids.append(item['image_id'])
+                    indexed_vectors.append(features)
+            if return_metadata and metadata is not None:
+                item['image_width'] = metadata['width']
+                item['image_height'] = metadata['height']
+                item['image_format'] = metadata['format']
+    
+    await index_vectors(indexed_ids, indexed_vectors)
+    
+    succeeded = sum(1 for item in results if item['error'] is None)
+    processing_time_ms = (time.perf_counter() - start_time) * 1000
+    
+    logger.info(
+        "Batch feature extraction completed",
+        extra={
+            'batch_size': len(files),
+            'succeeded': succeeded,
+            'processing_time_ms': processing_time_ms
+        }
+    )
+    
+    feature_dimension = next(
+        (vector.shape[0] for vector in vectors if vector is not None),
+        served_model.feature_dimension
+    )
+    
+    with stage_timer("serialization"):
+        media_type = negotiate_media_type(accept)
+        if media_type != MEDIA_JSON:
+            matrix = np.zeros((len(files), feature_dimension), dtype=np.float32)
+            for index, vector in enumerate(vectors):
+                if vector is not None:
+                    matrix[index] = vector
+            encoded, headers = encoded_binary(matrix, encoding)
+            headers.update(metadata_headers(served_model.model_name, served_model.model_version, processing_time_ms))
+            headers.update(perceptual_hash_headers(metadatas))
+            headers.update(failed_indices_header(
+                [item['index'] for item in results if item['error'] is not None]
+            ))
+            return binary_response(encoded, media_type, headers)
+        
+        return json_response({
+            'results': results,
+            'feature_dimension': int(feature_dimension),
+            'model_name': served_model.model_name,
+            'model_version': served_model.model_version,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'processing_time_ms': round(processing_time_ms, 2)
+        })
+
+
+@app.get("/encodings", response_model=EncodingsResponse)
+async def encodings():
+    """
+    Available vector encodings
+    Lists the size of each encoding and, when a recall report produced by
+    `vector_encoding.py` is configured, its measured recall loss versus float32
+    """
+    report = load_encoding_report()
+    dimension = settings.feature_dimension
+    return EncodingsResponse(
+        feature_dimension=dimension,
+        encodings=[
+            EncodingInfo(
+                encoding=name,
+                dtype=ENCODING_DTYPES[name],
+                bytes_per_vector=bytes_per_vector(name, dimension),
+                compression_ratio=round(
+                    bytes_per_vector(FLOAT32, dimension) / bytes_per_vector(name, dimension), 2
+                ),
+                recall_at_k=report.get(name, {}).get('recall_at_k'),
+                recall_loss=report.get(name, {}).get('recall_loss'),
+                k=report.get(name, {}).get('k'),
+                reference_size=report.get(name, {}).get('reference_size')
+            )
+            for name in ENCODINGS
+        ],
+        report_path=settings.encoding_report_path if report else None
+    )
+
+
+def parse_query_vector(vector: str, dimension: int) -> np.ndarray:
+    """
+    Parse a JSON array query vector and L2-normalize it
+    
+    Raises:
+        HTTPException: 400 if it is not a finite, non-zero vector of the index dimension
+    """
+    try:
+        query = np.asarray(json.loads(vector), dtype=np.float32)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="vector must be a JSON array of numbers")
+    if query.shape != (dimension,):
+        raise HTTPException(
+            status_code=400,
+            detail=f"vector has shape {list(query.shape)}, expected [{dimension}]"
+        )
+    norm = float(np.linalg.norm(query))
+    if not np.isfinite(norm) or norm == 0:
+        raise HTTPException(status_code=400, detail="vector must be finite and non-zero")
+    return query / norm
+
+
+@app.post(
+    "/search",
+    response_model=SearchResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    }
+)
+async def search(
+    file: Optional[UploadFile] = File(None, description="Query image"),
+    vector: Optional[str] = Form(None, description="Query vector as a JSON array (instead of an image)"),
+    k: int = Form(10, description="Number of results"),
+    exact: Optional[bool] = Form(None, description="Force exact (true) or IVF (false) search"),
+    nprobe: Optional[int] = Form(None, description="IVF lists to scan (default VECTOR_INDEX_NPROBE)")
+):
+    """
+    Find the most similar indexed images
+    
+    - **file**: Query image (JPEG, PNG, or WebP), embedded like /extract-features
+    - **vector**: Or a query vector of the model's dimension as a JSON array
+    - **k**: Number of results, at most `search_max_k`
+    - **exact**: Override the configured search mode
+    - **nprobe**: IVF lists to scan; more is slower and closer to exact
+    
+    The index holds vectors extracted with an `image_id` while the index is enabled.
+    """
+    if vector_index is None:
+        raise HTTPException(status_code=503, detail="Vector index is not enabled")
+    
+    if (file is None) == (vector is None):
+        raise HTTPException(status_code=400, detail="Provide either an image file or a vector")
+    
+    if not 1 <= k <= settings.search_max_k:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {settings.search_max_k}")
+    
+    if nprobe is not None and nprobe < 1:
+        raise HTTPException(status_code=400, detail="nprobe must be at least 1")
+    
+    start_time = time.perf_counter()
+    # The index and model are read together; a hot swap replaces both
+    index, served_model = vector_index, primary_model
+    metadata = None
+    if file is not None:
+        served_model, extractor = await select_model(None)
+        image_bytes = await read_image_upload(file)
+        primary = extractor is feature_extractor
+        try:
+            query, metadata = await extraction_pipeline.extract(
+                extractor, image_bytes, batcher=micro_batcher if primary else None, reuse=primary
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        query = parse_query_vector(vector, index.dimension)
+    
+    try:
+        with stage_timer("search"):
+            hits = (await extraction_pipeline.decode_pool(INTERACTIVE).run(index.search, query, k, exact, nprobe))[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    processing_time_ms = (time.perf_counter() - start_time) * 1000
+    with stage_timer("serialization"):
+        return json_response({
+            'results': [{'id': vector_id, 'score': round(score, 6)} for vector_id, score in hits],
+            'k': k,
+            'mode': index.search_mode(exact),
+            'index_size': len(index),
+            **({'perceptual_hash': metadata['perceptual_hash']}
+               if metadata and metadata.get('perceptual_hash') else {}),
+            'model_name': served_model.model_name,
+            'model_version': served_model.model_version,
+            'processing_time_ms': round(processing_time_ms, 2)
+        })
+
+
+def parse_cluster_vectors(vectors: str) -> np.ndarray:
+    """
+    Parse a JSON array of vectors and L2-normalize each row
+    
+    Raises:
+        HTTPException: 400 unless it is a non-empty (N, D) array of finite, non-zero vectors
+    """
+    try:
+        matrix = np.asarray(json.loads(vectors), dtype=np.float32)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="vectors must be a JSON array of equal-length number arrays")
+    if matrix.ndim != 2 or matrix.shape[0] == 0 or matrix.shape[1] == 0:
+        raise HTTPException(status_code=400, detail="vectors must be a JSON array of equal-length number arrays")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    if not np.all(np.isfinite(norms)) or np.any(norms == 0):
+        raise HTTPException(status_code=400, detail="vectors must be finite and non-zero")
+    return matrix / norms
+
+
+@app.post(
+    "/cluster",
+    response_model=ClusterResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        500: {"model": ErrorResponse}
+    }
+)
+async def cluster(
+    files: List[UploadFile] = File([], description="Images to group"),
+    vectors: Optional[str] = Form(None, description="Or feature vectors as a JSON array of arrays"),
+    image_ids: List[str] = Form([], description="Optional identifiers, one per file or vector in order"),
+    threshold: float = Form(settings.cluster_threshold, description="Cosine similarity linking two items"),
+    model: Optional[str] = Form(None, description="Model embedding the files, as name or name:version")
+):
+    """
+    Group near-duplicate images
+    
+    - **files**: Images (JPEG, PNG, or WebP), at most `max_cluster_items`
+    - **vectors**: Or L2-normalized vectors from /extract-features as a JSON array
+    - **image_ids**: Optional identifiers aligned with the files or vectors
+    - **threshold**: Items whose cosine similarity reaches this share a cluster,
+      transitively (A~B and B~C puts A, B and C together)
+    - **model**: A registered model to embed the files with; the default model if omitted
+    
+    Images are embedded in batches of `max_batch_images`; the full similarity
+    matrix is then computed in blocks and the links merged with union-find.
+    Images that fail are listed in `errors` and left out of the clusters.
+    """
+    if bool(files) == (vectors is not None):
+        raise HTTPException(status_code=400, detail="Provide either image files or vectors")
+    
+    if not -1.0 <= threshold <= 1.0:
+        raise HTTPException(status_code=400, detail="threshold must be between -1 and 1")
+    
+    start_time = time.perf_counter()
+    errors: List[dict] = []
+    served_model = primary_model
+    if files:
+        served_model, extractor = await select_model(model)
+        count = len(files)
+    else:
+        matrix = parse_cluster_vectors(vectors)
+        count = matrix.shape[0]
+    
+    if count > settings.max_cluster_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Got {count} items, maximum is {settings.max_cluster_items}"
+        )
+    
+    if image_ids and len(image_ids) != count:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Got {len(image_ids)} image_ids for {count} items"
+        )
+    
+    if files:
+        # Embed in bounded batches; each batch is one inference call
+        positions: List[int] = []
+        embedded: List[np.ndarray] = []
+        for chunk_start in range(0, count, settings.max_batch_images):
+            chunk_indices = []
+            chunk_images = []
+            for index in range(chunk_start, min(chunk_start + settings.max_batch_images, count)):
+                image_bytes, error = await read_batch_upload(files[index])
+                if error is not None:
+                    errors.append({'index': index, 'error': error})
+                else:
+                    chunk_indices.append(index)
+                    chunk_images.append(image_bytes)
+            if not chunk_images:
+                continue
+            try:
+                extracted = await extraction_pipeline.extract_batch(
+                    extractor, chunk_images, reuse=extractor is feature_extractor, lane=BULK
+                )
+            except LaneFullError as e:
+                raise lane_full(e)
+            except Exception as e:
+                logger.error(f"Unexpected error during cluster feature extraction: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Internal server error during feature extraction"
+                )
+            for index, (features, _, error) in zip(chunk_indices, extracted):
+                if error is not None:
+                    errors.append({'index': index, 'error': error})
+                else:
+                    positions.append(index)
+                    embedded.append(features)
+        errors.sort(key=lambda item: item['index'])
+        matrix = np.stack(embedded) if embedded else np.zeros((0, served_model.feature_dimension), dtype=np.float32)
+    else:
+        positions = list(range(count))
+    
+    with stage_timer("clustering"):
+        groups, cluster_stats = await extraction_pipeline.decode.run(
+            cluster_vectors, matrix, threshold, settings.cluster_block_size
+        )
+    
+    clusters = []
+    for group in groups:
+        indices = [positions[member] for member in group]
+        clusters.append({
+            'indices': indices,
+            'ids': [image_ids[index] for index in indices] if image_ids else None,
+            'size': len(indices)
+        })
+    
+    processing_time_ms = (time.perf_counter() - start_time) * 1000
+    logger.info(
+        "Clustering completed",
+        extra={
+            'items': len(positions),
+            'clusters': len(clusters),
+            'processing_time_ms': processing_time_ms
+        }
+    )
+    
+    with stage_timer("serialization"):
+        return json_response({
+            'clusters': clusters,
+            'threshold': threshold,
+            'items': len(positions),
+            **cluster_stats,
+            'errors': [
+                {**item, 'image_id': image_ids[item['index']] if image_ids else None} for item in errors
+            ],
+            'model_name': served_model.model_name,
+            'model_version': served_model.model_version,
+            'processing_time_ms': round(processing_time_ms, 2)
+        })
+
+
+@app.get("/stats", response_model=StatsResponse)
+async def stats():
+    """
+    Pipeline statistics
+    Reports queue depth and task counters per executor stage,
+    and embedding cache hit/miss/eviction counters when enabled
+    """
+    return StatsResponse(
+        **extraction_pipeline.stats(),
+        micro_batcher=micro_batcher.stats() if micro_batcher is not None else None,
+        kafka=kafka_worker.stats() if kafka_worker is not None else None,
+        vector_index=vector_index.stats() if vector_index is not None else None,
+        models=model_registry.stats() if model_registry is not None else None,
+        inference_processes=inference_pool.stats() if inference_pool is not None else None
+    )
+
+
+def check_admin_token(token: Optional[str]) -> None:
+    """
+    Raises:
+        HTTPException: 403 if admin endpoints are disabled, 401 for a wrong token
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not token or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+async def swap_primary_model(config: ModelConfig) -> None:
+    """
+    Replace the startup model without dropping requests
+    
+    The new model is loaded and warmed up off the event loop while the old one
+    keeps serving. Traffic is then switched in one step: the extractor, the
+    model reported in responses, and the per-model cache, near-duplicate index,
+    vector index and micro-batcher all change together. Requests that started
+    on the old model finish on it; it is released once they are done or after
+    `model_drain_timeout_s`. Progress is recorded in swap_state; on failure the
+    old model keeps serving.
+    
+    Args:
+        config: The new model
+    """
+    global feature_extractor, primary_model, micro_batcher, vector_index
+    loop = asyncio.get_running_loop()
+    old_model, old_extractor = primary_model, feature_extractor
+    old_batcher, old_index = micro_batcher, vector_index
+    new_key = model_key(config.model_name, config.model_version)
+    swap_state.clear()
+    swap_state.update({
+        'status': 'loading',
+        'from_model': model_key(old_model.model_name, old_model.model_version),
+        'to_model': new_key
+    })
+    logger.info(f"Swapping model {swap_state['from_model']} -> {new_key}")
+    
+    batcher = None
+    try:
+        phase_start = time.perf_counter()
+        if model_registry is not None and new_key in model_registry:
+            # Already registered (e.g. served side by side): reuse its session if loaded
+            config, extractor = await loop.run_in_executor(None, model_registry.get, new_key)
+        else:
+            loader = model_registry.loader if model_registry is not None else load_registered_model
+            extractor = await loop.run_in_executor(None, loader, config)
+        swap_state['load_ms'] = round((time.perf_counter() - phase_start) * 1000, 2)
+        
+        swap_state['status'] = 'warming'
+        if settings.warmup_iterations > 0 and settings.warmup_batch_sizes:
+            # On its own thread: live traffic keeps the inference pool
+            swap_state['warmup_ms'] = await loop.run_in_executor(
+                None, extractor.warmup, settings.warmup_batch_sizes, settings.warmup_iterations
+            )
+        
+        # Vectors of different versions are not comparable: per-model state, opened
+        # without touching the old version's files while it still serves
+        cache = await loop.run_in_executor(None, create_embedding_cache, config)
+        index = await loop.run_in_executor(None, open_vector_index, config)
+        if old_batcher is not None:
+            batcher = MicroBatcher(
+                extractor,
+                max_batch_size=old_batcher.max_batch_size,
+                window_ms=old_batcher.window_seconds * 1000,
+                executor=extraction_pipeline.inference
+            )
+            await batcher.start()
+    except Exception as e:
+        logger.error(f"Model swap to {new_key} failed: {str(e)}")
+        if batcher is not None:
+            await batcher.stop()
+        swap_state.update({'status': 'failed', 'error': str(e)})
+        return
+    
+    # Switch: no await until every reference points at the new model
+    feature_extractor, primary_model = extractor, config
+    extraction_pipeline.cache = cache
+    extraction_pipeline.near_duplicates = create_near_duplicate_index()
+    vector_index = index
+    micro_batcher = batcher
+    if kafka_worker is not None:
+        kafka_worker.extractor, kafka_worker.model_version = extractor, config.model_version
+    old_key = model_registry.promote(config, extractor) if model_registry is not None else None
+    # Loaded and warmed up, so ready even if the startup model had failed
+    startup_state['ready'] = True
+    
+    swap_state['status'] = 'draining'
+    phase_start = time.perf_counter()
+    drained = await model_leases.drain(old_extractor, settings.model_drain_timeout_s)
+    swap_state['drain_ms'] = round((time.perf_counter() - phase_start) * 1000, 2)
+    swap_state['drained'] = drained
+    if not drained:
+        logger.warning(
+            f"{model_leases.in_flight(old_extractor)} requests still on {swap_state['from_model']} "
+            f"after {settings.model_drain_timeout_s} s; releasing it anyway"
+        )
+    
+    if old_batcher is not None:
+        await old_batcher.stop()
+    if old_index is not None:
+        await loop.run_in_executor(None, old_index.close)
+    if old_key is not None:
+        # Still registered: requests naming the old version load it again
+        model_registry.unload(old_key)
+    # The old version stays registered for rollback, so only unregistered ones go
+    await loop.run_in_executor(None, prune_model_state, cache, index)
+    swap_state['status'] = 'completed'
+    logger.info(f"Model swap complete: {swap_state}")
+
+
+def swap_target(request: ModelSwapRequest) -> ModelConfig:
+    """
+    The model a swap request asks for
+    
+    Raises:
+        HTTPException: 400 if it names no valid model or the one already serving
+    """
+    if request.model:
+        if model_registry is None or request.model not in model_registry:
+            raise HTTPException(status_code=400, detail=f"Unknown model: {request.model}")
+        config = model_registry.config(request.model)
+    else:
+        if not request.model_file or not request.model_version:
+            raise HTTPException(status_code=400, detail="Provide a registered model, or model_file and model_version")
+        if not os.path.isfile(request.model_file):
+            raise HTTPException(status_code=400, detail=f"Model file not found: {request.model_file}")
+        config = primary_model.model_copy(update={
+            'model_name': request.model_name or primary_model.model_name,
+            'model_version': request.model_version,
+            'feature_dimension': request.feature_dimension or primary_model.feature_dimension,
+            'model_file': request.model_file,
+            'description': ""
+        })
+    if (config.model_name, config.model_version) == (primary_model.model_name, primary_model.model_version):
+        raise HTTPException(status_code=400, detail=f"{config.model_name}:{config.model_version} is already serving")
+    return config
+
+
+@app.post(
+    "/admin/model",
+    response_model=ModelSwapStatus,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse},
+        401: {"model": ErrorResponse},
+        403: {"model": ErrorResponse},
+        409: {"model": ErrorResponse}
+    }
+)
+async def swap_model(
+    request: ModelSwapRequest,
+    x_admin_token: Optional[str] = Header(None, description="Must match ADMIN_TOKEN")
+):
+    """
+    Hot swap the startup model
+    
+    Loads and warms up the new model in the background, switches traffic to it
+    atomically and drains requests still running on the old one. Responses
+    report the version that served them throughout. Poll `GET /admin/model`
+    for progress, or pass `wait: true` to respond once the swap has completed.
+    """
+    global swap_task
+    check_admin_token(x_admin_token)
+    if inference_pool is not None:
+        raise HTTPException(status_code=409, detail="Hot swap is not supported with pre-forked inference processes")
+    if swap_task is not None and not swap_task.done():
+        raise HTTPException(status_code=409, detail=f"A swap to {swap_state.get('to_model')} is in progress")
+    
+    config = swap_target(request)
+    swap_task = asyncio.create_task(swap_primary_model(config))
+    if request.wait:
+        await asyncio.shield(swap_task)
+        return JSONResponse(status_code=200, content=ModelSwapStatus(**swap_state).model_dump())
+    await asyncio.sleep(0)  # Let the swap record its initial state
+    return ModelSwapStatus(**swap_state)
+
+
+@app.get("/admin/model", response_model=ModelSwapStatus, responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}})
+async def swap_status(
+    x_admin_token: Optional[str] = Header(None, description="Must match ADMIN_TOKEN")
+):
+    """Progress of the latest model swap"""
+    check_admin_token(x_admin_token)
+    return ModelSwapStatus(**swap_state)
+
+
+@app.get("/models", response_model=ModelsResponse, responses={503: {"model": ErrorResponse}})
+async def list_models():
+    """
+    Registered models
+    Lists every model a request can name in its `model` parameter, whether
+    its session is loaded, and memory use against `model_memory_budget_mb`
+    """
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model registry is not initialized")
+    registry_stats = model_registry.stats()
+    return ModelsResponse(
+        default=registry_stats['default'],
+        memory_budget_bytes=registry_stats['memory_budget_bytes'],
+        memory_bytes=registry_stats['memory_bytes'],
+        models=[ModelInfo(model=key, **model_stats) for key, model_stats in registry_stats['models'].items()]
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Prometheus metrics
+    Per-stage latency histograms, inference batch sizes, in-flight requests,
+    stage queue depths and cache, micro-batcher and Kafka counters
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with service information"""
@@ -186,7 +1540,17 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "encodings": "/encodings",
+            "models": "/models",
+            "admin_model": "/admin/model",
             "extract_features": "/extract-features",
+            "extract_features_batch": "/extract-features/batch",
+            "extract_features_stream": "/extract-features/stream",
+            "search": "/search",
+            "cluster": "/cluster",
             "docs": "/docs"
         }
     }
@@ -0,0 +1,374 @@
+"""
+Per-stage latency metrics
+Histograms of upload read, decode, preprocess, inference and serialization
+time, inference batch sizes and request counts, exposed by /metrics in the
+Prometheus text format (version 0.0.4). Each extraction request also gets a
+`Server-Timing` header with its own stage durations.
+
+Stage time is attributed to the current request through a context variable;
+StagePool runs tasks in a copy of the caller's context, so work done on the
+decode and inference threads is still charged to the request that queued it.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+STAGES = ("upload_read", "decode", "preprocess", "queue_wait", "inference", "serialization")
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (labels, value) pairs of one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Unlabelled metrics are exported from the start, labelled ones once used
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def collect(self) -> Samples:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return sum(series[0]) if series else 0
+
+    def collect(self) -> Samples:
+        """Samples with the suffix (_bucket, _sum, _count) stored under the '__suffix' label"""
+        samples: Samples = []
+        with self._lock:
+            series_items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series_items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(({**labels, 'le': _format_value(bound), '__suffix': '_bucket'}, cumulative))
+            samples.append(({**labels, '__suffix': '_sum'}, total))
+            samples.append(({**labels, '__suffix': '_count'}, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Metrics rendered by /metrics: registered metric objects plus collectors
+    that read existing stats() dicts at scrape time
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Samples]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Samples]]]) -> None:
+        """
+        Add a scrape-time collector
+
+        Args:
+            collector: Callable returning (name, type, help, samples) families
+        """
+        self._collectors.append(collector)
+
+    def clear_collectors(self) -> None:
+        self._collectors.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        families = [(m.name, m.kind, m.documentation, m.collect()) for m in self._metrics]
+        for collector in list(self._collectors):
+            families.extend(collector())
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = dict(labels)
+                suffix = labels.pop('__suffix', '')
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_families(
+    prefix: str,
+    series: Iterable[Tuple[Dict[str, str], Optional[dict]]],
+    counters: Iterable[str] = ()
+) -> List[Tuple[str, str, str, Samples]]:
+    """
+    Turn numeric stats() dicts into metric families
+
+    Args:
+        prefix: Metric name prefix, e.g. "deeplens_cache"
+        series: (labels, stats) pairs; every numeric key becomes one family
+            with a sample per pair, and None stats are skipped
+        counters: Keys that only ever grow (exported as counters with _total)
+
+    Returns:
+        (name, type, help, samples) families for collectors
+    """
+    counters = set(counters)
+    families: Dict[str, Tuple[str, str, str, Samples]] = {}
+    for labels, stats in series:
+        for key, value in (stats or {}).items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if key not in families:
+                if key in counters:
+                    families[key] = (f"{prefix}_{key}_total", "counter", f"{prefix} {key}", [])
+                else:
+                    families[key] = (f"{prefix}_{key}", "gauge", f"{prefix} {key}", [])
+            families[key][3].append((labels, value))
+    return list(families.values())
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "deeplens_stage_duration_seconds",
+    "Time spent in each extraction stage",
+    labelnames=("stage",)
+))
+INFERENCE_BATCH_SIZE = registry.register(Histogram(
+    "deeplens_inference_batch_size",
+    "Images per inference call",
+    buckets=BATCH_SIZE_BUCKETS
+))
+QUEUE_WAIT_SECONDS = registry.register(Histogram(
+    "deeplens_queue_wait_seconds",
+    "Time images wait in a priority lane before inference starts",
+    labelnames=("lane",)
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "deeplens_requests_in_flight",
+    "Extraction requests currently being handled"
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "deeplens_request_duration_seconds",
+    "End-to-end extraction request time until the response starts",
+    labelnames=("endpoint",)
+))
+REQUESTS_TOTAL = registry.register(Counter(
+    "deeplens_requests_total",
+    "Extraction requests by endpoint and status code",
+    labelnames=("endpoint", "status")
+))
+
+
+class RequestTimings:
+    """Stage durations of one request (stages may run on several threads)"""
+
+    def __init__(self):
+        self._durations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._durations[stage] = self._durations.get(stage, 0.0) + seconds
+
+    def durations_ms(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds * 1000, 3) for stage, seconds in self._durations.items()}
+
+    def server_timing(self, total_seconds: Optional[float] = None) -> str:
+        """
+        Server-Timing header value, stages in pipeline order
+
+        Decode and preprocess times of a batch are summed over its images.
+        """
+        durations = self.durations_ms()
+        ordered = [stage for stage in STAGES if stage in durations]
+        ordered += sorted(stage for stage in durations if stage not in STAGES)
+        entries = [f"{stage};dur={durations[stage]}" for stage in ordered]
+        if total_seconds is not None:
+            entries.append(f"total;dur={round(total_seconds * 1000, 3)}")
+        return ", ".join(entries)
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the request being handled in this context, if any"""
+    return _current_timings.get()
+
+
+@contextmanager
+def stage_timer(stage: str, observe: bool = True) -> Iterator[None]:
+    """
+    Time a block as one pipeline stage
+
+    Args:
+        stage: Stage name (see STAGES)
+        observe: Record into the stage histogram; False only charges the current
+            request, for waits whose work is observed elsewhere (micro-batching)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if observe:
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed)
+
+
+def observe_batch_size(batch_size: int) -> None:
+    """Record the size of one inference call"""
+    INFERENCE_BATCH_SIZE.observe(batch_size)
+
+
+def observe_queue_wait(lane: str, seconds: float) -> None:
+    """Record how long one image waited in a priority lane"""
+    QUEUE_WAIT_SECONDS.observe(seconds, lane=lane)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware for extraction endpoints: counts in-flight requests,
+    records request latency and adds the Server-Timing header
+    """
+
+    def __init__(self, app, endpoints: Sequence[str], server_timing: bool = True):
+        """
+        Args:
+            app: ASGI application
+            endpoints: Paths to instrument (also the endpoint label values)
+            server_timing: Add the Server-Timing response header
+        """
+        self.app = app
+        self.endpoints = frozenset(endpoints)
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                status[0] = message["status"]
+                REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing(elapsed).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUESTS_TOTAL.inc(endpoint=endpoint, status=status[0])
+            _current_timings.reset(token)
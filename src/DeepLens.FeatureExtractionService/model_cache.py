@@ -0,0 +1,50 @@
+"""
+Optimized model cache
+The first load of a model saves ONNX Runtime's optimized graph (ORT format
+by default); later starts load it directly and skip graph optimization.
+Cache entries are keyed by the source file, ONNX Runtime version,
+optimization level and CPU, since optimized graphs are hardware specific.
+"""
+import hashlib
+import os
+
+import onnxruntime as ort
+
+from session_tuning import node_fingerprint
+
+OPTIMIZED_MODEL_FORMATS = ("ort", "onnx")
+
+
+def optimized_model_path(
+    model_path: str,
+    cache_dir: str,
+    optimization_level: str = "all",
+    model_format: str = "ort"
+) -> str:
+    """
+    Cache path of the optimized form of a model
+
+    Args:
+        model_path: Source ONNX model
+        cache_dir: Cache directory
+        optimization_level: Graph optimization level the cached graph was built with
+        model_format: "ort" (fastest to load) or "onnx"
+
+    Returns:
+        <cache_dir>/<model name>.<key>.<format>
+    """
+    if model_format not in OPTIMIZED_MODEL_FORMATS:
+        raise ValueError(f"Unsupported optimized model format: {model_format}")
+    stat = os.stat(model_path)
+    identity = "|".join((
+        os.path.abspath(model_path),
+        str(stat.st_size),
+        str(stat.st_mtime_ns),
+        ort.__version__,
+        optimization_level,
+        node_fingerprint()
+    ))
+    key = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{name}.{key}.{model_format}")
+
@@ -0,0 +1,336 @@
+"""
+Model registry
+Serves several ONNX embedding models side by side, addressed by name or
+`name:version`, so an old and a new model can answer during re-indexing.
+Sessions are created on first use and kept in least-recently-used order;
+when the estimated memory of the loaded models passes the budget, the least
+recently used unpinned ones are unloaded. A request already holding an
+unloaded extractor finishes on it; the session is freed with the last reference.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+
+def model_key(name: str, version: str) -> str:
+    """Registry key of a model version"""
+    return f"{name}:{version}"
+
+
+def model_memory_bytes(model_path: str) -> int:
+    """
+    Estimated memory of a loaded model: the size of its ONNX file
+
+    Weights dominate a session's footprint; arena growth during inference
+    is not counted. Missing files count as 0.
+    """
+    try:
+        return os.path.getsize(model_path)
+    except OSError:
+        return 0
+
+
+class _Entry:
+    """One registered model version and its session, if loaded"""
+
+    def __init__(self, config: ModelConfig, pinned: bool):
+        self.config = config
+        self.pinned = pinned
+        self.extractor: Optional[Any] = None
+        self.memory_bytes = 0
+        self.load_lock = threading.Lock()
+        self.last_used = 0.0
+
+        # Statistics
+        self.requests = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_ms: Optional[float] = None
+
+
+class ModelRegistry:
+    """
+    Lazily loaded models by name and version under an LRU memory budget.
+
+    Each model is loaded at most once at a time (concurrent first requests
+    wait for the same load) and loading one model never blocks requests to
+    another. Pinned models are never unloaded.
+    """
+
+    def __init__(self, loader: Callable[[ModelConfig], Any], memory_budget_bytes: int = 0):
+        """
+        Initialize an empty registry
+
+        Args:
+            loader: Builds a loaded extractor for a model config (blocking)
+            memory_budget_bytes: Estimated memory of loaded models to stay under (0 = no limit)
+        """
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.default_key: Optional[str] = None
+
+        self._lock = threading.Lock()
+        # Registration order; loaded entries are moved to the end when used
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __contains__(self, model: str) -> bool:
+        try:
+            self.resolve(model)
+        except KeyError:
+            return False
+        return True
+
+    def register(
+        self,
+        config: ModelConfig,
+        extractor: Optional[Any] = None,
+        pinned: bool = False,
+        default: bool = False
+    ) -> str:
+        """
+        Add a model version; it is loaded on first use unless an extractor is given
+
+        Args:
+            config: Model name, version, file and preprocessing parameters
+            extractor: Already loaded extractor for the model
+            pinned: Never unload the model
+            default: Serve the model when a request names none (the first model
+                registered is the default otherwise)
+
+        Returns:
+            The model's registry key
+
+        Raises:
+            ValueError: If the version is already registered
+        """
+        key = model_key(config.model_name, config.model_version)
+        with self._lock:
+            if key in self._entries:
+                raise ValueError(f"Model {key} is already registered")
+            entry = _Entry(config, pinned)
+            if extractor is not None:
+                entry.extractor = extractor
+                entry.memory_bytes = model_memory_bytes(config.model_file)
+                entry.last_used = time.monotonic()
+            self._entries[key] = entry
+            if default or self.default_key is None:
+                self.default_key = key
+        return key
+
+    def resolve(self, model: Optional[str] = None) -> str:
+        """
+        Registry key for a requested model
+
+        Args:
+            model: "name:version", or "name" (the default model if it has that
+                name, else the first version registered), or None for the default
+
+        Raises:
+            KeyError: If no registered model matches
+        """
+        with self._lock:
+            if not model:
+                if self.default_key is None:
+                    raise KeyError("No models registered")
+                return self.default_key
+            if model in self._entries:
+                return model
+            if self.default_key is not None and self._entries[self.default_key].config.model_name == model:
+                return self.default_key
+            for key, entry in self._entries.items():
+                if entry.config.model_name == model:
+                    return key
+        raise KeyError(f"Unknown model: {model}")
+
+    def config(self, model: Optional[str] = None) -> ModelConfig:
+        """Config of a registered model (see resolve)"""
+        key = self.resolve(model)
+        with self._lock:
+            return self._entries[key].config
+
+    def get(self, model: Optional[str] = None) -> Tuple[ModelConfig, Any]:
+        """
+        The extractor for a model, loading it first if needed (blocking)
+
+        Args:
+            model: Requested model (see resolve)
+
+        Returns:
+            Tuple of (config, extractor)
+
+        Raises:
+            KeyError: If no registered model matches
+            RuntimeError: If the model fails to load
+        """
+        key = self.resolve(model)
+        with self._lock:
+            entry = self._entries[key]
+            extractor = entry.extractor
+
+        if extractor is None:
+            with entry.load_lock:
+                extractor = entry.extractor
+                if extractor is None:
+                    extractor = self._load(key, entry)
+
+        self._count_request(key)
+        return entry.config, extractor
+
+    def record_request(self, model: Optional[str] = None) -> None:
+        """
+        Count a request served by a model's extractor obtained without get()
+        (the startup model, which the service holds directly)
+
+        Raises:
+            KeyError: If no registered model matches
+        """
+        self._count_request(self.resolve(model))
+
+    def _count_request(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries[key]
+            entry.requests += 1
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+
+    def _load(self, key: str, entry: _Entry) -> Any:
+        """Create the model's session and make room for it under the budget"""
+        logger.info(f"Loading model {key} from {entry.config.model_file}")
+        start = time.perf_counter()
+        try:
+            extractor = self.loader(entry.config)
+        except Exception as e:
+            logger.error(f"Failed to load model {key}: {str(e)}")
+            raise RuntimeError(f"Model {key} could not be loaded: {str(e)}")
+        load_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        with self._lock:
+            entry.extractor = extractor
+            entry.memory_bytes = model_memory_bytes(entry.config.model_file)
+            entry.loads += 1
+            entry.load_ms = load_ms
+            self._evict(keep=key)
+        logger.info(f"Model {key} loaded in {load_ms} ms")
+        return extractor
+
+    def _evict(self, keep: str) -> None:
+        """Unload least recently used unpinned models until within the budget (lock held)"""
+        if self.memory_budget_bytes <= 0:
+            return
+        loaded = [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.extractor is not None
+        ]
+        total = sum(entry.memory_bytes for _, entry in loaded)
+        for key, entry in sorted(loaded, key=lambda item: item[1].last_used):
+            if total <= self.memory_budget_bytes:
+                break
+            if key == keep or entry.pinned:
+                continue
+            logger.info(f"Unloading model {key} ({entry.memory_bytes} bytes) to stay within the memory budget")
+            total -= entry.memory_bytes
+            self._unload(entry)
+        if total > self.memory_budget_bytes:
+            logger.warning(
+                f"Loaded models use an estimated {total} bytes, over the "
+                f"{self.memory_budget_bytes} byte budget, with nothing left to unload"
+            )
+
+    @staticmethod
+    def _unload(entry: _Entry) -> None:
+        entry.extractor = None
+        entry.memory_bytes = 0
+        entry.evictions += 1
+
+    def promote(self, config: ModelConfig, extractor: Any) -> Optional[str]:
+        """
+        Make a loaded model the pinned default, registering it if needed
+
+        The previous default stays registered, unpinned, so requests can still
+        name it (and load it again) after a swap.
+
+        Args:
+            config: The new default model
+            extractor: Its loaded extractor
+
+        Returns:
+            Key of the previous default, or None if it was the same model
+        """
+        key = model_key(config.model_name, config.model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(config, pinned=True)
+            if entry.extractor is not extractor:
+                entry.extractor = extractor
+                entry.memory_bytes = model_memory_bytes(entry.config.model_file)
+            entry.pinned = True
+            entry.last_used = time.monotonic()
+            previous, self.default_key = self.default_key, key
+            if previous is None or previous == key:
+                return None
+            self._entries[previous].pinned = False
+        return previous
+
+    def unload(self, model: str) -> bool:
+        """
+        Drop a model's session; it is loaded again on its next request
+
+        Returns:
+            False if the model was not loaded
+
+        Raises:
+            KeyError: If no registered model matches
+        """
+        key = self.resolve(model)
+        with self._lock:
+            entry = self._entries[key]
+            if entry.extractor is None:
+                return False
+            self._unload(entry)
+        logger.info(f"Unloaded model {key}")
+        return True
+
+    def versions(self, model_name: str) -> List[str]:
+        """Registered versions of a model"""
+        with self._lock:
+            return [entry.config.model_version for entry in self._entries.values()
+                    if entry.config.model_name == model_name]
+
+    def memory_bytes(self) -> int:
+        """Estimated memory of the loaded models"""
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def stats(self) -> dict:
+        """Default model, memory use against the budget, and per-model state and counters"""
+        with self._lock:
+            models = {
+                key: {
+                    'model_name': entry.config.model_name,
+                    'model_version': entry.config.model_version,
+                    'feature_dimension': entry.config.feature_dimension,
+                    'loaded': entry.extractor is not None,
+                    'pinned': entry.pinned,
+                    'memory_bytes': entry.memory_bytes,
+                    'requests': entry.requests,
+                    'loads': entry.loads,
+                    'evictions': entry.evictions,
+                    'load_ms': entry.load_ms
+                }
+                for key, entry in self._entries.items()
+            }
+            return {
+                'default': self.default_key,
+                'memory_budget_bytes': self.memory_budget_bytes,
+                'memory_bytes': sum(entry.memory_bytes for entry in self._entries.values()),
+                'loaded': sum(1 for entry in self._entries.values() if entry.extractor is not None),
+                'models': models
+            }
@@ -2,7 +2,7 @@
 Data models for Feature Extraction Service API
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class HealthResponse(BaseModel):
@@ -11,6 +11,9 @@ class HealthResponse(BaseModel):
     service: str
     version: str
     model_loaded: bool
+    ready: Optional[bool] = Field(None, description="Model loaded and warmed up")
+    startup: Optional[Dict[str, Any]] = Field(None, description="Startup phase timings in milliseconds")
+    load: Optional[Dict[str, float]] = Field(None, description="Admission load signal: in-flight, queued, utilization and drain rate")
 
 
 class ExtractFeaturesRequest(BaseModel):
@@ -22,8 +25,11 @@ class ExtractFeaturesRequest(BaseModel):
 class ExtractFeaturesResponse(BaseModel):
     """Response model for feature extraction"""
     image_id: Optional[str] = Field(None, description="Image identifier if provided")
-    features: List[float] = Field(..., description="Feature vector extracted from image (2048 dimensions)")
+    features: Optional[List[float]] = Field(None, description="Feature vector extracted from image (2048 dimensions), float32 encoding only")
     feature_dimension: int = Field(2048, description="Dimension of feature vector")
+    encoding: str = Field("float32", description="Vector encoding: float32, float16, int8 or binary")
+    encoded_features: Optional[str] = Field(None, description="Base64 of the encoded vector for non-float32 encodings")
+    quantization_scale: Optional[float] = Field(None, description="Per-vector scale for int8 (value = int8 * scale)")
     model_name: str = Field("resnet50", description="Model used for extraction")
     model_version: str = Field("v2.7", description="Version of the model used")
     processing_time_ms: float = Field(..., description="Processing time in milliseconds")
@@ -33,7 +39,172 @@ class ExtractFeaturesResponse(BaseModel):
     image_height: Optional[int] = None
     image_format: Optional[str] = None
     
+    # Perceptual hash of the decoded image, and the Hamming distance to the
+    # indexed image whose embedding was reused (absent when inference ran)
+    perceptual_hash: Optional[str] = Field(None, description="64-bit perceptual hash as 16 hex digits")
+    near_duplicate_distance: Optional[int] = Field(None, description="Bits differing from the near-duplicate whose features were reused")
+    
+
+class BatchItemResult(BaseModel):
+    """Per-image result of a batch feature extraction"""
+    index: int = Field(..., description="Position of the image in the request")
+    image_id: Optional[str] = Field(None, description="Image identifier if provided")
+    features: Optional[List[float]] = Field(None, description="Feature vector, absent if the item failed or not float32")
+    encoding: str = Field("float32", description="Vector encoding")
+    encoded_features: Optional[str] = Field(None, description="Base64 of the encoded vector for non-float32 encodings")
+    quantization_scale: Optional[float] = Field(None, description="Per-vector scale for int8")
+    error: Optional[str] = Field(None, description="Error message if the item failed")
+    
+    # Optional image metadata
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    image_format: Optional[str] = None
+    perceptual_hash: Optional[str] = Field(None, description="64-bit perceptual hash as 16 hex digits")
+    near_duplicate_distance: Optional[int] = Field(None, description="Bits differing from the near-duplicate whose features were reused")
+
+
+class BatchExtractFeaturesResponse(BaseModel):
+    """Response model for batch feature extraction"""
+    results: List[BatchItemResult] = Field(..., description="Per-image results in request order")
+    feature_dimension: int = Field(2048, description="Dimension of feature vectors")
+    model_name: str = Field("resnet50", description="Model used for extraction")
+    model_version: str = Field("v2.7", description="Version of the model used")
+    succeeded: int = Field(..., description="Number of images processed successfully")
+    failed: int = Field(..., description="Number of images that failed")
+    processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+
+
+class SearchHit(BaseModel):
+    """One search result"""
+    id: str = Field(..., description="Image identifier the vector was indexed under")
+    score: float = Field(..., description="Cosine similarity to the query")
+
+
+class SearchResponse(BaseModel):
+    """Top-k results of a vector index search"""
+    results: List[SearchHit] = Field(..., description="Most similar images, best first")
+    k: int
+    mode: str = Field(..., description="Search that ran: exact or ivf")
+    index_size: int = Field(..., description="Vectors in the index")
+    perceptual_hash: Optional[str] = Field(None, description="Perceptual hash of the query image")
+    model_name: str = Field("resnet50", description="Model the vectors come from")
+    model_version: str = Field("v2.7", description="Version of the model")
+    processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+
+
+class ImageCluster(BaseModel):
+    """Items that are transitively near-duplicates of each other"""
+    indices: List[int] = Field(..., description="Positions of the members in the request")
+    ids: Optional[List[str]] = Field(None, description="Member identifiers, when provided")
+    size: int
+
+
+class ClusterItemError(BaseModel):
+    """An item left out of clustering"""
+    index: int
+    image_id: Optional[str] = None
+    error: str
+
+
+class ClusterResponse(BaseModel):
+    """Near-duplicate clusters of a set of images or vectors"""
+    clusters: List[ImageCluster] = Field(..., description="Clusters, largest first")
+    threshold: float = Field(..., description="Cosine similarity linking two items")
+    items: int = Field(..., description="Items clustered (failed items excluded)")
+    comparisons: int = Field(..., description="Pairwise similarities computed")
+    pairs_above_threshold: int
+    errors: List[ClusterItemError] = Field(default_factory=list, description="Items that could not be embedded")
+    model_name: str = Field("resnet50", description="Model used for extraction")
+    model_version: str = Field("v2.7", description="Version of the model used")
+    processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+
+
+class EncodingInfo(BaseModel):
+    """Size and measured accuracy of one vector encoding"""
+    encoding: str
+    dtype: str = Field(..., description="Wire dtype of the encoded vector")
+    bytes_per_vector: int
+    compression_ratio: float = Field(..., description="Size reduction versus float32")
+    recall_at_k: Optional[float] = Field(None, description="Measured recall@k versus float32 on the reference set")
+    recall_loss: Optional[float] = Field(None, description="1 - recall_at_k")
+    k: Optional[int] = None
+    reference_size: Optional[int] = Field(None, description="Number of vectors in the reference set")
+
+
+class EncodingsResponse(BaseModel):
+    """Available vector encodings"""
+    feature_dimension: int
+    encodings: List[EncodingInfo]
+    report_path: Optional[str] = Field(None, description="Recall report the measurements were read from")
+
+
+class ModelInfo(BaseModel):
+    """A registered model version and its session state"""
+    model: str = Field(..., description="Registry key, name:version")
+    model_name: str
+    model_version: str
+    feature_dimension: int
+    loaded: bool = Field(..., description="Whether a session is currently loaded")
+    pinned: bool = Field(..., description="Never unloaded (the startup model)")
+    memory_bytes: int = Field(..., description="Estimated memory while loaded (ONNX file size)")
+    requests: int
+    loads: int
+    evictions: int
+    load_ms: Optional[float] = Field(None, description="Duration of the last load")
+
+
+class ModelsResponse(BaseModel):
+    """Models servable by name through the `model` parameter"""
+    default: str = Field(..., description="Model used when a request names none")
+    memory_budget_bytes: int = Field(..., description="Budget for loaded models (0 = no limit)")
+    memory_bytes: int = Field(..., description="Estimated memory of the loaded models")
+    models: List[ModelInfo]
+
+
+class ModelSwapRequest(BaseModel):
+    """New startup model: a registered model, or a model file and version"""
+    model: Optional[str] = Field(None, description="Registered model (name or name:version) to promote")
+    model_file: Optional[str] = Field(None, description="ONNX file of the new version")
+    model_version: Optional[str] = Field(None, description="Version reported by responses it serves")
+    model_name: Optional[str] = Field(None, description="Defaults to the current model name")
+    feature_dimension: Optional[int] = Field(None, description="Defaults to the current dimension")
+    wait: bool = Field(False, description="Respond once the swap has completed instead of when it starts")
+
+
+class ModelSwapStatus(BaseModel):
+    """Progress of the latest startup model swap"""
+    status: str = Field(..., description="idle, loading, warming, draining, completed or failed")
+    from_model: Optional[str] = None
+    to_model: Optional[str] = None
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
+    drain_ms: Optional[float] = None
+    drained: Optional[bool] = Field(None, description="False if old requests outlived the drain timeout")
+    error: Optional[str] = None
+
+
+class StageStats(BaseModel):
+    """Queue depth and counters for one executor stage"""
+    workers: int
+    queued: int = Field(..., description="Tasks waiting for a worker thread")
+    active: int = Field(..., description="Tasks currently running")
+    completed: int
+    failed: int
+
 
+class StatsResponse(BaseModel):
+    """Runtime statistics of the extraction pipeline"""
+    decode: StageStats
+    interactive_decode: Optional[StageStats] = Field(None, description="Decode threads reserved for interactive requests when scheduling")
+    inference: StageStats
+    cache: Optional[Dict[str, float]] = Field(None, description="Embedding cache stats when enabled")
+    near_duplicates: Optional[Dict[str, float]] = Field(None, description="Near-duplicate index stats when enabled")
+    vector_index: Optional[Dict[str, Any]] = Field(None, description="In-process vector index stats when enabled")
+    models: Optional[Dict[str, Any]] = Field(None, description="Model registry state and per-model counters")
+    scheduler: Optional[Dict[str, Any]] = Field(None, description="Priority lane queue depth, batching and queue wait when enabled")
+    micro_batcher: Optional[Dict[str, float]] = Field(None, description="Micro-batching stats when enabled")
+    kafka: Optional[Dict[str, float]] = Field(None, description="Kafka consumer stats when enabled")
+    inference_processes: Optional[Dict[str, Any]] = Field(None, description="Pre-forked worker stats under serve.py")
 
 
 class ErrorResponse(BaseModel):
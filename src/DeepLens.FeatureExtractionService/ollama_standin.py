@@ -0,0 +1,139 @@
+"""
+Local stand-in for the Ollama API used by the reasoning service
+Serves /api/tags and streaming /api/generate with a canned JSON answer that
+parses for every reasoning endpoint. Generation time is simulated as time to
+first token plus tokens / tokens-per-second. `parallel` slots behave like
+OLLAMA_NUM_PARALLEL: further requests wait for a free slot. This lets the
+reasoning service's queueing be load tested without a GPU or a model.
+
+Usage:
+    python ollama_standin.py --port 11435 --first-token-ms 150 --tokens-per-second 40
+    OLLAMA_BASE_URL=http://localhost:11435 uvicorn main:app --port 8002   # in DeepLens.ReasoningService
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_MODEL = "phi4-mini:latest"
+
+# Union of the fields the reasoning endpoints read
+CANNED_ANSWER = {
+    "category": "saree",
+    "subCategory": "Silk Saree",
+    "price": 1850,
+    "isPlusShipping": True,
+    "title": "Banarasi Silk Saree with Zari Border",
+    "keywords": "banarasi, silk, saree, zari",
+    "fabric": "Silk",
+    "color": "Maroon",
+    "stitch_type": "Unstitched",
+    "stitchType": "Unstitched",
+    "work_heaviness": "Medium",
+    "patterns": ["Floral"],
+    "occasions": ["Wedding"],
+    "sizes": [],
+    "tags": ["saree", "silk"]
+}
+
+
+def create_app(
+    first_token_ms: float = 150.0,
+    tokens_per_second: float = 40.0,
+    parallel: int = 1,
+    model: str = DEFAULT_MODEL
+) -> FastAPI:
+    """
+    Build the stand-in application
+
+    Args:
+        first_token_ms: Delay before the first chunk (prompt evaluation)
+        tokens_per_second: Generation speed; each chunk is one token
+        parallel: Requests generated concurrently; the rest queue
+        model: Model name reported by /api/tags and echoed in chunks
+
+    Returns:
+        FastAPI application
+    """
+    app = FastAPI(title="Ollama stand-in")
+    answer = json.dumps(CANNED_ANSWER)
+    # Roughly one token per 4 characters, as for English text
+    tokens = [answer[start:start + 4] for start in range(0, len(answer), 4)]
+    app.state.slots = None
+    app.state.stats = {'requests': 0, 'active': 0, 'max_waiting': 0, 'waiting': 0}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": model}]}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        stream = body.get("stream", True)
+        if app.state.slots is None:
+            app.state.slots = asyncio.Semaphore(max(1, parallel))
+        counters = app.state.stats
+        counters['requests'] += 1
+        counters['waiting'] += 1
+        counters['max_waiting'] = max(counters['max_waiting'], counters['waiting'])
+
+        async def chunks():
+            await app.state.slots.acquire()
+            counters['waiting'] -= 1
+            counters['active'] += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.sleep(first_token_ms / 1000)
+                for token in tokens:
+                    if tokens_per_second > 0:
+                        await asyncio.sleep(1 / tokens_per_second)
+                    yield json.dumps({"model": model, "response": token, "done": False}) + "\n"
+                yield json.dumps({
+                    "model": model,
+                    "response": "",
+                    "done": True,
+                    "eval_count": len(tokens),
+                    "total_duration": int((time.perf_counter() - start) * 1e9)
+                }) + "\n"
+            finally:
+                counters['active'] -= 1
+                app.state.slots.release()
+
+        if stream:
+            return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+        async for _ in chunks():
+            pass
+        return {"model": model, "response": answer, "done": True}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stand-in Ollama API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--parallel", type=int, default=1, help="Concurrent generations (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        create_app(args.first_token_ms, args.tokens_per_second, args.parallel, args.model),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Executor stages for the extraction pipeline
+Keeps PIL decode, NumPy preprocessing and ONNX inference off the asyncio
+event loop, using separately sized thread pools with queue-depth accounting.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from feature_extractor import ResNet50FeatureExtractor
+from embedding_cache import EmbeddingCache
+from metrics import observe_batch_size, stage_timer
+from perceptual_hash import PerceptualHashIndex, parse_hash
+from preprocessing import BatchBuffer
+from scheduling import BULK, INTERACTIVE, PriorityScheduler
+
+if TYPE_CHECKING:
+    from batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class StagePool:
+    """
+    Thread pool for one pipeline stage.
+    Tracks how many tasks are waiting for a worker and how many are running.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        Initialize the stage pool
+
+        Args:
+            name: Stage name used for thread names and stats
+            max_workers: Number of worker threads in the pool
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the executor on first use (and again after shutdown)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"{self.name}-stage"
+                )
+            return self._executor
+
+    def _call(self, fn: Callable, args: tuple) -> Any:
+        """Run a task on a worker thread, moving it from queued to active"""
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            result = fn(*args)
+        except BaseException:
+            with self._lock:
+                self.active -= 1
+                self.failed += 1
+            raise
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        return result
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run a blocking function on this stage's pool
+
+        The function runs in a copy of the caller's context, so stage timings
+        it records are charged to the calling request.
+
+        Args:
+            fn: Function to run
+            *args: Positional arguments for fn
+
+        Returns:
+            The function's return value
+        """
+        executor = self._get_executor()
+        with self._lock:
+            self.queued += 1
+        try:
+            future = executor.submit(contextvars.copy_context().run, self._call, fn, args)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """Current worker count, queue depth and task counters"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker threads; the pool is recreated on next use"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+class ExtractionPipeline:
+    """
+    Two-stage extraction pipeline.
+    Decode/preprocess and inference run on separate pools so that
+    concurrent requests overlap instead of serializing on the event loop.
+    When an embedding cache is attached, cached images skip both stages.
+    When a near-duplicate index is attached, images whose perceptual hash
+    is close to an already embedded one skip inference.
+    When a priority scheduler is attached, inference goes through its lanes
+    and interactive requests decode on their own reserved threads.
+    """
+
+    def __init__(
+        self,
+        decode_workers: int = 4,
+        inference_workers: int = 1,
+        cache: Optional[EmbeddingCache] = None,
+        near_duplicates: Optional[PerceptualHashIndex] = None,
+        interactive_decode_workers: int = 1
+    ):
+        """
+        Initialize the pipeline
+
+        Args:
+            decode_workers: Threads for PIL decode and NumPy preprocessing
+            inference_workers: Threads calling session.run concurrently
+            cache: Optional content-addressed embedding cache
+            near_duplicates: Optional perceptual hash index of embedded images
+            interactive_decode_workers: Decode threads reserved for interactive
+                requests while a scheduler is attached
+        """
+        self.decode = StagePool("decode", decode_workers)
+        self.interactive_decode = StagePool("interactive-decode", interactive_decode_workers)
+        self.inference = StagePool("inference", inference_workers)
+        self.cache = cache
+        self.near_duplicates = near_duplicates
+        self.scheduler: Optional[PriorityScheduler] = None
+        self.batch_buffer = BatchBuffer()
+
+    def _infer(self, extractor: ResNet50FeatureExtractor, input_batch: np.ndarray) -> np.ndarray:
+        """Run the model, recording inference time and batch size"""
+        observe_batch_size(input_batch.shape[0])
+        with stage_timer("inference"):
+            return extractor.run_inference(input_batch)
+
+    def _infer_stacked(
+        self, extractor: ResNet50FeatureExtractor, tensors: List[np.ndarray]
+    ) -> np.ndarray:
+        """Stack tensors into the inference thread's reusable buffer and run the model"""
+        return self._infer(extractor, self.batch_buffer.stack(tensors))
+
+    def decode_pool(self, lane: Optional[str] = None) -> StagePool:
+        """Pool for a lane's CPU work: interactive requests skip the shared decode queue while scheduled"""
+        if self.scheduler is not None and lane == INTERACTIVE:
+            return self.interactive_decode
+        return self.decode
+
+    async def prepare(
+        self, extractor: ResNet50FeatureExtractor, image_bytes: bytes, lane: Optional[str] = None
+    ) -> Tuple[np.ndarray, dict]:
+        """
+        Decode and preprocess an image on the lane's decode pool
+
+        Raises:
+            ValueError: If the image cannot be decoded
+        """
+        try:
+            return await self.decode_pool(lane).run(extractor.prepare_image, image_bytes)
+        except Exception as e:
+            raise ValueError(f"Failed to extract features: {str(e)}")
+
+    def _match_near_duplicate(
+        self, metadata: dict, index: Optional[PerceptualHashIndex]
+    ) -> Optional[np.ndarray]:
+        """
+        Reuse the embedding of a near-duplicate image, if one is indexed
+
+        On a match, metadata gains near_duplicate_distance (Hamming bits).
+
+        Returns:
+            The stored feature vector, or None
+        """
+        hash_value = metadata.get('perceptual_hash')
+        if index is None or hash_value is None:
+            return None
+        match = index.lookup(parse_hash(hash_value))
+        if match is None:
+            return None
+        features, distance = match
+        metadata['near_duplicate_distance'] = distance
+        return features
+
+    def _index_near_duplicate(
+        self, metadata: dict, features: np.ndarray, index: Optional[PerceptualHashIndex]
+    ) -> None:
+        """Add a freshly embedded image to the near-duplicate index"""
+        hash_value = metadata.get('perceptual_hash')
+        if index is not None and hash_value is not None:
+            index.add(parse_hash(hash_value), features)
+
+    async def extract(
+        self,
+        extractor: ResNet50FeatureExtractor,
+        image_bytes: bytes,
+        batcher: Optional["MicroBatcher"] = None,
+        reuse: bool = True,
+        lane: str = INTERACTIVE
+    ) -> Tuple[np.ndarray, dict]:
+        """
+        Extract a feature vector for one image
+
+        Args:
+            extractor: Loaded feature extractor
+            image_bytes: Raw image bytes
+            batcher: Optional micro-batcher to coalesce inference with concurrent requests
+                (unused while a scheduler is attached)
+            reuse: Use the cache and near-duplicate index; False when the extractor
+                is not the model they hold embeddings of
+            lane: Scheduler lane, INTERACTIVE or BULK
+
+        Returns:
+            Tuple of (feature_vector, metadata) with an L2-normalized 1-D vector
+
+        Raises:
+            ValueError: If the image cannot be decoded
+            LaneFullError: If the scheduler's lane has no room
+        """
+        cache = self.cache if reuse else None
+        near_duplicates = self.near_duplicates if reuse else None
+        pool = self.decode_pool(lane)
+        if cache is not None:
+            # Hashing a large upload is CPU work too, so it stays off the event loop
+            digest, cached = await pool.run(cache.lookup, image_bytes)
+            if cached is not None:
+                return cached
+
+        input_tensor, metadata = await self.prepare(extractor, image_bytes, lane)
+
+        features = None
+        if near_duplicates is not None:
+            features = await pool.run(self._match_near_duplicate, metadata, near_duplicates)
+
+        if features is None:
+            if self.scheduler is not None:
+                features = await self.scheduler.submit(extractor, input_tensor, lane)
+            elif batcher is not None:
+                # The batch is observed by the batcher; the request is charged its wait
+                with stage_timer("inference", observe=False):
+                    features = await batcher.submit(input_tensor)
+            else:
+                features = (await self.inference.run(self._infer, extractor, input_tensor))[0]
+            self._index_near_duplicate(metadata, features, near_duplicates)
+
+        if cache is not None:
+            await pool.run(cache.put, digest, features, metadata)
+
+        return features, metadata
+
+    async def extract_batch(
+        self,
+        extractor: ResNet50FeatureExtractor,
+        images: List[bytes],
+        reuse: bool = True,
+        lane: str = BULK
+    ) -> List[Tuple[Optional[np.ndarray], Optional[dict], Optional[str]]]:
+        """
+        Decode images concurrently, then run one inference for the batch
+
+        With a scheduler attached the images are queued in the lane together
+        and batched by the scheduler instead.
+
+        Args:
+            extractor: Loaded feature extractor
+            images: Raw image bytes
+            reuse: Use the cache and near-duplicate index (see extract)
+            lane: Scheduler lane, INTERACTIVE or BULK
+
+        Returns:
+            List aligned with the input of (feature_vector, metadata, error)
+
+        Raises:
+            LaneFullError: If the scheduler's lane has no room for the images
+        """
+        cache = self.cache if reuse else None
+        near_duplicates = self.near_duplicates if reuse else None
+        pool = self.decode_pool(lane)
+        results: List[Tuple[Optional[np.ndarray], Optional[dict], Optional[str]]] = [
+            (None, None, None) for _ in images
+        ]
+        digests: List[Optional[str]] = [None] * len(images)
+        misses = list(range(len(images)))
+
+        if cache is not None:
+            lookups = await asyncio.gather(
+                *(pool.run(cache.lookup, image_bytes) for image_bytes in images)
+            )
+            misses = []
+            for index, (digest, cached) in enumerate(lookups):
+                digests[index] = digest
+                if cached is not None:
+                    results[index] = (cached[0], cached[1], None)
+                else:
+                    misses.append(index)
+
+        prepared = await asyncio.gather(
+            *(self.prepare(extractor, images[index], lane) for index in misses),
+            return_exceptions=True
+        )
+
+        tensors = []
+        decoded = []
+        for index, item in zip(misses, prepared):
+            if isinstance(item, Exception):
+                results[index] = (None, None, str(item))
+                continue
+            tensor, metadata = item
+            features = None
+            if near_duplicates is not None:
+                features = await pool.run(self._match_near_duplicate, metadata, near_duplicates)
+            if features is not None:
+                results[index] = (features, metadata, None)
+                if cache is not None:
+                    await pool.run(cache.put, digests[index], features, metadata)
+            else:
+                tensors.append(tensor)
+                decoded.append((index, metadata))
+
+        if not tensors:
+            return results
+
+        if self.scheduler is not None:
+            features = await self.scheduler.submit_many(extractor, tensors, lane)
+        else:
+            features = await self.inference.run(self._infer_stacked, extractor, tensors)
+
+        for row, (index, metadata) in enumerate(decoded):
+            results[index] = (features[row], metadata, None)
+            self._index_near_duplicate(metadata, features[row], near_duplicates)
+            if cache is not None:
+                await pool.run(cache.put, digests[index], features[row], metadata)
+        return results
+
+    def stats(self) -> dict:
+        """Queue depth and counters for each stage, plus cache, near-duplicate and scheduler stats if attached"""
+        scheduled = self.scheduler is not None
+        return {
+            'decode': self.decode.stats(),
+            'interactive_decode': self.interactive_decode.stats() if scheduled else None,
+            'inference': self.inference.stats(),
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'near_duplicates': self.near_duplicates.stats() if self.near_duplicates is not None else None,
+            'scheduler': self.scheduler.stats() if scheduled else None
+        }
+
+    def shutdown(self) -> None:
+        """Shut down the stage pools"""
+        self.decode.shutdown()
+        self.interactive_decode.shutdown()
+        self.inference.shutdown()
@@ -0,0 +1,287 @@
+"""
+Microbenchmark suite for the extraction pipeline
+Times each step of feature_extractor.py on the images in data/testData and
+on synthetic images of several sizes and formats:
+
+- decode: Image.open + load (with the extractor's fast_decode setting)
+- preprocess: _preprocess_image (resize + fused normalization)
+- inference: session.run via run_inference at several batch sizes
+- end_to_end: extract_features on raw image bytes
+
+Results are written as JSON with p50/p95/p99 latency and images per second
+per case. When the serving model file is absent, a tiny generated model with
+the same interface is used (inference numbers are then only comparable with
+other tiny-model runs; decode and preprocess numbers are unaffected).
+--compare reports the change per case against an earlier result file.
+
+Usage:
+    python pipeline_benchmark.py --output pipeline_report.json
+    python pipeline_benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+from config import settings
+from feature_extractor import ResNet50FeatureExtractor
+from quantize_model import find_images
+from session_tuning import node_fingerprint
+from tiny_model import write_tiny_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'testData')
+DEFAULT_SIZES = [(320, 240), (1024, 768), (4000, 3000)]
+DEFAULT_FORMATS = ["JPEG", "PNG", "WEBP"]
+DEFAULT_BATCH_SIZES = [1, 4, 8, 16, 32]
+
+
+def summarize(latencies_ms: Sequence[float], images_per_call: int = 1) -> Dict[str, float]:
+    """
+    Percentiles and throughput of a set of timed calls
+
+    Args:
+        latencies_ms: Wall time of each call in milliseconds
+        images_per_call: Images processed by one call
+
+    Returns:
+        Dict with runs, p50/p95/p99/mean latency in ms and images_per_second
+    """
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    mean_ms = float(latencies.mean())
+    return {
+        'runs': int(latencies.size),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'mean_ms': round(mean_ms, 4),
+        'images_per_second': round(images_per_call * 1000 / mean_ms, 2) if mean_ms > 0 else None
+    }
+
+
+def time_calls(fn: Callable[[], object], runs: int, warmup: int = 2) -> List[float]:
+    """Wall time in ms of `runs` calls after `warmup` untimed ones"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def synthetic_image(width: int, height: int, image_format: str, seed: int = 0) -> bytes:
+    """
+    Encoded image with photo-like content (smooth gradients plus noise, so
+    codecs do realistic work rather than compressing a flat colour)
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([
+        (x + y) / 2 * np.ones((height, 1), dtype=np.float32),
+        np.broadcast_to(x, (height, width)),
+        np.broadcast_to(y, (height, width))
+    ], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **({'quality': 90} if image_format in ("JPEG", "WEBP") else {}))
+    return buffer.getvalue()
+
+
+def load_corpus(
+    test_data: Optional[str],
+    sizes: Sequence[Tuple[int, int]] = DEFAULT_SIZES,
+    formats: Sequence[str] = DEFAULT_FORMATS
+) -> List[Tuple[str, bytes]]:
+    """
+    Benchmark images: every file in test_data plus one synthetic image per size and format
+
+    Returns:
+        (case name, image bytes) pairs
+    """
+    corpus = []
+    if test_data and os.path.isdir(test_data):
+        for path in find_images(test_data):
+            with open(path, 'rb') as f:
+                corpus.append((f"testData/{os.path.basename(path)}", f.read()))
+    elif test_data:
+        logger.warning(f"Test data directory not found: {test_data}")
+
+    for width, height in sizes:
+        for image_format in formats:
+            corpus.append((f"{image_format.lower()}-{width}x{height}", synthetic_image(width, height, image_format)))
+    return corpus
+
+
+def resolve_model(model_path: Optional[str], work_dir: str) -> Tuple[str, bool]:
+    """
+    The model to benchmark, generating the tiny stand-in if the file is missing
+
+    Returns:
+        (model path, whether it is the tiny model)
+    """
+    if model_path and os.path.exists(model_path):
+        return model_path, False
+    logger.warning(f"Model not found at {model_path}; using a tiny generated model")
+    return write_tiny_model(os.path.join(work_dir, "tiny_feature_extractor.onnx")), True
+
+
+def run_suite(
+    extractor: ResNet50FeatureExtractor,
+    corpus: List[Tuple[str, bytes]],
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    runs: int = 20,
+    warmup: int = 2
+) -> List[dict]:
+    """
+    Time decode, preprocess and end-to-end extraction per image, and inference per batch size
+
+    Args:
+        extractor: Loaded feature extractor
+        corpus: (case name, image bytes) pairs
+        batch_sizes: Batch sizes for the inference benchmark
+        runs: Timed calls per case
+        warmup: Untimed calls before each case
+
+    Returns:
+        One result dict per (benchmark, case)
+    """
+    results = []
+
+    def record(benchmark: str, case: str, latencies: List[float], images_per_call: int = 1, **details):
+        result = {'benchmark': benchmark, 'case': case, **details, **summarize(latencies, images_per_call)}
+        logger.info(f"{benchmark} {case}: p50 {result['p50_ms']} ms, {result['images_per_second']} images/s")
+        results.append(result)
+
+    for case, image_bytes in corpus:
+        def decode():
+            image, _ = extractor._open_image(image_bytes)
+            image.load()
+            return image
+
+        image = decode()
+        details = {'width': image.width, 'height': image.height, 'bytes': len(image_bytes)}
+        record("decode", case, time_calls(decode, runs, warmup), **details)
+        record("preprocess", case, time_calls(lambda: extractor._preprocess_image(image), runs, warmup), **details)
+        record("end_to_end", case, time_calls(lambda: extractor.extract_features(image_bytes), runs, warmup),
+               **details)
+
+    width, height = extractor.input_size
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.standard_normal((batch_size, 3, height, width)).astype(np.float32)
+        record("inference", f"batch-{batch_size}",
+               time_calls(lambda: extractor.run_inference(batch), runs, warmup), batch_size, batch_size=batch_size)
+    return results
+
+
+def compare_reports(before: dict, after: dict) -> List[dict]:
+    """
+    Per-case change between two reports (cases present in both)
+
+    Returns:
+        Dicts with p50/p99 before and after and the p50 speedup (before / after)
+    """
+    previous = {(r['benchmark'], r['case']): r for r in before.get('results', [])}
+    changes = []
+    for result in after.get('results', []):
+        old = previous.get((result['benchmark'], result['case']))
+        if old is None:
+            continue
+        changes.append({
+            'benchmark': result['benchmark'],
+            'case': result['case'],
+            'p50_ms_before': old['p50_ms'],
+            'p50_ms_after': result['p50_ms'],
+            'p99_ms_before': old['p99_ms'],
+            'p99_ms_after': result['p99_ms'],
+            'speedup': round(old['p50_ms'] / result['p50_ms'], 3) if result['p50_ms'] > 0 else None
+        })
+    return changes
+
+
+def environment(model_path: str, tiny_model: bool, extractor: ResNet50FeatureExtractor) -> dict:
+    """Machine and software details recorded with the results"""
+    return {
+        'node': node_fingerprint(),
+        'python': platform.python_version(),
+        'onnxruntime': ort.__version__,
+        'numpy': np.__version__,
+        'model': os.path.basename(model_path),
+        'tiny_model': tiny_model,
+        'fast_decode': extractor.fast_decode,
+        'resample': settings.resample_filter
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark decode, preprocessing, inference and extraction")
+    parser.add_argument("--model", default=settings.serving_model_path,
+                        help="ONNX model (a tiny generated model is used if missing)")
+    parser.add_argument("--tiny-model", action="store_true", help="Always use the tiny generated model")
+    parser.add_argument("--test-data", default=DEFAULT_TEST_DATA, help="Directory of real images")
+    parser.add_argument("--sizes", default=",".join(f"{w}x{h}" for w, h in DEFAULT_SIZES),
+                        help="Synthetic image sizes, e.g. 320x240,1024x768")
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS), help="Synthetic image formats")
+    parser.add_argument("--batch-sizes", default=",".join(str(size) for size in DEFAULT_BATCH_SIZES))
+    parser.add_argument("--runs", type=int, default=20, help="Timed calls per case")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--fast-decode", action="store_true", default=settings.fast_decode)
+    parser.add_argument("--output", default="pipeline_report.json")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path, tiny = resolve_model(None if args.tiny_model else args.model, work_dir)
+        extractor = ResNet50FeatureExtractor(
+            model_path, fast_decode=args.fast_decode, resample=settings.resample_filter
+        )
+        corpus = load_corpus(
+            args.test_data,
+            sizes=[tuple(int(v) for v in size.split('x')) for size in args.sizes.split(',') if size],
+            formats=[f.upper() for f in args.formats.split(',') if f]
+        )
+        report = {
+            'environment': environment(model_path, tiny, extractor),
+            'runs': args.runs,
+            'results': run_suite(
+                extractor,
+                corpus,
+                batch_sizes=[int(size) for size in args.batch_sizes.split(',')],
+                runs=args.runs,
+                warmup=args.warmup
+            )
+        }
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare_reports(json.load(f), report)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for result in report['results']:
+        print(f"{result['benchmark']:<11} {result['case']:<48} p50 {result['p50_ms']:>9.3f} ms  "
+              f"p99 {result['p99_ms']:>9.3f} ms  {result['images_per_second']:>9} img/s")
+    for change in report.get('comparison', []):
+        print(f"{change['benchmark']:<11} {change['case']:<48} {change['speedup']}x")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
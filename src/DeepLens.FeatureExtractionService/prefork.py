@@ -0,0 +1,447 @@
+"""
+Pre-forked inference worker processes
+Runs ONNX inference in N forked processes, each pinned to its own core set
+with a matching intra-op thread count. Requests go to the worker with the
+fewest outstanding images. Workers load one pre-optimized model whose weights
+live in an external data file that ONNX Runtime memory-maps, so the page
+cache holds a single copy of the weights for all workers.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import onnxruntime as ort
+
+from config import SessionTuning
+from feature_extractor import ResNet50FeatureExtractor
+
+logger = logging.getLogger(__name__)
+
+SHARED_MODEL_SUFFIX = ".shared.onnx"
+
+
+def available_cores() -> List[int]:
+    """Cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(
+    workers: int,
+    cores: Optional[Sequence[int]] = None,
+    reserve: int = 0
+) -> Tuple[List[int], List[List[int]]]:
+    """
+    Split cores into a reserved set for the server process and one contiguous set per worker
+
+    Args:
+        workers: Number of inference workers
+        cores: Cores to split (this process's affinity if None)
+        reserve: Cores kept for the server process (HTTP, decode, preprocessing)
+
+    Returns:
+        Tuple of (reserved_cores, core_sets) with len(core_sets) == workers
+
+    Raises:
+        ValueError: If there are fewer free cores than workers
+    """
+    cores = sorted(cores if cores is not None else available_cores())
+    reserved, free = cores[:reserve], cores[reserve:]
+    if workers < 1 or workers > len(free):
+        raise ValueError(f"Cannot place {workers} workers on {len(free)} free cores")
+
+    base, extra = divmod(len(free), workers)
+    core_sets = []
+    start = 0
+    for index in range(workers):
+        size = base + (1 if index < extra else 0)
+        core_sets.append(free[start:start + size])
+        start += size
+    return reserved, core_sets
+
+
+def pin_to_cores(cores: Sequence[int]) -> bool:
+    """Restrict the calling process to the given cores; False where unsupported"""
+    if not cores or not hasattr(os, 'sched_setaffinity'):
+        return False
+    os.sched_setaffinity(0, set(cores))
+    return True
+
+
+def process_memory(pid: int) -> Optional[Dict[str, float]]:
+    """
+    Resident and proportional set size of a process (Linux)
+
+    PSS divides shared pages between the processes mapping them, so summing
+    PSS over the workers shows whether the weights are really shared.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return {
+        'rss_mb': round(int(fields['Rss'].split()[0]) / 1024, 1),
+        'pss_mb': round(int(fields['Pss'].split()[0]) / 1024, 1)
+    }
+
+
+def prepare_shared_model(model_path: str, output_dir: Optional[str] = None) -> str:
+    """
+    Write the optimized model with its weights in an external data file
+
+    Workers load the result without further optimization or prepacking,
+    so ONNX Runtime memory-maps the data file read-only and every worker
+    maps the same page-cache pages. The files are reused while newer than
+    the source model. Optimization is hardware specific, so build them on
+    the serving host.
+
+    Args:
+        model_path: Source ONNX model
+        output_dir: Directory for the shared model (the model's directory if None)
+
+    Returns:
+        Path of the shared model (<name>.shared.onnx next to <name>.shared.onnx.data)
+    """
+    output_dir = output_dir or os.path.dirname(os.path.abspath(model_path))
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    shared_path = os.path.join(output_dir, name + SHARED_MODEL_SUFFIX)
+    data_file = os.path.basename(shared_path) + ".data"
+
+    if (
+        os.path.exists(shared_path)
+        and os.path.exists(os.path.join(output_dir, data_file))
+        and os.path.getmtime(shared_path) >= os.path.getmtime(model_path)
+    ):
+        return shared_path
+
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"Writing shared-weight model {shared_path}")
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # No intra-op pool threads, since worker processes are forked right after this
+    sess_options.intra_op_num_threads = 1
+    sess_options.optimized_model_filepath = shared_path + ".tmp"
+    sess_options.add_session_config_entry('session.optimized_model_external_initializers_file_name', data_file)
+    sess_options.add_session_config_entry('session.optimized_model_external_initializers_min_size_in_bytes', '1024')
+    session = ort.InferenceSession(model_path, sess_options=sess_options, providers=['CPUExecutionProvider'])
+    del session
+
+    # The model file appears last, so a complete pair is never mistaken for a partial one
+    os.replace(shared_path + ".tmp", shared_path)
+    return shared_path
+
+
+def load_worker_extractor(
+    model_path: str,
+    threads: Optional[int],
+    shared_weights: bool,
+    tuning: Optional[SessionTuning] = None,
+    optimized_model_dir: Optional[str] = None,
+    optimized_model_format: str = 'ort',
+    warmup_batch_sizes: Sequence[int] = (),
+    warmup_iterations: int = 0
+) -> ResNet50FeatureExtractor:
+    """
+    Default worker factory: an extractor with its own pinned-size session,
+    warmed up before the worker reports ready (bind the keyword options with functools.partial)
+    """
+    extractor = ResNet50FeatureExtractor(
+        model_path,
+        intra_op_threads=threads,
+        shared_weights=shared_weights,
+        tuning=tuning,
+        optimized_model_dir=optimized_model_dir,
+        optimized_model_format=optimized_model_format
+    )
+    if warmup_iterations and warmup_batch_sizes:
+        extractor.warmup(warmup_batch_sizes, warmup_iterations)
+    return extractor
+
+
+def _worker_main(
+    model_path: str,
+    cores: List[int],
+    shared_weights: bool,
+    conn,
+    extractor_factory: Callable
+) -> None:
+    """Worker process: load the model, then answer (request_id, batch) messages until closed"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the launcher handles shutdown
+    pin_to_cores(cores)
+    try:
+        extractor = extractor_factory(model_path, len(cores) or None, shared_weights)
+    except Exception as e:
+        conn.send(('error', str(e)))
+        return
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        request_id, batch = message
+        try:
+            reply = (request_id, extractor.run_inference(batch), None)
+        except Exception as e:
+            reply = (request_id, None, str(e))
+        conn.send(reply)
+
+
+class _Worker:
+    """Server-side handle of one worker process"""
+
+    def __init__(self, index: int, cores: List[int], process, conn):
+        self.index = index
+        self.cores = cores
+        self.process = process
+        self.conn = conn
+        self.pid: Optional[int] = None
+        self.alive = True
+        self.outstanding = 0
+        self.completed = 0
+        self.failed = 0
+        self.pending: Dict[int, Tuple[Future, int]] = {}
+        self.send_lock = threading.Lock()
+        self.receiver: Optional[threading.Thread] = None
+
+
+class InferenceWorkerPool:
+    """
+    Pool of pre-forked inference processes with least-outstanding routing.
+
+    `submit`/`infer` are thread-safe and meant to be called from the
+    inference stage threads; each worker has a receiver thread resolving
+    the futures of its replies. A worker that dies is taken out of
+    rotation and its in-flight requests fail.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        core_sets: Sequence[Sequence[int]],
+        shared_weights: bool = True,
+        extractor_factory: Callable = load_worker_extractor,
+        start_timeout: float = 300.0
+    ):
+        """
+        Initialize the pool (processes start in `start`)
+
+        Args:
+            model_path: Model each worker loads (see prepare_shared_model)
+            core_sets: One core list per worker; an empty list leaves that worker unpinned
+            shared_weights: Load the model as a shared-weight model
+            extractor_factory: (model_path, threads, shared_weights) -> object with run_inference
+            start_timeout: Seconds to wait for each worker to load its model
+        """
+        self.model_path = model_path
+        self.core_sets = [list(cores) for cores in core_sets]
+        self.shared_weights = shared_weights
+        self.extractor_factory = extractor_factory
+        self.start_timeout = start_timeout
+
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._cursor = 0
+
+    @property
+    def alive_workers(self) -> int:
+        return sum(1 for worker in self._workers if worker.alive)
+
+    def start(self) -> None:
+        """
+        Fork the workers and wait until every one has loaded the model
+
+        Call before the server starts threads or an event loop.
+
+        Raises:
+            RuntimeError: If a worker fails to load the model
+        """
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(method)
+
+        for index, cores in enumerate(self.core_sets):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(self.model_path, cores, self.shared_weights, child_conn, self.extractor_factory),
+                name=f"inference-worker-{index}",
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._workers.append(_Worker(index, cores, process, parent_conn))
+
+        for worker in self._workers:
+            if not worker.conn.poll(self.start_timeout):
+                self.shutdown()
+                raise RuntimeError(f"Inference worker {worker.index} did not start within {self.start_timeout}s")
+            try:
+                status, detail = worker.conn.recv()
+            except EOFError:
+                status, detail = 'error', "process exited"
+            if status != 'ready':
+                self.shutdown()
+                raise RuntimeError(f"Inference worker {worker.index} failed to load the model: {detail}")
+            worker.pid = detail
+            worker.receiver = threading.Thread(
+                target=self._receive, args=(worker,), name=f"inference-worker-{worker.index}-rx", daemon=True
+            )
+            worker.receiver.start()
+            logger.info(f"Inference worker {worker.index} (pid {worker.pid}) ready on cores {worker.cores or 'all'}")
+
+    def _select(self) -> _Worker:
+        """Worker with the fewest outstanding images; ties rotate"""
+        alive = [worker for worker in self._workers if worker.alive]
+        if not alive:
+            raise RuntimeError("No inference workers available")
+        self._cursor = (self._cursor + 1) % len(alive)
+        rotated = alive[self._cursor:] + alive[:self._cursor]
+        return min(rotated, key=lambda worker: worker.outstanding)
+
+    def submit(self, batch: np.ndarray) -> Future:
+        """
+        Send a preprocessed NCHW batch to the least busy worker
+
+        Returns:
+            Future resolving to the (N, D) normalized features
+        """
+        future: Future = Future()
+        rows = int(batch.shape[0])
+        with self._lock:
+            worker = self._select()
+            request_id = next(self._ids)
+            worker.pending[request_id] = (future, rows)
+            worker.outstanding += rows
+        try:
+            with worker.send_lock:
+                worker.conn.send((request_id, batch))
+        except (OSError, ValueError) as e:
+            self._resolve(worker, request_id, None, f"Inference worker {worker.index} unavailable: {str(e)}")
+        return future
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """Blocking inference on the pool"""
+        return self.submit(batch).result()
+
+    def _resolve(self, worker: _Worker, request_id: int, features: Optional[np.ndarray], error: Optional[str]) -> None:
+        with self._lock:
+            entry = worker.pending.pop(request_id, None)
+            if entry is None:
+                return
+            future, rows = entry
+            worker.outstanding -= rows
+            if error is None:
+                worker.completed += rows
+            else:
+                worker.failed += rows
+        if error is None:
+            future.set_result(features)
+        else:
+            future.set_exception(RuntimeError(error))
+
+    def _receive(self, worker: _Worker) -> None:
+        """Resolve futures from a worker's replies until its pipe closes"""
+        while True:
+            try:
+                request_id, features, error = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            self._resolve(worker, request_id, features, error)
+
+        with self._lock:
+            was_alive, worker.alive = worker.alive, False
+            pending = list(worker.pending)
+        if was_alive:
+            logger.error(f"Inference worker {worker.index} (pid {worker.pid}) exited")
+        for request_id in pending:
+            self._resolve(worker, request_id, None, f"Inference worker {worker.index} exited")
+
+    def stats(self) -> dict:
+        """Per-worker pid, cores, liveness and image counters"""
+        with self._lock:
+            return {
+                'alive': self.alive_workers,
+                'workers': [
+                    {
+                        'pid': worker.pid,
+                        'cores': worker.cores,
+                        'alive': worker.alive,
+                        'outstanding': worker.outstanding,
+                        'completed': worker.completed,
+                        'failed': worker.failed
+                    }
+                    for worker in self._workers
+                ]
+            }
+
+    def memory(self) -> List[Optional[Dict[str, float]]]:
+        """RSS/PSS of each worker process"""
+        return [process_memory(worker.pid) if worker.pid else None for worker in self._workers]
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Ask workers to exit, then terminate any that do not"""
+        for worker in self._workers:
+            worker.alive = False
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+            if worker.receiver is not None:
+                worker.receiver.join(timeout)
+        self._workers = []
+
+
+class PreforkFeatureExtractor(ResNet50FeatureExtractor):
+    """
+    Feature extractor for the server process of a pre-forked deployment.
+    Decodes and preprocesses locally; `run_inference` runs on the worker pool.
+    """
+
+    def __init__(
+        self,
+        pool: InferenceWorkerPool,
+        fast_decode: bool = False,
+        resample: str = 'bilinear',
+        perceptual_hash: Optional[str] = 'phash'
+    ):
+        """
+        Initialize the extractor
+
+        Args:
+            pool: Started inference worker pool
+            fast_decode: Decode large images at reduced resolution before resizing
+            resample: Resample filter for the final resize (see RESAMPLE_FILTERS)
+            perceptual_hash: Hash added to metadata during decode, or None
+        """
+        self.pool = pool
+        super().__init__(
+            pool.model_path, fast_decode=fast_decode, resample=resample, perceptual_hash=perceptual_hash
+        )
+
+    def _load_model(self) -> None:
+        """The server process holds no session; the workers do"""
+
+    def run_inference(self, input_batch: np.ndarray) -> np.ndarray:
+        return self.pool.infer(input_batch)
+
+    def is_loaded(self) -> bool:
+        return self.pool.alive_workers > 0
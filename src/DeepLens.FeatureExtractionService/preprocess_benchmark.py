@@ -0,0 +1,135 @@
+"""
+Microbenchmarks for image preprocessing
+Compares the original step-by-step NumPy preprocessing with the fused
+multiply-add into reusable buffers: time and peak allocation per image,
+for single images and for stacking a batch.
+
+Usage:
+    python preprocess_benchmark.py --batch-size 16 --runs 200 --output preprocess_report.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import BatchBuffer, Preprocessor
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def legacy_preprocess(image: Image.Image, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """The original preprocessing: divide, subtract, divide, transpose, expand_dims"""
+    img_array = np.array(image, dtype=np.float32) / 255.0
+    img_array = (img_array - mean) / std
+    img_array = np.transpose(img_array, (2, 0, 1))
+    return np.expand_dims(img_array, axis=0)
+
+
+def measure(fn: Callable[[], object], runs: int) -> Dict[str, float]:
+    """
+    Mean time and peak traced allocation of a callable
+
+    Args:
+        fn: Zero-argument callable to measure
+        runs: Timed calls
+
+    Returns:
+        Dict with mean_us and peak_alloc_bytes (peak of a single call)
+    """
+    fn()  # warm up (and let reusable buffers allocate once)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    mean_us = (time.perf_counter() - start) / runs * 1e6
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'mean_us': round(mean_us, 2), 'peak_alloc_bytes': int(peak)}
+
+
+def run_benchmarks(batch_size: int = 16, runs: int = 200, input_size=(224, 224)) -> dict:
+    """
+    Benchmark legacy and fused preprocessing on random resized images
+
+    Returns:
+        Report with single-image and batch measurements and their ratios
+    """
+    rng = np.random.default_rng(0)
+    width, height = input_size
+    images: List[Image.Image] = [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for _ in range(batch_size)
+    ]
+    preprocessor = Preprocessor(IMAGENET_MEAN, IMAGENET_STD, input_size)
+    buffer = BatchBuffer()
+
+    def legacy_batch():
+        return np.concatenate([legacy_preprocess(image, IMAGENET_MEAN, IMAGENET_STD) for image in images], axis=0)
+
+    def fused_batch():
+        batch = buffer.acquire(len(images), preprocessor.sample_shape)
+        for row, image in enumerate(images):
+            preprocessor.normalize_into(image, batch[row])
+        return batch
+
+    single = {
+        'legacy': measure(lambda: legacy_preprocess(images[0], IMAGENET_MEAN, IMAGENET_STD), runs),
+        'fused': measure(lambda: preprocessor.normalize(images[0]), runs)
+    }
+    batch = {
+        'legacy': measure(legacy_batch, max(1, runs // batch_size)),
+        'fused': measure(fused_batch, max(1, runs // batch_size))
+    }
+
+    for entry in (single, batch):
+        entry['speedup'] = round(entry['legacy']['mean_us'] / entry['fused']['mean_us'], 2)
+        entry['alloc_reduction_bytes'] = entry['legacy']['peak_alloc_bytes'] - entry['fused']['peak_alloc_bytes']
+
+    max_error = float(np.abs(
+        legacy_preprocess(images[0], IMAGENET_MEAN, IMAGENET_STD) - preprocessor.normalize(images[0])
+    ).max())
+
+    return {
+        'input_size': list(input_size),
+        'batch_size': batch_size,
+        'single_image': single,
+        'batch': batch,
+        'batch_buffer_allocations': buffer.allocations,
+        'max_abs_difference': max_error
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare legacy and fused image preprocessing")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=200, help="Timed single-image calls")
+    parser.add_argument("--output", default="preprocess_report.json")
+    args = parser.parse_args()
+
+    report = run_benchmarks(batch_size=args.batch_size, runs=args.runs)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name in ('single_image', 'batch'):
+        entry = report[name]
+        print(f"{name}: {entry['legacy']['mean_us']:.0f} us -> {entry['fused']['mean_us']:.0f} us "
+              f"({entry['speedup']}x), peak alloc {entry['legacy']['peak_alloc_bytes']} -> "
+              f"{entry['fused']['peak_alloc_bytes']} bytes")
+    print(f"max |legacy - fused| = {report['max_abs_difference']:.2e}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+INT8 quantization of the ResNet50 ONNX model
+Produces a dynamically or statically quantized copy of the fp32 model and
+reports latency, throughput and cosine agreement of its embeddings with fp32.
+
+Requires the `onnx` package (see requirements-quantization.txt); serving the
+quantized model only needs onnxruntime.
+
+Usage:
+    python quantize_model.py quantize --mode static --calibration-dir ../../data/testData
+    python quantize_model.py report --images ../../data/testData --output quantization_report.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config import settings, quantized_model_path_for
+from feature_extractor import ResNet50FeatureExtractor
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+
+def find_images(directory: str, limit: Optional[int] = None) -> List[str]:
+    """Image files in a directory, sorted by name"""
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+
+def load_tensors(extractor: ResNet50FeatureExtractor, image_paths: List[str]) -> List[np.ndarray]:
+    """Preprocess images into (1, 3, 224, 224) tensors exactly as the service does"""
+    tensors = []
+    for path in image_paths:
+        with open(path, 'rb') as f:
+            tensor, _ = extractor.prepare_image(f.read())
+        tensors.append(tensor)
+    return tensors
+
+
+class ImageCalibrationReader:
+    """
+    Calibration data reader for static quantization.
+    Feeds preprocessed calibration images one at a time.
+    """
+
+    def __init__(self, input_name: str, tensors: List[np.ndarray]):
+        self.input_name = input_name
+        self._tensors = tensors
+        self._iterator: Optional[Iterator[np.ndarray]] = None
+        self.rewind()
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        tensor = next(self._iterator, None)
+        return None if tensor is None else {self.input_name: tensor}
+
+    def rewind(self) -> None:
+        self._iterator = iter(self._tensors)
+
+
+def quantize(
+    model_path: str,
+    output_path: str,
+    mode: str = 'static',
+    calibration_tensors: Optional[List[np.ndarray]] = None,
+    per_channel: bool = True
+) -> str:
+    """
+    Write an INT8-quantized copy of an ONNX model
+
+    Static quantization (QDQ, int8 weights and activations) calibrates
+    activation ranges on representative images and is the faster option
+    for convolutional models; dynamic quantization needs no calibration
+    data but computes activation ranges at run time.
+
+    Args:
+        model_path: fp32 ONNX model
+        output_path: Where to write the quantized model
+        mode: 'static' or 'dynamic'
+        calibration_tensors: Preprocessed images, required for static mode
+        per_channel: Quantize weights per output channel
+
+    Returns:
+        output_path
+
+    Raises:
+        ValueError: On an unknown mode or missing calibration data
+        RuntimeError: If the onnx package is not installed
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+    if mode == 'static' and not calibration_tensors:
+        raise ValueError("Static quantization needs calibration images")
+
+    try:
+        from onnxruntime.quantization import (
+            CalibrationMethod,
+            QuantFormat,
+            QuantType,
+            quantize_dynamic,
+            quantize_static
+        )
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+    except ImportError as e:
+        raise RuntimeError(
+            f"Quantization requires the onnx package (pip install -r requirements-quantization.txt): {str(e)}"
+        )
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Shape inference and graph cleanup improve which nodes get quantized
+        prepared_path = os.path.join(work_dir, 'prepared.onnx')
+        try:
+            quant_pre_process(model_path, prepared_path, skip_symbolic_shape=True)
+        except Exception as e:
+            logger.warning(f"Pre-processing failed, quantizing the original graph: {str(e)}")
+            prepared_path = model_path
+
+        if mode == 'dynamic':
+            quantize_dynamic(
+                prepared_path,
+                output_path,
+                per_channel=per_channel,
+                weight_type=QuantType.QInt8
+            )
+        else:
+            import onnxruntime as ort
+            input_name = ort.InferenceSession(
+                prepared_path, providers=['CPUExecutionProvider']
+            ).get_inputs()[0].name
+            quantize_static(
+                prepared_path,
+                output_path,
+                ImageCalibrationReader(input_name, calibration_tensors),
+                quant_format=QuantFormat.QDQ,
+                per_channel=per_channel,
+                activation_type=QuantType.QInt8,
+                weight_type=QuantType.QInt8,
+                calibrate_method=CalibrationMethod.MinMax
+            )
+
+    logger.info(f"Wrote {mode} INT8 model to {output_path}")
+    return output_path
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """
+    Cosine similarity between matching rows of two embedding matrices
+
+    Returns:
+        Mean, minimum and 5th percentile of the per-image cosine similarity
+    """
+    reference = reference / (np.linalg.norm(reference, axis=1, keepdims=True) + 1e-8)
+    candidate = candidate / (np.linalg.norm(candidate, axis=1, keepdims=True) + 1e-8)
+    cosine = np.sum(reference * candidate, axis=1)
+    return {
+        'mean': round(float(cosine.mean()), 6),
+        'min': round(float(cosine.min()), 6),
+        'p5': round(float(np.percentile(cosine, 5)), 6)
+    }
+
+
+def benchmark(
+    extractor: ResNet50FeatureExtractor,
+    tensors: List[np.ndarray],
+    batch_size: int = 8,
+    runs: int = 20,
+    warmup: int = 3
+) -> Dict[str, float]:
+    """
+    Single-image latency and batched throughput of run_inference
+
+    Args:
+        extractor: Loaded feature extractor
+        tensors: Preprocessed (1, 3, 224, 224) tensors, cycled as needed
+        batch_size: Images per call for the throughput measurement
+        runs: Timed calls per measurement
+        warmup: Untimed calls before measuring
+
+    Returns:
+        Latency percentiles in milliseconds and images per second
+    """
+    for i in range(warmup):
+        extractor.run_inference(tensors[i % len(tensors)])
+
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        extractor.run_inference(tensors[i % len(tensors)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = np.concatenate([tensors[i % len(tensors)] for i in range(batch_size)], axis=0)
+    start = time.perf_counter()
+    for _ in range(runs):
+        extractor.run_inference(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'latency_p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'throughput_images_per_s': round(batch_size * runs / elapsed, 2),
+        'batch_size': batch_size
+    }
+
+
+def compare(
+    reference: ResNet50FeatureExtractor,
+    candidate: ResNet50FeatureExtractor,
+    tensors: List[np.ndarray],
+    batch_size: int = 8,
+    runs: int = 20
+) -> dict:
+    """
+    Compare a quantized extractor against the fp32 reference
+
+    Returns:
+        Report with per-model benchmarks, speedup and cosine agreement
+    """
+    reference_stats = benchmark(reference, tensors, batch_size=batch_size, runs=runs)
+    candidate_stats = benchmark(candidate, tensors, batch_size=batch_size, runs=runs)
+
+    batch = np.concatenate(tensors, axis=0)
+    agreement = cosine_agreement(reference.run_inference(batch), candidate.run_inference(batch))
+
+    return {
+        'images': len(tensors),
+        'fp32': reference_stats,
+        'int8': candidate_stats,
+        'latency_speedup': round(reference_stats['latency_p50_ms'] / candidate_stats['latency_p50_ms'], 3),
+        'throughput_speedup': round(
+            candidate_stats['throughput_images_per_s'] / reference_stats['throughput_images_per_s'], 3
+        ),
+        'cosine_agreement': agreement
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Quantize the ResNet50 model to INT8 and compare it with fp32")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quantize_parser = subparsers.add_parser("quantize", help="Write an INT8 copy of the model")
+    quantize_parser.add_argument("--model", default=settings.model_path, help="fp32 ONNX model")
+    quantize_parser.add_argument("--output", default=None, help="Quantized model path (default: <model>-int8.onnx)")
+    quantize_parser.add_argument("--mode", choices=QUANTIZATION_MODES, default="static")
+    quantize_parser.add_argument("--calibration-dir", default=None, help="Directory of representative images")
+    quantize_parser.add_argument("--calibration-images", type=int, default=100, help="Maximum calibration images")
+
+    report_parser = subparsers.add_parser("report", help="Compare latency, throughput and embeddings with fp32")
+    report_parser.add_argument("--model", default=settings.model_path, help="fp32 ONNX model")
+    report_parser.add_argument("--quantized", default=None, help="Quantized model path (default: <model>-int8.onnx)")
+    report_parser.add_argument("--images", required=True, help="Directory of evaluation images")
+    report_parser.add_argument("--batch-size", type=int, default=8)
+    report_parser.add_argument("--runs", type=int, default=20)
+    report_parser.add_argument("--output", default="quantization_report.json")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    reference = ResNet50FeatureExtractor(args.model)
+
+    if args.command == "quantize":
+        tensors = None
+        if args.calibration_dir:
+            tensors = load_tensors(reference, find_images(args.calibration_dir, args.calibration_images))
+        output = args.output or quantized_model_path_for(args.model)
+        quantize(args.model, output, mode=args.mode, calibration_tensors=tensors)
+        print(f"Quantized model written to {output}")
+        return
+
+    candidate = ResNet50FeatureExtractor(args.quantized or quantized_model_path_for(args.model))
+    tensors = load_tensors(reference, find_images(args.images))
+    if not tensors:
+        parser.error(f"No images found in {args.images}")
+
+    report = compare(reference, candidate, tensors, batch_size=args.batch_size, runs=args.runs)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"fp32: {report['fp32']['latency_p50_ms']} ms p50, {report['fp32']['throughput_images_per_s']} img/s")
+    print(f"int8: {report['int8']['latency_p50_ms']} ms p50, {report['int8']['throughput_images_per_s']} img/s")
+    print(f"cosine agreement: mean={report['cosine_agreement']['mean']} min={report['cosine_agreement']['min']}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
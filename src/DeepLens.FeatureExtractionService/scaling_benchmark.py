@@ -0,0 +1,167 @@
+"""
+Scaling benchmark for pre-forked inference
+Measures throughput and latency with 1..N pinned single-core workers,
+compared with one process using the same number of intra-op threads,
+and reports per-worker memory to show the weights are shared.
+
+Usage:
+    python scaling_benchmark.py --batch-size 1 --requests 200 --output scaling_report.json
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import settings
+from feature_extractor import ResNet50FeatureExtractor
+from prefork import InferenceWorkerPool, available_cores, partition_cores, prepare_shared_model
+
+logger = logging.getLogger(__name__)
+
+
+def default_counts(cores: int) -> List[int]:
+    """1, 2, 4, ... up to and including all cores"""
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def drive(infer: Callable[[np.ndarray], np.ndarray], batch: np.ndarray, requests: int, concurrency: int) -> dict:
+    """
+    Issue `requests` inferences from `concurrency` client threads
+
+    Returns:
+        Throughput in images/s and latency percentiles in ms
+    """
+    infer(batch)  # warm up
+
+    def timed(_):
+        start = time.perf_counter()
+        infer(batch)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        latencies = list(clients.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'images_per_second': round(requests * batch.shape[0] / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2)
+    }
+
+
+def run_scaling(
+    model_path: str,
+    counts: Optional[List[int]] = None,
+    batch_size: int = 1,
+    requests: int = 200,
+    share_weights: bool = True,
+    shared_model_dir: Optional[str] = None,
+    compare_threads: bool = True
+) -> dict:
+    """
+    Benchmark the worker pool at each worker count
+
+    Args:
+        model_path: Source ONNX model
+        counts: Worker counts to measure (1, 2, 4, ... all cores if None)
+        batch_size: Images per request
+        requests: Requests per measurement
+        share_weights: Load the shared-weight model in the workers
+        shared_model_dir: Where to write the shared-weight model
+        compare_threads: Also measure one in-process session with the same thread count
+
+    Returns:
+        Report with one entry per worker count
+    """
+    cores = available_cores()
+    counts = counts or default_counts(len(cores))
+    worker_model = prepare_shared_model(model_path, shared_model_dir) if share_weights else model_path
+    batch = np.random.default_rng(0).standard_normal((batch_size, 3, 224, 224)).astype(np.float32)
+
+    entries = []
+    for workers in counts:
+        _, core_sets = partition_cores(workers, cores[:workers])
+        pool = InferenceWorkerPool(worker_model, core_sets, shared_weights=share_weights)
+        pool.start()
+        try:
+            entry = {'workers': workers, 'processes': drive(pool.infer, batch, requests, 2 * workers)}
+            memory = [m for m in pool.memory() if m is not None]
+            if memory:
+                entry['worker_rss_mb'] = max(m['rss_mb'] for m in memory)
+                entry['total_pss_mb'] = round(sum(m['pss_mb'] for m in memory), 1)
+        finally:
+            pool.shutdown()
+        entries.append(entry)
+        logger.info(f"{workers} workers: {entry['processes']['images_per_second']} images/s")
+
+    # In-process sessions last: their thread pools must not exist when workers fork
+    if compare_threads:
+        for entry in entries:
+            extractor = ResNet50FeatureExtractor(model_path, intra_op_threads=entry['workers'])
+            entry['threads'] = drive(extractor.run_inference, batch, requests, 2)
+            del extractor
+
+    base = entries[0]['processes']['images_per_second']
+    for entry in entries:
+        speedup = entry['processes']['images_per_second'] / base
+        entry['speedup'] = round(speedup, 2)
+        entry['efficiency'] = round(speedup / entry['workers'], 2)
+
+    return {
+        'model_path': model_path,
+        'shared_weights': share_weights,
+        'batch_size': batch_size,
+        'requests': requests,
+        'cores': len(cores),
+        'results': entries
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure pre-forked inference scaling from 1 to all cores")
+    parser.add_argument("--model", default=settings.serving_model_path)
+    parser.add_argument("--counts", help="Comma-separated worker counts (default 1,2,4,...,all cores)")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--no-share-weights", action="store_true")
+    parser.add_argument("--skip-threads", action="store_true", help="Skip the in-process thread comparison")
+    parser.add_argument("--output", default="scaling_report.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    counts = [int(count) for count in args.counts.split(',')] if args.counts else None
+    report = run_scaling(
+        args.model,
+        counts=counts,
+        batch_size=args.batch_size,
+        requests=args.requests,
+        share_weights=not args.no_share_weights,
+        shared_model_dir=settings.shared_model_dir,
+        compare_threads=not args.skip_threads
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in report['results']:
+        line = (f"{entry['workers']:>3} workers: {entry['processes']['images_per_second']:8.1f} images/s "
+                f"(x{entry['speedup']}, efficiency {entry['efficiency']})")
+        if 'threads' in entry:
+            line += f" | 1 process x {entry['workers']} threads: {entry['threads']['images_per_second']:.1f} images/s"
+        if 'total_pss_mb' in entry:
+            line += f" | PSS {entry['total_pss_mb']} MB"
+        print(line)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
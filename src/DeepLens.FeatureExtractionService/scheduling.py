@@ -0,0 +1,389 @@
+"""
+Two-lane priority scheduling of inference
+Interactive queries and bulk indexing share the inference pool. Queued
+interactive images are always dispatched first, at once and in small
+batches; bulk images wait in a bounded queue and are batched aggressively.
+When the pool has several threads, bulk batches never take the last one,
+so a query does not wait behind indexing at all. With a single thread there
+is nothing to reserve and a query can wait for one bulk batch; the service
+therefore runs at least two inference threads with priority scheduling.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from metrics import current_timings, observe_batch_size, observe_queue_wait, stage_timer
+from preprocessing import BatchBuffer
+
+if TYPE_CHECKING:
+    from pipeline import StagePool
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+
+class LaneFullError(RuntimeError):
+    """Raised when a bounded lane has no room for more images"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Item:
+    """One queued image"""
+
+    __slots__ = ('extractor', 'tensor', 'future', 'enqueued', 'dispatched', 'completed')
+
+    def __init__(self, extractor: Any, tensor: np.ndarray, future: asyncio.Future):
+        self.extractor = extractor
+        self.tensor = tensor
+        self.future = future
+        self.enqueued = time.perf_counter()
+        self.dispatched = self.enqueued
+        self.completed = self.enqueued
+
+
+class _Lane:
+    """Queue, batching limits and counters of one lane"""
+
+    def __init__(self, name: str, max_batch_size: int, window_seconds: float, max_queue: int):
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = max(0.0, window_seconds)
+        self.max_queue = max(0, max_queue)
+        self.queue: Deque[_Item] = deque()
+        self.running = 0
+
+        # Statistics
+        self.submitted = 0
+        self.rejected = 0
+        self.dispatched = 0
+        self.batches_run = 0
+        self.items_processed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # (completion time, images) of recent batches, for the drain rate
+        self._completions: Deque[Tuple[float, int]] = deque()
+
+    def record_batch(self, size: int) -> None:
+        """Count a completed batch"""
+        self.batches_run += 1
+        self.items_processed += size
+        self._completions.append((time.monotonic(), size))
+
+    def drain_rate(self, window: float) -> float:
+        """Images completed per second over the last `window` seconds"""
+        horizon = time.monotonic() - window
+        while self._completions and self._completions[0][0] < horizon:
+            self._completions.popleft()
+        return sum(size for _, size in self._completions) / window
+
+    def prune(self) -> None:
+        """Drop items at the head whose callers gave up"""
+        while self.queue and self.queue[0].future.done():
+            self.queue.popleft()
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': len(self.queue),
+            'max_queue_depth': self.max_queue,
+            'running': self.running,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'batches_run': self.batches_run,
+            'items_processed': self.items_processed,
+            'avg_batch_size': round(self.items_processed / self.batches_run, 2) if self.batches_run else 0.0,
+            'avg_wait_ms': round(self.wait_seconds_total * 1000 / self.dispatched, 3) if self.dispatched else 0.0,
+            'max_wait_ms': round(self.wait_seconds_max * 1000, 3),
+            'drain_rate_per_s': round(self.drain_rate(PriorityScheduler.RATE_WINDOW), 3)
+        }
+
+
+class PriorityScheduler:
+    """
+    Dispatches queued inputs from an interactive and a bulk lane to the inference pool.
+
+    Interactive images go out as soon as a pool thread is free, up to
+    `interactive_batch_size` per call. Bulk images are held until
+    `bulk_batch_size` are queued or the oldest has waited `bulk_window_ms`,
+    and run on at most `slots - reserved_slots` threads. Each call only
+    batches inputs for the same extractor, so several models can share the
+    scheduler.
+    """
+
+    # Seconds of completed batches the drain rate is measured over
+    RATE_WINDOW = 10.0
+    # Upper bound of the Retry-After hint for a full lane
+    MAX_RETRY_AFTER = 60
+
+    def __init__(
+        self,
+        executor: Optional["StagePool"] = None,
+        interactive_batch_size: int = 4,
+        bulk_batch_size: int = 32,
+        bulk_window_ms: float = 20.0,
+        bulk_queue_size: int = 512,
+        reserved_slots: int = 1
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+            executor: Stage pool that runs inference (event loop default executor if None);
+                its thread count is the number of batches run at once
+            interactive_batch_size: Maximum interactive images per inference call
+            bulk_batch_size: Maximum bulk images per inference call
+            bulk_window_ms: How long the oldest bulk image waits for a fuller batch
+            bulk_queue_size: Bulk images allowed to wait before submits are rejected (0 = no limit)
+            reserved_slots: Threads kept free of bulk batches for interactive ones
+        """
+        self.executor = executor
+        self.slots = executor.max_workers if executor is not None else 1
+        self.bulk_slots = max(1, self.slots - max(0, reserved_slots))
+        if reserved_slots > 0 and self.bulk_slots >= self.slots:
+            logger.warning(
+                f"Inference pool has {self.slots} thread(s): none can be reserved for interactive "
+                f"batches, so a query may wait for a whole bulk batch; use at least {reserved_slots + 1}"
+            )
+        self.lanes: Dict[str, _Lane] = {
+            INTERACTIVE: _Lane(INTERACTIVE, interactive_batch_size, 0.0, 0),
+            BULK: _Lane(BULK, bulk_batch_size, bulk_window_ms / 1000.0, bulk_queue_size)
+        }
+
+        self.batch_buffer = BatchBuffer()
+
+        self._running = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start the dispatch loop"""
+        if self._worker is not None:
+            return
+        self._wake = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+        interactive, bulk = self.lanes[INTERACTIVE], self.lanes[BULK]
+        logger.info(
+            f"Priority scheduler started (slots={self.slots}, bulk_slots={self.bulk_slots}, "
+            f"interactive_batch_size={interactive.max_batch_size}, bulk_batch_size={bulk.max_batch_size}, "
+            f"bulk_window_ms={bulk.window_seconds * 1000:.1f}, bulk_queue_size={bulk.max_queue})"
+        )
+
+    async def stop(self) -> None:
+        """Stop dispatching, fail queued inputs and wait for running batches"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        for lane in self.lanes.values():
+            while lane.queue:
+                item = lane.queue.popleft()
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("Scheduler stopped"))
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        logger.info("Priority scheduler stopped")
+
+    def lane(self, name: str) -> _Lane:
+        """
+        Raises:
+            ValueError: If the lane name is unknown
+        """
+        if name not in self.lanes:
+            raise ValueError(f"Unknown priority '{name}', expected one of: {', '.join(LANES)}")
+        return self.lanes[name]
+
+    async def submit(self, extractor: Any, input_tensor: np.ndarray, lane: str = INTERACTIVE) -> np.ndarray:
+        """
+        Queue one preprocessed image and wait for its feature vector
+
+        Args:
+            extractor: Loaded extractor to run the image through
+            input_tensor: Preprocessed tensor (1, 3, H, W) from prepare_image
+            lane: INTERACTIVE or BULK
+
+        Returns:
+            L2-normalized feature vector
+
+        Raises:
+            LaneFullError: If the lane's queue is full
+            RuntimeError: If the scheduler is not running or inference failed
+        """
+        return (await self.submit_many(extractor, [input_tensor], lane))[0]
+
+    async def submit_many(self, extractor: Any, tensors: List[np.ndarray], lane: str = BULK) -> List[np.ndarray]:
+        """
+        Queue several preprocessed images together and wait for all their vectors
+
+        The images are admitted or rejected as a whole; a set larger than the
+        queue bound is only admitted into an empty queue.
+
+        Returns:
+            Feature vectors aligned with tensors
+
+        Raises:
+            LaneFullError: If the lane's queue has no room for all of them
+            RuntimeError: If the scheduler is not running or inference failed
+        """
+        if self._worker is None:
+            raise RuntimeError("Scheduler is not running")
+        queue = self.lane(lane)
+        if not tensors:
+            return []
+
+        queue.prune()
+        if queue.max_queue and queue.queue and len(queue.queue) + len(tensors) > queue.max_queue:
+            queue.rejected += len(tensors)
+            raise LaneFullError(
+                f"The {lane} queue is full ({len(queue.queue)} images waiting)", self.retry_after(lane)
+            )
+
+        loop = asyncio.get_running_loop()
+        items = [_Item(extractor, tensor, loop.create_future()) for tensor in tensors]
+        queue.queue.extend(items)
+        queue.submitted += len(items)
+        self._wake.set()
+
+        features = await asyncio.gather(*(item.future for item in items))
+
+        # The batch ran in the dispatcher's context; charge this request its share
+        timings = current_timings()
+        if timings is not None:
+            dispatched = max(item.dispatched for item in items)
+            timings.add("queue_wait", dispatched - items[0].enqueued)
+            timings.add("inference", max(item.completed for item in items) - dispatched)
+        return list(features)
+
+    def retry_after(self, lane: str = BULK) -> int:
+        """
+        Seconds until a lane's queue is expected to drain, at least 1
+
+        The queue depth over the lane's measured drain rate; 1 without recent
+        completions, as no rate is known yet.
+        """
+        queue = self.lane(lane)
+        rate = queue.drain_rate(self.RATE_WINDOW)
+        estimate = len(queue.queue) / rate if rate > 0 else 1
+        return min(self.MAX_RETRY_AFTER, max(1, math.ceil(estimate)))
+
+    def stats(self) -> dict:
+        """Thread slots and per-lane queue depth, batching and queue wait"""
+        return {
+            'slots': self.slots,
+            'bulk_slots': self.bulk_slots,
+            'running': self._running,
+            'lanes': {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+
+    def _next_lane(self) -> Tuple[Optional[_Lane], Optional[float]]:
+        """Lane to dispatch from now, or None and the seconds until the bulk window closes"""
+        interactive, bulk = self.lanes[INTERACTIVE], self.lanes[BULK]
+        interactive.prune()
+        bulk.prune()
+        if self._running >= self.slots:
+            return None, None
+        if interactive.queue:
+            return interactive, None
+        if not bulk.queue or bulk.running >= self.bulk_slots:
+            return None, None
+        if len(bulk.queue) >= bulk.max_batch_size:
+            return bulk, None
+        remaining = bulk.queue[0].enqueued + bulk.window_seconds - time.perf_counter()
+        if remaining <= 0:
+            return bulk, None
+        return None, remaining
+
+    @staticmethod
+    def _take(lane: _Lane) -> List[_Item]:
+        """Up to max_batch_size queued items for the head item's extractor, in queue order"""
+        extractor = lane.queue[0].extractor
+        batch: List[_Item] = []
+        skipped: List[_Item] = []
+        while lane.queue and len(batch) < lane.max_batch_size:
+            item = lane.queue.popleft()
+            if item.future.done():
+                continue
+            if item.extractor is extractor:
+                batch.append(item)
+            else:
+                skipped.append(item)
+        lane.queue.extendleft(reversed(skipped))
+        return batch
+
+    async def _run(self) -> None:
+        """Dispatch loop: start a batch whenever a lane may run one, else sleep until woken"""
+        while True:
+            self._wake.clear()
+            lane, timeout = self._next_lane()
+            if lane is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batch = self._take(lane)
+            if not batch:
+                continue
+            self._running += 1
+            lane.running += 1
+            task = asyncio.create_task(self._run_batch(lane, batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    def _infer_stacked(self, extractor: Any, tensors: List[np.ndarray]) -> np.ndarray:
+        """Stack tensors into the worker thread's reusable buffer and run the model"""
+        observe_batch_size(len(tensors))
+        with stage_timer("inference"):
+            return extractor.run_inference(self.batch_buffer.stack(tensors))
+
+    async def _run_batch(self, lane: _Lane, batch: List[_Item]) -> None:
+        """Run one batch on the executor and fan the results out"""
+        dispatched = time.perf_counter()
+        lane.dispatched += len(batch)
+        for item in batch:
+            item.dispatched = dispatched
+            wait = dispatched - item.enqueued
+            observe_queue_wait(lane.name, wait)
+            lane.wait_seconds_total += wait
+            lane.wait_seconds_max = max(lane.wait_seconds_max, wait)
+
+        tensors = [item.tensor for item in batch]
+        try:
+            if self.executor is not None:
+                features = await self.executor.run(self._infer_stacked, batch[0].extractor, tensors)
+            else:
+                loop = asyncio.get_running_loop()
+                features = await loop.run_in_executor(None, self._infer_stacked, batch[0].extractor, tensors)
+        except Exception as e:
+            logger.error(f"{lane.name.capitalize()} batch of {len(batch)} failed: {str(e)}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError(str(e)))
+            return
+        finally:
+            self._running -= 1
+            lane.running -= 1
+            self._wake.set()
+
+        lane.record_batch(len(batch))
+        completed = time.perf_counter()
+        for row, item in enumerate(batch):
+            item.completed = completed
+            if not item.future.done():
+                item.future.set_result(features[row])
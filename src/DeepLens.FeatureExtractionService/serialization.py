@@ -0,0 +1,237 @@
+"""
+Response serialization for feature vectors
+Negotiates the wire format from the Accept header and serializes feature
+vectors without per-element Python float conversion or Pydantic validation.
+"""
+import base64
+import io
+import json
+from urllib.parse import quote
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import Response
+
+from vector_encoding import FLOAT32, INT8, encode
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+MEDIA_JSON = "application/json"
+MEDIA_OCTET_STREAM = "application/octet-stream"
+MEDIA_NPY = "application/x-npy"
+
+SUPPORTED_MEDIA_TYPES = (MEDIA_JSON, MEDIA_OCTET_STREAM, MEDIA_NPY)
+
+# OpenAPI documentation for endpoints that support binary responses
+BINARY_RESPONSE_DOCS = {
+    "content": {
+        MEDIA_OCTET_STREAM: {"schema": {"type": "string", "format": "binary"}},
+        MEDIA_NPY: {"schema": {"type": "string", "format": "binary"}}
+    },
+    "description": "JSON by default; raw little-endian float32 or NPY via the Accept header"
+}
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header
+
+    The supported type with the highest q-value wins; ties go to the type
+    listed first. Wildcards and unsupported types fall back to JSON.
+
+    Args:
+        accept: Raw Accept header value
+
+    Returns:
+        One of SUPPORTED_MEDIA_TYPES
+    """
+    if not accept:
+        return MEDIA_JSON
+
+    best_type = MEDIA_JSON
+    best_quality = -1.0
+    for part in accept.split(','):
+        fields = [field.strip() for field in part.split(';')]
+        media_type = fields[0].lower()
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+
+        if media_type in ('*/*', 'application/*'):
+            media_type = MEDIA_JSON
+        if media_type not in SUPPORTED_MEDIA_TYPES or quality <= 0:
+            continue
+        if quality > best_quality:
+            best_type, best_quality = media_type, quality
+
+    return best_type
+
+
+def dumps_json(payload: dict) -> bytes:
+    """
+    Serialize a response payload to JSON bytes
+
+    NumPy arrays in the payload are written directly (orjson) or via a
+    single tolist() call, never validated element by element.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_response(payload: dict, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Build a JSON response without going through response_model validation"""
+    return Response(content=dumps_json(payload), media_type=MEDIA_JSON, headers=headers)
+
+
+def to_wire_array(features: np.ndarray) -> np.ndarray:
+    """
+    Contiguous little-endian view of the features (no copy when already in that layout)
+
+    float16 and single-byte encodings keep their dtype; everything else is float32.
+    """
+    features = np.asarray(features)
+    if features.dtype == np.float16:
+        return np.ascontiguousarray(features, dtype='<f2')
+    if features.dtype.itemsize == 1 and features.dtype.kind in 'iu':
+        return np.ascontiguousarray(features)
+    return np.ascontiguousarray(features, dtype='<f4')
+
+
+def encoded_fields(features: np.ndarray, encoding: str) -> dict:
+    """
+    JSON fields for a feature vector in the requested encoding
+
+    float32 is returned as the `features` list; compact encodings are sent
+    base64-encoded in `encoded_features` (with `quantization_scale` for int8).
+    """
+    if encoding == FLOAT32:
+        return {'encoding': FLOAT32, 'features': to_wire_array(features)}
+
+    encoded, scales = encode(features, encoding)
+    fields = {
+        'encoding': encoding,
+        'encoded_features': base64.b64encode(to_wire_array(encoded).tobytes()).decode('ascii')
+    }
+    if encoding == INT8:
+        fields['quantization_scale'] = float(scales)
+    return fields
+
+
+def encoded_binary(features: np.ndarray, encoding: str) -> Tuple[np.ndarray, Dict[str, str]]:
+    """
+    Encode a vector or (N, D) matrix for a binary response
+
+    Returns:
+        Tuple of (encoded_array, headers) where headers describe the encoding
+    """
+    encoded, scales = encode(features, encoding)
+    headers = {'X-Feature-Encoding': encoding}
+    if scales is not None:
+        headers['X-Quantization-Scale'] = ','.join(
+            repr(float(scale)) for scale in np.atleast_1d(scales)
+        )
+    return encoded, headers
+
+
+def binary_response(
+    features: np.ndarray,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Build a binary response carrying the feature vector or matrix
+
+    Args:
+        features: 1-D vector or 2-D (N, D) matrix, float32 or an encoded array
+        media_type: MEDIA_OCTET_STREAM for the raw buffer, MEDIA_NPY for an .npy file
+        headers: Metadata headers to attach
+
+    Returns:
+        Response with the serialized array as body
+    """
+    array = to_wire_array(features)
+    if media_type == MEDIA_NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        body = buffer.getvalue()
+    else:
+        body = array.tobytes()
+
+    response_headers = {
+        'X-Feature-Dtype': array.dtype.name,
+        'X-Feature-Shape': ','.join(str(size) for size in array.shape)
+    }
+    response_headers.update(headers or {})
+    return Response(content=body, media_type=media_type, headers=response_headers)
+
+
+def metadata_headers(
+    model_name: str,
+    model_version: str,
+    processing_time_ms: float,
+    image_id: Optional[str] = None,
+    metadata: Optional[dict] = None
+) -> Dict[str, str]:
+    """Response headers carrying what the JSON body would otherwise contain"""
+    headers = {
+        'X-Model-Name': model_name,
+        'X-Model-Version': model_version,
+        'X-Processing-Time-Ms': f"{processing_time_ms:.2f}"
+    }
+    if image_id is not None:
+        headers['X-Image-Id'] = quote(image_id, safe='')
+    if metadata is not None:
+        headers['X-Image-Width'] = str(metadata['width'])
+        headers['X-Image-Height'] = str(metadata['height'])
+        headers['X-Image-Format'] = str(metadata['format'])
+    return headers
+
+
+def perceptual_hash_fields(metadata: Optional[dict]) -> Dict[str, object]:
+    """JSON fields for the image's perceptual hash and near-duplicate match, when present"""
+    if not metadata:
+        return {}
+    return {
+        key: metadata[key]
+        for key in ('perceptual_hash', 'near_duplicate_distance')
+        if metadata.get(key) is not None
+    }
+
+
+def perceptual_hash_headers(metadatas: List[Optional[dict]]) -> Dict[str, str]:
+    """
+    Headers with the perceptual hash of each row (empty for failed rows)
+    and the rows whose embedding was reused from a near-duplicate
+    """
+    hashes = [(metadata or {}).get('perceptual_hash') for metadata in metadatas]
+    if not any(hashes):
+        return {}
+    headers = {'X-Perceptual-Hash': ','.join(value or '' for value in hashes)}
+    reused = [
+        str(index) for index, metadata in enumerate(metadatas)
+        if metadata and metadata.get('near_duplicate_distance') is not None
+    ]
+    if reused:
+        headers['X-Near-Duplicate-Rows'] = ','.join(reused)
+    return headers
+
+
+def failed_indices_header(indices: List[int]) -> Dict[str, str]:
+    """Header listing batch rows that failed (zero-filled in binary responses)"""
+    return {'X-Failed-Indices': ','.join(str(index) for index in indices)}
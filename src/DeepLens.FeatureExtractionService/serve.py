@@ -0,0 +1,90 @@
+"""
+Production launcher for the Feature Extraction Service
+Pre-forks pinned inference worker processes sharing one copy of the model
+weights, then serves the API from this process, which decodes and
+preprocesses images and routes inference to the least busy worker.
+
+Usage:
+    python serve.py --workers 4 --reserve-cores 2
+"""
+import argparse
+import functools
+import logging
+
+from config import settings
+from prefork import (
+    InferenceWorkerPool,
+    available_cores,
+    load_worker_extractor,
+    partition_cores,
+    pin_to_cores,
+    prepare_shared_model
+)
+from session_tuning import load_tuning_profile
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve with pre-forked inference workers")
+    parser.add_argument("--workers", type=int, default=settings.inference_processes or None,
+                        help="Inference processes (default: one per free core)")
+    parser.add_argument("--reserve-cores", type=int, default=settings.reserve_cores,
+                        help="Cores kept for the server process (HTTP, decode, preprocessing)")
+    parser.add_argument("--no-pin", action="store_true", default=not settings.pin_cores,
+                        help="Do not pin workers to cores")
+    parser.add_argument("--no-share-weights", action="store_true", default=not settings.share_model_weights,
+                        help="Load the model privately in every worker")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    args = parser.parse_args()
+    logging.basicConfig(level=settings.log_level)
+
+    cores = available_cores()
+    workers = args.workers or max(1, len(cores) - args.reserve_cores)
+    if args.no_pin:
+        reserved, core_sets = [], [[] for _ in range(workers)]
+    else:
+        reserved, core_sets = partition_cores(workers, cores, reserve=args.reserve_cores)
+
+    model_path = settings.serving_model_path
+    if not args.no_share_weights:
+        model_path = prepare_shared_model(model_path, settings.shared_model_dir)
+
+    # Worker thread counts follow the pinned core sets; the rest of the profile applies as is
+    tuning = None
+    if settings.tuning_profile_path:
+        tuning = load_tuning_profile(settings.tuning_profile_path, settings.tuning_profile_name)
+
+    # Fork before any threads or event loop exist in this process
+    pool = InferenceWorkerPool(
+        model_path,
+        core_sets,
+        shared_weights=not args.no_share_weights,
+        extractor_factory=functools.partial(
+            load_worker_extractor,
+            tuning=tuning,
+            optimized_model_dir=settings.optimized_model_dir,
+            optimized_model_format=settings.optimized_model_format,
+            warmup_batch_sizes=settings.warmup_batch_sizes,
+            warmup_iterations=settings.warmup_iterations
+        )
+    )
+    pool.start()
+    pin_to_cores(reserved)
+
+    # Enough inference stage threads to keep every worker busy
+    settings.inference_workers = max(settings.inference_workers, 2 * workers)
+
+    import uvicorn
+    import main as service
+
+    service.inference_pool = pool
+    try:
+        uvicorn.run(service.app, host=args.host, port=args.port, log_level=settings.log_level.lower())
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+ONNX Runtime tuning profiles
+Builds session options from a SessionTuning and stores named profiles (one
+per node type) in a JSON file written by autotune.py. At startup the profile
+is picked by name, else by this machine's CPU fingerprint, else "default".
+"""
+import json
+import logging
+import os
+import platform
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+import onnxruntime as ort
+
+from config import SessionTuning
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+
+OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+
+
+def build_session_options(tuning: Optional[SessionTuning] = None) -> ort.SessionOptions:
+    """
+    Session options for a tuning profile (ONNX Runtime defaults with full optimization if None)
+
+    Args:
+        tuning: Profile to apply
+
+    Returns:
+        Configured SessionOptions
+    """
+    tuning = tuning or SessionTuning()
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = OPTIMIZATION_LEVELS[tuning.graph_optimization_level]
+    if tuning.intra_op_threads:
+        sess_options.intra_op_num_threads = tuning.intra_op_threads
+    if tuning.inter_op_threads:
+        sess_options.inter_op_num_threads = tuning.inter_op_threads
+    sess_options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if tuning.execution_mode == "parallel" else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    sess_options.enable_cpu_mem_arena = tuning.enable_cpu_mem_arena
+    sess_options.enable_mem_pattern = tuning.enable_mem_pattern
+    if not tuning.allow_spinning:
+        sess_options.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        sess_options.add_session_config_entry('session.inter_op.allow_spinning', '0')
+    return sess_options
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine() or "cpu"
+
+
+def node_fingerprint() -> str:
+    """
+    Profile name for this machine: CPU model and usable core count,
+    e.g. "intel-r-xeon-r-platinum-8375c-cpu-2-90ghz-16c"
+    """
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    slug = re.sub(r'[^a-z0-9]+', '-', _cpu_model().lower()).strip('-')
+    return f"{slug}-{cores}c"
+
+
+def load_tuning_profile(path: str, name: Optional[str] = None) -> Optional[SessionTuning]:
+    """
+    Load the tuning for this node from a profile file
+
+    Args:
+        path: JSON file written by autotune.py
+        name: Profile to use (this node's fingerprint, then "default", if None)
+
+    Returns:
+        The selected SessionTuning, or None if the file has no matching profile
+    """
+    with open(path) as f:
+        profiles = json.load(f).get('profiles', {})
+
+    candidates = [name] if name else [node_fingerprint(), DEFAULT_PROFILE]
+    for candidate in candidates:
+        if candidate in profiles:
+            logger.info(f"Using ONNX Runtime tuning profile '{candidate}' from {path}")
+            return SessionTuning(**profiles[candidate]['tuning'])
+
+    logger.warning(f"No tuning profile matching {candidates} in {path}; using ONNX Runtime defaults")
+    return None
+
+
+def save_tuning_profile(path: str, name: str, tuning: SessionTuning, measured: dict, **details) -> None:
+    """
+    Add or replace one named profile, keeping the other node types in the file
+
+    Args:
+        path: Profile file
+        name: Profile name (usually a node fingerprint)
+        tuning: Selected settings
+        measured: Throughput and latency measured with them
+        **details: Extra fields recorded with the profile (target, model, ...)
+    """
+    data = {'profiles': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        data.setdefault('profiles', {})
+
+    data['profiles'][name] = {
+        'tuning': tuning.model_dump(),
+        'measured': measured,
+        'created': datetime.now(timezone.utc).isoformat(),
+        **details
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
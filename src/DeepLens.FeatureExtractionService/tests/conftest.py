@@ -13,9 +13,11 @@ from fastapi.testclient import TestClient
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import main
 from main import app
 from config import settings
 from feature_extractor import ResNet50FeatureExtractor
+from preprocessing import Preprocessor, BatchBuffer
 
 
 @pytest.fixture(scope="session")
@@ -110,14 +112,21 @@ def sample_feature_vector() -> list[float]:
 @pytest.fixture
 def mock_extractor_success(monkeypatch, sample_feature_vector):
     """Mock the feature extractor to return success without loading actual model."""
-    def mock_init(self, model_path: str):
+    def mock_init(self, model_path: str, fast_decode: bool = False, resample: str = 'bilinear'):
         self.model_path = model_path
+        self.fast_decode = fast_decode
+        self.resample = Image.Resampling.BILINEAR
+        self.input_size = (224, 224)
         self.session = "mock_session"  # Mock ONNX session
         self.input_name = "data"
         self.output_name = "resnet50_output"
         self.input_shape = [1, 3, 224, 224]
         self.mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
         self.std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+        self.preprocessor = Preprocessor(self.mean, self.std, self.input_size)
+        self.batch_buffer = BatchBuffer()
+        self.perceptual_hash = 'phash'
+        self.max_pixels = settings.max_image_pixels
     
     def mock_extract_features(self, image_bytes: bytes):
         # Mock successful feature extraction
@@ -127,19 +136,35 @@ def mock_extractor_success(monkeypatch, sample_feature_vector):
             'format': 'JPEG'
         }
     
+    def mock_extract_features_batch(self, images: list):
+        # Mock successful batch extraction, one result per image
+        return [
+            (sample_feature_vector, {'width': 224, 'height': 224, 'format': 'JPEG'}, None)
+            for _ in images
+        ]
+    
+    def mock_run_inference(self, input_batch):
+        # Mock model output: one normalized feature vector per input
+        return np.tile(np.array(sample_feature_vector, dtype=np.float32), (input_batch.shape[0], 1))
+    
     def mock_is_loaded(self):
         return True
     
-    # Apply the mocks
+    # Apply the mocks (prepare_image runs for real on the mocked instance)
     monkeypatch.setattr(ResNet50FeatureExtractor, '__init__', mock_init)
     monkeypatch.setattr(ResNet50FeatureExtractor, 'extract_features', mock_extract_features)
+    monkeypatch.setattr(ResNet50FeatureExtractor, 'extract_features_batch', mock_extract_features_batch)
+    monkeypatch.setattr(ResNet50FeatureExtractor, 'run_inference', mock_run_inference)
     monkeypatch.setattr(ResNet50FeatureExtractor, 'is_loaded', mock_is_loaded)
+    
+    # Install the mocked extractor into the app (TestClient does not run the lifespan)
+    monkeypatch.setattr(main, 'feature_extractor', ResNet50FeatureExtractor("dummy_path"))
 
 
 @pytest.fixture
 def mock_extractor_failure(monkeypatch):
     """Mock the feature extractor to simulate model loading failure."""
-    def mock_init(self, model_path: str):
+    def mock_init(self, model_path: str, fast_decode: bool = False, resample: str = 'bilinear'):
         self.model_path = model_path
         self.session = None  # Simulate failed loading
         
@@ -149,6 +174,7 @@ def mock_extractor_failure(monkeypatch):
     # Apply the mocks
     monkeypatch.setattr(ResNet50FeatureExtractor, '__init__', mock_init)
     monkeypatch.setattr(ResNet50FeatureExtractor, 'is_loaded', mock_is_loaded)
+    monkeypatch.setattr(main, 'feature_extractor', ResNet50FeatureExtractor("dummy_path"))
 
 
 class TestConfig:
@@ -167,6 +193,7 @@ class TestConfig:
     # API endpoints
     HEALTH_ENDPOINT = "/health"
     EXTRACT_FEATURES_ENDPOINT = "/extract-features"
+    EXTRACT_FEATURES_BATCH_ENDPOINT = "/extract-features/batch"
     
     # Expected response times (milliseconds)
     HEALTH_CHECK_MAX_TIME_MS = 100
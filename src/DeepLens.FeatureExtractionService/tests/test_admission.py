@@ -0,0 +1,133 @@
+"""
+Unit tests for admission control.
+"""
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+
+
+async def hold(controller, seconds, served):
+    """Take a slot, keep it for a while, then release it."""
+    await controller.acquire()
+    served.append(asyncio.get_running_loop().time())
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        controller.release()
+
+
+class TestAdmissionController:
+    """Test cases for the AdmissionController class."""
+
+    @pytest.mark.unit
+    def test_queue_then_reject(self):
+        """Test that requests beyond the slots queue, and beyond the queue are rejected."""
+        controller = AdmissionController(max_in_flight=2, max_queued=1, queue_timeout=5)
+
+        async def scenario():
+            served = []
+            holders = [asyncio.ensure_future(hold(controller, 0.05, served)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            assert (controller.in_flight, controller.queued) == (2, 1)
+            with pytest.raises(AdmissionRejected) as rejection:
+                await controller.acquire()
+            await asyncio.gather(*holders)
+            return served, rejection.value
+
+        served, rejection = asyncio.run(scenario())
+
+        # The queued request started once a slot was released
+        assert served[2] - served[0] >= 0.04
+        assert rejection.retry_after >= 1
+        assert controller.in_flight == 0 and controller.queued == 0
+        assert (controller.admitted, controller.rejected) == (3, 1)
+
+    @pytest.mark.unit
+    def test_queue_timeout(self):
+        """Test that a request waiting longer than the queue timeout is rejected and leaves the queue."""
+        controller = AdmissionController(max_in_flight=1, max_queued=4, queue_timeout=0.02)
+
+        async def scenario():
+            holder = asyncio.ensure_future(hold(controller, 0.1, []))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected, match="No capacity"):
+                await controller.acquire()
+            assert controller.queued == 0
+            await holder
+
+        asyncio.run(scenario())
+
+        assert controller.timed_out == 1
+        assert controller.in_flight == 0
+
+    @pytest.mark.unit
+    def test_cancelled_waiter_leaves_queue(self):
+        """Test that a client disconnecting while queued neither keeps nor leaks a slot."""
+        controller = AdmissionController(max_in_flight=1, max_queued=4)
+
+        async def scenario():
+            holder = asyncio.ensure_future(hold(controller, 0.03, []))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            await holder
+
+        asyncio.run(scenario())
+
+        assert controller.in_flight == 0 and controller.queued == 0
+
+    @pytest.mark.unit
+    def test_retry_after_from_drain_rate(self):
+        """Test that Retry-After is the queue length over the measured completion rate."""
+        controller = AdmissionController(max_in_flight=1, max_queued=10, queue_timeout=7, rate_window=10)
+
+        assert controller.retry_after() == 7
+        for _ in range(20):
+            controller.in_flight += 1
+            controller.release()
+        assert controller.drain_rate() == 2.0
+        assert controller.retry_after() == 1
+
+        loop = asyncio.new_event_loop()
+        try:
+            controller._waiters.extend(loop.create_future() for _ in range(9))
+            assert controller.retry_after() == 5
+            assert controller.load()['utilization'] == round(9 / 11, 3)
+        finally:
+            loop.close()
+
+
+class TestAdmissionMiddleware:
+    """Test cases for the AdmissionMiddleware class."""
+
+    @pytest.mark.unit
+    def test_rejects_without_reading_body(self):
+        """Test that a rejected request gets 429 with Retry-After and its body is never read."""
+        controller = AdmissionController(max_in_flight=1, max_queued=0)
+        controller.in_flight = 1
+        called = []
+
+        async def app(scope, receive, send):
+            called.append(scope["path"])
+
+        async def receive():
+            raise AssertionError("body read")
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        middleware = AdmissionMiddleware(app, controller, endpoints=["/extract-features"])
+        asyncio.run(middleware({"type": "http", "path": "/extract-features"}, receive, send))
+        asyncio.run(middleware({"type": "http", "path": "/health"}, receive, send))
+
+        assert called == ["/health"]
+        assert messages[0]["status"] == 429
+        # No completions measured yet: retry after the queue timeout
+        assert dict(messages[0]["headers"])[b"retry-after"] == b"10"
+        assert b"capacity" in messages[1]["body"]
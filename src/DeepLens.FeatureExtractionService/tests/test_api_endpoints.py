@@ -2,11 +2,13 @@
 Integration tests for the FastAPI endpoints.
 Tests the complete API functionality including request/response handling.
 """
+import base64
 import pytest
 import json
 import io
+import numpy as np
 from fastapi.testclient import TestClient
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from tests.conftest import create_test_image, assert_api_response_structure
 
@@ -53,6 +55,91 @@ class TestHealthEndpoint:
         assert response_time_ms < test_config.HEALTH_CHECK_MAX_TIME_MS
 
 
+class TestReadyEndpoint:
+    """Test cases for the /ready endpoint."""
+
+    @pytest.mark.api
+    def test_ready_after_warmup(self, api_client, mock_extractor_success, monkeypatch):
+        """Test that /ready returns 200 with startup timings once warmed up."""
+        import main
+
+        monkeypatch.setattr(main, 'startup_state', {
+            'ready': True, 'model_load_ms': 120.0, 'warmup_ms': 35.0, 'optimized_model': 'hit'
+        })
+        response = api_client.get("/ready")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["ready"] is True
+        assert data["startup"]["optimized_model"] == "hit"
+        assert api_client.get("/health").json()["ready"] is True
+
+    @pytest.mark.api
+    def test_not_ready_during_startup(self, api_client, mock_extractor_success, monkeypatch):
+        """Test that /ready returns 503 before warmup while /health stays 200."""
+        import main
+
+        monkeypatch.setattr(main, 'startup_state', {'ready': False})
+        response = api_client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
+        assert api_client.get("/health").status_code == 200
+
+    @pytest.mark.api
+    def test_not_ready_without_model(self, api_client, mock_extractor_failure, monkeypatch):
+        """Test that /ready returns 503 when the model is not loaded."""
+        import main
+
+        monkeypatch.setattr(main, 'startup_state', {'ready': True})
+        response = api_client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["model_loaded"] is False
+
+
+class TestMetricsEndpoint:
+    """Test cases for /metrics and Server-Timing headers."""
+
+    @pytest.mark.api
+    def test_server_timing_header(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that an extraction response reports its stage durations."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files)
+
+        assert response.status_code == 200
+        stages = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        assert stages == ["upload_read", "decode", "preprocess", "inference", "serialization", "total"]
+
+    @pytest.mark.api
+    def test_metrics_after_extraction(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that /metrics exposes stage histograms, batch sizes and request counters."""
+        import metrics
+
+        decode_before = metrics.STAGE_SECONDS.count(stage="decode")
+        files = [("files", (f"img{i}.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")) for i in range(3)]
+        assert api_client.post("/extract-features/batch", files=files).status_code == 200
+
+        response = api_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert metrics.STAGE_SECONDS.count(stage="decode") == decode_before + 3
+
+        text = response.text
+        for stage in ("upload_read", "decode", "preprocess", "inference", "serialization"):
+            assert f'deeplens_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert 'deeplens_inference_batch_size_bucket{le="4"}' in text
+        assert 'deeplens_requests_total{endpoint="/extract-features/batch",status="200"}' in text
+        assert "deeplens_requests_in_flight 0" in text
+        assert 'deeplens_stage_queued{stage="decode"}' in text
+
+    @pytest.mark.api
+    def test_metrics_not_instrumented_elsewhere(self, api_client):
+        """Test that non-extraction endpoints get no Server-Timing header."""
+        assert "server-timing" not in api_client.get("/health").headers
+
+
 class TestExtractFeaturesEndpoint:
     """Test cases for the /extract-features endpoint."""
 
@@ -182,7 +269,7 @@ class TestExtractFeaturesEndpoint:
         # Mock the extractor to raise ValueError for invalid data
         with patch('main.feature_extractor') as mock_extractor:
             mock_extractor.is_loaded.return_value = True
-            mock_extractor.extract_features.side_effect = ValueError("Invalid image data")
+            mock_extractor.prepare_image.side_effect = ValueError("Invalid image data")
             
             response = api_client.post("/extract-features", files=files)
         
@@ -208,7 +295,8 @@ class TestExtractFeaturesEndpoint:
         # Mock the extractor to raise unexpected exception
         with patch('main.feature_extractor') as mock_extractor:
             mock_extractor.is_loaded.return_value = True
-            mock_extractor.extract_features.side_effect = RuntimeError("Unexpected error")
+            mock_extractor.prepare_image.return_value = (np.zeros((1, 3, 224, 224), dtype=np.float32), {})
+            mock_extractor.run_inference.side_effect = RuntimeError("Unexpected error")
             
             response = api_client.post("/extract-features", files=files)
         
@@ -264,6 +352,1080 @@ class TestExtractFeaturesEndpoint:
         assert response_data["processing_time_ms"] < test_config.FEATURE_EXTRACTION_MAX_TIME_MS
 
 
+class TestBinaryResponses:
+    """Test cases for binary feature vector responses."""
+
+    @pytest.mark.api
+    def test_extract_features_octet_stream(self, api_client, mock_extractor_success, sample_image_bytes, sample_feature_vector):
+        """Test that Accept: application/octet-stream returns the raw float32 vector."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        data = {"image_id": "bin_001", "return_metadata": "true"}
+
+        response = api_client.post(
+            "/extract-features", files=files, data=data,
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/octet-stream"
+        features = np.frombuffer(response.content, dtype="<f4")
+        assert features.shape == (2048,)
+        np.testing.assert_allclose(features, np.array(sample_feature_vector, dtype=np.float32))
+        assert response.headers["x-image-id"] == "bin_001"
+        assert response.headers["x-model-name"] == "resnet50"
+        assert response.headers["x-image-width"] == "224"
+
+    @pytest.mark.api
+    def test_extract_features_npy(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that Accept: application/x-npy returns a loadable .npy vector."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post(
+            "/extract-features", files=files, headers={"Accept": "application/x-npy"}
+        )
+
+        assert response.status_code == 200
+        features = np.load(io.BytesIO(response.content), allow_pickle=False)
+        assert features.dtype == np.float32
+        assert features.shape == (2048,)
+        assert "x-image-width" not in response.headers
+
+    @pytest.mark.api
+    def test_batch_octet_stream_zero_fills_failures(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that binary batch responses mark failed rows in a header."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.gif", io.BytesIO(b"GIF89a"), "image/gif")),
+            ("files", ("c.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+        ]
+
+        response = api_client.post(
+            "/extract-features/batch", files=files, headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        matrix = np.frombuffer(response.content, dtype="<f4").reshape(3, 2048)
+        assert response.headers["x-feature-shape"] == "3,2048"
+        assert response.headers["x-failed-indices"] == "1"
+        assert not matrix[1].any()
+        assert matrix[0].any() and matrix[2].any()
+
+    @pytest.mark.api
+    def test_json_remains_default(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that clients without an Accept preference still get JSON."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post("/extract-features", files=files, headers={"Accept": "*/*"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["model_version"] == "v2.7"
+        assert_api_response_structure(response.json())
+
+
+class TestMicroBatchedExtraction:
+    """Test cases for /extract-features with micro-batching enabled."""
+
+    @pytest.mark.api
+    def test_extract_features_through_micro_batcher(self, monkeypatch, mock_extractor_success, sample_image_bytes):
+        """Test that single-image requests are served through the batcher when enabled."""
+        import main
+        from feature_extractor import ResNet50FeatureExtractor
+
+        calls = []
+        original_run_inference = ResNet50FeatureExtractor.run_inference
+
+        def recording_run_inference(self, input_batch):
+            calls.append(input_batch.shape[0])
+            return original_run_inference(self, input_batch)
+
+        monkeypatch.setattr(ResNet50FeatureExtractor, 'run_inference', recording_run_inference)
+        monkeypatch.setattr(main.settings, 'micro_batch_enabled', True)
+        completed_before = main.extraction_pipeline.inference.stats()['completed']
+
+        with TestClient(main.app) as client:
+            assert main.micro_batcher is not None
+            files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+            response = client.post("/extract-features", files=files, data={"image_id": "mb_1"})
+
+        assert response.status_code == 200
+        assert response.json()["image_id"] == "mb_1"
+        assert len(response.json()["features"]) == 2048
+        assert calls == [1]
+        assert main.micro_batcher is None
+        assert main.extraction_pipeline.inference.stats()['completed'] == completed_before + 1
+
+
+class TestPriorityScheduling:
+    """Test cases for the priority parameter and the two-lane scheduler."""
+
+    @pytest.mark.api
+    def test_requests_served_through_lanes(self, monkeypatch, mock_extractor_success, sample_image_bytes):
+        """Test that each request is queued in its lane when scheduling is enabled."""
+        import main
+
+        monkeypatch.setattr(main.settings, 'priority_scheduling_enabled', True)
+
+        with TestClient(main.app) as client:
+            assert main.extraction_pipeline.scheduler is not None
+            assert main.micro_batcher is None
+            files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+            query = client.post("/extract-features", files=files)
+            files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+            indexing = client.post("/extract-features", files=files, data={"priority": "bulk"})
+            files = [("files", (f"{i}.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")) for i in range(3)]
+            batch = client.post("/extract-features/batch", files=files)
+            stats = client.get("/stats").json()
+
+        assert query.status_code == indexing.status_code == batch.status_code == 200
+        assert "queue_wait;dur=" in query.headers["server-timing"]
+        lanes = stats["scheduler"]["lanes"]
+        assert lanes["interactive"]["items_processed"] == 1
+        assert lanes["bulk"]["items_processed"] == 4
+        assert stats["interactive_decode"]["completed"] >= 1
+        assert main.extraction_pipeline.scheduler is None
+
+    @pytest.mark.api
+    def test_invalid_priority(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that unknown priorities are rejected."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files, data={"priority": "urgent"})
+
+        assert response.status_code == 400
+        assert "interactive, bulk" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_full_bulk_queue_returns_503(self, api_client, monkeypatch, mock_extractor_success, sample_image_bytes):
+        """Test that a full bulk lane asks the client to retry after the lane's estimated drain time."""
+        import main
+        from scheduling import LaneFullError
+
+        async def full(*args, **kwargs):
+            raise LaneFullError("The bulk queue is full (512 images waiting)", retry_after=7)
+
+        monkeypatch.setattr(main.extraction_pipeline, 'extract_batch', full)
+        files = [("files", ("0.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))]
+        response = api_client.post("/extract-features/batch", files=files)
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "7"
+
+
+class TestNearDuplicates:
+    """Test cases for perceptual hashes and near-duplicate reuse over the API."""
+
+    @staticmethod
+    def _photo(seed, quality=90):
+        """Textured JPEG whose perceptual hash is distinct from flat test images"""
+        from PIL import Image
+        rng = np.random.default_rng(seed)
+        image = Image.fromarray(rng.uniform(0, 255, (6, 8, 3)).astype(np.uint8)).resize(
+            (320, 240), Image.Resampling.BICUBIC
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+
+    @pytest.mark.api
+    def test_response_includes_perceptual_hash(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that JSON and binary responses carry the image's perceptual hash."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files)
+
+        assert response.status_code == 200
+        assert len(response.json()["perceptual_hash"]) == 16
+        assert "near_duplicate_distance" not in response.json()
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        binary = api_client.post(
+            "/extract-features", files=files, headers={"Accept": "application/octet-stream"}
+        )
+        assert binary.headers["x-perceptual-hash"] == response.json()["perceptual_hash"]
+
+    @pytest.mark.api
+    def test_repost_reuses_embedding(self, api_client, monkeypatch, mock_extractor_success):
+        """Test that a re-encoded upload is answered from the near-duplicate index."""
+        import main
+        from feature_extractor import ResNet50FeatureExtractor
+        from perceptual_hash import PerceptualHashIndex
+
+        calls = []
+        original_run_inference = ResNet50FeatureExtractor.run_inference
+
+        def recording_run_inference(self, input_batch):
+            calls.append(input_batch.shape[0])
+            return original_run_inference(self, input_batch)
+
+        monkeypatch.setattr(ResNet50FeatureExtractor, 'run_inference', recording_run_inference)
+        monkeypatch.setattr(main.extraction_pipeline, 'near_duplicates', PerceptualHashIndex(max_distance=4))
+
+        first = api_client.post(
+            "/extract-features", files={"file": ("a.jpg", io.BytesIO(self._photo(1)), "image/jpeg")}
+        )
+        batch = api_client.post(
+            "/extract-features/batch",
+            files=[
+                ("files", ("b.jpg", io.BytesIO(self._photo(1, quality=60)), "image/jpeg")),
+                ("files", ("c.jpg", io.BytesIO(self._photo(2)), "image/jpeg")),
+            ],
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert first.status_code == 200 and batch.status_code == 200
+        assert calls == [1, 1]
+        assert batch.headers["x-near-duplicate-rows"] == "0"
+        assert batch.headers["x-perceptual-hash"].split(",")[0] != ""
+        assert api_client.get("/stats").json()["near_duplicates"]["hits"] == 1
+
+
+class TestExtractFeaturesBatchEndpoint:
+    """Test cases for the /extract-features/batch endpoint."""
+
+    @pytest.mark.api
+    def test_batch_success(self, api_client, mock_extractor_success, sample_image_bytes, sample_png_image_bytes):
+        """Test successful batch feature extraction via API."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.png", io.BytesIO(sample_png_image_bytes), "image/png")),
+        ]
+        data = {"image_ids": ["img_a", "img_b"], "return_metadata": "true"}
+
+        response = api_client.post("/extract-features/batch", files=files, data=data)
+
+        assert response.status_code == 200
+
+        response_data = response.json()
+        assert response_data["succeeded"] == 2
+        assert response_data["failed"] == 0
+        assert response_data["model_name"] == "resnet50"
+        assert [item["image_id"] for item in response_data["results"]] == ["img_a", "img_b"]
+        for index, item in enumerate(response_data["results"]):
+            assert item["index"] == index
+            assert item["error"] is None
+            assert len(item["features"]) == 2048
+        assert [item["image_width"] for item in response_data["results"]] == [224, 100]
+
+    @pytest.mark.api
+    def test_batch_per_item_validation_errors(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that unsupported items fail individually."""
+        fake_gif = b"GIF89a\x01\x00\x01\x00\x00\x00\x00"
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.gif", io.BytesIO(fake_gif), "image/gif")),
+        ]
+
+        response = api_client.post("/extract-features/batch", files=files)
+
+        assert response.status_code == 200
+
+        results = response.json()["results"]
+        assert results[0]["error"] is None
+        assert results[1]["features"] is None
+        assert "Unsupported image format" in results[1]["error"]
+        assert response.json()["failed"] == 1
+
+    @pytest.mark.api
+    def test_batch_decode_errors_reported(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that extractor per-item errors are passed through."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.jpg", io.BytesIO(b"broken"), "image/jpeg")),
+        ]
+
+        with patch('main.feature_extractor') as mock_extractor:
+            mock_extractor.is_loaded.return_value = True
+            mock_extractor.prepare_image.side_effect = [
+                (np.zeros((1, 3, 224, 224), dtype=np.float32), {'width': 10, 'height': 10, 'format': 'JPEG'}),
+                OSError("cannot identify image file"),
+            ]
+            mock_extractor.run_inference.return_value = np.full((1, 2048), 0.1, dtype=np.float32)
+
+            response = api_client.post("/extract-features/batch", files=files)
+
+        assert response.status_code == 200
+        mock_extractor.run_inference.assert_called_once()
+        results = response.json()["results"]
+        assert results[0]["error"] is None
+        assert "cannot identify image file" in results[1]["error"]
+
+    @pytest.mark.api
+    def test_batch_too_many_images(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that batches above the configured maximum are rejected."""
+        with patch('main.settings.max_batch_images', 2):
+            files = [
+                ("files", (f"{i}.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))
+                for i in range(3)
+            ]
+            response = api_client.post("/extract-features/batch", files=files)
+
+        assert response.status_code == 400
+        assert "maximum is 2" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_batch_mismatched_image_ids(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that image_ids must align with files."""
+        files = [("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))]
+        data = {"image_ids": ["one", "two"]}
+
+        response = api_client.post("/extract-features/batch", files=files, data=data)
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_batch_model_not_loaded(self, api_client, mock_extractor_failure, sample_image_bytes):
+        """Test batch extraction when model is not loaded."""
+        files = [("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))]
+
+        response = api_client.post("/extract-features/batch", files=files)
+
+        assert response.status_code == 500
+
+
+class TestEncodedResponses:
+    """Test cases for compact vector encodings."""
+
+    @pytest.mark.api
+    def test_int8_json_response(self, api_client, mock_extractor_success, sample_image_bytes, sample_feature_vector):
+        """Test that int8 vectors come back base64-encoded with their scale."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post("/extract-features", files=files, data={"encoding": "int8"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["encoding"] == "int8"
+        assert "features" not in data
+        quantized = np.frombuffer(base64.b64decode(data["encoded_features"]), dtype=np.int8)
+        assert quantized.shape == (2048,)
+        restored = quantized.astype(np.float32) * data["quantization_scale"]
+        np.testing.assert_allclose(restored, sample_feature_vector, atol=data["quantization_scale"])
+
+    @pytest.mark.api
+    def test_binary_octet_stream(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that sign-bit vectors are 256 packed bytes on the wire."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post(
+            "/extract-features", files=files, data={"encoding": "binary"},
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        assert len(response.content) == 256
+        assert response.headers["x-feature-encoding"] == "binary"
+        assert response.headers["x-feature-dtype"] == "uint8"
+
+    @pytest.mark.api
+    def test_batch_float16_matrix(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that batch binary responses use the requested encoding."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))
+        ]
+
+        response = api_client.post(
+            "/extract-features/batch", files=files, data={"encoding": "float16"},
+            headers={"Accept": "application/x-npy"}
+        )
+
+        assert response.status_code == 200
+        matrix = np.load(io.BytesIO(response.content), allow_pickle=False)
+        assert matrix.dtype == np.float16
+        assert matrix.shape == (2, 2048)
+
+    @pytest.mark.api
+    def test_batch_int8_scales_header(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that int8 batch responses carry one scale per row."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))
+        ]
+
+        response = api_client.post(
+            "/extract-features/batch", files=files, data={"encoding": "int8"},
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        assert len(response.content) == 2 * 2048
+        assert len(response.headers["x-quantization-scale"].split(",")) == 2
+
+    @pytest.mark.api
+    def test_unsupported_encoding(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that an unknown encoding is rejected."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post("/extract-features", files=files, data={"encoding": "int4"})
+
+        assert response.status_code == 400
+        assert "Unsupported encoding" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_encodings_endpoint(self, api_client, monkeypatch, tmp_path):
+        """Test that /encodings lists sizes and the measured recall report."""
+        import main
+        report_path = tmp_path / "encoding_report.json"
+        report_path.write_text(json.dumps({
+            "int8": {"recall_at_k": 0.98, "recall_loss": 0.02, "k": 10, "reference_size": 1000}
+        }))
+        monkeypatch.setattr(main.settings, "encoding_report_path", str(report_path))
+
+        response = api_client.get("/encodings")
+
+        assert response.status_code == 200
+        data = response.json()
+        encodings = {entry["encoding"]: entry for entry in data["encodings"]}
+        assert set(encodings) == {"float32", "float16", "int8", "binary"}
+        assert encodings["float32"]["bytes_per_vector"] == 8192
+        assert encodings["binary"]["compression_ratio"] == 32.0
+        assert encodings["int8"]["recall_loss"] == 0.02
+        assert encodings["float16"]["recall_at_k"] is None
+
+
+class TestStreamEndpoint:
+    """Test cases for the raw-body /extract-features/stream endpoint."""
+
+    @pytest.mark.api
+    def test_stream_success(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test extraction from a raw octet-stream body."""
+        response = api_client.post(
+            "/extract-features/stream",
+            params={"image_id": "raw_001", "return_metadata": "true"},
+            content=sample_image_bytes,
+            headers={"Content-Type": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["image_id"] == "raw_001"
+        assert len(data["features"]) == 2048
+        assert data["image_format"] == "JPEG"
+
+    @pytest.mark.api
+    def test_stream_chunked_body(self, api_client, mock_extractor_success, sample_png_image_bytes):
+        """Test that a chunked body without Content-Length is accepted."""
+        def body():
+            for i in range(0, len(sample_png_image_bytes), 256):
+                yield sample_png_image_bytes[i:i + 256]
+
+        response = api_client.post("/extract-features/stream", content=body())
+
+        assert response.status_code == 200
+
+    @pytest.mark.api
+    def test_stream_oversized(self, api_client, mock_extractor_success, large_image_bytes, monkeypatch):
+        """Test that uploads over the size limit are rejected with 413."""
+        import main
+        monkeypatch.setattr(main.settings, "max_image_size", 1024)
+
+        response = api_client.post("/extract-features/stream", content=large_image_bytes)
+
+        assert response.status_code == 413
+        assert "exceeds maximum" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_stream_bogus_data(self, api_client, mock_extractor_success, invalid_image_bytes):
+        """Test that non-image bodies are rejected regardless of Content-Type."""
+        response = api_client.post(
+            "/extract-features/stream",
+            content=invalid_image_bytes,
+            headers={"Content-Type": "image/jpeg"}
+        )
+
+        assert response.status_code == 400
+        assert "unrecognised" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_stream_pixel_limit(self, api_client, mock_extractor_success, monkeypatch):
+        """Test that images with too many pixels are rejected from their header."""
+        import main
+        monkeypatch.setattr(main.settings, "max_image_pixels", 100 * 100)
+
+        response = api_client.post("/extract-features/stream", content=create_test_image(200, 200))
+
+        assert response.status_code == 400
+        assert "pixels" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_stream_octet_stream_response(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that binary responses work for streamed uploads too."""
+        response = api_client.post(
+            "/extract-features/stream",
+            content=sample_image_bytes,
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        assert len(response.content) == 2048 * 4
+
+    @pytest.mark.api
+    def test_stream_model_not_loaded(self, api_client, mock_extractor_failure, sample_image_bytes):
+        """Test that streaming uploads fail cleanly without a model."""
+        response = api_client.post("/extract-features/stream", content=sample_image_bytes)
+
+        assert response.status_code == 500
+
+
+class TestStatsEndpoint:
+    """Test cases for the /stats endpoint."""
+
+    @pytest.mark.api
+    def test_stats_reports_stage_queues(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that stage counters reflect processed requests."""
+        before = api_client.get("/stats").json()
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        assert api_client.post("/extract-features", files=files).status_code == 200
+
+        after = api_client.get("/stats").json()
+        for stage in ("decode", "inference"):
+            assert after[stage]["queued"] == 0
+            assert after[stage]["active"] == 0
+            assert after[stage]["completed"] == before[stage]["completed"] + 1
+        assert after["micro_batcher"] is None
+
+    @pytest.mark.api
+    def test_health_not_blocked_by_extraction(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that /health answers while an extraction is running on the inference stage."""
+        import asyncio
+        import threading
+        import time
+        import httpx
+        from feature_extractor import ResNet50FeatureExtractor
+
+        release = threading.Event()
+
+        def slow_run_inference(self, input_batch):
+            release.wait(timeout=5)
+            return np.zeros((input_batch.shape[0], 2048), dtype=np.float32) + 0.01
+
+        async def scenario():
+            with patch.object(ResNet50FeatureExtractor, 'run_inference', slow_run_inference):
+                async with httpx.AsyncClient(app=api_client.app, base_url="http://test") as client:
+                    files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+                    extraction = asyncio.ensure_future(client.post("/extract-features", files=files))
+                    await asyncio.sleep(0.1)
+
+                    start = time.time()
+                    health = await client.get("/health")
+                    health_ms = (time.time() - start) * 1000
+                    stats = (await client.get("/stats")).json()
+
+                    release.set()
+                    return health, health_ms, stats, await extraction
+
+        health, health_ms, stats, extraction = asyncio.run(scenario())
+
+        assert health.status_code == 200
+        assert health_ms < 1000
+        assert stats["inference"]["active"] == 1
+        assert extraction.status_code == 200
+
+
+class TestAdmissionControl:
+    """Test cases for admission control of extraction endpoints."""
+
+    @pytest.mark.api
+    def test_health_reports_load(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that /health exposes the load signal and counts admitted requests."""
+        import main
+        admitted_before = main.admission.admitted
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        assert api_client.post("/extract-features", files=files).status_code == 200
+        load = api_client.get("/health").json()["load"]
+
+        assert load["in_flight"] == 0 and load["queued"] == 0
+        assert load["max_in_flight"] == main.settings.admission_max_in_flight
+        assert load["utilization"] == 0.0
+        assert load["admitted"] == admitted_before + 1
+        assert load["drain_rate_per_s"] > 0
+
+    @pytest.mark.api
+    def test_over_capacity_returns_429(self, api_client, monkeypatch, mock_extractor_success, sample_image_bytes):
+        """Test that requests beyond the in-flight and queue limits get 429 with Retry-After."""
+        import main
+        monkeypatch.setattr(main.admission, 'in_flight', main.admission.max_in_flight)
+        monkeypatch.setattr(main.admission, 'max_queued', 0)
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files)
+
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert "capacity" in response.json()["detail"]
+        # Other endpoints are not subject to admission
+        health = api_client.get("/health")
+        assert health.status_code == 200
+        assert health.json()["load"]["utilization"] == 1.0
+        assert 'deeplens_requests_total{endpoint="/extract-features",status="429"}' in api_client.get("/metrics").text
+
+
+class TestSearchEndpoint:
+    """Test cases for the /search endpoint."""
+
+    @pytest.fixture
+    def index(self, monkeypatch):
+        """Enable an in-memory vector index on the app."""
+        import main
+        from vector_index import VectorIndex
+        vector_index = VectorIndex(2048)
+        monkeypatch.setattr(main, 'vector_index', vector_index)
+        return vector_index
+
+    @pytest.mark.api
+    def test_search_disabled(self, api_client, mock_extractor_success):
+        """Test that /search reports 503 when the index is not enabled."""
+        response = api_client.post("/search", data={"vector": json.dumps([0.0] * 2048)})
+
+        assert response.status_code == 503
+
+    @pytest.mark.api
+    def test_extracted_images_are_searchable(self, api_client, mock_extractor_success, index, sample_image_bytes):
+        """Test that images extracted with an image_id are found by image and by vector."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        extracted = api_client.post("/extract-features", files=files, data={"image_id": "saree-1"})
+        batch = api_client.post(
+            "/extract-features/batch",
+            files=[("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))],
+            data={"image_ids": ["saree-2"]}
+        )
+        anonymous = api_client.post(
+            "/extract-features", files={"file": ("b.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        )
+        assert extracted.status_code == batch.status_code == anonymous.status_code == 200
+        assert len(index) == 2
+
+        by_image = api_client.post(
+            "/search",
+            files={"file": ("q.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")},
+            data={"k": "5"}
+        )
+        assert by_image.status_code == 200
+        body = by_image.json()
+        assert {hit["id"] for hit in body["results"]} == {"saree-1", "saree-2"}
+        assert body["results"][0]["score"] == pytest.approx(1.0, abs=1e-4)
+        assert body["mode"] == "exact"
+        assert body["index_size"] == 2
+        assert len(body["perceptual_hash"]) == 16
+
+        vector = extracted.json()["features"]
+        by_vector = api_client.post("/search", data={"vector": json.dumps(vector), "k": "1"})
+        assert by_vector.status_code == 200
+        assert len(by_vector.json()["results"]) == 1
+        assert "perceptual_hash" not in by_vector.json()
+
+    @pytest.mark.api
+    @pytest.mark.parametrize("data", [
+        {},
+        {"vector": json.dumps([1.0] * 3)},
+        {"vector": "not json"},
+        {"vector": json.dumps([0.0] * 2048)},
+        {"vector": json.dumps([1.0] * 2048), "k": "0"},
+        {"vector": json.dumps([1.0] * 2048), "nprobe": "0"},
+    ])
+    def test_invalid_queries(self, api_client, mock_extractor_success, index, data):
+        """Test that malformed queries are rejected with 400."""
+        response = api_client.post("/search", data=data)
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_image_and_vector_together_rejected(self, api_client, mock_extractor_success, index, sample_image_bytes):
+        """Test that a query must be either an image or a vector."""
+        response = api_client.post(
+            "/search",
+            files={"file": ("q.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")},
+            data={"vector": json.dumps([1.0] * 2048)}
+        )
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_stats_include_vector_index(self, api_client, mock_extractor_success, index):
+        """Test that /stats reports the index size and search counters."""
+        api_client.post("/search", data={"vector": json.dumps([1.0] * 2048)})
+
+        stats = api_client.get("/stats").json()["vector_index"]
+        assert stats["vectors"] == 0
+        assert stats["searches"] == 1
+
+
+class TestClusterEndpoint:
+    """Test cases for the /cluster endpoint."""
+
+    @pytest.mark.api
+    def test_cluster_vectors(self, api_client, mock_extractor_success):
+        """Test that posted vectors are grouped transitively and mapped back to their ids."""
+        vectors = [[1.0, 0.0], [0.98, 0.2], [0.0, 1.0], [0.99, 0.1]]
+
+        response = api_client.post(
+            "/cluster",
+            data={"vectors": json.dumps(vectors), "image_ids": ["a", "b", "c", "d"], "threshold": "0.95"}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["clusters"] == [
+            {"indices": [0, 1, 3], "ids": ["a", "b", "d"], "size": 3},
+            {"indices": [2], "ids": ["c"], "size": 1},
+        ]
+        assert body["items"] == 4
+        assert body["comparisons"] == 6
+        assert body["pairs_above_threshold"] == 3
+        assert body["errors"] == []
+
+    @pytest.mark.api
+    def test_cluster_images_with_failures(self, api_client, mock_extractor_success, sample_image_bytes,
+                                          sample_png_image_bytes):
+        """Test that images are embedded and failed items are reported, not clustered."""
+        files = [
+            ("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")),
+            ("files", ("b.gif", io.BytesIO(b"GIF89a"), "image/gif")),
+            ("files", ("c.png", io.BytesIO(sample_png_image_bytes), "image/png")),
+            ("files", ("d.jpg", io.BytesIO(b"broken"), "image/jpeg")),
+        ]
+
+        with patch('main.settings.max_batch_images', 1):
+            response = api_client.post("/cluster", files=files)
+
+        assert response.status_code == 200
+        body = response.json()
+        # The mocked model returns one vector for every image
+        assert body["clusters"] == [{"indices": [0, 2], "ids": None, "size": 2}]
+        assert body["items"] == 2
+        assert [item["index"] for item in body["errors"]] == [1, 3]
+
+    @pytest.mark.api
+    @pytest.mark.parametrize("data", [
+        {},
+        {"vectors": "not json"},
+        {"vectors": json.dumps([1.0, 2.0])},
+        {"vectors": json.dumps([[1.0, 0.0], [0.0, 0.0]])},
+        {"vectors": json.dumps([[1.0, 0.0]]), "threshold": "1.5"},
+        {"vectors": json.dumps([[1.0, 0.0]]), "image_ids": ["a", "b"]},
+    ])
+    def test_invalid_requests(self, api_client, mock_extractor_success, data):
+        """Test that malformed requests are rejected with 400."""
+        response = api_client.post("/cluster", data=data)
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_too_many_items(self, api_client, mock_extractor_success):
+        """Test that requests above max_cluster_items are rejected."""
+        with patch('main.settings.max_cluster_items', 2):
+            response = api_client.post("/cluster", data={"vectors": json.dumps([[1.0, 0.0]] * 3)})
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_files_and_vectors_together_rejected(self, api_client, mock_extractor_success, sample_image_bytes):
+        """Test that a request must carry either images or vectors."""
+        response = api_client.post(
+            "/cluster",
+            files=[("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))],
+            data={"vectors": json.dumps([[1.0, 0.0]])}
+        )
+
+        assert response.status_code == 400
+
+    @pytest.mark.api
+    def test_cluster_model_not_loaded(self, api_client, mock_extractor_failure, sample_image_bytes):
+        """Test that image clustering reports 500 without a model."""
+        response = api_client.post(
+            "/cluster", files=[("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))]
+        )
+
+        assert response.status_code == 500
+
+
+class SmallModel:
+    """Second registry model with a 512-d output."""
+
+    def __init__(self, config):
+        self.config = config
+        self.inference_rows = 0
+
+    def prepare_image(self, image_bytes):
+        return np.zeros((1, 3, 224, 224), dtype=np.float32), {'width': 224, 'height': 224, 'format': 'JPEG'}
+
+    def run_inference(self, input_batch):
+        self.inference_rows += input_batch.shape[0]
+        return np.full((input_batch.shape[0], 512), 1 / np.sqrt(512), dtype=np.float32)
+
+    def is_loaded(self):
+        return True
+
+    def warmup(self, batch_sizes=(1,), iterations=1):
+        self.run_inference(np.zeros((max(batch_sizes), 3, 224, 224), dtype=np.float32))
+        return 0.5
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path, mock_extractor_success):
+    """Register the startup model and a lazily loaded 512-d model."""
+    import main
+    from config import ModelConfig, settings
+    from model_registry import ModelRegistry
+    model_file = tmp_path / "clip.onnx"
+    model_file.write_bytes(b"\0" * 64)
+    registry = ModelRegistry(SmallModel)
+    registry.register(settings.default_model_config, extractor=main.feature_extractor, pinned=True)
+    registry.register(ModelConfig(
+        model_name="clip", model_version="v1", feature_dimension=512, model_file=str(model_file)
+    ))
+    monkeypatch.setattr(main, 'model_registry', registry)
+    return registry
+
+
+class TestModelSelection:
+    """Test cases for serving registry models through the `model` parameter."""
+
+    @pytest.mark.api
+    def test_default_model_unchanged(self, api_client, registry, sample_image_bytes):
+        """Test that requests without a model are served by the startup model."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files, data={"model": "resnet50"})
+
+        assert response.status_code == 200
+        assert response.json()["model_name"] == "resnet50"
+        assert response.json()["feature_dimension"] == 2048
+        assert registry.stats()['models']['clip:v1']['loaded'] is False
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        assert api_client.post("/extract-features", files=files).status_code == 200
+        assert registry.stats()['models']['resnet50:v2.7']['requests'] == 2
+
+    @pytest.mark.api
+    def test_named_model_loaded_on_first_request(self, api_client, registry, sample_image_bytes):
+        """Test that a named model is loaded once and reported in the response."""
+        for _ in range(2):
+            files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+            response = api_client.post("/extract-features", files=files, data={"model": "clip"})
+            assert response.status_code == 200
+            body = response.json()
+            assert body["model_name"] == "clip" and body["model_version"] == "v1"
+            assert body["feature_dimension"] == 512
+
+        stats = registry.stats()['models']['clip:v1']
+        assert stats['loads'] == 1 and stats['requests'] == 2
+
+        batch = api_client.post(
+            "/extract-features/batch",
+            files=[("files", ("a.jpg", io.BytesIO(sample_image_bytes), "image/jpeg"))],
+            data={"model": "clip:v1"}
+        )
+        assert batch.status_code == 200
+        assert batch.json()["feature_dimension"] == 512
+
+        stream = api_client.post(
+            "/extract-features/stream", params={"model": "clip"}, content=sample_image_bytes
+        )
+        assert stream.status_code == 200
+        assert stream.json()["model_name"] == "clip"
+
+    @pytest.mark.api
+    def test_named_model_not_indexed(self, api_client, monkeypatch, registry, sample_image_bytes):
+        """Test that vectors of other models stay out of the startup model's vector index."""
+        import main
+        from vector_index import VectorIndex
+        index = VectorIndex(2048)
+        monkeypatch.setattr(main, 'vector_index', index)
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files, data={"model": "clip", "image_id": "x"})
+
+        assert response.status_code == 200
+        assert len(index) == 0
+
+    @pytest.mark.api
+    def test_unknown_model(self, api_client, registry, sample_image_bytes):
+        """Test that unregistered models are rejected with 400."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        response = api_client.post("/extract-features", files=files, data={"model": "vit:v9"})
+
+        assert response.status_code == 400
+        assert "vit:v9" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_model_load_failure(self, api_client, registry, sample_image_bytes):
+        """Test that a model failing to load reports 500."""
+        registry.loader = lambda config: (_ for _ in ()).throw(OSError("no such file"))
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+
+        response = api_client.post("/extract-features", files=files, data={"model": "clip"})
+
+        assert response.status_code == 500
+        assert "clip:v1" in response.json()["detail"]
+
+    @pytest.mark.api
+    def test_models_endpoint(self, api_client, registry, sample_image_bytes):
+        """Test that /models lists registered models and their load state."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        api_client.post("/extract-features", files=files, data={"model": "clip"})
+
+        response = api_client.get("/models")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["default"] == "resnet50:v2.7"
+        models = {model["model"]: model for model in body["models"]}
+        assert models["resnet50:v2.7"]["pinned"]
+        assert models["clip:v1"]["loaded"] and models["clip:v1"]["memory_bytes"] == 64
+        assert api_client.get("/stats").json()["models"]["loaded"] == 2
+
+
+class TestModelHotSwap:
+    """Test cases for swapping the startup model through /admin/model."""
+
+    @pytest.fixture
+    def admin(self, monkeypatch, registry):
+        """Enable admin endpoints and restore the startup model after the test."""
+        import main
+        monkeypatch.setattr(main.settings, 'admin_token', 'secret')
+        for name in ('feature_extractor', 'primary_model', 'vector_index', 'micro_batcher', 'swap_task'):
+            monkeypatch.setattr(main, name, getattr(main, name))
+        monkeypatch.setattr(main, 'swap_state', {'status': 'idle'})
+        monkeypatch.setattr(main, 'startup_state', {'ready': False})
+        return {"X-Admin-Token": "secret"}
+
+    @pytest.fixture
+    def new_model_file(self, tmp_path):
+        path = tmp_path / "resnet50-v3.onnx"
+        path.write_bytes(b"\0" * 128)
+        return str(path)
+
+    @pytest.mark.api
+    def test_admin_disabled_without_token(self, api_client, registry):
+        """Test that admin endpoints are off unless ADMIN_TOKEN is set."""
+        assert api_client.get("/admin/model").status_code == 403
+        assert api_client.post("/admin/model", json={"model": "clip"}).status_code == 403
+
+    @pytest.mark.api
+    def test_wrong_token_rejected(self, api_client, admin):
+        """Test that a wrong token is rejected."""
+        response = api_client.post("/admin/model", json={"model": "clip"}, headers={"X-Admin-Token": "guess"})
+
+        assert response.status_code == 401
+
+    @pytest.mark.api
+    def test_swap_to_new_version(self, api_client, admin, registry, new_model_file, sample_image_bytes):
+        """Test that after a swap requests are served and labelled by the new version."""
+        response = api_client.post(
+            "/admin/model",
+            json={"model_file": new_model_file, "model_version": "v3.0", "feature_dimension": 512, "wait": True},
+            headers=admin
+        )
+
+        assert response.status_code == 200
+        status = response.json()
+        assert status["status"] == "completed"
+        assert status["from_model"] == "resnet50:v2.7" and status["to_model"] == "resnet50:v3.0"
+        assert status["drained"] is True
+        assert status["warmup_ms"] == 0.5
+
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        body = api_client.post("/extract-features", files=files).json()
+        assert body["model_name"] == "resnet50" and body["model_version"] == "v3.0"
+        assert body["feature_dimension"] == 512
+
+        models = {model["model"]: model for model in api_client.get("/models").json()["models"]}
+        assert models["resnet50:v3.0"]["pinned"] and models["resnet50:v3.0"]["loaded"]
+        assert not models["resnet50:v2.7"]["pinned"] and not models["resnet50:v2.7"]["loaded"]
+        assert api_client.get("/admin/model", headers=admin).json()["status"] == "completed"
+        assert api_client.get("/ready").status_code == 200
+
+    @pytest.mark.api
+    def test_swap_back_keeps_old_version_state(self, api_client, monkeypatch, admin, registry, new_model_file, tmp_path):
+        """Test that swapping v2.7 -> v3.0 -> v2.7 keeps v2.7's index and cache and drops unregistered versions."""
+        import main
+        index_path, cache_path = tmp_path / "index", tmp_path / "cache"
+        monkeypatch.setattr(main.settings, 'vector_index_enabled', True)
+        monkeypatch.setattr(main.settings, 'vector_index_path', str(index_path))
+        monkeypatch.setattr(main.settings, 'embedding_cache_enabled', True)
+        monkeypatch.setattr(main.settings, 'embedding_cache_dir', str(cache_path))
+        monkeypatch.setattr(main.extraction_pipeline, 'cache', main.extraction_pipeline.cache)
+        monkeypatch.setattr(main.extraction_pipeline, 'near_duplicates', main.extraction_pipeline.near_duplicates)
+        (index_path / "resnet50" / "v1.0").mkdir(parents=True)
+        (cache_path / "resnet50" / "v1.0").mkdir(parents=True)
+        index = main.open_vector_index(main.primary_model)
+        index.add(["kept"], np.full(2048, 1 / np.sqrt(2048), dtype=np.float32))
+        monkeypatch.setattr(main, 'vector_index', index)
+        main.create_embedding_cache(main.primary_model)
+
+        response = api_client.post(
+            "/admin/model",
+            json={"model_file": new_model_file, "model_version": "v3.0", "feature_dimension": 512, "wait": True},
+            headers=admin
+        )
+        assert response.json()["status"] == "completed"
+        assert (index_path / "resnet50" / "v2.7" / "vectors.npy").exists()
+        assert (cache_path / "resnet50" / "v2.7").is_dir()
+        assert not (index_path / "resnet50" / "v1.0").exists()
+        assert not (cache_path / "resnet50" / "v1.0").exists()
+
+        response = api_client.post("/admin/model", json={"model": "resnet50:v2.7", "wait": True}, headers=admin)
+
+        assert response.json()["status"] == "completed"
+        assert len(main.vector_index) == 1
+        assert main.vector_index.search(np.full(2048, 1 / np.sqrt(2048), dtype=np.float32), k=1)[0][0][0] == "kept"
+        assert (index_path / "resnet50" / "v3.0").is_dir()
+        main.vector_index.close()
+
+    @pytest.mark.api
+    def test_promote_registered_model(self, api_client, admin, registry, sample_image_bytes):
+        """Test that a model served side by side can become the default without reloading."""
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        api_client.post("/extract-features", files=files, data={"model": "clip"})
+
+        response = api_client.post("/admin/model", json={"model": "clip", "wait": True}, headers=admin)
+
+        assert response.json()["status"] == "completed"
+        assert registry.stats()['models']['clip:v1']['loads'] == 1
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        assert api_client.post("/extract-features", files=files).json()["model_name"] == "clip"
+
+    @pytest.mark.api
+    def test_failed_load_keeps_current_model(self, api_client, admin, registry, new_model_file, sample_image_bytes):
+        """Test that a model failing to load leaves the old one serving."""
+        def failing_loader(config):
+            raise RuntimeError("invalid graph")
+        registry.loader = failing_loader
+
+        response = api_client.post(
+            "/admin/model", json={"model_file": new_model_file, "model_version": "v3.0", "wait": True}, headers=admin
+        )
+
+        assert response.json()["status"] == "failed"
+        assert "invalid graph" in response.json()["error"]
+        files = {"file": ("test.jpg", io.BytesIO(sample_image_bytes), "image/jpeg")}
+        assert api_client.post("/extract-features", files=files).json()["model_version"] == "v2.7"
+
+    @pytest.mark.api
+    @pytest.mark.parametrize("body", [
+        {},
+        {"model": "vit"},
+        {"model_file": "/missing.onnx", "model_version": "v3.0"},
+        {"model": "resnet50"},
+    ])
+    def test_invalid_swap_requests(self, api_client, admin, body):
+        """Test that unknown targets and the serving model are rejected."""
+        assert api_client.post("/admin/model", json=body, headers=admin).status_code == 400
+
+    @pytest.mark.api
+    def test_concurrent_swap_rejected(self, api_client, monkeypatch, admin):
+        """Test that only one swap runs at a time."""
+        import main
+        running = MagicMock()
+        running.done.return_value = False
+        monkeypatch.setattr(main, 'swap_task', running)
+
+        response = api_client.post("/admin/model", json={"model": "clip"}, headers=admin)
+
+        assert response.status_code == 409
+
+
 class TestRootEndpoint:
     """Test cases for the root endpoint."""
 
@@ -0,0 +1,136 @@
+"""
+Unit tests for the MicroBatcher.
+Uses a fake extractor so batching behaviour can be checked without a model.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+from pipeline import StagePool
+
+
+class FakeBatchExtractor:
+    """Records the size of every batch it is asked to run."""
+
+    def __init__(self, delay: float = 0.0):
+        self.batch_sizes = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def run_inference(self, input_batch):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batch_sizes.append(input_batch.shape[0])
+        # Echo each input's marker value so callers can check they got their own row
+        return input_batch[:, 0, 0, :4].copy()
+
+
+def make_input(marker: float) -> np.ndarray:
+    """Create a (1, 3, 224, 224) tensor filled with a marker value."""
+    return np.full((1, 3, 224, 224), marker, dtype=np.float32)
+
+
+def run_batcher(extractor, coroutine_factory, **kwargs):
+    """Start a batcher, run the coroutine against it and stop it again."""
+    async def scenario():
+        batcher = MicroBatcher(extractor, **kwargs)
+        await batcher.start()
+        try:
+            return await coroutine_factory(batcher), batcher
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(scenario())
+
+
+class TestMicroBatcher:
+    """Test cases for the MicroBatcher class."""
+
+    @pytest.mark.unit
+    def test_concurrent_requests_are_coalesced(self):
+        """Test that requests arriving within the window share one inference."""
+        extractor = FakeBatchExtractor()
+
+        async def submit_all(batcher):
+            return await asyncio.gather(*(batcher.submit(make_input(i)) for i in range(8)))
+
+        results, batcher = run_batcher(extractor, submit_all, max_batch_size=16, window_ms=50)
+
+        assert extractor.batch_sizes == [8]
+        # Results are fanned back to the matching caller
+        assert [features[0] for features in results] == [float(i) for i in range(8)]
+        assert batcher.stats()['avg_batch_size'] == 8.0
+
+    @pytest.mark.unit
+    def test_max_batch_size_is_respected(self):
+        """Test that batches never exceed the configured maximum."""
+        extractor = FakeBatchExtractor()
+
+        async def submit_all(batcher):
+            return await asyncio.gather(*(batcher.submit(make_input(1)) for _ in range(10)))
+
+        results, batcher = run_batcher(extractor, submit_all, max_batch_size=4, window_ms=50)
+
+        assert len(results) == 10
+        assert max(extractor.batch_sizes) <= 4
+        assert sum(extractor.batch_sizes) == 10
+        assert batcher.stats()['batches_run'] == len(extractor.batch_sizes)
+
+    @pytest.mark.unit
+    def test_requests_during_inference_form_next_batch(self):
+        """Test that requests queued while a batch runs are batched together."""
+        extractor = FakeBatchExtractor(delay=0.1)
+
+        async def submit_staggered(batcher):
+            first = asyncio.ensure_future(batcher.submit(make_input(0)))
+            await asyncio.sleep(0.03)
+            rest = [asyncio.ensure_future(batcher.submit(make_input(1))) for _ in range(5)]
+            return await asyncio.gather(first, *rest)
+
+        run_batcher(extractor, submit_staggered, max_batch_size=16, window_ms=0)
+
+        assert extractor.batch_sizes == [1, 5]
+
+    @pytest.mark.unit
+    def test_runs_on_stage_pool(self):
+        """Test that batches run on the provided inference stage pool."""
+        extractor = FakeBatchExtractor()
+        pool = StagePool("inference", 1)
+
+        async def submit_all(batcher):
+            return await asyncio.gather(*(batcher.submit(make_input(2)) for _ in range(3)))
+
+        try:
+            run_batcher(extractor, submit_all, window_ms=20, executor=pool)
+        finally:
+            pool.shutdown()
+
+        assert pool.stats()['completed'] == 1
+
+    @pytest.mark.unit
+    def test_batch_failure_propagates_to_all_callers(self):
+        """Test that an inference failure is reported to every waiting caller."""
+        class BrokenExtractor:
+            def run_inference(self, input_batch):
+                raise RuntimeError("session crashed")
+
+        async def submit_two(batcher):
+            return await asyncio.gather(
+                batcher.submit(make_input(0)), batcher.submit(make_input(1)), return_exceptions=True
+            )
+
+        results, _ = run_batcher(BrokenExtractor(), submit_two, window_ms=20)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.unit
+    def test_submit_requires_running_batcher(self):
+        """Test that submitting to a stopped batcher fails fast."""
+        batcher = MicroBatcher(FakeBatchExtractor())
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(batcher.submit(make_input(0)))
@@ -0,0 +1,176 @@
+"""
+Unit tests for the offline bulk embedding CLI.
+Runs the tiny generated model over small synthetic images.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from bulk_embed import EmbeddingWriter, embed, read_manifest, walk_images
+from feature_extractor import ResNet50FeatureExtractor
+from tiny_model import write_tiny_model
+
+MODEL = {'model_name': 'tiny', 'model_version': 'v1'}
+
+
+@pytest.fixture
+def tiny_model_path(tmp_path):
+    """Path of the tiny generated model."""
+    return write_tiny_model(str(tmp_path / "tiny.onnx"))
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Directory of seven distinct images, two of them in a subdirectory, plus a non-image file."""
+    root = tmp_path / "images"
+    (root / "sub").mkdir(parents=True)
+    for i in range(7):
+        directory = root / "sub" if i >= 5 else root
+        Image.new('RGB', (40 + i, 30), color=(30 * i, 255 - 30 * i, 100)).save(directory / f"img{i}.png")
+    (root / "notes.txt").write_text("not an image")
+    return root
+
+
+def run(items, model_path, output, **options):
+    """Embed items with the tiny model into output."""
+    decoder_options = {'model_path': model_path, 'perceptual_hash': None}
+    extractor = options.pop('extractor', None) or ResNet50FeatureExtractor(model_path, perceptual_hash=None)
+    writer = EmbeddingWriter(str(output), items, MODEL)
+    try:
+        return embed(items, extractor, writer, decoder_options, **options)
+    finally:
+        writer.close()
+
+
+def read_output(output):
+    """Valid vectors and ids of an output directory."""
+    ids = (output / "ids.txt").read_text().splitlines()
+    vectors = np.load(output / "vectors.npy", mmap_mode='r')
+    return np.asarray(vectors[:len(ids)]), ids
+
+
+class InterruptingExtractor:
+    """Extractor that stops the run with KeyboardInterrupt on the given inference call."""
+
+    def __init__(self, extractor, interrupt_at):
+        self.extractor = extractor
+        self.batch_buffer = extractor.batch_buffer
+        self.interrupt_at = interrupt_at
+        self.calls = 0
+
+    def run_inference(self, input_batch):
+        self.calls += 1
+        if self.calls == self.interrupt_at:
+            raise KeyboardInterrupt
+        return self.extractor.run_inference(input_batch)
+
+
+class TestInputs:
+    """Test cases for directory walking and manifests."""
+
+    @pytest.mark.unit
+    def test_walk_images(self, images):
+        """Test that images are found recursively, sorted, with relative ids."""
+        ids = [image_id for image_id, _ in walk_images(str(images))]
+        assert ids == [f"img{i}.png" for i in range(5)] + ["sub/img5.png", "sub/img6.png"]
+
+    @pytest.mark.unit
+    def test_read_manifest(self, tmp_path, images):
+        """Test plain path and id<TAB>path lines, relative to the manifest."""
+        manifest = tmp_path / "manifest.tsv"
+        manifest.write_text("# catalog\nimages/img0.png\nsku-1\timages/sub/img5.png\n\n")
+        items = read_manifest(str(manifest))
+        assert [image_id for image_id, _ in items] == ["images/img0.png", "sku-1"]
+        assert items[1][1] == os.path.join(str(tmp_path), "images/sub/img5.png")
+
+        manifest.write_text("a\timages/img0.png\na\timages/img1.png\n")
+        with pytest.raises(ValueError, match="Duplicate"):
+            read_manifest(str(manifest))
+
+
+class TestBulkEmbed:
+    """Test cases for embedding runs, checkpoints and resuming."""
+
+    @pytest.mark.unit
+    def test_embeds_directory(self, tmp_path, images, tiny_model_path):
+        """Test that every image gets a normalized row matching single-image extraction."""
+        items = walk_images(str(images))
+        output = tmp_path / "out"
+        summary = run(items, tiny_model_path, output, batch_size=3)
+
+        vectors, ids = read_output(output)
+        assert ids == [image_id for image_id, _ in items]
+        assert vectors.shape == (7, 2048)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+        extractor = ResNet50FeatureExtractor(tiny_model_path, perceptual_hash=None)
+        expected, _ = extractor.extract_features((images / "sub" / "img6.png").read_bytes())
+        np.testing.assert_allclose(vectors[6], expected, atol=1e-5)
+
+        assert summary['embedded'] == 7 and summary['failed'] == 0 and summary['batches'] == 3
+        checkpoint = json.loads((output / "checkpoint.json").read_text())
+        assert checkpoint['completed'] and checkpoint['rows'] == 7 and checkpoint['dimension'] == 2048
+        assert checkpoint['images_per_second'] > 0
+
+    @pytest.mark.unit
+    def test_resume_after_interrupt(self, tmp_path, images, tiny_model_path):
+        """Test that an interrupted run resumes at the last batch without redoing or duplicating rows."""
+        items = walk_images(str(images))
+        complete = tmp_path / "complete"
+        run(items, tiny_model_path, complete, batch_size=2)
+
+        output = tmp_path / "out"
+        extractor = InterruptingExtractor(ResNet50FeatureExtractor(tiny_model_path, perceptual_hash=None), 3)
+        with pytest.raises(KeyboardInterrupt):
+            run(items, tiny_model_path, output, batch_size=2, checkpoint_every=100, extractor=extractor)
+        checkpoint = json.loads((output / "checkpoint.json").read_text())
+        assert (checkpoint['next_index'], checkpoint['rows'], checkpoint['completed']) == (4, 4, False)
+
+        summary = run(items, tiny_model_path, output, batch_size=2)
+
+        assert summary['resumed_from'] == 4 and summary['processed'] == 3
+        vectors, ids = read_output(output)
+        expected_vectors, expected_ids = read_output(complete)
+        assert ids == expected_ids
+        np.testing.assert_allclose(vectors, expected_vectors, atol=1e-6)
+
+    @pytest.mark.unit
+    def test_undecodable_image_recorded(self, tmp_path, images, tiny_model_path):
+        """Test that a broken image is listed in errors.txt and the rest are embedded."""
+        (images / "img2.png").write_bytes(b"not a png")
+        output = tmp_path / "out"
+        summary = run(walk_images(str(images)), tiny_model_path, output, batch_size=4)
+
+        assert (summary['embedded'], summary['failed']) == (6, 1)
+        assert "img2.png" not in read_output(output)[1]
+        assert (output / "errors.txt").read_text().startswith("img2.png\t")
+
+    @pytest.mark.unit
+    def test_rejects_other_inputs(self, tmp_path, images, tiny_model_path):
+        """Test that a checkpoint is not resumed for different inputs or another model."""
+        items = walk_images(str(images))
+        output = tmp_path / "out"
+        run(items, tiny_model_path, output)
+
+        with pytest.raises(ValueError, match="fingerprint"):
+            EmbeddingWriter(str(output), items[:3], MODEL)
+        with pytest.raises(ValueError, match="model"):
+            EmbeddingWriter(str(output), items, {**MODEL, 'model_version': 'v2'})
+        writer = EmbeddingWriter(str(output), items[:3], MODEL, restart=True)
+        assert writer.next_index == 0 and writer.rows == 0
+        writer.close()
+
+    @pytest.mark.unit
+    def test_decode_worker_processes(self, tmp_path, images, tiny_model_path):
+        """Test that decoding in worker processes gives the same output as decoding inline."""
+        items = walk_images(str(images))
+        run(items, tiny_model_path, tmp_path / "inline", batch_size=4)
+        run(items, tiny_model_path, tmp_path / "pool", batch_size=4, decode_workers=1)
+
+        inline_vectors, inline_ids = read_output(tmp_path / "inline")
+        pool_vectors, pool_ids = read_output(tmp_path / "pool")
+        assert pool_ids == inline_ids
+        np.testing.assert_allclose(pool_vectors, inline_vectors, atol=1e-6)
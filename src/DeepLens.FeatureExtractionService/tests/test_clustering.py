@@ -0,0 +1,91 @@
+"""
+Unit tests for near-duplicate clustering.
+"""
+import numpy as np
+import pytest
+
+from clustering import UnionFind, cluster_vectors, similar_pairs
+
+
+def unit_vectors(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestUnionFind:
+    """Test cases for the UnionFind class."""
+
+    @pytest.mark.unit
+    def test_union_and_groups(self):
+        """Test that unions merge sets and groups lists every member once."""
+        sets = UnionFind(6)
+
+        assert sets.union(0, 3)
+        assert sets.union(3, 5)
+        assert not sets.union(5, 0)
+        assert sets.union(1, 2)
+
+        assert sets.find(5) == sets.find(0)
+        assert sets.groups() == [[0, 3, 5], [1, 2], [4]]
+
+    @pytest.mark.unit
+    def test_long_chain(self):
+        """Test that a long chain of unions ends in a single set."""
+        sets = UnionFind(1000)
+        for item in range(999):
+            sets.union(item, item + 1)
+
+        assert sets.groups() == [list(range(1000))]
+
+
+class TestSimilarPairs:
+    """Test cases for blocked pair search."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("block_size", [1, 7, 64, 1024])
+    def test_matches_brute_force(self, block_size):
+        """Test that every block size finds exactly the upper-triangle pairs above the threshold."""
+        vectors = unit_vectors(50, dimension=4, seed=1)
+        scores = vectors @ vectors.T
+        expected = {(i, j) for i in range(50) for j in range(i + 1, 50) if scores[i, j] >= 0.8}
+
+        found = set()
+        for rows, columns, similarities in similar_pairs(vectors, 0.8, block_size):
+            assert np.all(rows < columns)
+            np.testing.assert_allclose(similarities, scores[rows, columns], rtol=1e-5)
+            found.update(zip(rows.tolist(), columns.tolist()))
+
+        assert found == expected
+
+
+class TestClusterVectors:
+    """Test cases for cluster_vectors."""
+
+    @pytest.mark.unit
+    def test_groups_are_transitive(self):
+        """Test that A~B and B~C cluster together even when A and C are below the threshold."""
+        angles = np.radians([0, 20, 40, 120])
+        vectors = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        threshold = np.cos(np.radians(25))
+
+        clusters, stats = cluster_vectors(vectors, threshold)
+
+        assert clusters == [[0, 1, 2], [3]]
+        assert stats == {'comparisons': 6, 'pairs_above_threshold': 2}
+
+    @pytest.mark.unit
+    def test_largest_cluster_first(self):
+        """Test ordering by size, then by first member, with singletons kept."""
+        base = unit_vectors(3, seed=2)
+        vectors = np.stack([base[0], base[1], base[2], base[1], base[2], base[2]])
+
+        clusters, _ = cluster_vectors(vectors, 0.99, block_size=2)
+
+        assert clusters == [[2, 4, 5], [1, 3], [0]]
+
+    @pytest.mark.unit
+    def test_empty_and_single(self):
+        """Test degenerate inputs."""
+        assert cluster_vectors(np.zeros((0, 8)), 0.9) == ([], {'comparisons': 0, 'pairs_above_threshold': 0})
+        assert cluster_vectors(unit_vectors(1), 0.9)[0] == [[0]]
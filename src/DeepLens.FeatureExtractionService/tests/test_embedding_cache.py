@@ -0,0 +1,200 @@
+"""
+Unit tests for the content-addressed embedding cache.
+"""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache, preprocessing_fingerprint
+from pipeline import ExtractionPipeline
+
+
+METADATA = {'width': 640, 'height': 480, 'format': 'JPEG'}
+
+
+def vector(seed: int, dimension: int = 2048) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    v = rng.standard_normal(dimension).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class TestEmbeddingCache:
+    """Test cases for the EmbeddingCache class."""
+
+    @pytest.mark.unit
+    def test_memory_hit_and_miss(self):
+        """Test that a stored vector is returned for identical bytes only."""
+        cache = EmbeddingCache("resnet50", "v2.7")
+        digest, cached = cache.lookup(b"image-a")
+        assert cached is None
+
+        cache.put(digest, vector(1), METADATA)
+
+        _, hit = cache.lookup(b"image-a")
+        _, other = cache.lookup(b"image-b")
+
+        np.testing.assert_array_equal(hit[0], vector(1))
+        assert hit[1] == METADATA
+        assert other is None
+        stats = cache.stats()
+        assert stats['memory_hits'] == 1
+        assert stats['misses'] == 2
+
+    @pytest.mark.unit
+    def test_key_includes_model_name_and_version(self):
+        """Test that keys differ across model versions."""
+        v1 = EmbeddingCache("resnet50", "v1")
+        v2 = EmbeddingCache("resnet50", "v2")
+        digest = EmbeddingCache.digest(b"same")
+
+        assert v1.key(digest) != v2.key(digest)
+        assert digest in v1.key(digest)
+
+    @pytest.mark.unit
+    def test_preprocessing_change_invalidates_disk(self, tmp_path):
+        """Test that entries made with other preprocessing become misses and are removed."""
+        bilinear = preprocessing_fingerprint(fast_decode=False, resample="bilinear", input_size=(224, 224))
+        bicubic = preprocessing_fingerprint(fast_decode=False, resample="bicubic", input_size=(224, 224))
+        assert bilinear != bicubic and len(bilinear) == 12
+        assert preprocessing_fingerprint(input_size=(224, 224), fast_decode=False, resample="bilinear") == bilinear
+
+        old = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path), preprocessing=bilinear)
+        old.put("abc", vector(6), METADATA)
+        assert old.key("abc") != EmbeddingCache("resnet50", "v2.7", preprocessing=bicubic).key("abc")
+
+        new = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path), preprocessing=bicubic)
+
+        assert new.get("abc") is None
+        assert os.listdir(os.path.join(str(tmp_path), "resnet50", "v2.7")) == [bicubic]
+        new.put("abc", vector(7), METADATA)
+        reopened = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path), preprocessing=bicubic)
+        np.testing.assert_array_equal(reopened.get("abc")[0], vector(7))
+
+    @pytest.mark.unit
+    def test_memory_lru_eviction_by_size(self):
+        """Test that the least recently used entry is evicted over budget."""
+        entry_size = vector(0).nbytes + 256
+        cache = EmbeddingCache("resnet50", "v2.7", max_memory_bytes=entry_size * 2)
+
+        cache.put("a", vector(1), METADATA)
+        cache.put("b", vector(2), METADATA)
+        assert cache.get("a") is not None  # "a" becomes most recently used
+        cache.put("c", vector(3), METADATA)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()['memory_evictions'] == 1
+        assert cache.stats()['memory_bytes'] <= entry_size * 2
+
+    @pytest.mark.unit
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that entries written to disk are found by a new cache instance."""
+        first = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path))
+        first.put("abc", vector(4), METADATA)
+
+        second = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path))
+        hit = second.get("abc")
+
+        np.testing.assert_array_equal(hit[0], vector(4))
+        assert hit[1] == METADATA
+        assert second.stats()['disk_hits'] == 1
+        # Promoted into memory on the disk hit
+        second.get("abc")
+        assert second.stats()['memory_hits'] == 1
+
+    @pytest.mark.unit
+    def test_model_version_change_invalidates_disk(self, tmp_path):
+        """Test that opening the cache for a new version drops old entries."""
+        old = EmbeddingCache("resnet50", "v2.7", disk_path=str(tmp_path))
+        old.put("abc", vector(5), METADATA)
+
+        new = EmbeddingCache("resnet50", "v3.0", disk_path=str(tmp_path))
+
+        assert new.get("abc") is None
+        assert not os.path.exists(os.path.join(str(tmp_path), "resnet50", "v2.7"))
+
+    @pytest.mark.unit
+    def test_disk_eviction_by_size(self, tmp_path):
+        """Test that the disk tier stays within its byte budget."""
+        cache = EmbeddingCache(
+            "resnet50", "v2.7", max_memory_bytes=0, disk_path=str(tmp_path), max_disk_bytes=20000
+        )
+        for i in range(5):
+            cache.put(f"d{i}", vector(i), METADATA)
+
+        stats = cache.stats()
+        assert stats['disk_bytes'] <= 20000
+        assert stats['disk_evictions'] == 3
+        assert cache.get("d0") is None
+        assert cache.get("d4") is not None
+
+    @pytest.mark.unit
+    def test_corrupt_disk_entry_is_dropped(self, tmp_path):
+        """Test that an unreadable entry counts as a miss and is removed."""
+        cache = EmbeddingCache("resnet50", "v2.7", max_memory_bytes=0, disk_path=str(tmp_path))
+        cache.put("bad", vector(6), METADATA)
+        with open(os.path.join(cache.disk_dir, "bad.emb"), 'wb') as f:
+            f.write(b"\xff\xff")
+
+        assert cache.get("bad") is None
+        assert cache.stats()['disk_entries'] == 0
+
+
+class TestPipelineCache:
+    """Test cases for cache integration in the extraction pipeline."""
+
+    class CountingExtractor:
+        def __init__(self):
+            self.prepared = 0
+            self.inferred = 0
+
+        def prepare_image(self, image_bytes):
+            self.prepared += 1
+            return np.ones((1, 3, 224, 224), dtype=np.float32), dict(METADATA)
+
+        def run_inference(self, input_batch):
+            self.inferred += input_batch.shape[0]
+            return np.tile(vector(7), (input_batch.shape[0], 1))
+
+    @pytest.mark.unit
+    def test_cached_image_skips_decode_and_inference(self):
+        """Test that a repeated image is served from the cache."""
+        extractor = self.CountingExtractor()
+        pipeline = ExtractionPipeline(cache=EmbeddingCache("resnet50", "v2.7"))
+
+        async def scenario():
+            first = await pipeline.extract(extractor, b"forwarded-image")
+            second = await pipeline.extract(extractor, b"forwarded-image")
+            return first, second
+
+        try:
+            first, second = asyncio.run(scenario())
+        finally:
+            pipeline.shutdown()
+
+        assert extractor.prepared == 1
+        assert extractor.inferred == 1
+        np.testing.assert_array_equal(first[0], second[0])
+        assert second[1] == METADATA
+        assert pipeline.stats()['cache']['memory_hits'] == 1
+
+    @pytest.mark.unit
+    def test_batch_only_infers_cache_misses(self):
+        """Test that batch extraction runs inference for uncached images only."""
+        extractor = self.CountingExtractor()
+        pipeline = ExtractionPipeline(cache=EmbeddingCache("resnet50", "v2.7"))
+
+        async def scenario():
+            await pipeline.extract(extractor, b"seen")
+            return await pipeline.extract_batch(extractor, [b"seen", b"new-1", b"new-2"])
+
+        try:
+            results = asyncio.run(scenario())
+        finally:
+            pipeline.shutdown()
+
+        assert extractor.inferred == 3
+        assert all(error is None for _, _, error in results)
@@ -8,6 +8,8 @@ from PIL import Image
 import io
 import tempfile
 import os
+import struct
+import zlib
 from unittest.mock import Mock, patch
 
 from feature_extractor import ResNet50FeatureExtractor
@@ -288,4 +290,224 @@ class TestResNet50FeatureExtractor:
             # Should flatten to 1D list
             assert len(features) == 2048
             assert isinstance(features, list)
-            assert all(isinstance(f, float) for f in features)
\ No newline at end of file
+            assert all(isinstance(f, float) for f in features)
+
+class TestBatchExtraction:
+    """Test cases for batched feature extraction."""
+
+    @staticmethod
+    def _batch_session(mock_session_cls, input_shape=None):
+        """Configure a mocked ONNX session that echoes the batch size."""
+        mock_session = Mock()
+        mock_session.get_inputs.return_value = [Mock(name='data', shape=input_shape or ['N', 3, 224, 224])]
+        mock_session.get_outputs.return_value = [Mock(name='output')]
+        mock_session.run.side_effect = lambda names, feeds: [
+            np.random.randn(next(iter(feeds.values())).shape[0], 2048, 1, 1).astype(np.float32)
+        ]
+        mock_session_cls.return_value = mock_session
+        return mock_session
+
+    @pytest.mark.unit
+    def test_batch_runs_single_inference(self):
+        """Test that a batch of images is stacked into one session.run call."""
+        images = [create_test_image(w, h) for w, h in [(100, 100), (640, 480), (50, 200)]]
+
+        with patch('onnxruntime.InferenceSession') as mock_session_cls:
+            mock_session = self._batch_session(mock_session_cls)
+            extractor = ResNet50FeatureExtractor("dummy_path")
+            results = extractor.extract_features_batch(images)
+
+        assert mock_session.run.call_count == 1
+        feeds = mock_session.run.call_args[0][1]
+        assert next(iter(feeds.values())).shape == (3, 3, 224, 224)
+
+        assert len(results) == 3
+        for features, metadata, error in results:
+            assert error is None
+            assert_valid_feature_vector(features)
+            assert abs(np.linalg.norm(features) - 1.0) < 0.01
+            assert metadata['format'] == 'JPEG'
+
+    @pytest.mark.unit
+    def test_batch_reports_per_item_errors(self):
+        """Test that undecodable images fail individually without failing the batch."""
+        images = [create_test_image(224, 224), b"not an image", create_test_image(300, 200, 'PNG')]
+
+        with patch('onnxruntime.InferenceSession') as mock_session_cls:
+            mock_session = self._batch_session(mock_session_cls)
+            extractor = ResNet50FeatureExtractor("dummy_path")
+            results = extractor.extract_features_batch(images)
+
+        feeds = mock_session.run.call_args[0][1]
+        assert next(iter(feeds.values())).shape[0] == 2
+
+        assert results[0][2] is None
+        assert results[1][0] is None
+        assert "Failed to extract features" in results[1][2]
+        assert results[2][1]['width'] == 300
+
+    @pytest.mark.unit
+    def test_batch_all_invalid_skips_inference(self):
+        """Test that a batch without decodable images never calls the model."""
+        with patch('onnxruntime.InferenceSession') as mock_session_cls:
+            mock_session = self._batch_session(mock_session_cls)
+            extractor = ResNet50FeatureExtractor("dummy_path")
+            results = extractor.extract_features_batch([b"bad", b""])
+
+        assert not mock_session.run.called
+        assert all(error is not None for _, _, error in results)
+
+    @pytest.mark.unit
+    def test_batch_with_fixed_batch_dimension(self):
+        """Test that models exported with batch size 1 are run per chunk."""
+        images = [create_test_image(224, 224) for _ in range(3)]
+
+        with patch('onnxruntime.InferenceSession') as mock_session_cls:
+            mock_session = self._batch_session(mock_session_cls, input_shape=[1, 3, 224, 224])
+            extractor = ResNet50FeatureExtractor("dummy_path")
+            results = extractor.extract_features_batch(images)
+
+        assert mock_session.run.call_count == 3
+        assert all(len(features) == 2048 for features, _, _ in results)
+
+
+def textured_image(width: int, height: int, format: str = 'JPEG') -> bytes:
+    """Smooth gradients plus mild noise, closer to a photo than a flat color"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.stack([
+        127 + 100 * np.sin(x / 97.0),
+        127 + 100 * np.cos(y / 61.0),
+        127 + 100 * np.sin((x + y) / 143.0)
+    ], axis=-1) + rng.normal(0, 4, (height, width, 3))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class TestFastDecode:
+    """Test cases for the reduced-resolution decode path."""
+
+    @staticmethod
+    def _decoded_size(extractor, image_bytes):
+        """Size of the decoded image handed to the final resize"""
+        sizes = []
+        original = extractor._resize
+        extractor._resize = lambda image: sizes.append(image.size) or original(image)
+        tensor, metadata = extractor.prepare_image(image_bytes)
+        return sizes[0], tensor, metadata
+
+    @pytest.mark.unit
+    def test_jpeg_decoded_with_dct_scaling(self, large_image_bytes):
+        """Test that a 2000x2000 JPEG is decoded at 1/8 scale, not full size."""
+        with patch('onnxruntime.InferenceSession'):
+            extractor = ResNet50FeatureExtractor("dummy_path", fast_decode=True)
+        size, tensor, metadata = self._decoded_size(extractor, large_image_bytes)
+
+        assert size == (250, 250)
+        assert tensor.shape == (1, 3, 224, 224)
+        assert (metadata['width'], metadata['height']) == (2000, 2000)
+
+    @pytest.mark.unit
+    def test_decoded_size_never_below_input_size(self):
+        """Test that DCT scaling stops at the smallest scale covering 224x224."""
+        with patch('onnxruntime.InferenceSession'):
+            extractor = ResNet50FeatureExtractor("dummy_path", fast_decode=True)
+        size, _, _ = self._decoded_size(extractor, create_test_image(1920, 1080))
+
+        assert size[0] >= 224 and size[1] >= 224
+        assert size[0] < 1920
+
+    @pytest.mark.unit
+    def test_png_reduced_by_integer_factor(self):
+        """Test that non-JPEG images are box-reduced before the final resize."""
+        with patch('onnxruntime.InferenceSession'):
+            extractor = ResNet50FeatureExtractor("dummy_path", fast_decode=True)
+        size, _, metadata = self._decoded_size(extractor, create_test_image(1000, 1000, 'PNG'))
+
+        assert size == (250, 250)
+        assert metadata['format'] == 'PNG'
+
+    @pytest.mark.unit
+    def test_small_images_unchanged(self, sample_image_bytes):
+        """Test that images already near the input size are decoded as-is."""
+        with patch('onnxruntime.InferenceSession'):
+            extractor = ResNet50FeatureExtractor("dummy_path", fast_decode=True)
+        size, _, _ = self._decoded_size(extractor, sample_image_bytes)
+
+        assert size == (224, 224)
+
+    @pytest.mark.unit
+    def test_fast_decode_input_close_to_full_decode(self):
+        """Test that the reduced decode produces nearly the same model input."""
+        image_bytes = textured_image(1600, 1200)
+        with patch('onnxruntime.InferenceSession'):
+            full = ResNet50FeatureExtractor("dummy_path")
+            fast = ResNet50FeatureExtractor("dummy_path", fast_decode=True)
+
+        full_tensor, _ = full.prepare_image(image_bytes)
+        fast_tensor, _ = fast.prepare_image(image_bytes)
+
+        cosine = np.dot(full_tensor.ravel(), fast_tensor.ravel()) / (
+            np.linalg.norm(full_tensor) * np.linalg.norm(fast_tensor)
+        )
+        assert cosine > 0.99
+
+    @pytest.mark.unit
+    def test_invalid_resample_filter(self):
+        """Test that unknown resample filters are rejected."""
+        with pytest.raises(ValueError):
+            ResNet50FeatureExtractor("dummy_path", resample="cubic-spline")
+
+    @pytest.mark.unit
+    def test_decode_benchmark_report(self):
+        """Test the benchmark report and that the extractor's mode is restored."""
+        from decode_benchmark import compare_decode
+
+        with patch('onnxruntime.InferenceSession') as mock_session_cls:
+            TestBatchExtraction._batch_session(mock_session_cls)
+            extractor = ResNet50FeatureExtractor("dummy_path")
+            report = compare_decode(extractor, [("large.jpg", textured_image(1600, 1200))], runs=1)
+
+        entry = report['images'][0]
+        assert entry['width'] == 1600
+        assert entry['input_cosine'] > 0.99
+        assert 'embedding_cosine' in entry
+        assert report['summary']['images'] == 1
+        assert extractor.fast_decode is False
+
+
+class TestPixelLimit:
+    """Test cases for the max_image_pixels guard applied on every decode."""
+
+    @pytest.mark.unit
+    def test_rejects_images_over_limit(self):
+        """Test that an image over the pixel limit is rejected before its pixels are decoded."""
+        extractor = ResNet50FeatureExtractor("dummy_path", load_model=False, max_pixels=100 * 100)
+
+        with pytest.raises(ValueError, match="exceed the maximum of 10000 pixels"):
+            extractor.prepare_image(create_test_image(101, 100))
+        tensor, metadata = extractor.prepare_image(create_test_image(100, 100))
+        assert tensor.shape == (1, 3, 224, 224)
+
+    @pytest.mark.unit
+    def test_limit_defaults_to_setting(self, monkeypatch):
+        """Test that MAX_IMAGE_PIXELS applies when no limit is passed."""
+        from config import settings
+        monkeypatch.setattr(settings, 'max_image_pixels', 50 * 50)
+        extractor = ResNet50FeatureExtractor("dummy_path", load_model=False)
+
+        with pytest.raises(ValueError):
+            extractor.prepare_image(create_test_image(60, 60))
+
+    @pytest.mark.unit
+    def test_decompression_bomb_is_value_error(self):
+        """Test that dimensions past Pillow's own bomb limit give the same error, not a crash."""
+        data = bytearray(create_test_image(8, 8, 'PNG'))
+        struct.pack_into('>II', data, 16, 50_000, 50_000)
+        struct.pack_into('>I', data, 29, zlib.crc32(bytes(data[12:29])) & 0xffffffff)
+        extractor = ResNet50FeatureExtractor("dummy_path", load_model=False, max_pixels=10 ** 12)
+
+        with pytest.raises(ValueError, match="pixel count"):
+            extractor.prepare_image(bytes(data))
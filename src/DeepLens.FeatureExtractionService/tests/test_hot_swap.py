@@ -0,0 +1,104 @@
+"""
+Unit tests for model leases and draining.
+"""
+import asyncio
+
+import pytest
+
+from hot_swap import ModelLeaseMiddleware, ModelLeases
+
+
+class TestModelLeases:
+    """Test cases for the ModelLeases class and its middleware."""
+
+    @pytest.mark.unit
+    def test_acquire_outside_request_is_ignored(self):
+        """Test that leases are only tracked within a request."""
+        leases = ModelLeases()
+        extractor = object()
+
+        leases.acquire(extractor)
+
+        assert leases.in_flight(extractor) == 0
+
+    @pytest.mark.unit
+    def test_released_after_response(self):
+        """Test that a request holds its lease until the app has finished sending."""
+        leases = ModelLeases()
+        extractor = object()
+        seen = []
+
+        async def app(scope, receive, send):
+            leases.acquire(extractor)
+            leases.acquire(extractor)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            seen.append(leases.in_flight(extractor))
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        middleware = ModelLeaseMiddleware(app, leases)
+        asyncio.run(middleware({"type": "http", "path": "/"}, None, send))
+
+        assert seen == [2]
+        assert leases.in_flight(extractor) == 0
+
+    @pytest.mark.unit
+    def test_released_when_app_fails(self):
+        """Test that an exception in the app does not leak leases."""
+        leases = ModelLeases()
+        extractor = object()
+
+        async def app(scope, receive, send):
+            leases.acquire(extractor)
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(ModelLeaseMiddleware(app, leases)({"type": "http", "path": "/"}, None, None))
+        assert leases.in_flight(extractor) == 0
+
+    @pytest.mark.unit
+    def test_drain_waits_for_requests(self):
+        """Test that drain completes when the last request on the extractor finishes."""
+        leases = ModelLeases()
+        old, new = object(), object()
+
+        async def request(extractor, duration):
+            async def app(scope, receive, send):
+                leases.acquire(extractor)
+                await asyncio.sleep(duration)
+            await ModelLeaseMiddleware(app, leases)({"type": "http", "path": "/"}, None, None)
+
+        async def scenario():
+            running = [asyncio.create_task(request(old, 0.05)), asyncio.create_task(request(new, 1.0))]
+            await asyncio.sleep(0)
+            assert leases.in_flight(old) == 1
+            drained = await leases.drain(old, timeout=0.5)
+            still_running = leases.in_flight(new)
+            for task in running:
+                task.cancel()
+            return drained, still_running
+
+        drained, still_running = asyncio.run(scenario())
+
+        assert drained
+        assert still_running == 1
+
+    @pytest.mark.unit
+    def test_drain_timeout(self):
+        """Test that drain gives up after the timeout."""
+        leases = ModelLeases()
+        extractor = object()
+
+        async def scenario():
+            async def app(scope, receive, send):
+                leases.acquire(extractor)
+                await asyncio.sleep(10)
+            task = asyncio.create_task(ModelLeaseMiddleware(app, leases)({"type": "http", "path": "/"}, None, None))
+            await asyncio.sleep(0)
+            drained = await leases.drain(extractor, timeout=0.05)
+            task.cancel()
+            return drained
+
+        assert asyncio.run(scenario()) is False
@@ -0,0 +1,231 @@
+"""
+Unit tests for the Kafka consumer mode, run against the in-memory broker.
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from kafka_worker import FileImageStore, InMemoryBroker, KafkaExtractionWorker, build_indexing_event
+from pipeline import ExtractionPipeline
+
+EXTRACTION_TOPIC = "deeplens.features.extraction"
+INDEXING_TOPIC = "deeplens.vectors.indexing"
+GROUP_ID = "deeplens-feature-extraction-workers"
+
+
+class FakeExtractor:
+    """Extractor whose features encode the image size, so outputs can be matched to inputs."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def prepare_image(self, image_bytes):
+        if image_bytes.startswith(b"bad"):
+            raise OSError("cannot identify image file")
+        return np.full((1, 3, 224, 224), len(image_bytes), dtype=np.float32), {'width': 64, 'height': 48, 'format': 'JPEG'}
+
+    def run_inference(self, input_batch):
+        self.batch_sizes.append(input_batch.shape[0])
+        return input_batch[:, 0, 0, :4].copy()
+
+
+def extraction_event(image_id, image_path, correlation_id="corr-1"):
+    """FeatureExtractionRequestedEvent as published by the C# API"""
+    return {
+        'eventId': f"evt-{image_id}",
+        'eventType': "feature.extraction.requested",
+        'eventVersion': "1.0",
+        'timestamp': "2024-01-01T00:00:00Z",
+        'tenantId': "SINGLE_TENANT",
+        'correlationId': correlation_id,
+        'data': {
+            'imageId': image_id,
+            'imagePath': image_path,
+            'modelName': "resnet50",
+            'modelVersion': "v2.7",
+            'expectedDimension': 2048,
+            'extractionOptions': {'normalize': True, 'returnMetadata': True, 'timeout': 30}
+        }
+    }
+
+
+@pytest.fixture
+def image_root(tmp_path):
+    """Storage root with three images of distinct sizes and one undecodable file"""
+    for name, size in (("a.jpg", 10), ("b.jpg", 20), ("c.jpg", 30)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    (tmp_path / "bad.jpg").write_bytes(b"bad data")
+    return tmp_path
+
+
+def make_worker(broker, image_root, extractor=None, batch_size=32):
+    return KafkaExtractionWorker(
+        extractor or FakeExtractor(),
+        ExtractionPipeline(decode_workers=2, inference_workers=1),
+        broker.consumer(GROUP_ID),
+        broker.producer(),
+        FileImageStore(str(image_root)),
+        extraction_topic=EXTRACTION_TOPIC,
+        indexing_topic=INDEXING_TOPIC,
+        batch_size=batch_size,
+        poll_timeout=0.01
+    )
+
+
+async def run_polls(worker, polls):
+    await worker._client(worker.consumer.subscribe, [worker.extraction_topic])
+    return [await worker.run_once() for _ in range(polls)]
+
+
+class TestKafkaExtractionWorker:
+    """Test cases for the KafkaExtractionWorker class."""
+
+    @pytest.mark.unit
+    def test_batch_is_extracted_produced_and_committed(self, image_root):
+        """Test that one poll runs one inference batch and produces one event per image."""
+        broker = InMemoryBroker()
+        for image_id, path in (("img-a", "a.jpg"), ("img-b", "b.jpg"), ("img-c", "c.jpg")):
+            broker.publish(EXTRACTION_TOPIC, extraction_event(image_id, path), key=image_id)
+        extractor = FakeExtractor()
+        worker = make_worker(broker, image_root, extractor)
+
+        consumed = asyncio.run(run_polls(worker, 1))
+
+        assert consumed == [3]
+        assert extractor.batch_sizes == [3]
+        produced = broker.messages(INDEXING_TOPIC)
+        assert [m.key() for m in produced] == [b"img-a", b"img-b", b"img-c"]
+        assert broker.committed[(GROUP_ID, EXTRACTION_TOPIC)] == 3
+
+        event = json.loads(produced[1].value())
+        assert event['eventType'] == "vector.indexing.requested"
+        assert event['correlationId'] == "corr-1"
+        assert event['data']['imageId'] == "img-b"
+        assert event['data']['modelName'] == "resnet50"
+        assert event['data']['featureVector'] == [20.0] * 4
+        assert event['data']['imageMetadata'] == {'width': 64, 'height': 48, 'format': 'JPEG'}
+        assert event['data']['vectorMetadata']['modelVersion'] == "v2.7"
+
+    @pytest.mark.unit
+    def test_polls_respect_batch_size(self, image_root):
+        """Test that messages are consumed in batches of at most batch_size."""
+        broker = InMemoryBroker()
+        for i, path in enumerate(("a.jpg", "b.jpg", "c.jpg")):
+            broker.publish(EXTRACTION_TOPIC, extraction_event(f"img-{i}", path))
+        extractor = FakeExtractor()
+        worker = make_worker(broker, image_root, extractor, batch_size=2)
+
+        consumed = asyncio.run(run_polls(worker, 3))
+
+        assert consumed == [2, 1, 0]
+        assert extractor.batch_sizes == [2, 1]
+        assert worker.stats()['commits'] == 2
+
+    @pytest.mark.unit
+    def test_failures_and_malformed_events_are_skipped(self, image_root):
+        """Test that bad events and images are counted and do not block the batch."""
+        broker = InMemoryBroker()
+        broker.publish(EXTRACTION_TOPIC, "not json")
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-missing", "missing.jpg"))
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-bad", "bad.jpg"))
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-a", "a.jpg"))
+        worker = make_worker(broker, image_root)
+
+        asyncio.run(run_polls(worker, 1))
+
+        assert [m.key() for m in broker.messages(INDEXING_TOPIC)] == [b"img-a"]
+        stats = worker.stats()
+        assert stats['invalid'] == 1
+        assert stats['failed'] == 2
+        assert broker.committed[(GROUP_ID, EXTRACTION_TOPIC)] == 4
+
+    @pytest.mark.unit
+    def test_undelivered_events_are_not_committed(self, image_root):
+        """Test that a failed produce leaves offsets uncommitted so the batch is redelivered."""
+        broker = InMemoryBroker()
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-a", "a.jpg"))
+        worker = make_worker(broker, image_root)
+        worker.producer.fail_deliveries = True
+
+        with pytest.raises(RuntimeError, match="not committed"):
+            asyncio.run(run_polls(worker, 1))
+        assert (GROUP_ID, EXTRACTION_TOPIC) not in broker.committed
+
+        retry = make_worker(broker, image_root)
+        assert asyncio.run(run_polls(retry, 1)) == [1]
+        assert [m.key() for m in broker.messages(INDEXING_TOPIC)] == [b"img-a"]
+
+    @pytest.mark.unit
+    def test_failed_batch_is_redelivered_after_rewind(self, image_root):
+        """Test that the consumer seeks back to the committed offset after a failed batch."""
+        broker = InMemoryBroker()
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-a", "a.jpg"))
+        worker = make_worker(broker, image_root)
+        worker.producer.fail_deliveries = True
+
+        async def scenario():
+            await run_polls(worker, 0)
+            with pytest.raises(RuntimeError):
+                await worker.run_once()
+            await worker._client(worker._rewind)
+            worker.producer.fail_deliveries = False
+            return await worker.run_once()
+
+        assert asyncio.run(scenario()) == 1
+        assert [m.key() for m in broker.messages(INDEXING_TOPIC)] == [b"img-a"]
+        assert broker.committed[(GROUP_ID, EXTRACTION_TOPIC)] == 1
+
+    @pytest.mark.unit
+    def test_start_and_stop(self, image_root):
+        """Test that the background loop drains the topic and stops cleanly."""
+        broker = InMemoryBroker()
+        broker.publish(EXTRACTION_TOPIC, extraction_event("img-a", "a.jpg"))
+        worker = make_worker(broker, image_root)
+
+        async def scenario():
+            await worker.start()
+            for _ in range(100):
+                if broker.messages(INDEXING_TOPIC):
+                    break
+                await asyncio.sleep(0.01)
+            await worker.stop()
+
+        asyncio.run(scenario())
+
+        assert len(broker.messages(INDEXING_TOPIC)) == 1
+        assert worker.consumer.closed
+
+
+class TestImageStore:
+    """Test cases for the FileImageStore class."""
+
+    @pytest.mark.unit
+    def test_reads_relative_paths(self, image_root):
+        """Test that image paths resolve under the root."""
+        store = FileImageStore(str(image_root))
+        assert store.read("/a.jpg") == b"x" * 10
+        assert store.read("minio://a.jpg") == b"x" * 10
+
+    @pytest.mark.unit
+    def test_rejects_paths_outside_root(self, image_root):
+        """Test that traversal out of the root is refused."""
+        with pytest.raises(ValueError):
+            FileImageStore(str(image_root)).read("../etc/passwd")
+
+
+class TestIndexingEvent:
+    """Test cases for build_indexing_event."""
+
+    @pytest.mark.unit
+    def test_defaults_tenant(self):
+        """Test that a missing tenant falls back to the single tenant id."""
+        request = extraction_event("img-a", "a.jpg")
+        del request['tenantId']
+        event = build_indexing_event(
+            request, np.zeros(4, dtype=np.float32), {'width': 1, 'height': 2, 'format': 'PNG'}, 3.456, "v2.7", "1.0.0"
+        )
+        assert event['tenantId'] == "SINGLE_TENANT"
+        assert event['data']['vectorMetadata']['processingTimeMs'] == 3.46
+        assert event['data']['vectorMetadata']['extractorVersion'] == "1.0.0"
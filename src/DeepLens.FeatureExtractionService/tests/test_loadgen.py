@@ -0,0 +1,194 @@
+"""
+Unit tests for the HTTP load generator and the Ollama stand-in.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from loadgen import (
+    LoadRecorder,
+    RequestSpec,
+    find_saturation,
+    image_requests,
+    load_descriptions,
+    reasoning_requests,
+    run_closed_loop,
+    run_open_loop
+)
+from ollama_standin import CANNED_ANSWER, create_app
+
+
+def slow_app(delay_s: float = 0.01, fail_every: int = 0) -> FastAPI:
+    """Service that answers after a delay and fails every n-th request."""
+    app = FastAPI()
+    app.state.count = 0
+
+    @app.post("/work")
+    async def work():
+        app.state.count += 1
+        number = app.state.count
+        await asyncio.sleep(delay_s)
+        if fail_every and number % fail_every == 0:
+            return JSONResponse(status_code=500, content={"detail": "boom"})
+        return {"ok": True}
+
+    return app
+
+
+def client_for(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestWorkloads:
+    """Test cases for request generation."""
+
+    @pytest.mark.unit
+    def test_image_requests(self):
+        """Test multipart, raw-body and batch uploads with content types from the extension."""
+        images = [("a.png", b"png"), ("b.jpg", b"jpg")]
+
+        single = image_requests(images)
+        assert single[0].kwargs['files']['file'] == ("a.png", b"png", "image/png")
+        assert single[1].path == "/extract-features"
+
+        stream = image_requests(images, endpoint="/extract-features/stream")
+        assert stream[1].kwargs['content'] == b"jpg"
+
+        batch = image_requests(images, endpoint="/extract-features/batch")
+        assert batch[0].kwargs['files'][0][0] == "files"
+
+    @pytest.mark.unit
+    def test_reasoning_requests(self):
+        """Test the body shape per endpoint and the /extract-product priority."""
+        specs = reasoning_requests(["red silk saree"], endpoints=["/extract-product", "/extract"], priority=1)
+        assert specs[0].kwargs == {'json': {'description': "red silk saree"}, 'params': {'priority': 1}}
+        assert specs[1].kwargs == {'json': {'text': "red silk saree"}, 'params': None}
+
+    @pytest.mark.unit
+    def test_load_descriptions(self, tmp_path):
+        """Test blank-line separated description files and the built-in fallback."""
+        path = tmp_path / "descriptions.txt"
+        path.write_text("first saree\nline two\n\n\nsecond saree\n", encoding='utf-8')
+        assert load_descriptions([str(path)]) == ["first saree\nline two", "second saree"]
+        assert len(load_descriptions([])) > 0
+
+
+class TestRecorder:
+    """Test cases for result summaries and saturation detection."""
+
+    @pytest.mark.unit
+    def test_summary(self):
+        """Test counts, error rate including drops, and percentiles."""
+        recorder = LoadRecorder()
+        recorder.first_send = 0.0
+        recorder.latencies_ms = [10.0] * 98 + [100.0, 200.0]
+        recorder.statuses = {'200': 99, '500': 1}
+        recorder.errors = 1
+        recorder.dropped = 0
+        recorder.last_completion = 2.0
+
+        summary = recorder.summary()
+        assert summary['completed'] == 100
+        assert summary['error_rate'] == 0.01
+        assert summary['achieved_rps'] == 49.5
+        assert summary['p50_ms'] == 10.0
+        assert summary['max_ms'] == 200.0
+
+    @pytest.mark.unit
+    def test_open_loop_saturation(self):
+        """Test that the first level falling behind the offered rate is reported."""
+        levels = [
+            {'mode': 'open', 'offered_rps': 10, 'achieved_rps': 10.0, 'error_rate': 0.0, 'p99_ms': 20},
+            {'mode': 'open', 'offered_rps': 20, 'achieved_rps': 19.5, 'error_rate': 0.0, 'p99_ms': 30},
+            {'mode': 'open', 'offered_rps': 40, 'achieved_rps': 25.0, 'error_rate': 0.0, 'p99_ms': 900}
+        ]
+        saturation = find_saturation(levels)
+        assert saturation['offered_rps'] == 40
+        assert "achieved 25.0 of 40" in saturation['reason']
+
+        assert find_saturation(levels, slo_p99_ms=25)['offered_rps'] == 20
+        assert find_saturation(levels[:2]) is None
+
+    @pytest.mark.unit
+    def test_closed_loop_saturation(self):
+        """Test that throughput flattening as clients double is reported."""
+        levels = [
+            {'mode': 'closed', 'concurrency': 1, 'achieved_rps': 10.0, 'error_rate': 0.0},
+            {'mode': 'closed', 'concurrency': 2, 'achieved_rps': 19.0, 'error_rate': 0.0},
+            {'mode': 'closed', 'concurrency': 4, 'achieved_rps': 20.0, 'error_rate': 0.0}
+        ]
+        assert find_saturation(levels)['concurrency'] == 4
+
+        levels[1]['error_rate'] = 0.05
+        assert "error rate" in find_saturation(levels)['reason']
+
+
+class TestLoops:
+    """Test cases for open and closed loop runs against in-process services."""
+
+    @pytest.mark.unit
+    def test_open_loop_rate_and_errors(self):
+        """Test that the offered rate is kept and failed responses are counted."""
+        async def run():
+            async with client_for(slow_app(fail_every=5)) as client:
+                return await run_open_loop(client, [RequestSpec("w", "POST", "/work")], rps=100, duration_s=0.3)
+
+        result = asyncio.run(run())
+        assert 25 <= result['sent'] <= 31
+        assert result['completed'] == result['sent']
+        assert result['statuses']['500'] == result['sent'] // 5
+        assert result['error_rate'] == pytest.approx(result['errors'] / result['completed'])
+
+    @pytest.mark.unit
+    def test_open_loop_drops_beyond_outstanding_limit(self):
+        """Test that arrivals over the in-flight limit are dropped, not queued."""
+        async def run():
+            async with client_for(slow_app(delay_s=0.5)) as client:
+                return await run_open_loop(
+                    client, [RequestSpec("w", "POST", "/work")], rps=100, duration_s=0.1, max_outstanding=3
+                )
+
+        result = asyncio.run(run())
+        assert result['sent'] == 3
+        assert result['dropped'] >= 5
+        assert result['error_rate'] > 0.5
+
+    @pytest.mark.unit
+    def test_closed_loop_against_standin(self):
+        """Test closed-loop clients against the Ollama stand-in's single generation slot."""
+        app = create_app(first_token_ms=5, tokens_per_second=0, parallel=1)
+        spec = RequestSpec("gen", "POST", "/api/generate", json={'prompt': "saree", 'stream': True})
+
+        async def run():
+            async with client_for(app) as client:
+                return await run_closed_loop(client, [spec], concurrency=3, duration_s=0.2)
+
+        result = asyncio.run(run())
+        assert result['concurrency'] == 3
+        assert result['errors'] == 0
+        assert result['completed'] >= 3
+        assert app.state.stats['max_waiting'] >= 2
+        assert app.state.stats['active'] == 0
+
+
+class TestOllamaStandin:
+    """Test cases for the stand-in's Ollama API."""
+
+    @pytest.mark.unit
+    def test_streamed_answer_parses(self):
+        """Test that the streamed chunks join into the canned JSON answer."""
+        async def run():
+            async with client_for(create_app(first_token_ms=0, tokens_per_second=0)) as client:
+                tags = (await client.get("/api/tags")).json()
+                response = await client.post("/api/generate", json={'prompt': "x", 'stream': True})
+                return tags, response
+
+        tags, response = asyncio.run(run())
+        assert tags['models'][0]['name'] == "phi4-mini:latest"
+        chunks = [json.loads(line) for line in response.text.splitlines() if line]
+        assert chunks[-1]['done'] is True
+        assert json.loads("".join(chunk['response'] for chunk in chunks)) == CANNED_ANSWER
@@ -0,0 +1,149 @@
+"""
+Unit tests for the Prometheus metrics and Server-Timing support.
+"""
+import asyncio
+
+import pytest
+
+from metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    RequestTimings,
+    _current_timings,
+    current_timings,
+    stage_timer,
+    stats_families
+)
+from pipeline import StagePool
+
+
+class TestMetricTypes:
+    """Test cases for counters, gauges and histograms."""
+
+    @pytest.mark.unit
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket placement, sum and count."""
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), labelnames=("stage",))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, stage="decode")
+
+        samples = {
+            (labels['__suffix'], labels.get('le')): value
+            for labels, value in histogram.collect()
+        }
+        assert samples[('_bucket', '0.1')] == 2
+        assert samples[('_bucket', '1')] == 3
+        assert samples[('_bucket', '+Inf')] == 4
+        assert samples[('_count', None)] == 4
+        assert samples[('_sum', None)] == pytest.approx(3.65)
+        assert histogram.count(stage="decode") == 4
+        assert histogram.count(stage="inference") == 0
+
+    @pytest.mark.unit
+    def test_counter_and_gauge(self):
+        """Test labelled counters and up/down gauges."""
+        counter = Counter("requests_total", "Requests", labelnames=("status",))
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        assert counter.value(status=200) == 3
+
+        gauge = Gauge("in_flight", "In flight")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.value() == 1
+        gauge.set(7)
+        assert gauge.value() == 7
+
+
+class TestRegistry:
+    """Test cases for the text exposition format."""
+
+    @pytest.mark.unit
+    def test_render(self):
+        """Test HELP/TYPE lines, label formatting and histogram suffixes."""
+        registry = MetricsRegistry()
+        registry.register(Counter("requests_total", "Requests", labelnames=("endpoint",))).inc(endpoint='/a"b')
+        registry.register(Histogram("size", "Batch size", buckets=(1, 2))).observe(2)
+        registry.add_collector(lambda: stats_families("cache", [({}, {'hits': 5, 'hit_rate': 0.5})], counters=('hits',)))
+
+        text = registry.render()
+        assert text.endswith("\n")
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{endpoint="/a\\"b"} 1' in text
+        assert '# TYPE size histogram' in text
+        assert 'size_bucket{le="1"} 0' in text
+        assert 'size_bucket{le="2"} 1' in text
+        assert 'size_bucket{le="+Inf"} 1' in text
+        assert 'size_count 1' in text
+        assert '# TYPE cache_hits_total counter' in text
+        assert 'cache_hits_total 5' in text
+        assert 'cache_hit_rate 0.5' in text
+
+    @pytest.mark.unit
+    def test_stats_families_merge_labels(self):
+        """Test that one family gets a sample per labelled stats dict and non-numbers are skipped."""
+        families = stats_families(
+            "stage",
+            [({'stage': 'decode'}, {'queued': 1, 'completed': 4, 'name': 'decode'}),
+             ({'stage': 'inference'}, {'queued': 0, 'completed': 2}),
+             ({}, None)],
+            counters=('completed',)
+        )
+        by_name = {name: (kind, samples) for name, kind, _, samples in families}
+        assert set(by_name) == {'stage_queued', 'stage_completed_total'}
+        assert by_name['stage_completed_total'][0] == 'counter'
+        assert by_name['stage_queued'][1] == [({'stage': 'decode'}, 1), ({'stage': 'inference'}, 0)]
+
+
+class TestRequestTimings:
+    """Test cases for per-request stage attribution."""
+
+    @pytest.mark.unit
+    def test_server_timing_header(self):
+        """Test that stages appear in pipeline order with the total last."""
+        timings = RequestTimings()
+        timings.add("inference", 0.004)
+        timings.add("decode", 0.001)
+        timings.add("decode", 0.002)
+        assert timings.server_timing(0.01) == "decode;dur=3.0, inference;dur=4.0, total;dur=10.0"
+
+    @pytest.mark.unit
+    def test_stage_timer_charges_current_request(self):
+        """Test that stage_timer records only when a request is being timed."""
+        with stage_timer("preprocess"):
+            pass
+        assert current_timings() is None
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        try:
+            with stage_timer("preprocess", observe=False):
+                pass
+        finally:
+            _current_timings.reset(token)
+        assert "preprocess" in timings.durations_ms()
+
+    @pytest.mark.unit
+    def test_stage_pool_threads_inherit_request(self):
+        """Test that work on a stage pool thread is charged to the request that queued it."""
+        pool = StagePool("decode", 2)
+
+        def work():
+            with stage_timer("decode"):
+                return current_timings()
+
+        async def request():
+            timings = RequestTimings()
+            _current_timings.set(timings)
+            seen = await pool.run(work)
+            return timings, seen
+
+        try:
+            timings, seen = asyncio.run(request())
+        finally:
+            pool.shutdown()
+        assert seen is timings
+        assert "decode" in timings.durations_ms()
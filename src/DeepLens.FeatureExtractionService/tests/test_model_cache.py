@@ -0,0 +1,113 @@
+"""
+Unit tests for the optimized model cache and warmup.
+"""
+import os
+
+import numpy as np
+import pytest
+
+import model_cache
+from feature_extractor import ResNet50FeatureExtractor
+from model_cache import optimized_model_path
+from tiny_model import write_tiny_model
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    """A placeholder model file for cache keying."""
+    path = tmp_path / "resnet50.onnx"
+    path.write_bytes(b"model")
+    return str(path)
+
+
+class TestOptimizedModelPath:
+    """Test cases for cache keying."""
+
+    @pytest.mark.unit
+    def test_path_layout(self, model_file, tmp_path):
+        """Test that the cached file is named after the model and format."""
+        path = optimized_model_path(model_file, str(tmp_path / "cache"))
+        assert os.path.dirname(path) == str(tmp_path / "cache")
+        assert os.path.basename(path).startswith("resnet50.")
+        assert path.endswith(".ort")
+        assert optimized_model_path(model_file, str(tmp_path / "cache")) == path
+
+    @pytest.mark.unit
+    def test_key_changes_with_inputs(self, model_file, tmp_path, monkeypatch):
+        """Test that level, format, model contents and CPU each select a different entry."""
+        cache_dir = str(tmp_path / "cache")
+        base = optimized_model_path(model_file, cache_dir)
+
+        assert optimized_model_path(model_file, cache_dir, optimization_level="extended") != base
+        assert optimized_model_path(model_file, cache_dir, model_format="onnx").endswith(".onnx")
+
+        monkeypatch.setattr(model_cache, 'node_fingerprint', lambda: "other-cpu-64c")
+        assert optimized_model_path(model_file, cache_dir) != base
+        monkeypatch.undo()
+
+        with open(model_file, 'ab') as f:
+            f.write(b"retrained")
+        assert optimized_model_path(model_file, cache_dir) != base
+
+    @pytest.mark.unit
+    def test_unknown_format(self, model_file, tmp_path):
+        """Test that only ORT and ONNX formats are accepted."""
+        with pytest.raises(ValueError):
+            optimized_model_path(model_file, str(tmp_path), model_format="pb")
+
+
+class TestCachedLoad:
+    """Test cases for loading through the cache with a real session."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("model_format", ["ort", "onnx"])
+    def test_miss_then_hit(self, tmp_path, model_format):
+        """Test that the first load writes the optimized model and the second loads it."""
+        model_path = str(tmp_path / "tiny.onnx")
+        write_tiny_model(model_path, feature_dimension=16)
+        cache_dir = str(tmp_path / "cache")
+        inputs = np.random.default_rng(1).standard_normal((2, 3, 224, 224)).astype(np.float32)
+
+        first = ResNet50FeatureExtractor(model_path, optimized_model_dir=cache_dir,
+                                         optimized_model_format=model_format)
+        assert first.load_timings['optimized_model'] == 'miss'
+        assert os.listdir(cache_dir) == [os.path.basename(
+            optimized_model_path(model_path, cache_dir, model_format=model_format)
+        )]
+
+        second = ResNet50FeatureExtractor(model_path, optimized_model_dir=cache_dir,
+                                          optimized_model_format=model_format)
+        assert second.load_timings['optimized_model'] == 'hit'
+        np.testing.assert_allclose(second.run_inference(inputs), first.run_inference(inputs), atol=1e-5)
+
+    @pytest.mark.unit
+    def test_corrupt_entry_is_rebuilt(self, tmp_path):
+        """Test that an unreadable cache entry falls back to the source model and is replaced."""
+        model_path = str(tmp_path / "tiny.onnx")
+        write_tiny_model(model_path, feature_dimension=16)
+        cache_dir = str(tmp_path / "cache")
+        cached_path = optimized_model_path(model_path, cache_dir)
+        os.makedirs(cache_dir)
+        with open(cached_path, 'wb') as f:
+            f.write(b"truncated")
+
+        extractor = ResNet50FeatureExtractor(model_path, optimized_model_dir=cache_dir)
+        assert extractor.load_timings['optimized_model'] == 'miss'
+        assert ResNet50FeatureExtractor(model_path, optimized_model_dir=cache_dir).load_timings['optimized_model'] == 'hit'
+
+    @pytest.mark.unit
+    def test_disabled_and_warmup(self, tmp_path):
+        """Test that no cache directory means no cache, and warmup runs every batch size."""
+        model_path = str(tmp_path / "tiny.onnx")
+        write_tiny_model(model_path, feature_dimension=16)
+
+        extractor = ResNet50FeatureExtractor(model_path)
+        assert extractor.load_timings['optimized_model'] == 'disabled'
+        assert extractor.load_timings['session_ms'] >= 0
+
+        calls = []
+        run_inference = extractor.run_inference
+        extractor.run_inference = lambda batch: calls.append(batch.shape) or run_inference(batch)
+        elapsed_ms = extractor.warmup(batch_sizes=[1, 4], iterations=2)
+        assert calls == [(1, 3, 224, 224)] * 2 + [(4, 3, 224, 224)] * 2
+        assert extractor.load_timings['warmup_ms'] == elapsed_ms
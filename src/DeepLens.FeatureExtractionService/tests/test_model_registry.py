@@ -0,0 +1,157 @@
+"""
+Unit tests for the model registry.
+"""
+import threading
+import time
+
+import pytest
+
+from config import ModelConfig
+from model_registry import ModelRegistry, model_key
+
+
+class LoadedModel:
+    """Stand-in extractor recording the config it was built from."""
+
+    def __init__(self, config):
+        self.config = config
+
+
+def model_config(tmp_path, name, version="v1", size=1000):
+    """Config whose model file has the given size on disk"""
+    path = tmp_path / f"{name}-{version}.onnx"
+    path.write_bytes(b"\0" * size)
+    return ModelConfig(model_name=name, model_version=version, feature_dimension=16, model_file=str(path))
+
+
+class CountingLoader:
+    """Loader counting loads per model key."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.loads = {}
+
+    def __call__(self, config):
+        time.sleep(self.delay)
+        key = model_key(config.model_name, config.model_version)
+        self.loads[key] = self.loads.get(key, 0) + 1
+        return LoadedModel(config)
+
+
+class TestModelRegistry:
+    """Test cases for the ModelRegistry class."""
+
+    @pytest.mark.unit
+    def test_resolve(self, tmp_path):
+        """Test lookup by name:version, by name and by default."""
+        registry = ModelRegistry(CountingLoader())
+        registry.register(model_config(tmp_path, "resnet50", "v2.7"), pinned=True)
+        registry.register(model_config(tmp_path, "clip", "v1"))
+        registry.register(model_config(tmp_path, "clip", "v2"))
+        registry.register(model_config(tmp_path, "resnet50", "v3"))
+
+        assert registry.resolve() == "resnet50:v2.7"
+        assert registry.resolve("resnet50") == "resnet50:v2.7"
+        assert registry.resolve("resnet50:v3") == "resnet50:v3"
+        assert registry.resolve("clip") == "clip:v1"
+        assert "clip:v2" in registry
+        with pytest.raises(KeyError):
+            registry.resolve("clip:v9")
+        with pytest.raises(ValueError):
+            registry.register(model_config(tmp_path, "clip", "v1"))
+
+    @pytest.mark.unit
+    def test_loads_lazily_once(self, tmp_path):
+        """Test that a model is loaded on its first request and reused afterwards."""
+        loader = CountingLoader()
+        registry = ModelRegistry(loader)
+        registry.register(model_config(tmp_path, "clip"))
+        assert registry.stats()['loaded'] == 0
+
+        config, first = registry.get("clip")
+        _, second = registry.get("clip:v1")
+
+        assert first is second
+        assert config.model_name == "clip"
+        assert loader.loads == {"clip:v1": 1}
+        stats = registry.stats()['models']['clip:v1']
+        assert stats['loaded'] and stats['requests'] == 2 and stats['memory_bytes'] == 1000
+
+    @pytest.mark.unit
+    def test_record_request_without_loading(self, tmp_path):
+        """Test that requests served by a held extractor are counted without a load."""
+        loader = CountingLoader()
+        registry = ModelRegistry(loader)
+        registry.register(model_config(tmp_path, "resnet50"), extractor=object(), pinned=True)
+
+        registry.record_request()
+        registry.record_request("resnet50:v1")
+
+        assert registry.stats()['models']['resnet50:v1']['requests'] == 2
+        assert loader.loads == {}
+        with pytest.raises(KeyError):
+            registry.record_request("clip")
+
+    @pytest.mark.unit
+    def test_concurrent_first_requests_share_one_load(self, tmp_path):
+        """Test that requests racing for an unloaded model wait for a single load."""
+        loader = CountingLoader(delay=0.05)
+        registry = ModelRegistry(loader)
+        registry.register(model_config(tmp_path, "clip"))
+        extractors = []
+
+        threads = [threading.Thread(target=lambda: extractors.append(registry.get("clip")[1])) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loader.loads == {"clip:v1": 1}
+        assert len({id(extractor) for extractor in extractors}) == 1
+
+    @pytest.mark.unit
+    def test_least_recently_used_evicted_over_budget(self, tmp_path):
+        """Test that loading past the budget unloads the least recently used unpinned model."""
+        loader = CountingLoader()
+        registry = ModelRegistry(loader, memory_budget_bytes=2500)
+        registry.register(model_config(tmp_path, "primary"), extractor=LoadedModel(None), pinned=True)
+        for name in ("a", "b"):
+            registry.register(model_config(tmp_path, name))
+
+        registry.get("a")
+        registry.get("primary")
+        registry.get("b")
+
+        models = registry.stats()['models']
+        assert not models['a:v1']['loaded'] and models['a:v1']['evictions'] == 1
+        assert models['b:v1']['loaded'] and models['primary:v1']['loaded']
+        assert registry.memory_bytes() == 2000
+
+        registry.get("a")
+        assert loader.loads == {"a:v1": 2, "b:v1": 1}
+        assert not registry.stats()['models']['b:v1']['loaded']
+
+    @pytest.mark.unit
+    def test_evicted_extractor_stays_usable(self, tmp_path):
+        """Test that a caller holding an unloaded extractor keeps its reference."""
+        registry = ModelRegistry(CountingLoader())
+        registry.register(model_config(tmp_path, "clip"))
+        _, extractor = registry.get("clip")
+
+        assert registry.unload("clip")
+        assert not registry.unload("clip")
+        assert extractor.config.model_name == "clip"
+        assert registry.get("clip")[1] is not extractor
+
+    @pytest.mark.unit
+    def test_load_failure(self, tmp_path):
+        """Test that loader errors surface as RuntimeError and leave the model unloaded."""
+        def failing_loader(config):
+            raise OSError("model file is corrupt")
+
+        registry = ModelRegistry(failing_loader)
+        registry.register(model_config(tmp_path, "clip"))
+
+        with pytest.raises(RuntimeError, match="corrupt"):
+            registry.get("clip")
+        assert registry.stats()['loaded'] == 0
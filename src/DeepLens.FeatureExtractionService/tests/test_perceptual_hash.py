@@ -0,0 +1,231 @@
+"""
+Unit tests for perceptual hashing and the near-duplicate index.
+"""
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from perceptual_hash import (
+    PerceptualHashIndex,
+    compute_hash,
+    dhash,
+    format_hash,
+    hamming_distance,
+    parse_hash,
+    phash
+)
+from pipeline import ExtractionPipeline
+
+
+def photo(seed: int, size=(320, 240)) -> Image.Image:
+    """Image with smooth structure (blurred noise) that survives resizing and recompression"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    coarse = rng.uniform(0, 255, (6, 8, 3)).astype(np.uint8)
+    image = Image.fromarray(coarse).resize((width, height), Image.Resampling.BICUBIC)
+    pixels = np.asarray(image, dtype=np.float32) + rng.normal(0, 4, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def recompressed(image: Image.Image, quality: int = 60) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def encoded(image: Image.Image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class TestHashes:
+    """Test cases for pHash and dHash."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("hash_fn", [phash, dhash])
+    def test_stable_under_recompression_and_resize(self, hash_fn):
+        """Test that re-encoded and resized copies hash within a few bits."""
+        image = photo(1)
+        reference = hash_fn(image)
+
+        assert hamming_distance(reference, hash_fn(recompressed(image))) <= 2
+        assert hamming_distance(reference, hash_fn(image.resize((160, 120)))) <= 2
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("hash_fn", [phash, dhash])
+    def test_different_images_far_apart(self, hash_fn):
+        """Test that unrelated images differ in many bits."""
+        hashes = [hash_fn(photo(seed)) for seed in range(5)]
+
+        distances = [
+            hamming_distance(a, b) for i, a in enumerate(hashes) for b in hashes[i + 1:]
+        ]
+        assert min(distances) > 10
+
+    @pytest.mark.unit
+    def test_hash_is_64_bit(self):
+        """Test that hashes fit in 64 bits and round-trip through hex."""
+        value = phash(photo(2))
+
+        assert 0 <= value < 2 ** 64
+        assert len(format_hash(value)) == 16
+        assert parse_hash(format_hash(value)) == value
+
+    @pytest.mark.unit
+    def test_mode_independent(self):
+        """Test that RGBA and palette images hash like their RGB version."""
+        image = photo(3)
+
+        assert hamming_distance(phash(image), phash(image.convert('RGBA'))) == 0
+        assert hamming_distance(phash(image), phash(image.convert('P'))) <= 4
+
+    @pytest.mark.unit
+    def test_unknown_algorithm(self):
+        """Test that unknown hash names are rejected."""
+        with pytest.raises(ValueError):
+            compute_hash(photo(0), "ahash")
+
+
+class TestPerceptualHashIndex:
+    """Test cases for the PerceptualHashIndex class."""
+
+    @pytest.mark.unit
+    def test_lookup_within_threshold(self):
+        """Test that the closest entry within max_distance is returned."""
+        index = PerceptualHashIndex(max_distance=4, max_entries=10)
+        index.add(0b1111, np.full(4, 1.0))
+        index.add(0xFFFF_0000_0000_0000, np.full(4, 2.0))
+
+        features, distance = index.lookup(0b0111)
+        assert features[0] == 1.0
+        assert distance == 1
+        assert index.lookup(0xFF00) is None
+
+        stats = index.stats()
+        assert stats['lookups'] == 2 and stats['hits'] == 1 and stats['entries'] == 2
+
+    @pytest.mark.unit
+    def test_returned_vector_is_a_copy(self):
+        """Test that callers cannot modify stored embeddings."""
+        index = PerceptualHashIndex()
+        index.add(42, np.ones(4))
+
+        features, _ = index.lookup(42)
+        features[:] = 0
+
+        assert index.lookup(42)[0][0] == 1.0
+
+    @pytest.mark.unit
+    def test_oldest_entries_replaced_when_full(self):
+        """Test ring-buffer replacement beyond max_entries."""
+        index = PerceptualHashIndex(max_distance=0, max_entries=2)
+        for value in (1, 2, 3):
+            index.add(value, np.full(4, float(value)))
+
+        assert len(index) == 2
+        assert index.lookup(1) is None
+        assert index.lookup(3)[0][0] == 3.0
+
+    @pytest.mark.unit
+    def test_high_bit_hashes(self):
+        """Test hashes using the full unsigned 64-bit range."""
+        index = PerceptualHashIndex(max_distance=1)
+        index.add(2 ** 64 - 1, np.ones(4))
+
+        assert index.lookup(2 ** 64 - 2)[1] == 1
+
+    @pytest.mark.unit
+    def test_clear(self):
+        """Test that clear drops every entry."""
+        index = PerceptualHashIndex()
+        index.add(7, np.ones(4))
+        index.clear()
+
+        assert len(index) == 0
+        assert index.lookup(7) is None
+
+
+class HashingExtractor:
+    """Extractor with real decode and hashing and counted, deterministic inference."""
+
+    def __init__(self):
+        from unittest.mock import patch
+        from feature_extractor import ResNet50FeatureExtractor
+
+        with patch('onnxruntime.InferenceSession'):
+            self.extractor = ResNet50FeatureExtractor("dummy_path")
+        self.inference_rows = 0
+
+    def prepare_image(self, image_bytes):
+        return self.extractor.prepare_image(image_bytes)
+
+    def run_inference(self, input_batch):
+        self.inference_rows += input_batch.shape[0]
+        features = input_batch.reshape(input_batch.shape[0], -1)[:, :16].copy()
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+class TestNearDuplicatePipeline:
+    """Test cases for near-duplicate reuse in the extraction pipeline."""
+
+    @pytest.mark.unit
+    def test_recompressed_repost_skips_inference(self):
+        """Test that a re-encoded copy reuses the first image's embedding."""
+        pipeline = ExtractionPipeline(near_duplicates=PerceptualHashIndex(max_distance=4))
+        extractor = HashingExtractor()
+        image = photo(5)
+
+        try:
+            first, first_metadata = asyncio.run(pipeline.extract(extractor, encoded(image)))
+            second, second_metadata = asyncio.run(pipeline.extract(extractor, encoded(image, quality=50)))
+            other, other_metadata = asyncio.run(pipeline.extract(extractor, encoded(photo(6))))
+        finally:
+            pipeline.shutdown()
+
+        assert extractor.inference_rows == 2
+        np.testing.assert_array_equal(first, second)
+        assert 'near_duplicate_distance' not in first_metadata
+        assert second_metadata['near_duplicate_distance'] <= 4
+        assert second_metadata['perceptual_hash'] is not None
+        assert 'near_duplicate_distance' not in other_metadata
+        assert pipeline.stats()['near_duplicates']['hits'] == 1
+
+    @pytest.mark.unit
+    def test_batch_reuses_indexed_embeddings(self):
+        """Test that batch items matching the index are left out of inference."""
+        pipeline = ExtractionPipeline(near_duplicates=PerceptualHashIndex(max_distance=4))
+        extractor = HashingExtractor()
+
+        try:
+            asyncio.run(pipeline.extract(extractor, encoded(photo(7))))
+            results = asyncio.run(pipeline.extract_batch(
+                extractor, [encoded(photo(7), quality=70), encoded(photo(8)), b"bad"]
+            ))
+        finally:
+            pipeline.shutdown()
+
+        assert extractor.inference_rows == 2
+        assert results[0][1]['near_duplicate_distance'] <= 4
+        assert 'near_duplicate_distance' not in results[1][1]
+        assert results[2][0] is None
+        assert len(pipeline.near_duplicates) == 2
+
+    @pytest.mark.unit
+    def test_without_index_every_image_is_embedded(self):
+        """Test that hashes are reported but not consulted when no index is attached."""
+        pipeline = ExtractionPipeline()
+        extractor = HashingExtractor()
+
+        try:
+            for quality in (90, 60):
+                _, metadata = asyncio.run(pipeline.extract(extractor, encoded(photo(9), quality=quality)))
+        finally:
+            pipeline.shutdown()
+
+        assert extractor.inference_rows == 2
+        assert len(metadata['perceptual_hash']) == 16
+        assert pipeline.stats()['near_duplicates'] is None
@@ -0,0 +1,150 @@
+"""
+Unit tests for the executor stages of the extraction pipeline.
+"""
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from pipeline import ExtractionPipeline, StagePool
+from tests.conftest import create_test_image
+
+
+class FakeExtractor:
+    """Minimal extractor: real-looking prepare, deterministic inference."""
+
+    def __init__(self):
+        self.inference_threads = set()
+
+    def prepare_image(self, image_bytes):
+        if image_bytes == b"bad":
+            raise OSError("cannot identify image file")
+        return np.full((1, 3, 224, 224), len(image_bytes), dtype=np.float32), {'width': 1, 'height': 1, 'format': 'JPEG'}
+
+    def run_inference(self, input_batch):
+        self.inference_threads.add(threading.current_thread().name)
+        return input_batch[:, 0, 0, :8].copy()
+
+
+class TestStagePool:
+    """Test cases for the StagePool class."""
+
+    @pytest.mark.unit
+    def test_queue_depth_accounting(self):
+        """Test that queued/active counters track blocked tasks."""
+        pool = StagePool("test", 1)
+        release = threading.Event()
+
+        async def scenario():
+            running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            during = pool.stats()
+            release.set()
+            await asyncio.gather(*running)
+            return during
+
+        try:
+            during = asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        assert during['active'] == 1
+        assert during['queued'] == 2
+        after = pool.stats()
+        assert after['queued'] == 0 and after['active'] == 0
+        assert after['completed'] == 3
+
+    @pytest.mark.unit
+    def test_failures_are_counted_and_raised(self):
+        """Test that exceptions propagate to the caller and are counted."""
+        pool = StagePool("test", 2)
+
+        def boom():
+            raise RuntimeError("boom")
+
+        try:
+            with pytest.raises(RuntimeError):
+                asyncio.run(pool.run(boom))
+        finally:
+            pool.shutdown()
+
+        assert pool.stats()['failed'] == 1
+        assert pool.stats()['active'] == 0
+
+    @pytest.mark.unit
+    def test_pool_is_recreated_after_shutdown(self):
+        """Test that a shut down pool can be used again."""
+        pool = StagePool("test", 1)
+        assert asyncio.run(pool.run(sum, [1, 2])) == 3
+        pool.shutdown()
+        assert asyncio.run(pool.run(sum, [3, 4])) == 7
+        pool.shutdown()
+
+
+class TestExtractionPipeline:
+    """Test cases for the ExtractionPipeline class."""
+
+    @pytest.mark.unit
+    def test_extract_runs_inference_on_inference_stage(self):
+        """Test that inference runs on the inference pool threads."""
+        pipeline = ExtractionPipeline(decode_workers=2, inference_workers=1)
+        extractor = FakeExtractor()
+
+        try:
+            features, metadata = asyncio.run(pipeline.extract(extractor, b"abcd"))
+        finally:
+            pipeline.shutdown()
+
+        assert features.shape == (8,)
+        assert features[0] == 4.0
+        assert metadata['format'] == 'JPEG'
+        assert all(name.startswith("inference-stage") for name in extractor.inference_threads)
+        assert pipeline.stats()['decode']['completed'] == 1
+
+    @pytest.mark.unit
+    def test_extract_decode_error_is_value_error(self):
+        """Test that decode failures surface as ValueError."""
+        pipeline = ExtractionPipeline()
+
+        try:
+            with pytest.raises(ValueError) as exc_info:
+                asyncio.run(pipeline.extract(FakeExtractor(), b"bad"))
+        finally:
+            pipeline.shutdown()
+
+        assert "Failed to extract features" in str(exc_info.value)
+
+    @pytest.mark.unit
+    def test_extract_batch_single_inference_with_errors(self):
+        """Test that a batch decodes per item and runs one inference."""
+        pipeline = ExtractionPipeline()
+        extractor = FakeExtractor()
+
+        try:
+            results = asyncio.run(pipeline.extract_batch(extractor, [b"aa", b"bad", b"aaaa"]))
+        finally:
+            pipeline.shutdown()
+
+        assert pipeline.stats()['inference']['completed'] == 1
+        assert results[0][0][0] == 2.0
+        assert results[1][0] is None and "cannot identify" in results[1][2]
+        assert results[2][0][0] == 4.0
+
+    @pytest.mark.unit
+    def test_real_image_prepared_on_decode_stage(self):
+        """Test the decode stage with the real preprocessing code path."""
+        from unittest.mock import patch
+        from feature_extractor import ResNet50FeatureExtractor
+
+        with patch('onnxruntime.InferenceSession'):
+            extractor = ResNet50FeatureExtractor("dummy_path")
+
+        pipeline = ExtractionPipeline()
+        try:
+            tensor, metadata = asyncio.run(pipeline.prepare(extractor, create_test_image(320, 240)))
+        finally:
+            pipeline.shutdown()
+
+        assert tensor.shape == (1, 3, 224, 224)
+        assert metadata['width'] == 320
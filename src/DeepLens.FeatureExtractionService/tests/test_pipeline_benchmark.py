@@ -0,0 +1,121 @@
+"""
+Unit tests for the pipeline microbenchmark suite and the tiny stand-in model.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from feature_extractor import ResNet50FeatureExtractor
+from pipeline_benchmark import compare_reports, load_corpus, resolve_model, run_suite, summarize, synthetic_image
+from tiny_model import write_tiny_model
+
+
+@pytest.fixture
+def tiny_extractor(tmp_path):
+    """Feature extractor running the tiny generated model."""
+    return ResNet50FeatureExtractor(write_tiny_model(str(tmp_path / "tiny.onnx")))
+
+
+class TestTinyModel:
+    """Test cases for the generated stand-in model."""
+
+    @pytest.mark.unit
+    def test_matches_serving_interface(self, tiny_extractor, sample_image_bytes):
+        """Test that the tiny model takes NCHW 224x224 input and returns normalized 2048-d features."""
+        assert tiny_extractor.input_shape == ["N", 3, 224, 224]
+        features = tiny_extractor.run_inference(np.random.default_rng(0).random((3, 3, 224, 224), dtype=np.float32))
+        assert features.shape == (3, 2048)
+        np.testing.assert_allclose(np.linalg.norm(features, axis=1), 1.0, rtol=1e-5)
+
+        vector, metadata = tiny_extractor.extract_features(sample_image_bytes)
+        assert len(vector) == 2048
+        assert metadata['width'] == 224
+
+    @pytest.mark.unit
+    def test_deterministic(self, tmp_path):
+        """Test that the same seed writes the same model."""
+        first = open(write_tiny_model(str(tmp_path / "a.onnx")), 'rb').read()
+        second = open(write_tiny_model(str(tmp_path / "b.onnx")), 'rb').read()
+        assert first == second
+
+
+class TestBenchmarkHelpers:
+    """Test cases for corpus generation, summaries and comparisons."""
+
+    @pytest.mark.unit
+    def test_summarize(self):
+        """Test percentiles and throughput."""
+        summary = summarize([float(ms) for ms in range(1, 101)], images_per_call=4)
+        assert summary['runs'] == 100
+        assert summary['p50_ms'] == pytest.approx(50.5)
+        assert summary['p95_ms'] == pytest.approx(95.05)
+        assert summary['p99_ms'] == pytest.approx(99.01)
+        assert summary['images_per_second'] == pytest.approx(4 * 1000 / 50.5, rel=1e-3)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("image_format", ["JPEG", "PNG", "WEBP"])
+    def test_synthetic_image(self, image_format):
+        """Test that synthetic images decode at the requested size and format."""
+        image = Image.open(io.BytesIO(synthetic_image(64, 48, image_format)))
+        assert image.format == image_format
+        assert image.size == (64, 48)
+
+    @pytest.mark.unit
+    def test_corpus_includes_test_data(self, tmp_path, sample_image_bytes):
+        """Test that real images come first, followed by one synthetic image per size and format."""
+        (tmp_path / "photo.jpg").write_bytes(sample_image_bytes)
+        (tmp_path / "notes.txt").write_text("not an image")
+
+        corpus = load_corpus(str(tmp_path), sizes=[(32, 32), (64, 48)], formats=["JPEG", "PNG"])
+        assert [name for name, _ in corpus] == [
+            "testData/photo.jpg", "jpeg-32x32", "png-32x32", "jpeg-64x48", "png-64x48"
+        ]
+
+    @pytest.mark.unit
+    def test_missing_model_falls_back_to_tiny(self, tmp_path):
+        """Test that a missing model file is replaced by the generated one."""
+        path, tiny = resolve_model(str(tmp_path / "missing.onnx"), str(tmp_path))
+        assert tiny and path.endswith("tiny_feature_extractor.onnx")
+
+        existing = tmp_path / "model.onnx"
+        existing.write_bytes(b"onnx")
+        assert resolve_model(str(existing), str(tmp_path)) == (str(existing), False)
+
+    @pytest.mark.unit
+    def test_compare_reports(self):
+        """Test per-case speedups for cases present in both reports."""
+        before = {'results': [
+            {'benchmark': 'decode', 'case': 'a', 'p50_ms': 10.0, 'p99_ms': 20.0},
+            {'benchmark': 'decode', 'case': 'gone', 'p50_ms': 1.0, 'p99_ms': 1.0}
+        ]}
+        after = {'results': [
+            {'benchmark': 'decode', 'case': 'a', 'p50_ms': 5.0, 'p99_ms': 8.0},
+            {'benchmark': 'decode', 'case': 'new', 'p50_ms': 1.0, 'p99_ms': 1.0}
+        ]}
+        changes = compare_reports(before, after)
+        assert len(changes) == 1
+        assert changes[0]['speedup'] == 2.0
+        assert changes[0]['p99_ms_after'] == 8.0
+
+
+class TestRunSuite:
+    """Test cases for the full suite on the tiny model."""
+
+    @pytest.mark.unit
+    def test_every_stage_is_measured(self, tiny_extractor):
+        """Test that each image gets decode, preprocess and end-to-end results, plus one per batch size."""
+        corpus = [("png-64x48", synthetic_image(64, 48, "PNG"))]
+        results = run_suite(tiny_extractor, corpus, batch_sizes=[1, 2], runs=3, warmup=1)
+
+        assert [(r['benchmark'], r['case']) for r in results] == [
+            ("decode", "png-64x48"), ("preprocess", "png-64x48"), ("end_to_end", "png-64x48"),
+            ("inference", "batch-1"), ("inference", "batch-2")
+        ]
+        for result in results:
+            assert result['runs'] == 3
+            assert 0 < result['p50_ms'] <= result['p99_ms']
+            assert result['images_per_second'] > 0
+        assert results[0]['width'] == 64
+        assert results[-1]['batch_size'] == 2
@@ -0,0 +1,237 @@
+"""
+Unit tests for the pre-forked inference worker pool.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from feature_extractor import ResNet50FeatureExtractor
+from prefork import (
+    InferenceWorkerPool,
+    PreforkFeatureExtractor,
+    partition_cores,
+    prepare_shared_model,
+    process_memory
+)
+from scaling_benchmark import default_counts, drive
+from tests.conftest import create_test_image
+from tiny_model import write_tiny_model
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="requires fork")
+
+
+class FakeWorkerExtractor:
+    """
+    Worker-side extractor: sleeps for batch[0, 0, 0, 0] seconds and answers
+    each row with (pid, intra-op threads, cores it may run on).
+    A negative first value makes the worker process exit.
+    """
+
+    def __init__(self, threads):
+        self.threads = threads
+
+    def run_inference(self, input_batch):
+        delay = float(input_batch[0, 0, 0, 0])
+        if delay < 0:
+            os._exit(1)
+        if delay > 100:
+            raise ValueError("bad batch")
+        time.sleep(delay)
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else 0
+        return np.tile([os.getpid(), self.threads or 0, cores], (input_batch.shape[0], 1)).astype(np.float32)
+
+
+def fake_factory(model_path, threads, shared_weights):
+    if model_path == "broken.onnx":
+        raise RuntimeError("cannot load model")
+    return FakeWorkerExtractor(threads)
+
+
+def batch(rows=1, delay=0.0):
+    tensor = np.zeros((rows, 3, 2, 2), dtype=np.float32)
+    tensor[0, 0, 0, 0] = delay
+    return tensor
+
+
+@pytest.fixture
+def pool():
+    pool = InferenceWorkerPool("model.onnx", [[], []], extractor_factory=fake_factory, start_timeout=30)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+class TestPartitionCores:
+    """Test cases for partition_cores."""
+
+    @pytest.mark.unit
+    def test_even_split(self):
+        """Test that cores are split into contiguous equal sets."""
+        reserved, sets = partition_cores(2, cores=[0, 1, 2, 3])
+        assert reserved == []
+        assert sets == [[0, 1], [2, 3]]
+
+    @pytest.mark.unit
+    def test_remainder_and_reserve(self):
+        """Test that reserved cores come first and leftovers go to the first workers."""
+        reserved, sets = partition_cores(2, cores=[0, 1, 2, 3, 4, 5], reserve=1)
+        assert reserved == [0]
+        assert sets == [[1, 2, 3], [4, 5]]
+
+    @pytest.mark.unit
+    def test_too_many_workers(self):
+        """Test that more workers than free cores is rejected."""
+        with pytest.raises(ValueError):
+            partition_cores(3, cores=[0, 1, 2], reserve=1)
+
+
+class TestInferenceWorkerPool:
+    """Test cases for the InferenceWorkerPool class."""
+
+    @pytest.mark.unit
+    def test_results_come_from_worker_processes(self, pool):
+        """Test that inference runs in separate processes and counters add up."""
+        result = pool.infer(batch(rows=3))
+
+        assert result.shape == (3, 3)
+        assert int(result[0, 0]) != os.getpid()
+        assert int(result[0, 0]) in {worker['pid'] for worker in pool.stats()['workers']}
+        stats = pool.stats()
+        assert stats['alive'] == 2
+        assert sum(worker['completed'] for worker in stats['workers']) == 3
+        assert all(worker['outstanding'] == 0 for worker in stats['workers'])
+
+    @pytest.mark.unit
+    def test_routes_to_least_outstanding_worker(self, pool):
+        """Test that a busy worker is skipped while another worker is idle."""
+        slow = pool.submit(batch(rows=4, delay=0.5))
+        time.sleep(0.05)
+        busy_pid = [w['pid'] for w in pool.stats()['workers'] if w['outstanding'] == 4][0]
+
+        fast_pids = {int(pool.infer(batch())[0, 0]) for _ in range(3)}
+
+        assert fast_pids and busy_pid not in fast_pids
+        assert int(slow.result()[0, 0]) == busy_pid
+
+    @pytest.mark.unit
+    def test_concurrent_callers(self, pool):
+        """Test that concurrent callers each get their own result."""
+        results = []
+
+        def call():
+            results.append(pool.infer(batch(rows=2, delay=0.01)).shape)
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [(2, 3)] * 8
+        assert sum(worker['completed'] for worker in pool.stats()['workers']) == 16
+
+    @pytest.mark.unit
+    def test_inference_errors_propagate(self, pool):
+        """Test that a failing batch raises in the caller without killing the worker."""
+        with pytest.raises(RuntimeError, match="bad batch"):
+            pool.infer(batch(delay=1000))
+        assert pool.stats()['alive'] == 2
+
+    @pytest.mark.unit
+    def test_dead_worker_leaves_rotation(self, pool):
+        """Test that a crashed worker fails its request and the rest keep serving."""
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.infer(batch(delay=-1))
+
+        assert pool.alive_workers == 1
+        assert pool.infer(batch()).shape == (1, 3)
+
+    @pytest.mark.unit
+    def test_workers_are_pinned(self):
+        """Test that each worker runs on its core set with a matching thread count."""
+        core = sorted(os.sched_getaffinity(0))[0] if hasattr(os, 'sched_getaffinity') else None
+        if core is None:
+            pytest.skip("requires sched_setaffinity")
+        pool = InferenceWorkerPool("model.onnx", [[core]], extractor_factory=fake_factory, start_timeout=30)
+        pool.start()
+        try:
+            _, threads, cores = pool.infer(batch())[0]
+        finally:
+            pool.shutdown()
+        assert (threads, cores) == (1, 1)
+
+    @pytest.mark.unit
+    def test_load_failure_raises(self):
+        """Test that a worker failing to load the model fails start()."""
+        pool = InferenceWorkerPool("broken.onnx", [[]], extractor_factory=fake_factory, start_timeout=30)
+        with pytest.raises(RuntimeError, match="cannot load model"):
+            pool.start()
+
+    @pytest.mark.unit
+    def test_memory_report(self, pool):
+        """Test that per-worker memory is reported where /proc is available."""
+        memory = pool.memory()
+        assert len(memory) == 2
+        if memory[0] is not None:
+            assert memory[0]['pss_mb'] <= memory[0]['rss_mb']
+        assert process_memory(-1) is None
+
+
+class TestPreforkFeatureExtractor:
+    """Test cases for the PreforkFeatureExtractor class."""
+
+    @pytest.mark.unit
+    def test_preprocesses_locally_and_infers_on_pool(self, pool):
+        """Test that images are decoded in-process and inference goes to a worker."""
+        extractor = PreforkFeatureExtractor(pool)
+        assert extractor.is_loaded()
+        assert extractor.session is None
+
+        tensor, metadata = extractor.prepare_image(create_test_image(width=64, height=48))
+        assert tensor.shape == (1, 3, 224, 224)
+        assert metadata['width'] == 64
+
+        # All-zero batch: the fake worker answers without sleeping
+        features = extractor.run_inference(np.zeros_like(tensor))
+        assert features.shape == (1, 3)
+
+
+class TestSharedModel:
+    """Test cases for prepare_shared_model."""
+
+    @pytest.mark.unit
+    def test_shared_model_matches_source(self, tmp_path):
+        """Test that the shared-weight model gives the source model's features and is reused."""
+        model_path = write_tiny_model(str(tmp_path / "tiny.onnx"), feature_dimension=16, input_size=(8, 8))
+
+        shared_path = prepare_shared_model(model_path, str(tmp_path / "shared"))
+        assert os.path.exists(shared_path + ".data")
+        written_at = os.path.getmtime(shared_path)
+        assert prepare_shared_model(model_path, str(tmp_path / "shared")) == shared_path
+        assert os.path.getmtime(shared_path) == written_at
+
+        inputs = np.random.default_rng(0).standard_normal((2, 3, 8, 8)).astype(np.float32)
+        expected = ResNet50FeatureExtractor(model_path).run_inference(inputs)
+        shared = ResNet50FeatureExtractor(shared_path, intra_op_threads=1, shared_weights=True)
+        np.testing.assert_allclose(shared.run_inference(inputs), expected, atol=1e-5)
+
+
+class TestScalingBenchmark:
+    """Test cases for the scaling benchmark helpers."""
+
+    @pytest.mark.unit
+    def test_default_counts(self):
+        """Test that worker counts double up to all cores."""
+        assert default_counts(1) == [1]
+        assert default_counts(6) == [1, 2, 4, 6]
+        assert default_counts(8) == [1, 2, 4, 8]
+
+    @pytest.mark.unit
+    def test_drive_reports_throughput(self, pool):
+        """Test that the load driver reports throughput and percentiles."""
+        result = drive(pool.infer, batch(rows=2), requests=10, concurrency=2)
+        assert result['images_per_second'] > 0
+        assert result['p50_ms'] <= result['p95_ms']
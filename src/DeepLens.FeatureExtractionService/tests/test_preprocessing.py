@@ -0,0 +1,130 @@
+"""
+Unit tests for fused preprocessing and reusable batch buffers.
+"""
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing import BatchBuffer, Preprocessor
+from preprocess_benchmark import IMAGENET_MEAN, IMAGENET_STD, legacy_preprocess, run_benchmarks
+
+
+def random_image(seed: int = 0, size=(224, 224)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+
+class TestPreprocessor:
+    """Test cases for the fused multiply-add normalization."""
+
+    @pytest.mark.unit
+    def test_matches_legacy_preprocessing(self):
+        """Test that fused output equals divide/subtract/divide/transpose."""
+        preprocessor = Preprocessor(IMAGENET_MEAN, IMAGENET_STD)
+        image = random_image()
+
+        np.testing.assert_allclose(
+            preprocessor.normalize(image),
+            legacy_preprocess(image, IMAGENET_MEAN, IMAGENET_STD),
+            atol=1e-5
+        )
+
+    @pytest.mark.unit
+    def test_output_is_contiguous_nchw_float32(self):
+        """Test that tensors can be passed to ONNX Runtime without a copy."""
+        tensor = Preprocessor(IMAGENET_MEAN, IMAGENET_STD).normalize(random_image())
+
+        assert tensor.shape == (1, 3, 224, 224)
+        assert tensor.dtype == np.float32
+        assert tensor.flags['C_CONTIGUOUS']
+
+    @pytest.mark.unit
+    def test_normalize_into_writes_destination(self):
+        """Test that normalize_into fills the given buffer row in place."""
+        preprocessor = Preprocessor(IMAGENET_MEAN, IMAGENET_STD)
+        batch = np.zeros((2, 3, 224, 224), dtype=np.float32)
+
+        result = preprocessor.normalize_into(random_image(1), batch[1])
+
+        assert result is not None and np.shares_memory(result, batch)
+        assert np.all(batch[0] == 0)
+        np.testing.assert_allclose(batch[1], preprocessor.normalize(random_image(1))[0])
+
+    @pytest.mark.unit
+    def test_non_square_input_size(self):
+        """Test that (width, height) maps to a (3, height, width) sample."""
+        preprocessor = Preprocessor(IMAGENET_MEAN, IMAGENET_STD, input_size=(64, 32))
+
+        assert preprocessor.sample_shape == (3, 32, 64)
+        assert preprocessor.normalize(random_image(size=(64, 32))).shape == (1, 3, 32, 64)
+
+
+class TestBatchBuffer:
+    """Test cases for the per-thread reusable buffers."""
+
+    @pytest.mark.unit
+    def test_buffer_reused_across_batches(self):
+        """Test that same-size and smaller batches reuse one allocation."""
+        buffer = BatchBuffer()
+
+        first = buffer.acquire(8, (3, 4, 4))
+        second = buffer.acquire(8, (3, 4, 4))
+        smaller = buffer.acquire(2, (3, 4, 4))
+
+        assert buffer.allocations == 1
+        assert np.shares_memory(first, second) and np.shares_memory(first, smaller)
+        assert smaller.flags['C_CONTIGUOUS']
+
+    @pytest.mark.unit
+    def test_buffer_grows_for_larger_batches(self):
+        """Test that a larger batch or a new sample shape reallocates."""
+        buffer = BatchBuffer()
+
+        buffer.acquire(2, (3, 4, 4))
+        assert buffer.acquire(4, (3, 4, 4)).shape == (4, 3, 4, 4)
+        assert buffer.acquire(4, (3, 8, 8)).shape == (4, 3, 8, 8)
+        assert buffer.allocations == 3
+
+    @pytest.mark.unit
+    def test_stack(self):
+        """Test that stack concatenates tensors into the buffer."""
+        buffer = BatchBuffer()
+        tensors = [np.full((1, 3, 2, 2), i, dtype=np.float32) for i in range(3)]
+
+        stacked = buffer.stack(tensors)
+
+        np.testing.assert_array_equal(stacked, np.concatenate(tensors, axis=0))
+
+    @pytest.mark.unit
+    def test_buffers_are_per_thread(self):
+        """Test that worker threads never share a buffer."""
+        buffer = BatchBuffer()
+        views = []
+
+        def worker():
+            views.append(buffer.acquire(4, (3, 4, 4)))
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert buffer.allocations == 2
+        assert not np.shares_memory(views[0], views[1])
+
+
+class TestPreprocessBenchmark:
+    """Test cases for the preprocessing microbenchmark."""
+
+    @pytest.mark.unit
+    def test_report_shows_allocation_savings(self):
+        """Test that the fused batch path allocates far less than the legacy one."""
+        report = run_benchmarks(batch_size=4, runs=4, input_size=(64, 64))
+
+        batch = report['batch']
+        assert batch['fused']['peak_alloc_bytes'] < batch['legacy']['peak_alloc_bytes']
+        assert report['batch_buffer_allocations'] == 1
+        assert report['max_abs_difference'] < 1e-5
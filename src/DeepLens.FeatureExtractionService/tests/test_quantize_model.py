@@ -0,0 +1,187 @@
+"""
+Unit tests for the INT8 quantization tool and its comparison report.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from config import Settings, quantized_model_path_for
+from quantize_model import (
+    ImageCalibrationReader,
+    benchmark,
+    compare,
+    cosine_agreement,
+    find_images,
+    quantize
+)
+
+
+class FakeExtractor:
+    """Returns fixed embeddings, optionally perturbed like a quantized model"""
+
+    def __init__(self, noise: float = 0.0):
+        self.noise = noise
+        self.calls = 0
+
+    def run_inference(self, input_batch):
+        self.calls += 1
+        features = input_batch.reshape(input_batch.shape[0], -1)[:, :64].copy()
+        if self.noise:
+            features += self.noise * np.random.default_rng(self.calls).standard_normal(features.shape)
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def tensors(count: int = 4):
+    rng = np.random.default_rng(0)
+    return [rng.standard_normal((1, 3, 8, 8)).astype(np.float32) for _ in range(count)]
+
+
+class TestQuantizationSettings:
+    """Test cases for the precision switch."""
+
+    @pytest.mark.unit
+    def test_fp32_serves_model_path(self):
+        """Test that fp32 precision loads the configured model unchanged."""
+        settings = Settings(model_path="/models/resnet50-v2-7.onnx")
+
+        assert settings.serving_model_path == "/models/resnet50-v2-7.onnx"
+        assert settings.serving_model_version == settings.model_version
+
+    @pytest.mark.unit
+    def test_int8_serves_quantized_model(self):
+        """Test that int8 precision loads the quantized copy with a distinct version."""
+        settings = Settings(model_path="/models/resnet50-v2-7.onnx", model_precision="int8")
+
+        assert settings.serving_model_path == "/models/resnet50-v2-7-int8.onnx"
+        assert settings.serving_model_version == f"{settings.model_version}-int8"
+
+    @pytest.mark.unit
+    def test_explicit_quantized_path(self):
+        """Test that QUANTIZED_MODEL_PATH overrides the derived path."""
+        settings = Settings(model_precision="int8", quantized_model_path="/models/custom.onnx")
+
+        assert settings.serving_model_path == "/models/custom.onnx"
+
+    @pytest.mark.unit
+    def test_invalid_precision(self):
+        """Test that unknown precisions are rejected."""
+        with pytest.raises(ValueError):
+            Settings(model_precision="int4")
+
+    @pytest.mark.unit
+    def test_quantized_path_for(self):
+        """Test derivation of the default INT8 model path."""
+        assert quantized_model_path_for("model.onnx") == "model-int8.onnx"
+        assert quantized_model_path_for("model") == "model-int8.onnx"
+
+
+class TestComparisonReport:
+    """Test cases for latency, throughput and agreement measurement."""
+
+    @pytest.mark.unit
+    def test_cosine_agreement_identical(self):
+        """Test that identical embeddings agree perfectly."""
+        embeddings = np.eye(4, dtype=np.float32)
+
+        agreement = cosine_agreement(embeddings, embeddings)
+
+        assert agreement == {'mean': 1.0, 'min': 1.0, 'p5': 1.0}
+
+    @pytest.mark.unit
+    def test_cosine_agreement_orthogonal(self):
+        """Test that orthogonal embeddings have zero agreement."""
+        agreement = cosine_agreement(np.eye(2), np.eye(2)[::-1])
+
+        assert agreement['mean'] == pytest.approx(0.0)
+
+    @pytest.mark.unit
+    def test_benchmark_fields(self):
+        """Test that the benchmark reports latency percentiles and throughput."""
+        extractor = FakeExtractor()
+
+        stats = benchmark(extractor, tensors(), batch_size=3, runs=5, warmup=2)
+
+        assert extractor.calls == 2 + 5 + 5
+        assert stats['batch_size'] == 3
+        assert stats['latency_p95_ms'] >= stats['latency_p50_ms'] >= 0
+        assert stats['throughput_images_per_s'] > 0
+
+    @pytest.mark.unit
+    def test_compare_report(self):
+        """Test the fp32 versus int8 report structure and agreement."""
+        report = compare(FakeExtractor(), FakeExtractor(noise=0.01), tensors(), batch_size=2, runs=3)
+
+        assert report['images'] == 4
+        assert set(report) >= {'fp32', 'int8', 'latency_speedup', 'throughput_speedup', 'cosine_agreement'}
+        assert 0.95 < report['cosine_agreement']['mean'] < 1.0
+
+
+class TestQuantize:
+    """Test cases for producing the quantized model."""
+
+    @pytest.mark.unit
+    def test_calibration_reader_rewinds(self):
+        """Test that the calibration reader yields every tensor, then None, and rewinds."""
+        reader = ImageCalibrationReader("data", tensors(2))
+
+        assert reader.get_next() is not None
+        assert reader.get_next() is not None
+        assert reader.get_next() is None
+        reader.rewind()
+        assert reader.get_next()["data"].shape == (1, 3, 8, 8)
+
+    @pytest.mark.unit
+    def test_static_requires_calibration(self, tmp_path):
+        """Test that static mode without calibration images is rejected."""
+        with pytest.raises(ValueError):
+            quantize("model.onnx", str(tmp_path / "out.onnx"), mode="static")
+
+    @pytest.mark.unit
+    def test_unknown_mode(self, tmp_path):
+        """Test that unknown modes are rejected."""
+        with pytest.raises(ValueError):
+            quantize("model.onnx", str(tmp_path / "out.onnx"), mode="fp8")
+
+    @pytest.mark.unit
+    def test_find_images(self, tmp_path):
+        """Test that only image files are picked up, in name order."""
+        for name in ("b.jpg", "a.PNG", "notes.txt"):
+            (tmp_path / name).write_bytes(b"")
+
+        assert [os.path.basename(p) for p in find_images(str(tmp_path))] == ["a.PNG", "b.jpg"]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("mode", ["dynamic", "static"])
+    def test_quantize_tiny_model(self, tmp_path, mode):
+        """Test quantizing a small conv model keeps its embeddings close to fp32."""
+        onnx = pytest.importorskip("onnx")
+        ort = pytest.importorskip("onnxruntime")
+        from onnx import TensorProto, helper, numpy_helper
+
+        rng = np.random.default_rng(0)
+        weight = numpy_helper.from_array(rng.standard_normal((16, 3, 3, 3)).astype(np.float32), "w")
+        graph = helper.make_graph(
+            [
+                helper.make_node("Conv", ["data", "w"], ["conv"], pads=[1, 1, 1, 1]),
+                helper.make_node("Relu", ["conv"], ["relu"]),
+                helper.make_node("GlobalAveragePool", ["relu"], ["pool"]),
+                helper.make_node("Flatten", ["pool"], ["features"])
+            ],
+            "tiny",
+            [helper.make_tensor_value_info("data", TensorProto.FLOAT, ["N", 3, 8, 8])],
+            [helper.make_tensor_value_info("features", TensorProto.FLOAT, ["N", 16])],
+            initializer=[weight]
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+        fp32_path = str(tmp_path / "tiny.onnx")
+        onnx.save(model, fp32_path)
+
+        calibration = tensors(8)
+        int8_path = quantize(fp32_path, quantized_model_path_for(fp32_path), mode=mode,
+                             calibration_tensors=calibration)
+
+        batch = np.concatenate(calibration, axis=0)
+        fp32 = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).run(None, {"data": batch})[0]
+        int8 = ort.InferenceSession(int8_path, providers=["CPUExecutionProvider"]).run(None, {"data": batch})[0]
+        assert cosine_agreement(fp32, int8)['mean'] > 0.98
@@ -0,0 +1,230 @@
+"""
+Unit tests for the two-lane PriorityScheduler.
+Uses a fake extractor recording the marker values of every batch it runs.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import ExtractionPipeline, StagePool
+from scheduling import BULK, INTERACTIVE, LaneFullError, PriorityScheduler
+
+
+class RecordingExtractor:
+    """Records each batch's markers and the peak number of concurrent batches."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def run_inference(self, input_batch):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+            self.batches.append([float(marker) for marker in input_batch[:, 0, 0, 0]])
+        return input_batch[:, 0, 0, :4].copy()
+
+
+def make_input(marker: float) -> np.ndarray:
+    """Create a (1, 3, 8, 8) tensor filled with a marker value."""
+    return np.full((1, 3, 8, 8), marker, dtype=np.float32)
+
+
+def run_scheduler(coroutine_factory, workers=1, **kwargs):
+    """Start a scheduler on an inference pool, run the coroutine against it and stop it again."""
+    pool = StagePool("inference", workers)
+
+    async def scenario():
+        scheduler = PriorityScheduler(executor=pool, **kwargs)
+        await scheduler.start()
+        try:
+            return await coroutine_factory(scheduler), scheduler
+        finally:
+            await scheduler.stop()
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+
+class TestPriorityScheduler:
+    """Test cases for the PriorityScheduler class."""
+
+    @pytest.mark.unit
+    def test_interactive_overtakes_queued_bulk(self):
+        """Test that a query waits for the bulk batch in flight only, not the bulk backlog."""
+        extractor = RecordingExtractor(delay=0.02)
+
+        async def scenario(scheduler):
+            bulk = asyncio.ensure_future(
+                scheduler.submit_many(extractor, [make_input(1) for _ in range(32)], BULK)
+            )
+            await asyncio.sleep(0.005)
+            query = await scheduler.submit(extractor, make_input(-1), INTERACTIVE)
+            await bulk
+            return query
+
+        query, scheduler = run_scheduler(
+            scenario, interactive_batch_size=4, bulk_batch_size=8, bulk_window_ms=0
+        )
+
+        assert query[0] == -1.0
+        assert extractor.batches[1] == [-1.0]
+        assert [len(batch) for batch in extractor.batches] == [8, 1, 8, 8, 8]
+        lanes = scheduler.stats()['lanes']
+        assert lanes[INTERACTIVE]['max_wait_ms'] < lanes[BULK]['max_wait_ms']
+
+    @pytest.mark.unit
+    def test_bulk_batched_within_window(self):
+        """Test that bulk images arriving within the window share one large batch."""
+        extractor = RecordingExtractor()
+
+        async def scenario(scheduler):
+            return await asyncio.gather(
+                *(scheduler.submit(extractor, make_input(i), BULK) for i in range(10))
+            )
+
+        results, scheduler = run_scheduler(scenario, bulk_batch_size=32, bulk_window_ms=50)
+
+        assert extractor.batches == [[float(i) for i in range(10)]]
+        assert [features[0] for features in results] == [float(i) for i in range(10)]
+        assert scheduler.stats()['lanes'][BULK]['avg_batch_size'] == 10.0
+
+    @pytest.mark.unit
+    def test_interactive_batches_stay_small(self):
+        """Test that queued interactive images are split into small batches."""
+        extractor = RecordingExtractor(delay=0.01)
+
+        async def scenario(scheduler):
+            return await asyncio.gather(
+                *(scheduler.submit(extractor, make_input(i), INTERACTIVE) for i in range(9))
+            )
+
+        results, _ = run_scheduler(scenario, interactive_batch_size=4)
+
+        assert len(results) == 9
+        assert max(len(batch) for batch in extractor.batches) <= 4
+        assert sum(len(batch) for batch in extractor.batches) == 9
+
+    @pytest.mark.unit
+    def test_bulk_never_takes_reserved_thread(self):
+        """Test that with several threads, one is kept free of bulk batches."""
+        extractor = RecordingExtractor(delay=0.03)
+
+        async def scenario(scheduler):
+            bulk = asyncio.ensure_future(
+                scheduler.submit_many(extractor, [make_input(1) for _ in range(12)], BULK)
+            )
+            await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            await scheduler.submit(extractor, make_input(-1), INTERACTIVE)
+            query_seconds = time.perf_counter() - start
+            await bulk
+            return query_seconds
+
+        query_seconds, scheduler = run_scheduler(scenario, workers=2, bulk_batch_size=4, bulk_window_ms=0)
+
+        assert scheduler.bulk_slots == 1
+        assert extractor.max_running == 2
+        # Ran next to the bulk batch in flight instead of after it
+        assert query_seconds < 0.05
+
+    @pytest.mark.unit
+    def test_full_bulk_queue_rejects(self):
+        """Test that the bulk queue is bounded and the interactive lane is not."""
+        extractor = RecordingExtractor()
+
+        async def scenario(scheduler):
+            waiting = asyncio.ensure_future(
+                scheduler.submit_many(extractor, [make_input(1) for _ in range(3)], BULK)
+            )
+            await asyncio.sleep(0)
+            with pytest.raises(LaneFullError):
+                await scheduler.submit_many(extractor, [make_input(2) for _ in range(2)], BULK)
+            await asyncio.gather(
+                *(scheduler.submit(extractor, make_input(3), INTERACTIVE) for _ in range(8))
+            )
+            return await waiting
+
+        results, scheduler = run_scheduler(scenario, bulk_queue_size=4, bulk_window_ms=100)
+
+        assert len(results) == 3
+        bulk = scheduler.stats()['lanes'][BULK]
+        assert bulk['rejected'] == 2 and bulk['submitted'] == 3
+
+    @pytest.mark.unit
+    def test_retry_after_from_drain_rate(self):
+        """Test that a full lane's Retry-After is its queue depth over the measured drain rate."""
+        scheduler = PriorityScheduler(executor=StagePool("inference", 2), bulk_queue_size=4)
+        bulk = scheduler.lane(BULK)
+
+        assert scheduler.retry_after(BULK) == 1
+        for _ in range(5):
+            bulk.record_batch(4)
+        assert bulk.drain_rate(scheduler.RATE_WINDOW) == 2.0
+        bulk.queue.extend(object() for _ in range(9))
+        assert scheduler.retry_after(BULK) == 5
+        bulk.queue.extend(object() for _ in range(1000))
+        assert scheduler.retry_after(BULK) == scheduler.MAX_RETRY_AFTER
+        scheduler.executor.shutdown()
+
+    @pytest.mark.unit
+    def test_single_thread_warns(self, caplog):
+        """Test that a pool with no thread to reserve for interactive batches is reported."""
+        pool = StagePool("inference", 1)
+        with caplog.at_level("WARNING", logger="scheduling"):
+            PriorityScheduler(executor=pool)
+        pool.shutdown()
+        assert "none can be reserved" in caplog.text
+
+    @pytest.mark.unit
+    def test_batches_never_mix_models(self):
+        """Test that inputs for different extractors run in separate batches."""
+        first, second = RecordingExtractor(), RecordingExtractor()
+
+        async def scenario(scheduler):
+            return await asyncio.gather(
+                *(scheduler.submit(first if i % 2 else second, make_input(i), BULK) for i in range(6))
+            )
+
+        results, _ = run_scheduler(scenario, bulk_window_ms=50)
+
+        assert [features[0] for features in results] == [float(i) for i in range(6)]
+        assert first.batches == [[1.0, 3.0, 5.0]]
+        assert second.batches == [[0.0, 2.0, 4.0]]
+
+    @pytest.mark.unit
+    def test_failure_and_unknown_lane(self):
+        """Test that inference errors reach the caller and unknown lanes are rejected."""
+        class BrokenExtractor:
+            def run_inference(self, input_batch):
+                raise RuntimeError("session crashed")
+
+        async def scenario(scheduler):
+            with pytest.raises(RuntimeError, match="session crashed"):
+                await scheduler.submit(BrokenExtractor(), make_input(0))
+            with pytest.raises(ValueError):
+                await scheduler.submit(RecordingExtractor(), make_input(0), "urgent")
+
+        run_scheduler(scenario)
+
+    @pytest.mark.unit
+    def test_decode_pool_reserved_while_scheduled(self):
+        """Test that interactive requests get their own decode threads only with a scheduler."""
+        pipeline = ExtractionPipeline(decode_workers=2, inference_workers=1)
+
+        assert pipeline.decode_pool(INTERACTIVE) is pipeline.decode
+        pipeline.scheduler = PriorityScheduler(executor=pipeline.inference)
+        assert pipeline.decode_pool(INTERACTIVE) is pipeline.interactive_decode
+        assert pipeline.decode_pool(BULK) is pipeline.decode
+        assert pipeline.stats()['scheduler']['lanes'][BULK]['queue_depth'] == 0
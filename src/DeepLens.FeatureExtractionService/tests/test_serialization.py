@@ -0,0 +1,96 @@
+"""
+Unit tests for response serialization and content negotiation.
+"""
+import io
+import json
+
+import numpy as np
+import pytest
+
+import serialization
+from serialization import (
+    MEDIA_JSON,
+    MEDIA_NPY,
+    MEDIA_OCTET_STREAM,
+    binary_response,
+    dumps_json,
+    metadata_headers,
+    negotiate_media_type
+)
+
+
+class TestNegotiateMediaType:
+    """Test cases for Accept header negotiation."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("accept,expected", [
+        (None, MEDIA_JSON),
+        ("", MEDIA_JSON),
+        ("*/*", MEDIA_JSON),
+        ("application/json", MEDIA_JSON),
+        ("application/octet-stream", MEDIA_OCTET_STREAM),
+        ("application/x-npy", MEDIA_NPY),
+        ("text/html, application/octet-stream", MEDIA_OCTET_STREAM),
+        ("application/json;q=0.5, application/x-npy", MEDIA_NPY),
+        ("application/x-npy;q=0, application/json", MEDIA_JSON),
+        ("application/octet-stream, application/x-npy", MEDIA_OCTET_STREAM),
+        ("image/png", MEDIA_JSON),
+    ])
+    def test_negotiation(self, accept, expected):
+        """Test media type selection for various Accept headers."""
+        assert negotiate_media_type(accept) == expected
+
+
+class TestSerializers:
+    """Test cases for JSON and binary serializers."""
+
+    @pytest.mark.unit
+    def test_dumps_json_round_trips_float32(self):
+        """Test that float32 arrays serialize to values equal after float32 cast."""
+        features = np.random.default_rng(0).standard_normal(2048).astype(np.float32)
+        payload = json.loads(dumps_json({'features': features, 'image_id': None}))
+
+        assert payload['image_id'] is None
+        np.testing.assert_array_equal(np.array(payload['features'], dtype=np.float32), features)
+
+    @pytest.mark.unit
+    def test_dumps_json_without_orjson(self, monkeypatch):
+        """Test the standard-library fallback serializer."""
+        monkeypatch.setattr(serialization, 'orjson', None)
+        features = np.array([0.5, -0.25], dtype=np.float32)
+
+        payload = json.loads(dumps_json({'features': features, 'dimension': np.int64(2)}))
+
+        assert payload == {'features': [0.5, -0.25], 'dimension': 2}
+
+    @pytest.mark.unit
+    def test_octet_stream_is_raw_little_endian_float32(self):
+        """Test that the octet-stream body is the raw vector buffer."""
+        features = np.linspace(-1, 1, 2048, dtype=np.float32)
+        response = binary_response(features, MEDIA_OCTET_STREAM, {'X-Model-Name': 'resnet50'})
+
+        assert len(response.body) == 2048 * 4
+        np.testing.assert_array_equal(np.frombuffer(response.body, dtype='<f4'), features)
+        assert response.headers['x-feature-shape'] == '2048'
+        assert response.headers['x-model-name'] == 'resnet50'
+
+    @pytest.mark.unit
+    def test_npy_body_loads_with_numpy(self):
+        """Test that the npy body is a valid .npy file."""
+        matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+        response = binary_response(matrix, MEDIA_NPY)
+
+        loaded = np.load(io.BytesIO(response.body), allow_pickle=False)
+
+        np.testing.assert_array_equal(loaded, matrix)
+        assert response.headers['x-feature-shape'] == '2,3'
+
+    @pytest.mark.unit
+    def test_metadata_headers_encode_image_id(self):
+        """Test that image ids are safe to send as header values."""
+        headers = metadata_headers("resnet50", "v2.7", 1.234, image_id="saree 1/ü",
+                                   metadata={'width': 10, 'height': 20, 'format': 'PNG'})
+
+        assert headers['X-Image-Id'] == 'saree%201%2F%C3%BC'
+        assert headers['X-Processing-Time-Ms'] == '1.23'
+        assert headers['X-Image-Width'] == '10'
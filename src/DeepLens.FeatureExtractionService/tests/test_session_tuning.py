@@ -0,0 +1,155 @@
+"""
+Unit tests for ONNX Runtime tuning profiles and the autotuner.
+"""
+import json
+
+import onnxruntime as ort
+import pytest
+
+import session_tuning
+from autotune import autotune, memory_candidates, select_best, thread_counts, threading_candidates
+from config import SessionTuning
+from session_tuning import build_session_options, load_tuning_profile, node_fingerprint, save_tuning_profile
+
+
+def fake_measure(tuning, batch_size):
+    """Synthetic machine: 4 threads is fastest, no arena is slightly faster, latency grows with batch."""
+    per_image_ms = 10.0 / min(tuning.intra_op_threads, 4)
+    if tuning.execution_mode == "parallel":
+        per_image_ms *= 1.2
+    if not tuning.enable_cpu_mem_arena:
+        per_image_ms *= 0.9
+    latency = per_image_ms * batch_size * 0.8 + 1.0
+    return {
+        'images_per_second': round(batch_size * 1000 / latency, 2),
+        'p50_ms': latency,
+        'p99_ms': latency * 1.1,
+        'mean_ms': latency
+    }
+
+
+class TestSessionOptions:
+    """Test cases for build_session_options."""
+
+    @pytest.mark.unit
+    def test_defaults_match_previous_behaviour(self):
+        """Test that no profile means full optimization and ORT threading defaults."""
+        options = build_session_options()
+        assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        assert options.intra_op_num_threads == 0
+        assert options.execution_mode == ort.ExecutionMode.ORT_SEQUENTIAL
+        assert options.enable_cpu_mem_arena and options.enable_mem_pattern
+
+    @pytest.mark.unit
+    def test_profile_is_applied(self):
+        """Test that every tuning field reaches the session options."""
+        options = build_session_options(SessionTuning(
+            graph_optimization_level="extended",
+            intra_op_threads=3,
+            inter_op_threads=2,
+            execution_mode="parallel",
+            enable_cpu_mem_arena=False,
+            enable_mem_pattern=False,
+            allow_spinning=False
+        ))
+        assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        assert (options.intra_op_num_threads, options.inter_op_num_threads) == (3, 2)
+        assert options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+        assert not options.enable_cpu_mem_arena and not options.enable_mem_pattern
+        assert options.get_session_config_entry('session.intra_op.allow_spinning') == '0'
+
+
+class TestTuningProfiles:
+    """Test cases for saving and selecting named profiles."""
+
+    @pytest.mark.unit
+    def test_profiles_for_several_node_types(self, tmp_path):
+        """Test that saving keeps other profiles and loading picks by name."""
+        path = str(tmp_path / "profiles.json")
+        save_tuning_profile(path, "small-node", SessionTuning(intra_op_threads=2), {'p99_ms': 9.0})
+        save_tuning_profile(path, "big-node", SessionTuning(intra_op_threads=16, batch_size=8), {'p99_ms': 20.0},
+                            target_p99_ms=25.0)
+
+        with open(path) as f:
+            data = json.load(f)
+        assert set(data['profiles']) == {"small-node", "big-node"}
+        assert data['profiles']["big-node"]['target_p99_ms'] == 25.0
+
+        assert load_tuning_profile(path, "small-node").intra_op_threads == 2
+        assert load_tuning_profile(path, "big-node").batch_size == 8
+
+    @pytest.mark.unit
+    def test_selects_by_fingerprint_then_default(self, tmp_path, monkeypatch):
+        """Test that this node's fingerprint wins over the default profile."""
+        path = str(tmp_path / "profiles.json")
+        save_tuning_profile(path, "default", SessionTuning(intra_op_threads=1), {})
+        assert load_tuning_profile(path).intra_op_threads == 1
+
+        monkeypatch.setattr(session_tuning, 'node_fingerprint', lambda: "this-node-8c")
+        save_tuning_profile(path, "this-node-8c", SessionTuning(intra_op_threads=8), {})
+        assert load_tuning_profile(path).intra_op_threads == 8
+
+    @pytest.mark.unit
+    def test_no_matching_profile(self, tmp_path):
+        """Test that a file without a matching profile yields ORT defaults."""
+        path = str(tmp_path / "profiles.json")
+        save_tuning_profile(path, "other-node", SessionTuning(), {})
+        assert load_tuning_profile(path) is None
+        assert load_tuning_profile(path, "missing") is None
+
+    @pytest.mark.unit
+    def test_fingerprint_format(self):
+        """Test that the fingerprint is a slug ending in the core count."""
+        fingerprint = node_fingerprint()
+        assert fingerprint == fingerprint.lower()
+        assert " " not in fingerprint
+        assert fingerprint.endswith("c")
+
+
+class TestAutotune:
+    """Test cases for the autotune search."""
+
+    @pytest.mark.unit
+    def test_candidates(self):
+        """Test the thread and memory option grids."""
+        assert thread_counts(1) == [1]
+        assert thread_counts(6) == [1, 2, 4, 6]
+        assert [c.execution_mode for c in threading_candidates(2)] == ["sequential", "sequential", "parallel"]
+        assert len(memory_candidates(SessionTuning())) == 8
+
+    @pytest.mark.unit
+    def test_select_best(self):
+        """Test that throughput decides within the target and latency decides otherwise."""
+        trials = [
+            {'tuning': 'a', 'measured': {'images_per_second': 100, 'p99_ms': 10}},
+            {'tuning': 'b', 'measured': {'images_per_second': 300, 'p99_ms': 40}},
+            {'tuning': 'c', 'measured': {'images_per_second': 200, 'p99_ms': 20}}
+        ]
+        assert select_best(trials, 25)['tuning'] == 'c'
+        assert select_best(trials, 5)['tuning'] == 'a'
+
+    @pytest.mark.unit
+    def test_staged_sweep_picks_best_within_target(self):
+        """Test that the staged sweep finds threads, memory options and the largest batch within p99."""
+        result = autotune(fake_measure, cores=8, target_p99_ms=12.0, batch_sizes=[1, 2, 4, 8])
+
+        tuning = result['tuning']
+        assert tuning.intra_op_threads == 4
+        assert tuning.execution_mode == "sequential"
+        assert tuning.enable_cpu_mem_arena is False
+        assert tuning.batch_size == 4
+        assert result['meets_target']
+        assert result['measured']['p99_ms'] <= 12.0
+
+    @pytest.mark.unit
+    def test_unreachable_target_keeps_lowest_latency(self):
+        """Test that an unreachable target falls back to the lowest-latency setting."""
+        result = autotune(fake_measure, cores=4, target_p99_ms=0.1, batch_sizes=[1, 4])
+        assert not result['meets_target']
+        assert result['tuning'].batch_size == 1
+
+    @pytest.mark.unit
+    def test_exhaustive_measures_full_grid(self):
+        """Test that exhaustive mode measures every combination."""
+        result = autotune(fake_measure, cores=2, target_p99_ms=100.0, batch_sizes=[1, 2], exhaustive=True)
+        assert len(result['trials']) == len(threading_candidates(2)) * 8 * 2
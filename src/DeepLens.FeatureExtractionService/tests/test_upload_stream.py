@@ -0,0 +1,166 @@
+"""
+Unit tests for streaming upload validation.
+"""
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from upload_stream import (
+    MAX_HEADER_BYTES,
+    StreamingImageValidator,
+    UploadRejected,
+    sniff_content_type
+)
+from tests.conftest import create_test_image
+
+
+def png_with_dimensions(width: int, height: int) -> bytes:
+    """A small PNG whose IHDR claims the given dimensions (pixel data is not valid)"""
+    data = bytearray(create_test_image(8, 8, 'PNG'))
+    # IHDR chunk: length(4) type(4) width(4) height(4) ... crc(4), right after the signature
+    struct.pack_into('>II', data, 16, width, height)
+    crc = zlib.crc32(bytes(data[12:29])) & 0xffffffff
+    struct.pack_into('>I', data, 29, crc)
+    return bytes(data)
+
+
+def chunks(data: bytes, size: int = 1024):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestSniffContentType:
+    """Test cases for magic byte detection."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("image_format,expected", [
+        ('JPEG', 'image/jpeg'),
+        ('PNG', 'image/png'),
+        ('WEBP', 'image/webp'),
+    ])
+    def test_supported_formats(self, image_format, expected):
+        """Test that each supported format is recognised from its first bytes."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (16, 16)).save(buffer, format=image_format)
+
+        assert sniff_content_type(buffer.getvalue()[:12]) == expected
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("head", [
+        b"GIF89a\x00\x00\x00\x00\x00\x00",
+        b"RIFF\x00\x00\x00\x00WAVE",
+        b"This is not ",
+    ])
+    def test_unrecognised(self, head):
+        """Test that other data is not mistaken for a supported image."""
+        assert sniff_content_type(head) is None
+
+
+class TestStreamingImageValidator:
+    """Test cases for chunk-by-chunk validation."""
+
+    def validator(self, max_bytes=1024 * 1024, max_pixels=10_000_000):
+        return StreamingImageValidator(max_bytes=max_bytes, max_pixels=max_pixels)
+
+    @pytest.mark.unit
+    def test_valid_upload(self):
+        """Test that a valid image passes and its header is read while streaming."""
+        image_bytes = create_test_image(640, 480)
+        validator = self.validator()
+
+        for chunk in chunks(image_bytes):
+            validator.feed(chunk)
+        assert validator.metadata == {'width': 640, 'height': 480, 'format': 'JPEG'}
+
+        data, metadata = validator.finish()
+        assert data == image_bytes
+        assert validator.content_type == 'image/jpeg'
+
+    @pytest.mark.unit
+    def test_size_limit_stops_at_first_chunk_over(self):
+        """Test that the upload is rejected as soon as it passes the limit."""
+        validator = self.validator(max_bytes=10_000)
+        consumed = 0
+
+        with pytest.raises(UploadRejected) as exc_info:
+            for chunk in chunks(create_test_image(224, 224) + b"\x00" * 100_000):
+                consumed += 1
+                validator.feed(chunk)
+
+        assert exc_info.value.status_code == 413
+        assert consumed == 10
+        assert validator.size <= 10_000
+
+    @pytest.mark.unit
+    def test_declared_length_rejected_before_body(self):
+        """Test that an oversized Content-Length is rejected without reading."""
+        validator = self.validator(max_bytes=100)
+
+        with pytest.raises(UploadRejected) as exc_info:
+            validator.check_declared_length("101")
+
+        assert exc_info.value.status_code == 413
+        validator.check_declared_length("100")
+        validator.check_declared_length(None)
+        with pytest.raises(UploadRejected):
+            validator.check_declared_length("lots")
+
+    @pytest.mark.unit
+    def test_bogus_magic_rejected_on_first_chunk(self):
+        """Test that non-image data is rejected after the first 12 bytes."""
+        validator = self.validator()
+
+        with pytest.raises(UploadRejected) as exc_info:
+            validator.feed(b"This is not an image file, just some random bytes")
+
+        assert exc_info.value.status_code == 400
+        assert validator.size < 100
+
+    @pytest.mark.unit
+    def test_unsupported_type_rejected(self):
+        """Test that sniffed types outside supported_types are rejected."""
+        validator = StreamingImageValidator(1024 * 1024, 10_000_000, supported_types=("image/png",))
+
+        with pytest.raises(UploadRejected):
+            validator.feed(create_test_image(32, 32, 'JPEG'))
+
+    @pytest.mark.unit
+    def test_decompression_bomb_rejected_from_header(self):
+        """Test that huge claimed dimensions are rejected before any pixel decode."""
+        validator = self.validator(max_pixels=10_000_000)
+
+        with pytest.raises(UploadRejected) as exc_info:
+            validator.feed(png_with_dimensions(50_000, 50_000)[:64])
+
+        assert "exceed" in exc_info.value.detail
+
+    @pytest.mark.unit
+    def test_truncated_image_rejected_at_finish(self):
+        """Test that a body that never yields a header is rejected when complete."""
+        validator = self.validator()
+        validator.feed(b"\xff\xd8\xff" + b"\x00" * 20)
+
+        with pytest.raises(UploadRejected) as exc_info:
+            validator.finish()
+
+        assert "header" in exc_info.value.detail
+
+    @pytest.mark.unit
+    def test_header_search_is_bounded(self):
+        """Test that data with a valid magic but no header is rejected after MAX_HEADER_BYTES."""
+        validator = self.validator(max_bytes=4 * MAX_HEADER_BYTES)
+
+        with pytest.raises(UploadRejected):
+            validator.feed(b"\xff\xd8\xff")
+            for _ in range(2 * MAX_HEADER_BYTES // 65536):
+                validator.feed(b"\x00" * 65536)
+
+        assert validator.size <= MAX_HEADER_BYTES + 65536
+
+    @pytest.mark.unit
+    def test_empty_body(self):
+        """Test that an empty body is rejected."""
+        with pytest.raises(UploadRejected):
+            self.validator().finish()
@@ -0,0 +1,157 @@
+"""
+Unit tests for compact feature vector encodings and the recall report.
+"""
+import json
+
+import numpy as np
+import pytest
+
+import vector_encoding
+from vector_encoding import (
+    BINARY,
+    ENCODINGS,
+    FLOAT16,
+    FLOAT32,
+    INT8,
+    bytes_per_vector,
+    decode,
+    encode,
+    hamming_distances,
+    measure_recall,
+    recall_report
+)
+
+
+def clustered_vectors(count: int = 400, dimension: int = 128, clusters: int = 20) -> np.ndarray:
+    """L2-normalized vectors grouped around random centroids, like real embeddings"""
+    rng = np.random.default_rng(0)
+    centroids = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, count)]
+    vectors = vectors + 0.3 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestEncode:
+    """Test cases for encoding and decoding."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("encoding,dtype,width", [
+        (FLOAT32, np.float32, 2048),
+        (FLOAT16, np.float16, 2048),
+        (INT8, np.int8, 2048),
+        (BINARY, np.uint8, 256),
+    ])
+    def test_encoded_dtype_and_size(self, encoding, dtype, width):
+        """Test wire dtype and width of each encoding."""
+        features = clustered_vectors(3, 2048)
+
+        encoded, _ = encode(features, encoding)
+
+        assert encoded.dtype == dtype
+        assert encoded.shape == (3, width)
+
+    @pytest.mark.unit
+    def test_bytes_per_vector(self):
+        """Test encoded sizes for a 2048-dimensional vector."""
+        assert bytes_per_vector(FLOAT32, 2048) == 8192
+        assert bytes_per_vector(FLOAT16, 2048) == 4096
+        assert bytes_per_vector(INT8, 2048) == 2052
+        assert bytes_per_vector(BINARY, 2048) == 256
+        with pytest.raises(ValueError):
+            bytes_per_vector("int4", 2048)
+
+    @pytest.mark.unit
+    def test_int8_roundtrip_error_bounded_by_scale(self):
+        """Test that int8 reconstruction is within half a quantization step."""
+        features = clustered_vectors(5, 2048)
+
+        encoded, scales = encode(features, INT8)
+        restored = decode(encoded, INT8, scales)
+
+        assert scales.shape == (5,)
+        assert np.all(np.abs(restored - features) <= scales[:, None] / 2 + 1e-7)
+
+    @pytest.mark.unit
+    def test_int8_zero_vector(self):
+        """Test that an all-zero vector (zero-filled batch row) encodes cleanly."""
+        encoded, scales = encode(np.zeros(16, dtype=np.float32), INT8)
+
+        assert np.all(encoded == 0)
+        assert float(scales) == 1.0
+
+    @pytest.mark.unit
+    def test_binary_decode_is_sign_vector(self):
+        """Test that binary codes decode to unit-norm sign vectors."""
+        features = np.array([0.5, -0.1, 0.2, -0.7, 0.0, 0.3, -0.2, 0.1, 0.4, -0.4], dtype=np.float32)
+
+        encoded, _ = encode(features, BINARY)
+        restored = decode(encoded, BINARY, dimension=10)
+
+        assert restored.shape == (10,)
+        np.testing.assert_array_equal(restored > 0, features > 0)
+        assert np.linalg.norm(restored) == pytest.approx(1.0)
+
+    @pytest.mark.unit
+    def test_unknown_encoding(self):
+        """Test that unknown encodings raise ValueError."""
+        with pytest.raises(ValueError):
+            encode(np.ones(4, dtype=np.float32), "int4")
+
+
+class TestHammingDistances:
+    """Test cases for packed sign-bit distances."""
+
+    @pytest.mark.unit
+    def test_matches_bitwise_count(self):
+        """Test against a direct count of differing sign bits."""
+        vectors = clustered_vectors(40, 100)
+        codes, _ = encode(vectors, BINARY)
+
+        distances = hamming_distances(codes[:20], codes)
+
+        signs = vectors > 0
+        expected = (signs[:20, None, :] != signs[None, :, :]).sum(axis=-1)
+        np.testing.assert_array_equal(distances, expected)
+        assert np.all(np.diag(distances) == 0)
+
+
+class TestRecall:
+    """Test cases for the recall@k measurement."""
+
+    @pytest.mark.unit
+    def test_recall_ordering(self):
+        """Test that recall degrades with coarser encodings."""
+        reference = clustered_vectors()
+
+        recall = {encoding: measure_recall(reference, encoding, k=10, num_queries=100) for encoding in ENCODINGS}
+
+        assert recall[FLOAT32] == pytest.approx(1.0)
+        assert recall[FLOAT16] > 0.99
+        assert recall[INT8] > 0.95
+        assert recall[BINARY] <= recall[INT8]
+        assert recall[BINARY] > 0.5
+
+    @pytest.mark.unit
+    def test_reference_too_small(self):
+        """Test that k must be smaller than the reference set."""
+        with pytest.raises(ValueError):
+            measure_recall(clustered_vectors(5, 16), INT8, k=10)
+
+    @pytest.mark.unit
+    def test_report_cli(self, tmp_path, monkeypatch):
+        """Test that the CLI writes a report matching recall_report."""
+        reference_path = tmp_path / "reference.npy"
+        output_path = tmp_path / "report.json"
+        np.save(reference_path, clustered_vectors(200, 64))
+        monkeypatch.setattr("sys.argv", [
+            "vector_encoding.py", "--reference", str(reference_path),
+            "--k", "5", "--queries", "50", "--output", str(output_path)
+        ])
+
+        vector_encoding.main()
+
+        report = json.loads(output_path.read_text())
+        assert set(report) == set(ENCODINGS)
+        assert report[BINARY]["bytes_per_vector"] == 8
+        assert report[FLOAT32]["recall_loss"] == 0.0
+        assert report == recall_report(clustered_vectors(200, 64), k=5, num_queries=50)
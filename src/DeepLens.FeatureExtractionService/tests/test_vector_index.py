@@ -0,0 +1,223 @@
+"""
+Unit tests for the in-process vector index and its benchmark.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex, kmeans, top_k
+from vector_index_benchmark import clustered_vectors, recall_at_k, run_benchmark
+
+
+def unit_vectors(count, dimension=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestTopK:
+    """Test cases for the top_k helper."""
+
+    @pytest.mark.unit
+    def test_sorted_best_first(self):
+        """Test that the k largest scores are returned in descending order."""
+        scores = np.array([[0.1, 0.9, 0.5, 0.7]], dtype=np.float32)
+
+        indices, values = top_k(scores, 3)
+
+        assert indices.tolist() == [[1, 3, 2]]
+        np.testing.assert_allclose(values, [[0.9, 0.7, 0.5]])
+
+    @pytest.mark.unit
+    def test_k_larger_than_candidates(self):
+        """Test that k is clipped to the number of candidates."""
+        indices, _ = top_k(np.array([[0.2, 0.4]]), 10)
+
+        assert indices.tolist() == [[1, 0]]
+        assert top_k(np.zeros((2, 0)), 5)[0].shape == (2, 0)
+
+
+class TestVectorIndex:
+    """Test cases for the VectorIndex class."""
+
+    @pytest.mark.unit
+    def test_exact_search_matches_brute_force(self):
+        """Test that exact search returns the true nearest neighbours."""
+        vectors = unit_vectors(500)
+        index = VectorIndex(32, initial_capacity=8)
+        index.add([f"img-{row}" for row in range(500)], vectors)
+
+        hits = index.search(vectors[:3], k=5)
+
+        expected = np.argsort(-(vectors[:3] @ vectors.T), axis=1)[:, :5]
+        for query_hits, truth in zip(hits, expected):
+            assert [vector_id for vector_id, _ in query_hits] == [f"img-{row}" for row in truth]
+        assert hits[0][0][0] == "img-0"
+        assert hits[0][0][1] == pytest.approx(1.0, abs=1e-5)
+        assert index.stats()['capacity'] >= 500
+
+    @pytest.mark.unit
+    def test_exact_search_across_blocks(self, monkeypatch):
+        """Test that the running top-k merges results from several blocks."""
+        import vector_index
+        monkeypatch.setattr(vector_index, '_BLOCK_ROWS', 64)
+        vectors = unit_vectors(300, seed=1)
+        index = VectorIndex(32)
+        index.add([str(row) for row in range(300)], vectors)
+
+        hits = index.search(vectors[250], k=4)[0]
+
+        truth = np.argsort(-(vectors @ vectors[250]))[:4]
+        assert [vector_id for vector_id, _ in hits] == [str(row) for row in truth]
+
+    @pytest.mark.unit
+    def test_existing_id_is_replaced(self):
+        """Test that re-adding an id overwrites its vector instead of duplicating it."""
+        vectors = unit_vectors(3)
+        index = VectorIndex(32)
+        index.add(["a", "b"], vectors[:2])
+        index.add(["a"], vectors[2])
+
+        assert len(index) == 2
+        assert index.search(vectors[2], k=1)[0][0][0] == "a"
+
+    @pytest.mark.unit
+    def test_rejects_wrong_dimension_and_line_breaks(self):
+        """Test input validation on add and search."""
+        index = VectorIndex(32)
+
+        with pytest.raises(ValueError):
+            index.add(["a"], np.ones(16))
+        with pytest.raises(ValueError):
+            index.add(["a\nb"], unit_vectors(1))
+        with pytest.raises(ValueError):
+            index.search(np.ones(16))
+
+    @pytest.mark.unit
+    def test_empty_index(self):
+        """Test that searching an empty index returns no results."""
+        assert VectorIndex(32).search(unit_vectors(1)[0], k=3) == [[]]
+
+    @pytest.mark.unit
+    def test_ivf_trains_at_threshold_and_keeps_recall(self):
+        """Test that IVF mode trains once enough vectors are added and finds most neighbours."""
+        vectors = clustered_vectors(2000, 32, clusters=40, spread=0.5, seed=2)
+        index = VectorIndex(32, mode="ivf", nlist=16, nprobe=4, background_training=False)
+        index.add([str(row) for row in range(600)], vectors[:600])
+        assert not index.trained
+        assert index.search_mode() == "exact"
+
+        index.add([str(row) for row in range(600, 2000)], vectors[600:])
+        assert index.trained
+        assert index.search_mode() == "ivf"
+        assert index.search_mode(exact=True) == "exact"
+
+        queries = vectors[:50]
+        exact = [[vector_id for vector_id, _ in hits] for hits in index.search(queries, 10, exact=True)]
+        approximate = [[vector_id for vector_id, _ in hits] for hits in index.search(queries, 10)]
+
+        assert recall_at_k(exact, approximate, 10) > 0.8
+        stats = index.stats()
+        assert stats['ivf_searches'] == 1 and stats['exact_searches'] == 1
+
+    @pytest.mark.unit
+    def test_vectors_added_after_training_are_searchable(self):
+        """Test that new vectors are assigned to their list on add."""
+        vectors = clustered_vectors(700, 32, clusters=20, spread=0.3, seed=3)
+        index = VectorIndex(32, mode="ivf", nlist=16, background_training=False)
+        index.add([str(row) for row in range(640)], vectors[:640])
+        assert index.trained
+
+        index.add(["late"], vectors[650])
+
+        assert index.search(vectors[650], k=1, nprobe=1)[0][0][0] == "late"
+
+    @pytest.mark.unit
+    def test_persisted_in_memory_mapped_file(self, tmp_path):
+        """Test that vectors, ids and centroids survive reopening the index."""
+        vectors = clustered_vectors(1500, 32, clusters=20, spread=0.3, seed=4)
+        index = VectorIndex(32, mode="ivf", path=str(tmp_path), nlist=16, initial_capacity=16,
+                            background_training=False)
+        index.add([f"img-{row}" for row in range(1500)], vectors)
+        index.close()
+
+        directory = os.path.join(str(tmp_path), "resnet50", "v2.7")
+        assert sorted(os.listdir(directory)) == ["centroids.npy", "ids.txt", "vectors.npy"]
+
+        reopened = VectorIndex(32, mode="ivf", path=str(tmp_path), nlist=16)
+        assert len(reopened) == 1500
+        assert reopened.trained
+        assert isinstance(reopened._vectors, np.memmap)
+        assert reopened.search(vectors[42], k=1)[0][0][0] == "img-42"
+
+        reopened.add(["new"], unit_vectors(1, seed=9))
+        reopened.close()
+        assert len(VectorIndex(32, path=str(tmp_path))) == 1501
+
+    @pytest.mark.unit
+    def test_other_model_versions_removed(self, tmp_path):
+        """Test that an index of another model version is discarded on open."""
+        old = VectorIndex(32, path=str(tmp_path), model_version="v1")
+        old.add(["a"], unit_vectors(1))
+        old.close()
+
+        current = VectorIndex(32, path=str(tmp_path), model_version="v2")
+
+        assert len(current) == 0
+        assert os.listdir(os.path.join(str(tmp_path), "resnet50")) == ["v2"]
+
+    @pytest.mark.unit
+    def test_mismatched_dimension_file_is_discarded(self, tmp_path):
+        """Test that a stored index of another dimension is replaced, not misread."""
+        stored = VectorIndex(16, path=str(tmp_path))
+        stored.add(["a"], unit_vectors(1, dimension=16))
+        stored.close()
+
+        assert len(VectorIndex(32, path=str(tmp_path))) == 0
+
+    @pytest.mark.unit
+    def test_unknown_mode(self):
+        """Test that unknown modes are rejected."""
+        with pytest.raises(ValueError):
+            VectorIndex(32, mode="hnsw")
+
+
+class TestKMeans:
+    """Test cases for spherical k-means."""
+
+    @pytest.mark.unit
+    def test_recovers_separated_clusters(self):
+        """Test that well separated clusters each get a centroid."""
+        centres = np.eye(4, 32, dtype=np.float32)
+        rng = np.random.default_rng(0)
+        vectors = np.repeat(centres, 50, axis=0) + 0.05 * rng.standard_normal((200, 32)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        centroids = kmeans(vectors, 4)
+
+        assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+        assert sorted(np.argmax(centroids @ centres.T, axis=1).tolist()) == [0, 1, 2, 3]
+
+
+class TestBenchmark:
+    """Test cases for the recall/latency benchmark."""
+
+    @pytest.mark.unit
+    def test_recall_at_k(self):
+        """Test recall computation against exact results."""
+        assert recall_at_k([["a", "b"], ["c", "d"]], [["a", "x"], ["d", "c"]], 2) == 0.75
+
+    @pytest.mark.unit
+    def test_run_benchmark_report(self):
+        """Test that the report has exact latency and recall per nprobe."""
+        vectors = clustered_vectors(1020, 32, clusters=20)
+
+        report = run_benchmark(vectors[20:], vectors[:20], k=5, nlist=8, nprobe_values=[1, 8], runs=5)
+
+        assert report['vectors'] == 1000 and report['nlist'] == 8
+        assert report['exact']['runs'] == 5
+        assert [result['nprobe'] for result in report['ivf']] == [1, 8]
+        # Scanning every list is exact
+        assert report['ivf'][1]['recall_at_k'] == 1.0
+        assert 0 < report['ivf'][0]['recall_at_k'] <= 1.0
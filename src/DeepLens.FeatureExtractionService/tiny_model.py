@@ -0,0 +1,136 @@
+"""
+Tiny stand-in model for benchmarks and tests
+A small Conv -> Relu -> GlobalAveragePool -> Flatten -> MatMul network with
+the serving model's interface (NCHW float input, (N, 2048) features), used
+when the ResNet50 file is not available. The ONNX protobuf is written
+directly, so only onnxruntime is needed to run it, not the onnx package.
+"""
+import os
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+# ONNX TensorProto.DataType.FLOAT and AttributeProto.AttributeType.INTS
+_FLOAT = 1
+_INTS = 7
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _int_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+
+def _bytes_field(number: int, value: Union[bytes, str]) -> bytes:
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return _varint((number << 3) | 2) + _varint(len(value)) + value
+
+
+def _tensor(name: str, array: np.ndarray) -> bytes:
+    """TensorProto: dims=1, data_type=2, name=8, raw_data=9"""
+    return (
+        b''.join(_int_field(1, dim) for dim in array.shape)
+        + _int_field(2, _FLOAT)
+        + _bytes_field(8, name)
+        + _bytes_field(9, np.ascontiguousarray(array, dtype='<f4').tobytes())
+    )
+
+
+def _value_info(name: str, dims: Sequence[Union[int, str]]) -> bytes:
+    """ValueInfoProto with a float tensor type; str dims are symbolic"""
+    shape = b''.join(
+        _bytes_field(1, _int_field(1, dim) if isinstance(dim, int) else _bytes_field(2, dim))
+        for dim in dims
+    )
+    tensor_type = _int_field(1, _FLOAT) + _bytes_field(2, shape)
+    return _bytes_field(1, name) + _bytes_field(2, _bytes_field(1, tensor_type))
+
+
+def _ints_attribute(name: str, values: Iterable[int]) -> bytes:
+    return _bytes_field(1, name) + b''.join(_int_field(8, value) for value in values) + _int_field(20, _INTS)
+
+
+def _node(op_type: str, inputs: Sequence[str], outputs: Sequence[str], *attributes: bytes) -> bytes:
+    """NodeProto: input=1, output=2, name=3, op_type=4, attribute=5"""
+    return (
+        b''.join(_bytes_field(1, name) for name in inputs)
+        + b''.join(_bytes_field(2, name) for name in outputs)
+        + _bytes_field(3, outputs[0])
+        + _bytes_field(4, op_type)
+        + b''.join(_bytes_field(5, attribute) for attribute in attributes)
+    )
+
+
+def build_tiny_model(
+    feature_dimension: int = 2048,
+    channels: int = 16,
+    input_size: Sequence[int] = (224, 224),
+    seed: int = 0
+) -> bytes:
+    """
+    Serialized ONNX model with the feature extractor's interface
+
+    Args:
+        feature_dimension: Output vector size
+        channels: Conv filters (compute grows linearly with this)
+        input_size: (width, height) of the input images
+        seed: Weight initialization seed
+
+    Returns:
+        ModelProto bytes (IR version 8, opset 13)
+    """
+    rng = np.random.default_rng(seed)
+    conv_weight = rng.standard_normal((channels, 3, 3, 3)).astype(np.float32)
+    projection = rng.standard_normal((channels, feature_dimension)).astype(np.float32)
+    width, height = input_size
+
+    graph = (
+        _bytes_field(1, _node("Conv", ["data", "conv_w"], ["conv"],
+                              _ints_attribute("strides", [2, 2]), _ints_attribute("pads", [1, 1, 1, 1])))
+        + _bytes_field(1, _node("Relu", ["conv"], ["relu"]))
+        + _bytes_field(1, _node("GlobalAveragePool", ["relu"], ["pool"]))
+        + _bytes_field(1, _node("Flatten", ["pool"], ["flat"]))
+        + _bytes_field(1, _node("MatMul", ["flat", "projection"], ["features"]))
+        + _bytes_field(2, "tiny_feature_extractor")
+        + _bytes_field(5, _tensor("conv_w", conv_weight))
+        + _bytes_field(5, _tensor("projection", projection))
+        + _bytes_field(11, _value_info("data", ["N", 3, height, width]))
+        + _bytes_field(12, _value_info("features", ["N", feature_dimension]))
+    )
+    return (
+        _int_field(1, 8)
+        + _bytes_field(2, "deeplens-tiny-model")
+        + _bytes_field(7, graph)
+        + _bytes_field(8, _bytes_field(1, "") + _int_field(2, 13))
+    )
+
+
+def write_tiny_model(path: str, **options) -> str:
+    """
+    Write the tiny model to a file
+
+    Args:
+        path: Output .onnx path
+        **options: build_tiny_model arguments
+
+    Returns:
+        The path written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(build_tiny_model(**options))
+    return path
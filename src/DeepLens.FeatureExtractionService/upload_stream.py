@@ -0,0 +1,180 @@
+"""
+Streaming validation of raw image uploads
+Checks size, magic bytes and image header (dimensions, decompression bombs)
+chunk by chunk while the body is still arriving, so bad uploads are rejected
+before they are fully received or decoded.
+"""
+import io
+import logging
+import warnings
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of each supported format (WebP is "RIFF" <size> "WEBP")
+MAGIC_SIGNATURES: Tuple[Tuple[bytes, str], ...] = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+# Bytes needed to recognise every signature above
+SNIFF_BYTES = 12
+
+# Give up on finding a decodable header after this many bytes
+# (JPEG EXIF/ICC segments ahead of the frame header can be large)
+MAX_HEADER_BYTES = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """Upload rejected during streaming; carries the HTTP status and detail"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Identify an image from its first bytes
+
+    Args:
+        head: At least SNIFF_BYTES leading bytes of the upload
+
+    Returns:
+        Content type (e.g. image/jpeg) or None if unrecognised
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for prefix, content_type in MAGIC_SIGNATURES:
+        if head.startswith(prefix):
+            return content_type
+    return None
+
+
+class StreamingImageValidator:
+    """
+    Incremental validator fed with upload chunks.
+
+    Rejects as soon as the byte limit is passed, the magic bytes are not a
+    supported image type, or the header reveals dimensions over the pixel
+    limit. The header is parsed with a lazy `Image.open`, which reads only
+    metadata and never allocates pixel memory; parsing is retried as the
+    buffer doubles, so the total parse cost stays linear in the header size.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_pixels: int,
+        supported_types: Tuple[str, ...] = ("image/jpeg", "image/png", "image/webp")
+    ):
+        """
+        Initialize the validator
+
+        Args:
+            max_bytes: Maximum upload size in bytes
+            max_pixels: Maximum width * height
+            supported_types: Content types accepted after sniffing
+        """
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.supported_types = tuple(supported_types)
+
+        self._buffer = bytearray()
+        self._next_parse_at = SNIFF_BYTES
+        self.content_type: Optional[str] = None
+        self.metadata: Optional[dict] = None
+
+    @property
+    def size(self) -> int:
+        """Bytes received so far"""
+        return len(self._buffer)
+
+    def check_declared_length(self, content_length: Optional[str]) -> None:
+        """Reject before reading the body if Content-Length is already over the limit"""
+        if content_length is None:
+            return
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise UploadRejected(400, "Invalid Content-Length header")
+        if declared > self.max_bytes:
+            raise UploadRejected(413, self._too_large_detail())
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Add a chunk of the upload
+
+        Raises:
+            UploadRejected: If the upload can already be rejected
+        """
+        if not chunk:
+            return
+        if len(self._buffer) + len(chunk) > self.max_bytes:
+            raise UploadRejected(413, self._too_large_detail())
+        self._buffer += chunk
+
+        if self.content_type is None and len(self._buffer) >= SNIFF_BYTES:
+            self._sniff()
+
+        if self.content_type is not None and self.metadata is None and len(self._buffer) >= self._next_parse_at:
+            self._parse_header()
+
+    def finish(self) -> Tuple[bytes, dict]:
+        """
+        Complete validation once the whole body has arrived
+
+        Returns:
+            Tuple of (image_bytes, metadata) with width, height and format
+
+        Raises:
+            UploadRejected: If the upload is empty, unrecognised or undecodable
+        """
+        if not self._buffer:
+            raise UploadRejected(400, "Empty request body")
+        if self.content_type is None:
+            self._sniff()
+        if self.metadata is None:
+            self._parse_header(final=True)
+        return bytes(self._buffer), self.metadata
+
+    def _sniff(self) -> None:
+        content_type = sniff_content_type(bytes(self._buffer[:SNIFF_BYTES]))
+        if content_type is None or content_type not in self.supported_types:
+            raise UploadRejected(
+                400,
+                f"Unsupported or unrecognised image data. Supported formats: {', '.join(self.supported_types)}"
+            )
+        self.content_type = content_type
+
+    def _parse_header(self, final: bool = False) -> None:
+        """Try to read dimensions from the data received so far"""
+        try:
+            with warnings.catch_warnings():
+                # Size is checked explicitly below against our own limit
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                image = Image.open(io.BytesIO(self._buffer))
+                width, height, image_format = image.width, image.height, image.format
+        except Image.DecompressionBombError as e:
+            raise UploadRejected(400, f"Image dimensions exceed the allowed pixel count: {str(e)}")
+        except Exception as e:
+            if final or len(self._buffer) >= MAX_HEADER_BYTES:
+                raise UploadRejected(400, f"Failed to read image header: {str(e)}")
+            self._next_parse_at = min(len(self._buffer) * 2, MAX_HEADER_BYTES)
+            return
+
+        if width * height > self.max_pixels:
+            raise UploadRejected(
+                400,
+                f"Image dimensions {width}x{height} exceed the maximum of {self.max_pixels} pixels"
+            )
+        self.metadata = {'width': width, 'height': height, 'format': image_format or 'UNKNOWN'}
+
+    def _too_large_detail(self) -> str:
+        return (
+            f"Image size exceeds maximum allowed size of "
+            f"{self.max_bytes / (1024*1024):.1f} MB"
+        )
@@ -0,0 +1,208 @@
+"""
+Compact encodings for feature vectors
+float16, int8 with a per-vector scale, and packed sign bits for Hamming
+prefiltering, plus a recall@k report against float32 on a reference set.
+
+Usage:
+    python vector_encoding.py --reference embeddings.npy --k 10 --output encoding_report.json
+"""
+import argparse
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+BINARY = "binary"
+
+ENCODINGS = (FLOAT32, FLOAT16, INT8, BINARY)
+
+# Wire dtype of each encoding
+ENCODING_DTYPES = {
+    FLOAT32: "float32",
+    FLOAT16: "float16",
+    INT8: "int8",
+    BINARY: "uint8"
+}
+
+
+def bytes_per_vector(encoding: str, dimension: int) -> int:
+    """Encoded size of one vector in bytes (int8 includes its float32 scale)"""
+    if encoding == FLOAT32:
+        return dimension * 4
+    if encoding == FLOAT16:
+        return dimension * 2
+    if encoding == INT8:
+        return dimension + 4
+    if encoding == BINARY:
+        return (dimension + 7) // 8
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode(features: np.ndarray, encoding: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode a vector (D,) or matrix (N, D) of float32 features
+
+    Args:
+        features: L2-normalized feature vector(s)
+        encoding: One of ENCODINGS
+
+    Returns:
+        Tuple of (encoded, scales)
+        - encoded: Array in the encoding's wire dtype; binary packs 8 dims per byte
+        - scales: Per-vector float32 scales for int8, None otherwise
+    """
+    features = np.asarray(features, dtype=np.float32)
+
+    if encoding == FLOAT32:
+        return features, None
+    if encoding == FLOAT16:
+        return features.astype(np.float16), None
+    if encoding == INT8:
+        # Symmetric per-vector scale: the largest magnitude maps to 127
+        scales = np.abs(features).max(axis=-1, keepdims=True) / 127.0
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        quantized = np.clip(np.rint(features / scales), -127, 127).astype(np.int8)
+        return quantized, scales.squeeze(-1)
+    if encoding == BINARY:
+        return np.packbits(features > 0, axis=-1), None
+
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decode(
+    encoded: np.ndarray,
+    encoding: str,
+    scales: Optional[np.ndarray] = None,
+    dimension: Optional[int] = None
+) -> np.ndarray:
+    """
+    Approximate float32 reconstruction of encoded vectors
+
+    Binary codes decode to +-1/sqrt(D), i.e. unit-norm sign vectors.
+    """
+    if encoding in (FLOAT32, FLOAT16):
+        return encoded.astype(np.float32)
+    if encoding == INT8:
+        return encoded.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+    if encoding == BINARY:
+        bits = np.unpackbits(encoded, axis=-1)
+        if dimension is not None:
+            bits = bits[..., :dimension]
+        return (bits.astype(np.float32) * 2.0 - 1.0) / np.sqrt(bits.shape[-1])
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def hamming_distances(query_codes: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances between packed sign codes (Q, B) x (N, B) -> (Q, N)"""
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+    distances = np.empty((query_codes.shape[0], codes.shape[0]), dtype=np.int32)
+    # A few queries at a time keeps the (q, N, B) XOR temporary small
+    for start in range(0, query_codes.shape[0], 16):
+        block = query_codes[start:start + 16]
+        distances[start:start + 16] = popcount[block[:, None, :] ^ codes[None, :, :]].sum(axis=-1)
+    return distances
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores per row"""
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def measure_recall(
+    reference: np.ndarray,
+    encoding: str,
+    k: int = 10,
+    num_queries: int = 200
+) -> float:
+    """
+    Recall@k of searching encoded vectors versus exact float32 search
+
+    Queries are drawn from the reference set (kept in float32, as at query
+    time) and searched against the encoded set, excluding the query itself.
+
+    Args:
+        reference: (N, D) float32 L2-normalized reference embeddings
+        encoding: Encoding to evaluate
+        k: Number of neighbours compared
+        num_queries: Number of reference vectors used as queries
+
+    Returns:
+        Fraction of exact top-k neighbours found by the encoded search
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    count = reference.shape[0]
+    if count <= k:
+        raise ValueError(f"Reference set needs more than k={k} vectors, got {count}")
+
+    query_ids = np.arange(min(num_queries, count))
+    queries = reference[query_ids]
+
+    exact_scores = queries @ reference.T
+    exact_scores[query_ids, query_ids] = -np.inf
+    exact = _top_k(exact_scores, k)
+
+    encoded, scales = encode(reference, encoding)
+    if encoding == BINARY:
+        query_codes, _ = encode(queries, BINARY)
+        approx_scores = -hamming_distances(query_codes, encoded).astype(np.float32)
+    else:
+        approx_scores = queries @ decode(encoded, encoding, scales).T
+    approx_scores[query_ids, query_ids] = -np.inf
+    approx = _top_k(approx_scores, k)
+
+    hits = sum(len(np.intersect1d(exact[row], approx[row])) for row in range(len(query_ids)))
+    return hits / float(len(query_ids) * k)
+
+
+def recall_report(reference: np.ndarray, k: int = 10, num_queries: int = 200) -> Dict[str, dict]:
+    """
+    Size and measured recall loss of every encoding against float32
+
+    Returns:
+        Mapping of encoding name to bytes_per_vector, compression_ratio,
+        recall_at_k and recall_loss
+    """
+    dimension = reference.shape[1]
+    report = {}
+    for encoding in ENCODINGS:
+        recall = measure_recall(reference, encoding, k=k, num_queries=num_queries)
+        report[encoding] = {
+            'bytes_per_vector': bytes_per_vector(encoding, dimension),
+            'compression_ratio': round(bytes_per_vector(FLOAT32, dimension) / bytes_per_vector(encoding, dimension), 2),
+            'k': k,
+            'recall_at_k': round(recall, 4),
+            'recall_loss': round(1.0 - recall, 4),
+            'reference_size': int(reference.shape[0])
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure recall loss of compact encodings against float32")
+    parser.add_argument("--reference", required=True, help="(N, D) float32 .npy file of reference embeddings")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of reference vectors used as queries")
+    parser.add_argument("--output", default="encoding_report.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    reference = np.load(args.reference, mmap_mode='r').astype(np.float32)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True) + 1e-8
+
+    report = recall_report(reference, k=args.k, num_queries=args.queries)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for encoding, entry in report.items():
+        print(f"{encoding:>8}: {entry['bytes_per_vector']:>5} B/vector "
+              f"({entry['compression_ratio']}x), recall@{args.k}={entry['recall_at_k']:.4f}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
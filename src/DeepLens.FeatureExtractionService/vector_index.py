@@ -0,0 +1,502 @@
+"""
+In-process vector index
+Stores L2-normalized embeddings by id for similarity search without a round
+trip to the vector database, for small tenants and tests. Search is exact
+(blocked matrix products over every vector) or approximate with an inverted
+file (IVF): vectors are assigned to the nearest of `nlist` k-means centroids
+and a query only scores the vectors of its `nprobe` closest lists.
+
+With a path, vectors live in a memory-mapped .npy file under
+`<path>/<model_name>/<model_version>/`, ids in an append-only text file and
+IVF centroids in centroids.npy, so the index survives restarts without
+being loaded into memory. Directories of other model versions are removed
+when the index is opened, since their vectors are not comparable.
+"""
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_MODES = ("exact", "ivf")
+
+_VECTORS_FILE = "vectors.npy"
+_IDS_FILE = "ids.txt"
+_CENTROIDS_FILE = "centroids.npy"
+
+# Rows scored per matrix product; bounds the temporary score matrix
+_BLOCK_ROWS = 32768
+
+# k-means needs this many training vectors per centroid to be meaningful
+_MIN_POINTS_PER_LIST = 39
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and values of the k largest scores per row, best first
+
+    Args:
+        scores: (Q, N) score matrix
+        k: Results per row (clipped to N)
+
+    Returns:
+        Tuple of (indices, values), both (Q, min(k, N))
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-values, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def kmeans(
+    vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """
+    Spherical k-means: centroids maximizing cosine similarity to their members
+
+    Args:
+        vectors: (N, D) L2-normalized training vectors, N >= clusters
+        clusters: Number of centroids
+        iterations: Lloyd iterations
+        seed: Initialization seed
+
+    Returns:
+        (clusters, D) L2-normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(vectors.shape[0], clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assignments, minlength=clusters)
+
+        # Per-cluster sums via one segmented reduction over vectors sorted by cluster
+        order = np.argsort(assignments, kind='stable')
+        occupied = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[occupied]
+        sums = np.zeros_like(centroids)
+        sums[occupied] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Re-seed empty lists with random vectors so no centroid is wasted
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = vectors[rng.choice(vectors.shape[0], empty.size, replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Id -> embedding store with exact and IVF top-k search.
+
+    Adding an id that is already present replaces its vector. In "ivf" mode
+    the index is searched exactly until it holds `nlist * 39` vectors; the
+    centroids are then trained on a background thread, and retrained each
+    time the index has grown fourfold since.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        mode: str = "exact",
+        path: Optional[str] = None,
+        model_name: str = "resnet50",
+        model_version: str = "v2.7",
+        nlist: int = 256,
+        nprobe: int = 16,
+        initial_capacity: int = 1024,
+        background_training: bool = True,
+        prune: bool = True
+    ):
+        """
+        Initialize the index, loading it from `path` if it exists
+
+        Args:
+            dimension: Vector dimension
+            mode: "exact" or "ivf" (see INDEX_MODES)
+            path: Root directory of the memory-mapped files (in memory if None)
+            model_name: Model the vectors were produced by
+            model_version: Model version; vectors of other versions are discarded
+            nlist: IVF lists (k-means centroids)
+            nprobe: Lists scored per query in IVF mode
+            initial_capacity: Rows allocated before the first resize
+            background_training: Train IVF centroids on a thread (else inline in add)
+            prune: Remove the files of other versions of the model on open
+        """
+        if mode not in INDEX_MODES:
+            raise ValueError(f"Unsupported index mode: {mode}")
+
+        self.dimension = dimension
+        self.mode = mode
+        self.model_name = model_name
+        self.model_version = model_version
+        self.nlist = max(1, nlist)
+        self.nprobe = max(1, nprobe)
+        self.background_training = background_training
+
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((max(1, initial_capacity), dimension), dtype=np.float32)
+        self._ids_file = None
+        self.directory: Optional[str] = None
+
+        # IVF state: centroids, list of each row, and the size they were trained at
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(self._vectors.shape[0], dtype=np.int32)
+        self._trained_size = 0
+        self._training = False
+
+        # Statistics
+        self.searches = 0
+        self.exact_searches = 0
+        self.ivf_searches = 0
+        self.trainings = 0
+
+        if path:
+            self._open(path)
+            if prune:
+                self.prune_versions()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def search_mode(self, exact: Optional[bool] = None) -> str:
+        """
+        The search a query will run: "ivf" only once centroids are trained
+
+        Args:
+            exact: Force exact (True) or IVF (False) search; default follows the mode
+        """
+        wants_ivf = self.mode == "ivf" if exact is None else not exact
+        return "ivf" if wants_ivf and self._centroids is not None else "exact"
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Insert or replace vectors
+
+        Args:
+            ids: Identifier of each vector
+            vectors: (len(ids), dimension) L2-normalized vectors, or one 1-D vector
+
+        Raises:
+            ValueError: If the vector dimension does not match the index or an id has a line break
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}"
+            )
+        if any('\n' in vector_id or '\r' in vector_id for vector_id in ids):
+            raise ValueError("Vector ids cannot contain line breaks")
+
+        with self._lock:
+            new_ids = []
+            rows = np.empty(len(ids), dtype=np.int64)
+            for position, vector_id in enumerate(ids):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[vector_id] = row
+                    self._ids.append(vector_id)
+                    new_ids.append(vector_id)
+                rows[position] = row
+
+            self._ensure_capacity(len(self._ids))
+            self._vectors[rows] = vectors
+            if self._centroids is not None:
+                self._assignments[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+
+            # Ids are appended after their vectors are written, so the id file
+            # never names a row that holds no vector
+            if self._ids_file is not None and new_ids:
+                self._ids_file.write(''.join(vector_id + '\n' for vector_id in new_ids))
+                self._ids_file.flush()
+
+            train = self._needs_training()
+            if train:
+                self._training = True
+
+        if train:
+            if self.background_training:
+                threading.Thread(target=self.train, name="vector-index-training", daemon=True).start()
+            else:
+                self.train()
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        exact: Optional[bool] = None,
+        nprobe: Optional[int] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k most similar ids by inner product (cosine for normalized vectors)
+
+        Args:
+            queries: (Q, dimension) query vectors, or one 1-D vector
+            k: Results per query
+            exact: Force exact (True) or IVF (False) search; default follows the mode
+            nprobe: Lists scored per query in IVF search (default self.nprobe)
+
+        Returns:
+            Per query, a list of (id, score) best first
+
+        Raises:
+            ValueError: If the query dimension does not match the index
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query dimension {queries.shape[1]} does not match index dimension {self.dimension}"
+            )
+
+        with self._lock:
+            size = len(self._ids)
+            self.searches += 1
+            if self.search_mode(exact) == "ivf":
+                self.ivf_searches += 1
+                indices, scores = self._search_ivf(queries, k, nprobe or self.nprobe, size)
+            else:
+                self.exact_searches += 1
+                indices, scores = self._search_exact(queries, k, size)
+            ids = self._ids
+
+            return [
+                [(ids[row], float(score)) for row, score in zip(row_indices, row_scores) if row >= 0]
+                for row_indices, row_scores in zip(indices, scores)
+            ]
+
+    def train(self, sample_size: Optional[int] = None, iterations: int = 10) -> None:
+        """
+        Train IVF centroids on a sample of the stored vectors and assign every vector
+
+        Args:
+            sample_size: Training vectors (default nlist * 64)
+            iterations: k-means iterations
+        """
+        try:
+            with self._lock:
+                size = len(self._ids)
+                clusters = min(self.nlist, size)
+                if clusters == 0:
+                    return
+                sample_size = min(size, sample_size or self.nlist * 64)
+                rows = np.random.default_rng(size).choice(size, sample_size, replace=False)
+                sample = np.array(self._vectors[np.sort(rows)])
+
+            # The expensive part runs without the lock; adds and searches continue meanwhile
+            centroids = kmeans(sample, clusters, iterations=iterations)
+
+            with self._lock:
+                size = len(self._ids)
+                for start in range(0, size, _BLOCK_ROWS):
+                    block = self._vectors[start:min(start + _BLOCK_ROWS, size)]
+                    self._assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+                self._centroids = centroids
+                self._trained_size = size
+                self.trainings += 1
+                if self.directory is not None:
+                    np.save(os.path.join(self.directory, _CENTROIDS_FILE), centroids)
+            logger.info(f"Trained {clusters} IVF lists on {sample_size} of {size} vectors")
+        finally:
+            self._training = False
+
+    def flush(self) -> None:
+        """Write memory-mapped vectors and ids to disk"""
+        with self._lock:
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            if self._ids_file is not None:
+                self._ids_file.flush()
+                os.fsync(self._ids_file.fileno())
+
+    def close(self) -> None:
+        """Flush and release the files"""
+        self.flush()
+        with self._lock:
+            if self._ids_file is not None:
+                self._ids_file.close()
+                self._ids_file = None
+
+    def stats(self) -> dict:
+        """Size, mode and search counters"""
+        with self._lock:
+            return {
+                'vectors': len(self._ids),
+                'capacity': self._vectors.shape[0],
+                'dimension': self.dimension,
+                'mode': self.mode,
+                'trained': self._centroids is not None,
+                'nlist': self._centroids.shape[0] if self._centroids is not None else 0,
+                'nprobe': self.nprobe,
+                'searches': self.searches,
+                'exact_searches': self.exact_searches,
+                'ivf_searches': self.ivf_searches,
+                'trainings': self.trainings
+            }
+
+    def _needs_training(self) -> bool:
+        """Whether IVF centroids should be (re)trained at the current size"""
+        if self.mode != "ivf" or self._training:
+            return False
+        size = len(self._ids)
+        if self._centroids is None:
+            return size >= self.nlist * _MIN_POINTS_PER_LIST
+        return size >= self._trained_size * 4
+
+    def _search_exact(self, queries: np.ndarray, k: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every stored vector, block by block, keeping a running top-k"""
+        best_indices = np.full((queries.shape[0], 0), -1, dtype=np.int64)
+        best_scores = np.zeros((queries.shape[0], 0), dtype=np.float32)
+        for start in range(0, size, _BLOCK_ROWS):
+            block = self._vectors[start:min(start + _BLOCK_ROWS, size)]
+            indices, scores = top_k(queries @ block.T, k)
+            best_indices, best_scores = self._merge(
+                best_indices, best_scores, indices + start, scores, k
+            )
+        return best_indices, best_scores
+
+    def _search_ivf(
+        self, queries: np.ndarray, k: int, nprobe: int, size: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Score only the vectors in each query's nprobe closest lists"""
+        probes, _ = top_k(queries @ self._centroids.T, nprobe)
+        assignments = self._assignments[:size]
+        indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for position, query in enumerate(queries):
+            selected = np.zeros(self._centroids.shape[0], dtype=bool)
+            selected[probes[position]] = True
+            candidates = np.flatnonzero(selected[assignments])
+            found, found_scores = top_k((self._vectors[candidates] @ query)[None, :], k)
+            indices[position, :found.shape[1]] = candidates[found[0]]
+            scores[position, :found.shape[1]] = found_scores[0]
+        return indices, scores
+
+    @staticmethod
+    def _merge(
+        indices_a: np.ndarray, scores_a: np.ndarray,
+        indices_b: np.ndarray, scores_b: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        indices = np.concatenate([indices_a, indices_b], axis=1)
+        scores = np.concatenate([scores_a, scores_b], axis=1)
+        order, top_scores = top_k(scores, k)
+        return np.take_along_axis(indices, order, axis=1), top_scores
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow the vector storage (doubling) to hold `rows` vectors"""
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+
+        if self.directory is None:
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            vectors[:len(self._vectors)] = self._vectors
+        else:
+            # Copy into a larger file and swap it in atomically
+            path = os.path.join(self.directory, _VECTORS_FILE)
+            temp_path = path + f".{os.getpid()}.tmp"
+            vectors = np.lib.format.open_memmap(
+                temp_path, mode='w+', dtype=np.float32, shape=(capacity, self.dimension)
+            )
+            vectors[:len(self._vectors)] = self._vectors
+            vectors.flush()
+            os.replace(temp_path, path)
+        self._vectors = vectors
+
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[:len(self._assignments)] = self._assignments
+        self._assignments = assignments
+
+    def prune_versions(self, keep: Iterable[str] = ()) -> None:
+        """
+        Remove the index files of other versions of the model
+
+        Vectors of other versions are not comparable with these, but an old
+        version's files must survive while it still serves or may be rolled
+        back to.
+
+        Args:
+            keep: Versions to leave in place besides this one
+        """
+        if self.directory is None:
+            return
+        model_dir = os.path.dirname(self.directory)
+        keep = {self.model_version, *keep}
+        for name in os.listdir(model_dir):
+            if name not in keep:
+                logger.info(f"Removing vector index for {self.model_name} {name}")
+                shutil.rmtree(os.path.join(model_dir, name), ignore_errors=True)
+
+    def _open(self, path: str) -> None:
+        """Open or create the version directory and map its files"""
+        self.directory = os.path.join(path, self.model_name, self.model_version)
+        os.makedirs(self.directory, exist_ok=True)
+
+        vectors_path = os.path.join(self.directory, _VECTORS_FILE)
+        ids_path = os.path.join(self.directory, _IDS_FILE)
+        vectors = None
+        if os.path.exists(vectors_path):
+            try:
+                vectors = np.load(vectors_path, mmap_mode='r+')
+                if vectors.ndim != 2 or vectors.shape[1] != self.dimension or vectors.dtype != np.float32:
+                    logger.warning(f"Discarding vector index with shape {vectors.shape} at {vectors_path}")
+                    vectors = None
+            except (OSError, ValueError) as e:
+                logger.warning(f"Discarding unreadable vector index {vectors_path}: {str(e)}")
+                vectors = None
+
+        ids: List[str] = []
+        if vectors is not None and os.path.exists(ids_path):
+            with open(ids_path, encoding='utf-8', newline='') as f:
+                ids = f.read().split('\n')[:-1]
+            # A crash between growing the file and writing ids leaves ids <= rows
+            ids = ids[:vectors.shape[0]]
+
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(
+                vectors_path, mode='w+', dtype=np.float32, shape=self._vectors.shape
+            )
+            ids = []
+
+        self._vectors = vectors
+        self._assignments = np.zeros(vectors.shape[0], dtype=np.int32)
+        self._ids = ids
+        self._rows = {vector_id: row for row, vector_id in enumerate(ids)}
+
+        # Rewrite the id file so it matches the rows kept
+        with open(ids_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(''.join(vector_id + '\n' for vector_id in ids))
+        self._ids_file = open(ids_path, 'a', encoding='utf-8', newline='')
+
+        centroids_path = os.path.join(self.directory, _CENTROIDS_FILE)
+        if self.mode == "ivf" and ids and os.path.exists(centroids_path):
+            centroids = np.load(centroids_path)
+            if centroids.ndim == 2 and centroids.shape[1] == self.dimension:
+                for start in range(0, len(ids), _BLOCK_ROWS):
+                    block = self._vectors[start:min(start + _BLOCK_ROWS, len(ids))]
+                    self._assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+                self._centroids = centroids.astype(np.float32)
+                self._trained_size = len(ids)
+
+        logger.info(f"Vector index at {self.directory}: {len(ids)} vectors, mode {self.mode}")
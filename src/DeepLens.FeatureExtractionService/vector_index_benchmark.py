@@ -0,0 +1,177 @@
+"""
+Recall and latency benchmark for the in-process vector index
+Builds a VectorIndex over a corpus of vectors (an .npy file of embeddings,
+or synthetic clustered unit vectors shaped like image embeddings) and
+compares IVF search at several nprobe values against exact brute force:
+recall@k of the IVF top-k versus the exact top-k, and p50/p95/p99 latency
+per query for both.
+
+Usage:
+    python vector_index_benchmark.py --vectors 100000 --output index_report.json
+    python vector_index_benchmark.py --corpus embeddings.npy --nprobe 4,16,64
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from pipeline_benchmark import summarize, time_calls
+from vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NPROBE = [1, 4, 16, 64]
+
+
+def clustered_vectors(
+    count: int, dimension: int, clusters: int = 1000, spread: float = 1.5, seed: int = 0
+) -> np.ndarray:
+    """
+    L2-normalized vectors drawn around random centres, so nearest neighbours
+    mostly share a cluster as with embeddings of similar products
+
+    Args:
+        count: Number of vectors
+        dimension: Vector dimension
+        clusters: Number of centres
+        spread: Noise scale relative to the centres
+        seed: Random seed
+
+    Returns:
+        (count, dimension) float32 matrix
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)]
+    vectors += spread * rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(expected: List[List[str]], found: List[List[str]], k: int) -> float:
+    """Mean fraction of each exact top-k found by the approximate search"""
+    if not expected:
+        return 0.0
+    return float(np.mean([
+        len(set(truth[:k]) & set(result[:k])) / max(1, min(k, len(truth)))
+        for truth, result in zip(expected, found)
+    ]))
+
+
+def run_benchmark(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    nlist: Optional[int] = None,
+    nprobe_values: Sequence[int] = DEFAULT_NPROBE,
+    runs: Optional[int] = None
+) -> Dict[str, object]:
+    """
+    Exact versus IVF search over one corpus
+
+    Args:
+        corpus: (N, D) L2-normalized vectors to index
+        queries: (Q, D) query vectors
+        k: Results per query
+        nlist: IVF lists (default sqrt(N))
+        nprobe_values: IVF nprobe settings to measure
+        runs: Timed single-query searches per setting (default Q)
+
+    Returns:
+        Dict with build timings, the exact latency summary and one result per nprobe
+    """
+    nlist = nlist or max(1, int(np.sqrt(corpus.shape[0])))
+    # An exact-mode index never trains on its own; centroids are trained
+    # once on the full corpus and used by the exact=False searches below
+    index = VectorIndex(corpus.shape[1], mode="exact", nlist=nlist, initial_capacity=corpus.shape[0])
+    ids = [str(row) for row in range(corpus.shape[0])]
+
+    start = time.perf_counter()
+    index.add(ids, corpus)
+    add_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    index.train()
+    train_ms = (time.perf_counter() - start) * 1000
+
+    runs = runs or queries.shape[0]
+    exact = [[vector_id for vector_id, _ in hits] for hits in index.search(queries, k, exact=True)]
+    query_cycle = [queries[position % queries.shape[0]] for position in range(runs)]
+
+    def timed(**options) -> List[float]:
+        iterator = iter(query_cycle)
+        return time_calls(lambda: index.search(next(iterator), k, **options), runs, warmup=0)
+
+    report = {
+        'vectors': int(corpus.shape[0]),
+        'dimension': int(corpus.shape[1]),
+        'queries': int(queries.shape[0]),
+        'k': k,
+        'nlist': nlist,
+        'add_ms': round(add_ms, 2),
+        'train_ms': round(train_ms, 2),
+        'exact': summarize(timed(exact=True)),
+        'ivf': []
+    }
+    exact_p50 = report['exact']['p50_ms']
+
+    for nprobe in nprobe_values:
+        found = [
+            [vector_id for vector_id, _ in hits]
+            for hits in index.search(queries, k, exact=False, nprobe=nprobe)
+        ]
+        latency = summarize(timed(exact=False, nprobe=nprobe))
+        result = {
+            'nprobe': nprobe,
+            'recall_at_k': round(recall_at_k(exact, found, k), 4),
+            **latency,
+            'speedup': round(exact_p50 / latency['p50_ms'], 2) if latency['p50_ms'] > 0 else None
+        }
+        logger.info(f"nprobe {nprobe}: recall@{k} {result['recall_at_k']}, p50 {result['p50_ms']} ms")
+        report['ivf'].append(result)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure vector index recall and latency against brute force")
+    parser.add_argument("--corpus", help=".npy file of (N, D) embeddings (synthetic vectors if omitted)")
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--dimension", type=int, default=2048, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Queries, held out from the corpus")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, help="IVF lists (default sqrt(N))")
+    parser.add_argument("--nprobe", default=",".join(str(value) for value in DEFAULT_NPROBE))
+    parser.add_argument("--output", default="vector_index_report.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.corpus:
+        vectors = np.load(args.corpus).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8
+    else:
+        vectors = clustered_vectors(args.vectors + args.queries, args.dimension)
+    corpus, queries = vectors[args.queries:], vectors[:args.queries]
+
+    report = run_benchmark(
+        corpus,
+        queries,
+        k=args.k,
+        nlist=args.nlist,
+        nprobe_values=[int(value) for value in args.nprobe.split(',') if value]
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['vectors']} vectors x {report['dimension']}, nlist {report['nlist']}, "
+          f"train {report['train_ms']} ms")
+    print(f"exact      p50 {report['exact']['p50_ms']:>9.3f} ms  p99 {report['exact']['p99_ms']:>9.3f} ms")
+    for result in report['ivf']:
+        print(f"nprobe {result['nprobe']:<4} p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+              f"recall@{report['k']} {result['recall_at_k']:.4f}  {result['speedup']}x")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
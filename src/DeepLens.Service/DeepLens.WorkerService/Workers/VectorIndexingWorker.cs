@@ -107,6 +107,15 @@ public class VectorIndexingWorker : BackgroundService
             await vectorStoreService.CreateCollectionAsync(tenantId, indexingEvent.Data.ModelName, indexingEvent.Data.FeatureVector.Length, cancellationToken);
         }
 
+        // Events from the Python extraction service's Kafka consumer have not been through
+        // FeatureExtractionWorker, so the media dimensions are persisted here for every producer
+        var imageMetadata = indexingEvent.Data.ImageMetadata;
+        if (imageMetadata.Width > 0 && imageMetadata.Height > 0)
+        {
+            var metadataService = serviceProvider.GetRequiredService<IMetadataService>();
+            await metadataService.UpdateMediaDimensionsAsync(indexingEvent.Data.ImageId, imageMetadata.Width, imageMetadata.Height);
+        }
+
         var vectorMetadata = indexingEvent.Data.VectorMetadata.ToDictionary();
         vectorMetadata["image_width"] = indexingEvent.Data.ImageMetadata.Width;
         vectorMetadata["image_height"] = indexingEvent.Data.ImageMetadata.Height;